@@ -0,0 +1,38 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Utilidades compartidas por los scripts de benchmark.
+Los módulos de la aplicación usan imports absolutos desde ecoreport_semi/
+(igual que al ejecutar main.py), así que se añade esa carpeta a sys.path.
+"""
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_APP = os.path.join(RAIZ_REPO, "ecoreport_semi")
+if DIR_APP not in sys.path:
+    sys.path.insert(0, DIR_APP)
+
+
+def metadatos_entorno() -> dict:
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def guardar_resultados(nombre_benchmark: str, resultados: dict, ruta_salida: str = None) -> dict:
+    """Añade metadatos del entorno, imprime el JSON y, si se indica, lo escribe en ruta_salida."""
+    documento = {"benchmark": nombre_benchmark, "entorno": metadatos_entorno(), "resultados": resultados}
+    texto = json.dumps(documento, indent=2, ensure_ascii=False)
+    print(texto)
+    if ruta_salida:
+        with open(ruta_salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    return documento
@@ -0,0 +1,122 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Latencia de búsqueda del archivo de estudios (archivo_estudios.py) con muchos estudios.
+
+Llena un archivo SQLite con --estudios estudios sintéticos (por defecto un millón,
+repartidos entre --estudios/5 pacientes y varios años de fechas) y mide consultas
+aleatorias: carga completa por id_informe, listado por NHC y listado por rango de un
+día. Informa p50/p99 en ms y si el p99 queda por debajo del objetivo (10 ms).
+
+Llenar el archivo lleva unos minutos; con --reutilizar se mide un archivo ya lleno.
+
+Uso:
+    python benchmarks/bench_archivo.py [--estudios 1000000] [--archivo /tmp/bench.sqlite3]
+                                       [--reutilizar] [--salida resultados.json]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from archivo_estudios import ArchivoEstudios
+
+OBJETIVO_MS = 10.0
+ESTUDIOS_POR_PACIENTE = 5
+FECHA_INICIAL = datetime(2020, 1, 1)
+MINUTOS_RANGO_FECHAS = 5 * 365 * 24 * 60
+LOTE = 5000
+
+
+def _nhc(indice_paciente: int) -> str:
+    return f"NHC{indice_paciente:08d}"
+
+
+def _estudios_sinteticos(n: int, rng: random.Random):
+    """Recorre plantillas sintéticas cambiando id, NHC y fecha. Se reutiliza el mismo
+    objeto: guardar_varios serializa cada estudio antes de pedir el siguiente."""
+    plantillas = generar_estudios(500)
+    n_pacientes = max(1, n // ESTUDIOS_POR_PACIENTE)
+    for i in range(n):
+        informe = plantillas[i % len(plantillas)]
+        informe.id_informe = f"BENCH-{i:09d}"
+        informe.paciente.nhc = _nhc(rng.randrange(n_pacientes))
+        informe.paciente.fecha_estudio = FECHA_INICIAL + timedelta(minutes=rng.randrange(MINUTOS_RANGO_FECHAS))
+        yield informe
+
+
+def llenar(archivo: ArchivoEstudios, n: int, rng: random.Random) -> float:
+    inicio = time.perf_counter()
+    estudios = _estudios_sinteticos(n, rng)
+    while archivo.guardar_varios(islice(estudios, LOTE)) > 0:
+        pass
+    return time.perf_counter() - inicio
+
+
+def _estadisticas_ms(latencias: list) -> dict:
+    latencias.sort()
+    p = lambda q: round(latencias[min(len(latencias) - 1, int(q * len(latencias)))] * 1e3, 3)
+    return {"consultas": len(latencias), "p50_ms": p(0.50), "p99_ms": p(0.99), "max_ms": p(1.0)}
+
+
+def medir(consulta, argumentos: list) -> dict:
+    latencias = []
+    for argumento in argumentos:
+        t = time.perf_counter()
+        consulta(argumento)
+        latencias.append(time.perf_counter() - t)
+    return _estadisticas_ms(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudios", type=int, default=1_000_000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--archivo", default=os.path.join(tempfile.gettempdir(), "ecoreport_bench_archivo.sqlite3"))
+    parser.add_argument("--reutilizar", action="store_true", help="No rellenar si el archivo ya tiene estudios")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    rng = random.Random(2024)
+    if not args.reutilizar and os.path.exists(args.archivo):
+        os.remove(args.archivo)
+    with ArchivoEstudios(args.archivo) as archivo:
+        segundos_llenado = None
+        if len(archivo) == 0:
+            segundos_llenado = llenar(archivo, args.estudios, rng)
+        n = len(archivo)
+        n_pacientes = max(1, n // ESTUDIOS_POR_PACIENTE)
+
+        ids = [f"BENCH-{rng.randrange(n):09d}" for _ in range(args.consultas)]
+        nhcs = [_nhc(rng.randrange(n_pacientes)) for _ in range(args.consultas)]
+        dias = [FECHA_INICIAL + timedelta(days=rng.randrange(5 * 365)) for _ in range(args.consultas)]
+
+        consultas = {
+            "cargar_por_id": medir(archivo.cargar, ids),
+            "buscar_por_nhc": medir(archivo.buscar_por_nhc, nhcs),
+            "buscar_por_fecha_un_dia": medir(lambda dia: archivo.buscar_por_fecha(dia, dia + timedelta(days=1)), dias),
+        }
+
+    resultados = {
+        "estudios": n,
+        "pacientes": n_pacientes,
+        "tamano_archivo_mb": round(os.path.getsize(args.archivo) / 2**20, 1),
+        "segundos_llenado": round(segundos_llenado, 1) if segundos_llenado is not None else None,
+        "consultas": consultas,
+        "objetivo_p99_ms": OBJETIVO_MS,
+        "objetivo_cumplido": all(c["p99_ms"] < OBJETIVO_MS for c in consultas.values()),
+    }
+    guardar_resultados("archivo_estudios", resultados, args.salida)
+
+
+if __name__ == "__main__":
+    main()
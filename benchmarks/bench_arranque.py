@@ -0,0 +1,146 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Tiempo de arranque de la interfaz: desde main() hasta el primer pintado de la ventana.
+
+Lanza main.py --repeticiones veces en procesos nuevos con ECOREPORT_MEDIR_ARRANQUE=1
+(imprime los ms y se cierra), alternando la construcción diferida de las secciones de
+DatosEcoTab (por defecto) y la construcción de todo al arrancar (ECOREPORT_UI_DIFERIDA=0).
+Informa mediana, mínimo y máximo de cada modo y la mejora de la mediana.
+
+Después comprueba en este proceso que la construcción diferida no cambia el
+comportamiento: una sección sin construir no toca el modelo al sincronizar, al
+construirse muestra el modelo actual (también tras cambiar de estudio), se construye al
+desplazarse hasta ella o desplegarla, y lo editado en ella llega al modelo.
+Termina con código 1 si alguna comprobación falla.
+
+Sin pantalla se usa QT_QPA_PLATFORM=offscreen.
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 10] [--salida resultados.json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from _comun import DIR_APP, guardar_resultados
+
+MODOS = {"diferida": "1", "completa": "0"}
+
+
+def medir_arranque(diferida: str, directorio: str) -> float:
+    entorno = dict(os.environ, ECOREPORT_MEDIR_ARRANQUE="1", ECOREPORT_UI_DIFERIDA=diferida,
+                   ECOREPORT_DIARIO=os.path.join(directorio, "arranque.diario"),
+                   ECOREPORT_ARCHIVO=os.path.join(directorio, "estudios.sqlite3"))
+    salida = subprocess.run([sys.executable, os.path.join(DIR_APP, "main.py")], env=entorno, cwd=DIR_APP,
+                            capture_output=True, text=True, timeout=120).stdout
+    for linea in salida.splitlines():
+        if linea.startswith("arranque_ms="):
+            return float(linea.split()[0].partition("=")[2])
+    raise RuntimeError(f"main.py no informó del tiempo de arranque:\n{salida}")
+
+
+def medir_modos(repeticiones: int) -> dict:
+    tiempos = {modo: [] for modo in MODOS}
+    with tempfile.TemporaryDirectory() as directorio:
+        for _ in range(repeticiones): # Alternados, para que ambos sufran igual el ruido del equipo
+            for modo, valor in MODOS.items():
+                tiempos[modo].append(medir_arranque(valor, directorio))
+    resultados = {modo: {"mediana_ms": round(statistics.median(t), 1), "min_ms": round(min(t), 1),
+                         "max_ms": round(max(t), 1)} for modo, t in tiempos.items()}
+    resultados["mejora_mediana_ms"] = round(resultados["completa"]["mediana_ms"] - resultados["diferida"]["mediana_ms"], 1)
+    return resultados
+
+
+def comprobar_diferida() -> list:
+    from PyQt5.QtWidgets import QApplication
+    from gui.tabs.datos_eco_tab import DatosEcoTab
+    from models import InformeEcoCompleto, P_VEXUS_VP, P_DERR_PLEURAL_PRESENTE, P_DERR_PLEURAL_LOC, P_VI_DTDVI
+
+    app = QApplication.instance() or QApplication([])
+    errores = []
+    informe = InformeEcoCompleto()
+    informe.derrame_pleural.presente, informe.derrame_pleural.localizacion = True, "Derecho"
+    informe.param_no_valorado_flags[P_VEXUS_VP] = True
+    tab = DatosEcoTab(informe)
+    tab.resize(1000, 500)
+    tab.show()
+    app.processEvents()
+    ultima = tab.secciones[-1]
+    if ultima.construida:
+        errores.append("la última sección se construyó sin estar a la vista")
+
+    # Sincronizar la pestaña no toca los campos de secciones sin construir
+    tab.actualizar_modelo()
+    if informe.derrame_pleural.localizacion != "Derecho" or not informe.param_no_valorado_flags.get(P_VEXUS_VP):
+        errores.append("actualizar_modelo modificó campos de una sección sin construir")
+
+    # Otro estudio antes de construirla: al construirse muestra el estudio actual
+    otro = InformeEcoCompleto()
+    otro.derrame_pleural.presente, otro.derrame_pleural.localizacion = True, "Bilateral"
+    otro.medidas_vi.dtdvi_mm = 55.0
+    tab.set_modelo(otro)
+    if tab.param_controls[P_VI_DTDVI]["input"].text() != "55.0":
+        errores.append("set_modelo no actualizó una sección construida")
+    tab.scroll_area.verticalScrollBar().setValue(tab.scroll_area.verticalScrollBar().maximum())
+    for _ in range(5):
+        app.processEvents()
+    if not ultima.construida:
+        errores.append("la última sección no se construyó al desplazarse hasta ella")
+    else:
+        controles = tab.param_controls[P_DERR_PLEURAL_LOC]
+        if controles["input"].currentText() != "Bilateral" or not controles["input"].isEnabled():
+            errores.append("la sección construida no refleja el modelo actual")
+        if tab.param_controls[P_VEXUS_VP]["nv_check"].isChecked():
+            errores.append("la sección construida muestra el NV del estudio anterior")
+        controles["input"].setCurrentText("Izquierdo") # Editar en ella llega al modelo
+        if otro.derrame_pleural.localizacion != "Izquierdo":
+            errores.append("lo editado en una sección diferida no llegó al modelo")
+        tab.param_controls[P_DERR_PLEURAL_PRESENTE]["button_group"].buttons()[0].click() # "Ausente"
+        if otro.derrame_pleural.localizacion is not None:
+            errores.append("los campos dependientes de una sección diferida no se reiniciaron")
+
+    # Plegada no se construye; al desplegarla, sí
+    tab2 = DatosEcoTab(InformeEcoCompleto())
+    tab2.resize(1000, 300)
+    seccion = tab2.secciones[-1]
+    seccion.cabecera.setChecked(False)
+    tab2.show()
+    tab2.scroll_area.verticalScrollBar().setValue(tab2.scroll_area.verticalScrollBar().maximum())
+    for _ in range(5):
+        app.processEvents()
+    if seccion.construida:
+        errores.append("una sección plegada se construyó")
+    seccion.cabecera.setChecked(True)
+    if not seccion.construida:
+        errores.append("una sección no se construyó al desplegarla")
+    for _ in range(3):
+        app.processEvents()
+    if not tab2._imagen_cargada:
+        errores.append("la imagen VExUS no se cargó tras el primer pintado")
+    tab.close(); tab2.close()
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    resultados = {"arranque": medir_modos(args.repeticiones)}
+    errores = comprobar_diferida()
+    resultados.update({"errores": errores, "total_errores": len(errores)})
+    guardar_resultados("arranque", resultados, args.salida)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Coste y seguridad del diario de recuperación (diario_recuperacion.py).
+
+- registrar(): microsegundos por llamada en el hilo de la interfaz.
+- Tecleo simulado (--ediciones cambios a ~1000 por segundo, repartidos entre los campos,
+  con valores repetidos): escrituras con fsync por segundo y bytes en disco por cambio.
+- Cierre abrupto: un proceso hijo escribe cambios numerados, avisa tras un sincronizar()
+  y recibe SIGKILL poco después. Lo recuperado debe ser el estado tras un prefijo de los
+  cambios que incluya todos los sincronizados (--repeticiones veces; solo en POSIX).
+- Escrituras interrumpidas: el diario truncado en posiciones aleatorias, o con un byte
+  alterado, debe reproducirse sin excepciones hasta un prefijo de los cambios.
+- Compactación: tras 3 * COMPACTAR_CADA cambios el fichero no pasa de COMPACTAR_CADA líneas.
+- Arranque: tiempo de recuperar() con el diario más largo posible (COMPACTAR_CADA líneas).
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_diario.py [--ediciones 3000] [--repeticiones 20] [--salida resultados.json]
+"""
+import argparse
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "ERROR")
+
+from _comun import guardar_resultados
+
+from diario_recuperacion import COMPACTAR_CADA, DiarioRecuperacion, reproducir
+from models import InformeEcoCompleto, informe_a_dict
+
+CAMPOS = ("medidas_vi.septo_iv_mm", "medidas_vi.dtdvi_mm", "medidas_vi.fevi_porcentaje", "medidas_vd.tapse_mm",
+          "presiones_llenado.e_sobre_e_prima_ratio", "vci.diametro_max_mm", "comentarios_adicionales")
+
+
+def _cambio(i: int):
+    """Cambio número i: el campo i % len(CAMPOS) pasa a valer i (sin dos seguidos iguales)."""
+    campo = CAMPOS[i % len(CAMPOS)]
+    return campo, (f"nota {i}" if campo == "comentarios_adicionales" else float(i))
+
+
+def _valor(estado: dict, campo: str):
+    seccion, _, atributo = campo.partition(".")
+    return estado[seccion][atributo] if atributo else estado[seccion]
+
+
+def _prefijo(estado: dict, base: dict) -> int:
+    """Número de cambios aplicados a 'estado', o -1 si no es el estado tras ningún prefijo."""
+    aplicados = 0
+    for campo in CAMPOS:
+        valor = _valor(estado, campo)
+        if valor != _valor(base, campo):
+            aplicados = max(aplicados, int(float(str(valor).replace("nota ", ""))) + 1)
+    for campo in CAMPOS: # Cada campo debe tener su último valor dentro del prefijo
+        ultimos = [i for i in range(aplicados) if _cambio(i)[0] == campo]
+        esperado = _cambio(ultimos[-1])[1] if ultimos else _valor(base, campo)
+        if _valor(estado, campo) != esperado:
+            return -1
+    return aplicados
+
+
+def medir_registrar(directorio: str, llamadas: int = 200000) -> dict:
+    diario = DiarioRecuperacion(os.path.join(directorio, "registrar.diario"), intervalo_sync_s=2.0)
+    diario.iniciar(InformeEcoCompleto())
+    cambios = [_cambio(i) for i in range(1000)]
+    inicio = time.perf_counter()
+    for i in range(llamadas):
+        diario.registrar(*cambios[i % 1000])
+    segundos = time.perf_counter() - inicio
+    diario.cerrar()
+    return {"llamadas": llamadas, "us_por_llamada": round(segundos / llamadas * 1e6, 2)}
+
+
+def medir_tecleo(directorio: str, ediciones: int) -> dict:
+    """Cada pulsación reenvía todos los campos (como actualizar_modelo()): solo cambia uno."""
+    ruta = os.path.join(directorio, "tecleo.diario")
+    diario = DiarioRecuperacion(ruta, intervalo_sync_s=0.5)
+    diario.iniciar(InformeEcoCompleto())
+    diario.sincronizar()
+    tamano_base = os.path.getsize(ruta)
+    valores = {campo: None for campo in CAMPOS}
+    inicio = time.perf_counter()
+    for i in range(ediciones):
+        campo, valor = _cambio(i // 5) # Cinco pulsaciones seguidas en el mismo campo
+        valores[campo] = valor if not isinstance(valor, float) else valor + (i % 5) / 10
+        for clave, actual in valores.items():
+            diario.registrar(clave, actual)
+        time.sleep(0.001)
+    segundos = time.perf_counter() - inicio
+    diario.sincronizar()
+    escrituras, bytes_escritos = diario.estadisticas["escrituras"], os.path.getsize(ruta) - tamano_base
+    diario.cerrar()
+    return {"ediciones": ediciones, "segundos": round(segundos, 2),
+            "fsync_s": round(escrituras / segundos, 2), "bytes_por_edicion": round(bytes_escritos / ediciones, 1),
+            "omitidos": diario.estadisticas["omitidos"]}
+
+
+def _hijo(ruta: str, escritura_aviso: int):
+    diario = DiarioRecuperacion(ruta, intervalo_sync_s=0.05)
+    diario.iniciar(InformeEcoCompleto())
+    i = 0
+    while True:
+        diario.registrar(*_cambio(i))
+        i += 1
+        if i % 500 == 0:
+            diario.sincronizar()
+            os.write(escritura_aviso, b"%d\n" % i)
+        time.sleep(0.0001)
+
+
+def probar_cierre_abrupto(directorio: str, repeticiones: int) -> dict:
+    errores, recuperados = [], []
+    if not hasattr(os, "fork"):
+        return {"omitido": "sin os.fork en esta plataforma"}
+    base = _estado_base()
+    rng = random.Random(21)
+    for repeticion in range(repeticiones):
+        ruta = os.path.join(directorio, f"abrupto_{repeticion}.diario")
+        lectura, escritura = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(lectura)
+                _hijo(ruta, escritura)
+            finally:
+                os._exit(0)
+        os.close(escritura)
+        with os.fdopen(lectura, "rb") as aviso:
+            sincronizados = int(aviso.readline())
+            time.sleep(rng.uniform(0, 0.05)) # Morir en cualquier punto del lote siguiente
+            os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        reproduccion = reproducir(ruta)
+        aplicados = _prefijo(reproduccion.estado, base) if reproduccion.estado else -1
+        recuperados.append(aplicados - sincronizados)
+        if aplicados < sincronizados:
+            errores.append(f"repetición {repeticion}: {aplicados} cambios recuperados, {sincronizados} sincronizados")
+    return {"repeticiones": repeticiones, "cambios_tras_ultimo_sincronizar": [min(recuperados), max(recuperados)],
+            "errores": errores}
+
+
+def _estado_base() -> dict:
+    return informe_a_dict(InformeEcoCompleto())
+
+
+def probar_truncados(directorio: str, cambios: int = 2000, cortes: int = 300) -> dict:
+    ruta = os.path.join(directorio, "truncado.diario")
+    diario = DiarioRecuperacion(ruta, intervalo_sync_s=0.01)
+    diario.iniciar(InformeEcoCompleto())
+    for i in range(cambios):
+        diario.registrar(*_cambio(i))
+        if i % 100 == 0:
+            diario.sincronizar()
+    diario.cerrar()
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    base, errores = _estado_base(), []
+    copia = os.path.join(directorio, "copia.diario")
+    rng = random.Random(7)
+    for n in range(cortes):
+        posicion = rng.randrange(len(datos))
+        if n % 2:
+            defectuoso = datos[:posicion]
+        else:
+            defectuoso = bytearray(datos)
+            defectuoso[posicion] ^= 1 << rng.randrange(8)
+        with open(copia, "wb") as f:
+            f.write(defectuoso)
+        try:
+            reproduccion = reproducir(copia)
+        except Exception as e: # noqa: BLE001 - cualquier excepción es un fallo
+            errores.append(f"posición {posicion}: {type(e).__name__}: {e}")
+            continue
+        if reproduccion.estado is not None and _prefijo(reproduccion.estado, base) < 0:
+            errores.append(f"posición {posicion}: el estado no corresponde a ningún prefijo")
+    return {"cortes": cortes, "errores": errores[:20], "total_errores": len(errores)}
+
+
+def probar_compactacion(directorio: str) -> dict:
+    ruta = os.path.join(directorio, "compactacion.diario")
+    diario = DiarioRecuperacion(ruta, intervalo_sync_s=0.01)
+    diario.iniciar(InformeEcoCompleto())
+    maximo_lineas = 0
+    for i in range(3 * COMPACTAR_CADA):
+        diario.registrar(*_cambio(i))
+        if i % 200 == 0:
+            diario.sincronizar()
+            with open(ruta, "rb") as f:
+                maximo_lineas = max(maximo_lineas, sum(1 for _ in f))
+    diario.cerrar()
+    reproduccion = reproducir(ruta)
+    aplicados = _prefijo(reproduccion.estado, _estado_base())
+    return {"cambios": 3 * COMPACTAR_CADA, "compactaciones": diario.estadisticas["compactaciones"],
+            "maximo_lineas": maximo_lineas, "kib_final": round(os.path.getsize(ruta) / 1024, 1),
+            "ok": maximo_lineas <= COMPACTAR_CADA + 1 and aplicados == 3 * COMPACTAR_CADA}
+
+
+def medir_arranque(directorio: str) -> dict:
+    ruta = os.path.join(directorio, "arranque.diario")
+    diario = DiarioRecuperacion(ruta, intervalo_sync_s=60)
+    diario.iniciar(InformeEcoCompleto())
+    for i in range(COMPACTAR_CADA - 1):
+        diario.registrar(*_cambio(i))
+    diario.cerrar()
+    lector = DiarioRecuperacion(ruta)
+    inicio = time.perf_counter()
+    informe = lector.recuperar()
+    milisegundos = (time.perf_counter() - inicio) * 1000
+    lector.cerrar()
+    return {"lineas": COMPACTAR_CADA, "recuperar_ms": round(milisegundos, 1), "ok": informe is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ediciones", type=int, default=3000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_diario_")
+    try:
+        resultados = {
+            "registrar": medir_registrar(directorio),
+            "tecleo": medir_tecleo(directorio, args.ediciones),
+            "cierre_abrupto": probar_cierre_abrupto(directorio, args.repeticiones),
+            "escrituras_interrumpidas": probar_truncados(directorio),
+            "compactacion": probar_compactacion(directorio),
+            "arranque": medir_arranque(directorio),
+        }
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    guardar_resultados("diario", resultados, args.salida)
+    fallos = (resultados["cierre_abrupto"].get("errores") or resultados["escrituras_interrumpidas"]["total_errores"]
+              or not resultados["compactacion"]["ok"] or not resultados["arranque"]["ok"])
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
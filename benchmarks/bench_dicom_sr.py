@@ -0,0 +1,307 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Exactitud y rendimiento de la importación DICOM SR (importacion_dicom_sr.py).
+
+Escribe informes estructurados a partir de los estudios sintéticos de bench_informe
+(árbol de contenido con contenedores anidados, cada medida como un ítem NUM con código
+LOINC, código privado con CodeMeaning o abreviatura, y unidades UCUM variadas), alternando
+little endian explícito e implícito, secuencias de longitud definida e indefinida y
+deflate, con un elemento privado grande que hay que saltar. Intercala SR defectuosos
+(unidad desconocida con otra medida válida, ningún concepto reconocido, fichero truncado)
+y, como en una carpeta exportada por el ecógrafo, multiframes de ecografía y ficheros
+que no son DICOM. Después:
+- importa el directorio y compara cada medida, el paciente, la fecha y el operador con
+  el estudio original, y las incidencias con las esperadas;
+- mide la precarga de la interfaz: una carpeta con un SR junto a --multiframes ficheros
+  de --mib-multiframe MiB (dispersos en disco), importada y aplicada con
+  completar_informe; debe quedar por debajo de un segundo;
+- mide ficheros/s al importar un directorio de --ficheros SR con 1 y --procesos procesos.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_dicom_sr.py [--verificar 600] [--ficheros 3000] [--procesos 4]
+                                        [--multiframes 4] [--mib-multiframe 1024] [--salida resultados.json]
+"""
+import argparse
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "ERROR")
+os.environ.setdefault("ECOREPORT_LOG_NIVEL", "ERROR")
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from importacion_dicom_sr import importar_sr
+from medidas_importadas import completar_informe
+from models import InformeEcoCompleto
+
+FECHA_INICIAL = datetime(2024, 1, 1, 8, 0)
+CADA_DEFECTUOSO = 40
+CADA_IMAGEN = 10
+LIMITE_PRECARGA_S = 1.0
+CLASE_SR = "1.2.840.10008.5.1.4.1.1.88.33" # Comprehensive SR
+CLASE_MULTIFRAME = "1.2.840.10008.5.1.4.1.1.3.1" # Ultrasound Multi-frame Image
+EXPLICITA, IMPLICITA, DEFLATE = "1.2.840.10008.1.2.1", "1.2.840.10008.1.2", "1.2.840.10008.1.2.1.99"
+_VR_LARGOS = {"OB", "OW", "SQ", "UN", "UT"}
+
+# Campo -> ((código, esquema, significado), unidad UCUM, factor desde la unidad del modelo)
+_NUM = {
+    ("medidas_vi", "septo_iv_mm"): (("18154-5", "LN", "Interventricular Septum Diastolic Thickness"), "cm", 0.1),
+    ("medidas_vi", "pared_posterior_vi_mm"): (("18152-9", "LN", "Left Ventricle Posterior Wall Diastolic Thickness"), "mm", 1.0),
+    ("medidas_vi", "dtdvi_mm"): (("29436-3", "LN", "Left Ventricle Internal End Diastolic Dimension"), "cm", 0.1),
+    ("medidas_vi", "fevi_porcentaje"): (("10230-1", "LN", "Left Ventricular Ejection Fraction"), "%", 1.0),
+    ("medidas_auriculas", "ai_vol_ml_m2"): (("ECO-0001", "99ECO", "Left Atrium Volume Index"), "ml/m2", 1.0),
+    ("medidas_vd", "vd_diametro_basal_mm"): (("RVD1", "99ECO", "RV basal"), "mm", 1.0),
+    ("medidas_vd", "tapse_mm"): (("ECO-0002", "99ECO", "Tricuspid Annular Plane Systolic Excursion"), "cm", 0.1),
+    ("presiones_llenado", "mitral_e_a_ratio"): (("ECO-0003", "99ECO", "Mitral Valve E/A Ratio"), "{ratio}", 1.0),
+    ("presiones_llenado", "e_prima_septal_cms"): (("E' Sept", "99ECO", "E' septal"), "m/s", 0.01),
+    ("presiones_llenado", "e_prima_lateral_cms"): (("E' Lat", "99ECO", "E' lateral"), "cm/s", 1.0),
+    ("presiones_llenado", "e_sobre_e_prima_ratio"): (("E/E' avg", "99ECO", "E/E'"), "1", 1.0),
+    ("presiones_llenado", "it_velocidad_max_ms"): (("ECO-0004", "99ECO", "Tricuspid Regurgitation Peak Velocity"), "cm/s", 100.0),
+    ("vci", "diametro_max_mm"): (("ECO-0005", "99ECO", "Inferior Vena Cava Diameter"), "mm", 1.0),
+    ("vci", "mm_inspiracion"): (("IVC Insp", "99ECO", "IVC insp"), "cm", 0.1),
+}
+_DEFECTUOSOS = ("unidad 'in'", "ninguna medida reconocida", "truncado")
+
+
+# --- Escritura mínima de DICOM ---
+
+def _elemento(tag: int, vr: str, valor: bytes, explicita: bool) -> bytes:
+    if len(valor) % 2:
+        valor += b"\0" if vr in ("UI", "OB") else b" "
+    grupo, elemento = tag >> 16, tag & 0xFFFF
+    if not explicita:
+        return struct.pack("<HHI", grupo, elemento, len(valor)) + valor
+    if vr in _VR_LARGOS:
+        return struct.pack("<HH2s2xI", grupo, elemento, vr.encode(), len(valor)) + valor
+    return struct.pack("<HH2sH", grupo, elemento, vr.encode(), len(valor)) + valor
+
+
+def _secuencia(tag: int, items, explicita: bool, indefinida: bool) -> bytes:
+    grupo, elemento = tag >> 16, tag & 0xFFFF
+    if indefinida:
+        cuerpo = b"".join(struct.pack("<HHI", 0xFFFE, 0xE000, 0xFFFFFFFF) + item + struct.pack("<HHI", 0xFFFE, 0xE00D, 0)
+                          for item in items) + struct.pack("<HHI", 0xFFFE, 0xE0DD, 0)
+        longitud = 0xFFFFFFFF
+    else:
+        cuerpo = b"".join(struct.pack("<HHI", 0xFFFE, 0xE000, len(item)) + item for item in items)
+        longitud = len(cuerpo)
+    if explicita:
+        return struct.pack("<HH2s2xI", grupo, elemento, b"SQ", longitud) + cuerpo
+    return struct.pack("<HHI", grupo, elemento, longitud) + cuerpo
+
+
+def _meta(clase: str, instancia: str, sintaxis: str) -> bytes:
+    elementos = (_elemento(0x00020001, "OB", b"\0\1", True) + _elemento(0x00020002, "UI", clase.encode(), True)
+                 + _elemento(0x00020003, "UI", instancia.encode(), True) + _elemento(0x00020010, "UI", sintaxis.encode(), True))
+    return b"\0" * 128 + b"DICM" + _elemento(0x00020000, "UL", struct.pack("<I", len(elementos)), True) + elementos
+
+
+class _EscritorSR:
+    def __init__(self, explicita: bool, indefinida: bool):
+        self.explicita, self.indefinida = explicita, indefinida
+
+    def e(self, tag, vr, texto) -> bytes:
+        return _elemento(tag, vr, texto if isinstance(texto, bytes) else texto.encode("utf-8"), self.explicita)
+
+    def sq(self, tag, items) -> bytes:
+        return _secuencia(tag, items, self.explicita, self.indefinida)
+
+    def codigo(self, valor, esquema, significado) -> bytes:
+        return self.e(0x00080100, "SH", valor) + self.e(0x00080102, "SH", esquema) + self.e(0x00080104, "LO", significado)
+
+    def item(self, relacion, tipo, concepto, *resto, hijos=None) -> bytes:
+        datos = (self.e(0x0040A010, "CS", relacion) + self.e(0x0040A040, "CS", tipo)
+                 + self.sq(0x0040A043, [self.codigo(*concepto)]) + b"".join(resto))
+        return datos + (self.sq(0x0040A730, hijos) if hijos else b"")
+
+    def num(self, concepto, valor, unidad, hijos=None) -> bytes:
+        medido = self.sq(0x004008EA, [self.codigo(unidad, "UCUM", unidad)]) + self.e(0x0040A30A, "DS", valor)
+        return self.item("CONTAINS", "NUM", concepto, self.sq(0x0040A300, [medido]), hijos=hijos)
+
+
+def _sr(i: int, informe, defecto: str = "") -> bytes:
+    variante = (i + i // CADA_DEFECTUOSO) % 4 # Los defectuosos también pasan por todas las variantes
+    sintaxis = (EXPLICITA, EXPLICITA, IMPLICITA, DEFLATE)[variante]
+    w = _EscritorSR(explicita=sintaxis != IMPLICITA, indefinida=variante in (1, 2))
+    p = informe.paciente
+    fecha = FECHA_INICIAL + timedelta(minutes=7 * i)
+    medidas = []
+    for (seccion, atributo), (concepto, unidad, factor) in _NUM.items():
+        valor = getattr(getattr(informe, seccion), atributo)
+        if valor is None or defecto == "ninguna medida reconocida":
+            continue
+        modificador = w.item("HAS CONCEPT MOD", "CODE", ("121401", "DCM", "Derivation"),
+                             w.sq(0x0040A168, [w.codigo("R-00317", "SRT", "Mean")]))
+        medidas.append(w.num(concepto, repr(valor * factor)[:16], unidad, hijos=[modificador] if i % 2 else None))
+    if informe.vci.colapso_mayor_50 is not None and not defecto:
+        medidas.append(w.num(("IVC COLLAPSE", "99ECO", "IVC collapse"), "60" if informe.vci.colapso_mayor_50 else "30", "%"))
+    medidas.append(w.num(("8867-4", "LN", "Heart rate"), "72", "/min")) # Sin correspondencia: se ignora
+    if defecto == "unidad 'in'":
+        medidas.append(w.num(("IVC", "99ECO", "IVC"), "0.9", "in"))
+    if not any(getattr(getattr(informe, s), a) is not None for s, a in _NUM) and not defecto:
+        medidas.append(w.num(("LVEF", "99ECO", "LVEF"), "55", "%"))
+    observador = w.item("HAS OBS CONTEXT", "PNAME", ("121008", "DCM", "Person Observer Name"),
+                        w.e(0x0040A123, "PN", "Gómez^Lucía"))
+    hijos = [observador, w.item("CONTAINS", "CONTAINER", ("121070", "DCM", "Findings"), hijos=medidas)]
+    uid = f"1.2.826.0.1.3680043.9.7{i:07d}"
+    conjunto = (w.e(0x00080005, "CS", "ISO_IR 192") + w.e(0x00080016, "UI", CLASE_SR) + w.e(0x00080018, "UI", uid)
+                + w.e(0x00080020, "DA", fecha.strftime("%Y%m%d")) + w.e(0x00080030, "TM", fecha.strftime("%H%M%S.000"))
+                + w.e(0x00080060, "CS", "SR") + w.e(0x00081070, "PN", "Otro^Operador")
+                + w.e(0x00090010, "LO", "ECO PRIVADO") + _elemento(0x00091001, "OB", b"\xAB" * 65536, w.explicita)
+                + w.e(0x00100010, "PN", f"{p.apellidos or 'Apellido'}^{p.nombre or 'Nombre'}")
+                + w.e(0x00100020, "LO", f"NHC{i:07d}") + w.e(0x00100040, "CS", p.sexo or "O")
+                + w.item("", "CONTAINER", ("18748-4", "LN", "Diagnostic Imaging Report"), hijos=hijos)
+                + _elemento(0x0040A372, "UT", b"Elemento posterior al contenido" * 8, w.explicita))
+    if sintaxis == DEFLATE:
+        compresor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        conjunto = compresor.compress(conjunto) + compresor.flush()
+    datos = _meta(CLASE_SR, uid, sintaxis) + conjunto
+    return datos[:len(datos) // 2] if defecto == "truncado" else datos
+
+
+def _multiframe(ruta: str, i: int, mib: int):
+    """Multiframe de ecografía con 'mib' MiB de píxeles; el fichero queda disperso en disco."""
+    uid = f"1.2.826.0.1.3680043.9.8{i:07d}"
+    cabecera = (_meta(CLASE_MULTIFRAME, uid, EXPLICITA) + _elemento(0x00080016, "UI", CLASE_MULTIFRAME.encode(), True)
+                + _elemento(0x00080060, "CS", b"US", True))
+    longitud = mib * 2 ** 20
+    with open(ruta, "wb") as f:
+        f.write(cabecera + struct.pack("<HH2s2xI", 0x7FE0, 0x0010, b"OB", longitud))
+        f.truncate(len(cabecera) + 12 + longitud)
+
+
+def escribir_directorio(directorio: str, n: int, plantillas: list, mib_imagen: int = 1) -> Counter:
+    """n SR (uno de cada CADA_DEFECTUOSO, defectuoso) repartidos en subdirectorios, con un
+    multiframe y un fichero que no es DICOM cada CADA_IMAGEN. Devuelve las incidencias esperadas."""
+    incidencias = Counter()
+    for i in range(n):
+        subdirectorio = os.path.join(directorio, f"ESTUDIO{i // 100:04d}")
+        os.makedirs(subdirectorio, exist_ok=True)
+        defecto = ""
+        if i % CADA_DEFECTUOSO == CADA_DEFECTUOSO - 1:
+            defecto = _DEFECTUOSOS[(i // CADA_DEFECTUOSO) % len(_DEFECTUOSOS)]
+            incidencias[defecto] += 1
+        with open(os.path.join(subdirectorio, f"SR{i:07d}"), "wb") as f:
+            f.write(_sr(i, plantillas[i % len(plantillas)], defecto))
+        if i % CADA_IMAGEN == 0:
+            _multiframe(os.path.join(subdirectorio, f"US{i:07d}.dcm"), i, mib_imagen)
+            with open(os.path.join(subdirectorio, f"LEEME{i:07d}.txt"), "w", encoding="utf-8") as f:
+                f.write("Exportación del ecógrafo\n")
+    return incidencias
+
+
+def _esperado(i: int, informe) -> dict:
+    esperado = {(s, a): getattr(getattr(informe, s), a) for s, a in _NUM}
+    if all(v is None for v in esperado.values()):
+        esperado[("medidas_vi", "fevi_porcentaje")] = 55.0
+    esperado[("vci", "colapso_mayor_50")] = informe.vci.colapso_mayor_50
+    esperado[("paciente", "nhc")] = f"NHC{i:07d}"
+    esperado[("paciente", "sexo")] = informe.paciente.sexo if informe.paciente.sexo in ("M", "F") else ""
+    esperado[("paciente", "fecha_estudio")] = FECHA_INICIAL + timedelta(minutes=7 * i)
+    return esperado
+
+
+def verificar(directorio: str, n: int, plantillas: list, incidencias_esperadas: Counter) -> list:
+    errores = []
+    incidencias = []
+    importados = {informe.id_informe: informe for informe in importar_sr(directorio, incidencias=incidencias.append)}
+    for i in range(n):
+        if i % CADA_DEFECTUOSO == CADA_DEFECTUOSO - 1:
+            continue
+        informe = importados.get(f"SR-1.2.826.0.1.3680043.9.7{i:07d}")
+        if informe is None:
+            errores.append(f"SR {i}: no importado")
+            continue
+        for (seccion, atributo), valor in _esperado(i, plantillas[i % len(plantillas)]).items():
+            obtenido = getattr(getattr(informe, seccion), atributo)
+            iguales = (obtenido == valor) if not isinstance(valor, float) else \
+                (obtenido is not None and math.isclose(obtenido, valor, rel_tol=1e-9))
+            if not iguales:
+                errores.append(f"SR {i}: {seccion}.{atributo} = {obtenido!r}, se esperaba {valor!r}")
+        if informe.realizado_por != "Lucía Gómez":
+            errores.append(f"SR {i}: realizado_por = {informe.realizado_por!r}")
+    if len(importados) != n - sum(incidencias_esperadas.values()) + incidencias_esperadas["unidad 'in'"]:
+        errores.append(f"{len(importados)} SR importados")
+    recibidas = Counter()
+    for incidencia in incidencias:
+        recibidas[next((d for d in _DEFECTUOSOS if d in incidencia.descripcion), incidencia.descripcion)] += 1
+    if recibidas != incidencias_esperadas:
+        errores.append(f"incidencias {dict(recibidas)}, se esperaban {dict(incidencias_esperadas)}")
+    return errores
+
+
+def precarga(directorio: str, plantillas: list, multiframes: int, mib: int) -> dict:
+    """Lo que hace 'Importar Medidas DICOM SR...': importar la carpeta del estudio y
+    completar el informe abierto. El SR se escribe el último para que se recorran antes
+    todos los multiframes."""
+    for j in range(multiframes):
+        _multiframe(os.path.join(directorio, f"IMG{j:04d}.dcm"), j, mib)
+    with open(os.path.join(directorio, "ZZSR.dcm"), "wb") as f:
+        f.write(_sr(0, plantillas[1]))
+    inicio = time.perf_counter()
+    informes = list(importar_sr(directorio))
+    abierto = InformeEcoCompleto()
+    asignados = completar_informe(abierto, informes[0]) if informes else []
+    segundos = time.perf_counter() - inicio
+    return {"multiframes": multiframes, "mib_por_multiframe": mib,
+            "gib_en_carpeta": round(sum(os.path.getsize(os.path.join(directorio, n)) for n in os.listdir(directorio)) / 2 ** 30, 2),
+            "sr_importados": len(informes), "datos_asignados": len(asignados), "milisegundos": round(segundos * 1000, 1)}
+
+
+def rendimiento(directorio: str, procesos: int) -> dict:
+    ficheros = sum(len(nombres) for _, _, nombres in os.walk(directorio))
+    inicio = time.perf_counter()
+    informes = sum(1 for _ in importar_sr(directorio, procesos=procesos))
+    segundos = time.perf_counter() - inicio
+    return {"procesos": procesos, "ficheros": ficheros, "sr_importados": informes,
+            "ficheros_s": round(ficheros / segundos), "segundos": round(segundos, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verificar", type=int, default=600, help="SR del directorio de verificación")
+    parser.add_argument("--ficheros", type=int, default=3000, help="SR del directorio de rendimiento")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--multiframes", type=int, default=4)
+    parser.add_argument("--mib-multiframe", type=int, default=1024)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    plantillas = generar_estudios(300)
+    directorio = tempfile.mkdtemp(prefix="bench_dicom_sr_")
+    resultados = {}
+    try:
+        ruta = os.path.join(directorio, "verificacion")
+        esperadas = escribir_directorio(ruta, args.verificar, plantillas)
+        errores = verificar(ruta, args.verificar, plantillas, esperadas)
+        resultados["verificacion"] = {"sr": args.verificar, "incidencias_esperadas": sum(esperadas.values()),
+                                      "errores": errores[:20], "total_errores": len(errores)}
+        ruta = os.path.join(directorio, "precarga")
+        os.makedirs(ruta)
+        resultados["precarga"] = precarga(ruta, plantillas, args.multiframes, args.mib_multiframe)
+        ruta = os.path.join(directorio, "rendimiento")
+        escribir_directorio(ruta, args.ficheros, plantillas)
+        resultados["rendimiento"] = [rendimiento(ruta, 1), rendimiento(ruta, args.procesos)]
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    guardar_resultados("dicom_sr", resultados, args.salida)
+    p = resultados["precarga"]
+    precarga_correcta = p["sr_importados"] == 1 and p["datos_asignados"] and p["milisegundos"] < LIMITE_PRECARGA_S * 1000
+    return 1 if resultados["verificacion"]["total_errores"] or not precarga_correcta else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Exactitud, memoria y rendimiento de las estadísticas de cohorte (estadisticas_cohorte.py).
+
+Llena un archivo SQLite temporal con estudios sintéticos (los de bench_informe, uno cada
+ESPACIADO desde 2020-01-01, para que haya varios meses) y:
+- compara el resultado en una pasada con un cálculo exacto que carga toda la cohorte en
+  listas: recuentos idénticos, media y desviación con error relativo < 1e-9 y cuantiles
+  con error relativo <= ALFA_CUANTILES;
+- repite el cálculo con bloques pequeños y varios procesos y comprueba que combinar los
+  parciales da lo mismo que la pasada en serie;
+- mide estudios/s y el pico de memoria Python (tracemalloc) para cada tamaño de --tamanos,
+  sin agrupar: la memoria crece con el número de grupos, pero no con el de estudios.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_estadisticas.py [--tamanos 1000,10000,100000] [--verificar 5000]
+                                            [--procesos 2] [--salida resultados.json]
+"""
+import argparse
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+os.environ.setdefault("ECOREPORT_LOG_NIVEL", "WARNING")
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from archivo_estudios import ArchivoEstudios
+from rangos_referencia import RANGOS_REFERENCIA
+from logic.calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+import estadisticas_cohorte
+from estadisticas_cohorte import (calcular_estadisticas, AGRUPACION_MES, AGRUPACION_TOTAL, ALFA_CUANTILES,
+                                  CUANTILES_RESUMEN, MEDIDAS_CONTINUAS)
+
+FECHA_INICIAL = datetime(2020, 1, 1)
+ESPACIADO = timedelta(hours=7)
+LOTE = 5000
+
+
+def llenar(archivo: ArchivoEstudios, n: int):
+    plantillas = generar_estudios(500)
+
+    def estudios():
+        for i in range(n):
+            informe = plantillas[i % len(plantillas)]
+            informe.id_informe = f"EST-{i:09d}"
+            informe.paciente.fecha_estudio = FECHA_INICIAL + i * ESPACIADO
+            yield informe
+
+    iterador = estudios()
+    while archivo.guardar_varios(islice(iterador, LOTE)) > 0:
+        pass
+
+
+def _exacto(archivo: ArchivoEstudios) -> dict:
+    """Mismas estadísticas por mes, con toda la cohorte en memoria."""
+    grupos = defaultdict(lambda: {"fevi": Counter(), "vexus": Counter(), "presiones": Counter(),
+                                  "medidas": defaultdict(list)})
+    for resumen, informe in archivo.iterar():
+        g = grupos[resumen.fecha_estudio[:7]]
+        umbrales = RANGOS_REFERENCIA.para_sexo(informe.paciente.sexo)
+        g["fevi"][calcular_clasificacion_fevi(informe.medidas_vi, informe.medidas_auriculas, umbrales)] += 1
+        g["vexus"][str(calcular_grado_vexus(informe.vexus))] += 1
+        g["presiones"][estimar_presiones_llenado_vi(informe.presiones_llenado, informe.medidas_auriculas, umbrales)] += 1
+        for nombre, (seccion, atributo) in MEDIDAS_CONTINUAS.items():
+            valor = getattr(getattr(informe, seccion), atributo)
+            if valor is not None:
+                g["medidas"][nombre].append(float(valor))
+    return grupos
+
+
+def _cerca(a: float, b: float, relativo: float) -> bool:
+    return abs(a - b) <= relativo * max(abs(a), abs(b), 1e-12)
+
+
+def comparar_con_exacto(resultado: dict, exacto: dict) -> list:
+    errores = []
+    if set(resultado["grupos"]) != set(exacto):
+        return [f"grupos distintos: {sorted(resultado['grupos'])} / {sorted(exacto)}"]
+    for clave, g in exacto.items():
+        r = resultado["grupos"][clave]
+        for campo, contador in (("clasificacion_fevi", g["fevi"]), ("grado_vexus", g["vexus"]),
+                                ("presiones_llenado", g["presiones"])):
+            if r[campo] != dict(contador):
+                errores.append(f"{clave}/{campo}: {r[campo]} != {dict(contador)}")
+        for nombre in MEDIDAS_CONTINUAS:
+            valores = sorted(g["medidas"][nombre])
+            m = r["medidas"][nombre]
+            if m["n"] != len(valores):
+                errores.append(f"{clave}/{nombre}: n {m['n']} != {len(valores)}")
+                continue
+            if len(valores) < 2:
+                continue
+            if not _cerca(m["media"], statistics.fmean(valores), 1e-9) or \
+                    not _cerca(m["desviacion"], statistics.stdev(valores), 1e-9):
+                errores.append(f"{clave}/{nombre}: media/desviación fuera de tolerancia")
+            for etiqueta, q in CUANTILES_RESUMEN:
+                real = valores[math.floor(q * (len(valores) - 1))]
+                if not _cerca(m[etiqueta], real, ALFA_CUANTILES * (1 + 1e-9)):
+                    errores.append(f"{clave}/{nombre}/{etiqueta}: {m[etiqueta]} frente a {real}")
+    return errores
+
+
+def comparar_combinado(serie: dict, combinado: dict) -> list:
+    """Los recuentos y cuantiles deben coincidir exactamente; media y desviación, salvo redondeo."""
+    errores = []
+    for clave, r in serie["grupos"].items():
+        c = combinado["grupos"].get(clave)
+        if c is None:
+            errores.append(f"{clave}: falta en el resultado combinado")
+            continue
+        for campo in ("estudios", "clasificacion_fevi", "grado_vexus", "presiones_llenado", "tasa_presiones_elevadas"):
+            if r[campo] != c[campo]:
+                errores.append(f"{clave}/{campo} difiere al combinar")
+        for nombre, m in r["medidas"].items():
+            for campo, valor in m.items():
+                otro = c["medidas"][nombre][campo]
+                if valor != otro and not (campo in ("media", "desviacion") and _cerca(valor, otro, 1e-9)):
+                    errores.append(f"{clave}/{nombre}/{campo}: {valor} != {otro}")
+    return errores
+
+
+def medir(ruta: str, procesos: int) -> dict:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    with ArchivoEstudios(ruta) as archivo:
+        resultado = calcular_estadisticas(archivo, AGRUPACION_TOTAL, procesos=procesos)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"estudios_s": round(resultado.estudios / segundos), "pico_memoria_kib": round(pico / 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default="1000,10000,100000")
+    parser.add_argument("--verificar", type=int, default=5000, help="Estudios de la comprobación exacta")
+    parser.add_argument("--procesos", type=int, default=2)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_estadisticas_")
+    resultados = {"verificacion": {}, "rendimiento": {}}
+    errores = []
+    try:
+        ruta = os.path.join(directorio, "verificacion.sqlite3")
+        with ArchivoEstudios(ruta) as archivo:
+            llenar(archivo, args.verificar)
+            serie = calcular_estadisticas(archivo, AGRUPACION_MES).a_dict()
+            errores += comparar_con_exacto(serie, _exacto(archivo))
+            lote_original = estadisticas_cohorte.LOTE_ESTADISTICAS
+            estadisticas_cohorte.LOTE_ESTADISTICAS = 37 # Muchos parciales, con cortes a mitad de mes
+            try:
+                combinado = calcular_estadisticas(archivo, AGRUPACION_MES, procesos=args.procesos).a_dict()
+            finally:
+                estadisticas_cohorte.LOTE_ESTADISTICAS = lote_original
+            errores += comparar_combinado(serie, combinado)
+        resultados["verificacion"] = {"estudios": args.verificar, "grupos": len(serie["grupos"]), "errores": errores}
+
+        for n in (int(t) for t in args.tamanos.split(",")):
+            ruta = os.path.join(directorio, f"cohorte_{n}.sqlite3")
+            with ArchivoEstudios(ruta) as archivo:
+                llenar(archivo, n)
+            resultados["rendimiento"][n] = {f"procesos_{p}": medir(ruta, p) for p in sorted({1, args.procesos})}
+            os.remove(ruta)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    guardar_resultados("estadisticas", resultados, args.salida)
+    for error in errores:
+        print(error, file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
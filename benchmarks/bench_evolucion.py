@@ -0,0 +1,171 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Evolución entre estudios: índice por paciente del archivo (tabla 'evolucion' de
+archivo_estudios.py) y sección "evolucion" del informe (logic/evolucion.py).
+
+Llena un archivo SQLite temporal con --pacientes pacientes de --por-paciente estudios
+sintéticos cada uno (bench_informe) y:
+- compara la serie de cada paciente leída del índice (serie_evolucion) con la que sale
+  de recorrer y descomprimir sus estudios, y mide ambas (p50/p99 en ms);
+- comprueba estudio_previo() frente al cálculo directo sobre la serie y mide su latencia;
+- comprueba que la sección de evolución del documento recoge los cambios de comparar()
+  y que el párrafo nombra cada parámetro comparado;
+- simula un archivo con el esquema 1 (sin índice) y comprueba que al abrirlo se rellena
+  con los mismos puntos.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_evolucion.py [--pacientes 200] [--por-paciente 50] [--salida resultados.json]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+from bench_informe import estudio_aleatorio
+
+from archivo_estudios import ArchivoEstudios
+from logic.evolucion import comparar, punto_evolucion
+from logic.renderizadores import redactar_seccion, _NOMBRES_EVOLUCION
+from logic.report_generator import CLAVE_EVOLUCION, construir_documento
+
+
+def _nhc(indice: int) -> str:
+    return f"NHC{indice:06d}"
+
+
+def llenar(archivo: ArchivoEstudios, pacientes: int, por_paciente: int, rng: random.Random) -> float:
+    """Estudios de cada paciente a intervalos de 1 a 60 días. Devuelve ms por estudio guardado."""
+    inicio = time.perf_counter()
+    for paciente in range(pacientes):
+        fecha = datetime(2020, 1, 1) + timedelta(days=rng.randrange(365))
+        estudios = []
+        for i in range(por_paciente):
+            informe = estudio_aleatorio(rng)
+            informe.id_informe = f"BENCH-{paciente:06d}-{i:04d}"
+            informe.paciente.nhc = _nhc(paciente)
+            fecha += timedelta(days=rng.randint(1, 60), minutes=rng.randrange(1440))
+            informe.paciente.fecha_estudio = fecha
+            estudios.append(informe)
+        archivo.guardar_varios(estudios)
+    return (time.perf_counter() - inicio) * 1000 / (pacientes * por_paciente)
+
+
+def _ms(tiempos: list) -> dict:
+    tiempos = sorted(tiempos)
+    return {"p50_ms": round(tiempos[len(tiempos) // 2] * 1000, 3),
+            "p99_ms": round(tiempos[int(len(tiempos) * 0.99)] * 1000, 3)}
+
+
+def comprobar_series(archivo: ArchivoEstudios, pacientes: int, errores: list) -> dict:
+    tiempos_indice, tiempos_recorrido = [], []
+    for paciente in range(pacientes):
+        nhc = _nhc(paciente)
+        inicio = time.perf_counter()
+        serie = archivo.serie_evolucion(nhc)
+        tiempos_indice.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        esperada = [punto_evolucion(informe) for _resumen, informe in archivo.iterar(nhc=nhc)]
+        tiempos_recorrido.append(time.perf_counter() - inicio)
+        if serie != esperada:
+            errores.append(f"serie de {nhc} distinta de la del recorrido completo")
+    indice, recorrido = _ms(tiempos_indice), _ms(tiempos_recorrido)
+    return {"indice": indice, "recorrido_descomprimiendo": recorrido,
+            "aceleracion_p50": round(recorrido["p50_ms"] / max(indice["p50_ms"], 1e-6), 1)}
+
+
+def comprobar_previos(archivo: ArchivoEstudios, pacientes: int, rng: random.Random, errores: list) -> dict:
+    tiempos = []
+    for paciente in rng.sample(range(pacientes), min(pacientes, 100)):
+        serie = archivo.serie_evolucion(_nhc(paciente))
+        posicion = rng.randrange(len(serie))
+        informe = archivo.cargar(serie[posicion].id_informe)
+        inicio = time.perf_counter()
+        previo = archivo.estudio_previo(informe)
+        tiempos.append(time.perf_counter() - inicio)
+        esperado = serie[posicion - 1] if posicion > 0 else None
+        if previo != esperado:
+            errores.append(f"estudio previo de {informe.id_informe}: {previo and previo.id_informe}")
+    return _ms(tiempos)
+
+
+def comprobar_seccion(archivo: ArchivoEstudios, pacientes: int, errores: list) -> dict:
+    con_cambios = sin_seccion = 0
+    for paciente in range(pacientes):
+        serie = archivo.serie_evolucion(_nhc(paciente))
+        for anterior, actual in zip(serie, serie[1:]):
+            informe = archivo.cargar(actual.id_informe)
+            seccion = construir_documento(informe, previo=anterior).secciones[-1]
+            cambios, sin_cambios = comparar(anterior, actual)
+            if seccion.clave != CLAVE_EVOLUCION:
+                errores.append(f"{informe.id_informe}: falta la sección de evolución")
+                continue
+            if not cambios and not sin_cambios:
+                sin_seccion += 1
+                if seccion.hallazgos:
+                    errores.append(f"{informe.id_informe}: sección de evolución sin parámetros comparables")
+                continue
+            obtenidos = {h.parametro: (h.valor_anterior, h.valor) for h in seccion.hallazgos
+                         if h.interpretacion == "cambio"}
+            if obtenidos != {c.clave: (c.valor_anterior, c.valor_actual) for c in cambios}:
+                errores.append(f"{informe.id_informe}: cambios de la sección distintos de comparar()")
+            parrafo = redactar_seccion(seccion) or ""
+            for clave in [c.clave for c in cambios] + sin_cambios:
+                if _NOMBRES_EVOLUCION[clave][0] not in parrafo:
+                    errores.append(f"{informe.id_informe}: el párrafo no menciona {clave}")
+            con_cambios += bool(cambios)
+            if len(errores) > 50:
+                return {"pares_con_cambios": con_cambios, "pares_sin_comparables": sin_seccion}
+    return {"pares_con_cambios": con_cambios, "pares_sin_comparables": sin_seccion}
+
+
+def comprobar_migracion(ruta: str, pacientes: int, errores: list) -> dict:
+    with ArchivoEstudios(ruta) as archivo:
+        series = {nhc: archivo.serie_evolucion(nhc) for nhc in map(_nhc, range(pacientes))}
+    conexion = sqlite3.connect(ruta) # Deja el archivo como lo habría dejado la versión 1
+    with conexion:
+        conexion.execute("DROP TABLE evolucion")
+        conexion.execute("PRAGMA user_version = 1")
+    conexion.close()
+    inicio = time.perf_counter()
+    with ArchivoEstudios(ruta) as archivo:
+        duracion = time.perf_counter() - inicio
+        for nhc, serie in series.items():
+            if archivo.serie_evolucion(nhc) != serie:
+                errores.append(f"migración: serie de {nhc} distinta")
+    return {"estudios": sum(map(len, series.values())), "segundos": round(duracion, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=200)
+    parser.add_argument("--por-paciente", type=int, default=50)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    rng, errores = random.Random(23), []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "evolucion.sqlite3")
+        with ArchivoEstudios(ruta) as archivo:
+            ms_guardar = llenar(archivo, args.pacientes, args.por_paciente, rng)
+            resultados = {"estudios": len(archivo), "guardar_ms_por_estudio": round(ms_guardar, 3),
+                          "serie_paciente": comprobar_series(archivo, args.pacientes, errores),
+                          "estudio_previo": comprobar_previos(archivo, args.pacientes, rng, errores),
+                          "seccion": comprobar_seccion(archivo, min(args.pacientes, 20), errores)}
+        resultados["migracion"] = comprobar_migracion(ruta, args.pacientes, errores)
+    resultados.update({"errores": errores[:20], "total_errores": len(errores)})
+    guardar_resultados("evolucion", resultados, args.salida)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
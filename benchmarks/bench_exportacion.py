@@ -0,0 +1,142 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Memoria y rendimiento de la exportación de informes a zip/JSONL (exportacion_estudios.py).
+
+Llena un archivo SQLite temporal con --estudios estudios sintéticos (uno por minuto
+desde 2020-01-01) y, para cada tamaño de --tamanos, exporta los N primeros por rango
+de fechas en zip, zip sin comprimir, JSONL y JSONL comprimido. Mide estudios/s y el
+pico de memoria Python (tracemalloc) durante la exportación: debe ser el mismo para
+100 que para 500 000 estudios.
+
+Además comprueba cada fichero (zipfile lo abre y verifica los CRC; el JSONL tiene una
+línea por estudio) y que una exportación cortada a mitad y reanudada da exactamente
+los mismos bytes que una sin cortes.
+
+Uso:
+    python benchmarks/bench_exportacion.py [--tamanos 100,10000,100000] [--salida resultados.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+from itertools import islice
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+os.environ.setdefault("ECOREPORT_LOG_NIVEL", "WARNING") # Una línea de log por informe falsearía la memoria
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from archivo_estudios import ArchivoEstudios
+from exportacion_estudios import exportar_estudios, FORMATO_ZIP, FORMATO_JSONL
+
+FECHA_INICIAL = datetime(2020, 1, 1)
+LOTE = 5000
+VARIANTES = ((FORMATO_ZIP, True, "zip"), (FORMATO_ZIP, False, "zip"),
+             (FORMATO_JSONL, False, "jsonl"), (FORMATO_JSONL, True, "jsonl.gz"))
+
+
+class _Interrupcion(Exception):
+    pass
+
+
+def llenar(archivo: ArchivoEstudios, n: int):
+    plantillas = generar_estudios(500)
+
+    def estudios():
+        for i in range(n):
+            informe = plantillas[i % len(plantillas)]
+            informe.id_informe = f"EXP-{i:09d}"
+            informe.paciente.nhc = f"NHC{i % 9973:08d}"
+            informe.paciente.fecha_estudio = FECHA_INICIAL + timedelta(minutes=i)
+            yield informe
+
+    iterador = estudios()
+    while archivo.guardar_varios(islice(iterador, LOTE)) > 0:
+        pass
+
+
+def verificar(ruta: str, formato: str, n: int):
+    if formato == FORMATO_ZIP:
+        with zipfile.ZipFile(ruta) as zf:
+            assert len(zf.infolist()) == n, f"{ruta}: {len(zf.infolist())} entradas, se esperaban {n}"
+            assert zf.testzip() is None, f"{ruta}: CRC incorrecto"
+    else:
+        abrir = gzip.open if ruta.endswith(".gz") else open
+        with abrir(ruta, "rt", encoding="utf-8") as f:
+            lineas = sum(1 for linea in f if json.loads(linea)["informe"])
+        assert lineas == n, f"{ruta}: {lineas} líneas, se esperaban {n}"
+
+
+def exportar_con_corte(archivo, ruta, formato, hasta, comprimir, cortar_en: int):
+    llamadas = [0]
+
+    def progreso(_exportados, _total):
+        llamadas[0] += 1
+        if llamadas[0] == cortar_en:
+            raise _Interrupcion()
+
+    try:
+        exportar_estudios(archivo, ruta, formato, FECHA_INICIAL, hasta, comprimir=comprimir, progreso=progreso)
+        raise AssertionError("la exportación debía interrumpirse")
+    except _Interrupcion:
+        pass
+    return exportar_estudios(archivo, ruta, formato, FECHA_INICIAL, hasta, comprimir=comprimir, reanudar=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default="100,10000,100000", help="Estudios por exportación, separados por comas")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+    tamanos = sorted(int(t) for t in args.tamanos.split(","))
+
+    dir_trabajo = tempfile.mkdtemp(prefix="ecoreport_bench_exportacion_")
+    try:
+        with ArchivoEstudios(os.path.join(dir_trabajo, "archivo.sqlite3")) as archivo:
+            llenar(archivo, tamanos[-1])
+            resultados = {"exportaciones": [], "reanudacion_identica": {}}
+            for n in tamanos:
+                hasta = FECHA_INICIAL + timedelta(minutes=n)
+                for formato, comprimir, extension in VARIANTES:
+                    ruta = os.path.join(dir_trabajo, f"exportacion_{n}.{extension}")
+                    tracemalloc.start()
+                    inicio = time.perf_counter()
+                    exportados = exportar_estudios(archivo, ruta, formato, FECHA_INICIAL, hasta, comprimir=comprimir)
+                    segundos = time.perf_counter() - inicio
+                    _, pico = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    verificar(ruta, formato, n)
+                    resultados["exportaciones"].append({
+                        "estudios": exportados, "formato": extension, "comprimido": comprimir,
+                        "segundos": round(segundos, 3), "estudios_s": round(exportados / segundos, 1),
+                        "pico_memoria_kib": round(pico / 1024, 1), "tamano_mib": round(os.path.getsize(ruta) / 2**20, 2)})
+                    os.remove(ruta)
+
+            # Reanudación: cortar tras el segundo punto de control y comparar con una exportación sin cortes
+            n = min(tamanos[-1], 2000)
+            hasta = FECHA_INICIAL + timedelta(minutes=n)
+            for formato, comprimir, extension in VARIANTES:
+                completa = os.path.join(dir_trabajo, f"completa.{extension}")
+                reanudada = os.path.join(dir_trabajo, f"reanudada.{extension}")
+                exportar_estudios(archivo, completa, formato, FECHA_INICIAL, hasta, comprimir=comprimir)
+                exportar_con_corte(archivo, reanudada, formato, hasta, comprimir, cortar_en=2)
+                with open(completa, "rb") as a, open(reanudada, "rb") as b:
+                    identica = a.read() == b.read()
+                resultados["reanudacion_identica"][extension + ("" if comprimir else " sin comprimir")] = identica
+                assert identica, f"La exportación reanudada ({extension}) no coincide con la completa"
+        guardar_resultados("exportacion", resultados, args.salida)
+    finally:
+        shutil.rmtree(dir_trabajo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
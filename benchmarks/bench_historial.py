@@ -0,0 +1,198 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Memoria y velocidad del historial de deshacer/rehacer (historial_cambios.py).
+
+Simula una sesión larga de edición (--pasos cambios de un campo al azar, con valores
+sintéticos de bench_informe, y uno de cada ocho cambiando un flag "No Valorado") y
+registra un paso tras cada cambio. Después:
+- memoria Python (tracemalloc) por paso, frente a una copia profunda del informe;
+- microsegundos por registrar(), y por deshacer()/rehacer() recorriendo el historial
+  entero en ambos sentidos (p50, p99 y máximo);
+- comprueba que cada deshacer/rehacer devuelve exactamente el estado de su paso (se
+  guarda informe_a_dict de uno de cada --cada pasos), que registrar tras deshacer
+  descarta los pasos que se podían rehacer y que los pasos con el mismo 'agrupar' se funden;
+- en esos mismos pasos, que anotar cambios_entre(estado anterior, estado nuevo) en un
+  diario de recuperación iniciado con el estado anterior (lo que hace la ventana al
+  deshacer/rehacer) reproduce el estado nuevo, y mide cambios_entre (p50, p99 y máximo).
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_historial.py [--pasos 100000] [--cada 97] [--salida resultados.json]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+from bench_informe import CAMPOS_CALCULADOS, _valor_sintetico, estudio_aleatorio
+
+from diario_recuperacion import DiarioRecuperacion, reproducir
+from historial_cambios import HistorialCambios, cambios_entre
+from models import CLAVES_NO_VALORADO, informe_a_dict, informe_desde_dict
+from study_table import ESQUEMA
+
+EDITABLES = [col for col in ESQUEMA if "." in col.nombre and col.nombre not in CAMPOS_CALCULADOS]
+
+
+def editar(rng: random.Random, informe, paso: int):
+    """Un cambio como los de la interfaz: un campo o un flag."""
+    if paso % 8 == 7:
+        clave = rng.choice(CLAVES_NO_VALORADO)
+        informe.param_no_valorado_flags[clave] = not informe.param_no_valorado_flags.get(clave, False)
+        return
+    col = rng.choice(EDITABLES)
+    seccion, _, atributo = col.nombre.partition(".")
+    setattr(getattr(informe, seccion), atributo, _valor_sintetico(rng, col))
+
+
+def _percentiles(tiempos: list) -> dict:
+    tiempos = sorted(tiempos)
+    return {"p50_us": round(tiempos[len(tiempos) // 2] * 1e6, 2),
+            "p99_us": round(tiempos[int(len(tiempos) * 0.99)] * 1e6, 2), "max_us": round(tiempos[-1] * 1e6, 2)}
+
+
+def sesion(pasos: int, cada: int, semilla: int = 22):
+    """Historial de una sesión de 'pasos' cambios y el estado de uno de cada 'cada' pasos."""
+    rng = random.Random(semilla)
+    informe = estudio_aleatorio(rng)
+    historial = HistorialCambios(informe)
+    esperados = {0: informe_a_dict(informe)}
+    for paso in range(1, pasos + 1):
+        registrado = False
+        while not registrado: # Un valor igual al actual no es un paso
+            editar(rng, informe, paso)
+            registrado = historial.registrar(informe)
+        if paso % cada == 0:
+            esperados[paso] = informe_a_dict(informe)
+    esperados[pasos] = informe_a_dict(informe)
+    return historial, esperados
+
+
+def medir_memoria(pasos: int) -> dict:
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    historial, _ = sesion(pasos, cada=pasos + 1)
+    por_paso = (tracemalloc.get_traced_memory()[0] - antes) / pasos
+    tracemalloc.stop()
+    informe = estudio_aleatorio(random.Random(1))
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    copias = [copy.deepcopy(informe) for _ in range(1000)]
+    copia_profunda = (tracemalloc.get_traced_memory()[0] - antes) / len(copias)
+    tracemalloc.stop()
+    return {"pasos": len(historial) - 1, "bytes_por_paso": round(por_paso),
+            "bytes_copia_profunda": round(copia_profunda), "proporcion": round(por_paso / copia_profunda, 3)}
+
+
+def medir_registrar(pasos: int = 20000) -> dict:
+    rng = random.Random(3)
+    informe = estudio_aleatorio(rng)
+    historial = HistorialCambios(informe)
+    tiempos = []
+    for paso in range(1, pasos + 1):
+        editar(rng, informe, paso)
+        inicio = time.perf_counter()
+        historial.registrar(informe)
+        tiempos.append(time.perf_counter() - inicio)
+    return _percentiles(tiempos)
+
+
+def _sin_flags_desmarcados(estado: dict) -> dict:
+    estado["param_no_valorado_flags"] = {k: v for k, v in estado["param_no_valorado_flags"].items() if v}
+    return estado
+
+
+class _ComprobadorDiario:
+    """Anota en un diario los cambios de un paso a otro, como MainWindow al deshacer/rehacer,
+    y comprueba que al reproducirlo se obtiene el estado nuevo."""
+
+    def __init__(self, directorio: str):
+        self.diario = DiarioRecuperacion(os.path.join(directorio, "historial.diario"), intervalo_sync_s=0)
+        self.tiempos = []
+
+    def comprobar(self, anterior, nuevo) -> bool:
+        self.diario.iniciar(anterior)
+        inicio = time.perf_counter()
+        cambios = cambios_entre(anterior, nuevo)
+        self.tiempos.append(time.perf_counter() - inicio)
+        for clave, valor in cambios:
+            self.diario.registrar(clave, valor)
+        self.diario.sincronizar()
+        reproducido = informe_a_dict(informe_desde_dict(reproducir(self.diario.ruta).estado))
+        return _sin_flags_desmarcados(reproducido) == _sin_flags_desmarcados(informe_a_dict(nuevo))
+
+
+def recorrer(pasos: int, cada: int, directorio: str) -> dict:
+    historial, esperados = sesion(pasos, cada)
+    comprobador = _ComprobadorDiario(directorio)
+    errores, tiempos_deshacer, tiempos_rehacer = [], [], []
+    anterior = None
+    for paso in range(pasos - 1, -1, -1):
+        inicio = time.perf_counter()
+        informe = historial.deshacer()
+        tiempos_deshacer.append(time.perf_counter() - inicio)
+        if paso in esperados and informe_a_dict(informe) != esperados[paso]:
+            errores.append(f"deshacer hasta el paso {paso}: estado distinto")
+        if paso in esperados and anterior is not None and not comprobador.comprobar(anterior, informe):
+            errores.append(f"deshacer hasta el paso {paso}: el diario no reproduce el estado")
+        anterior = informe
+    if historial.deshacer() is not None:
+        errores.append("se puede deshacer más allá del estado inicial")
+    for paso in range(1, pasos + 1):
+        inicio = time.perf_counter()
+        informe = historial.rehacer()
+        tiempos_rehacer.append(time.perf_counter() - inicio)
+        if paso in esperados and informe_a_dict(informe) != esperados[paso]:
+            errores.append(f"rehacer hasta el paso {paso}: estado distinto")
+        if paso in esperados and not comprobador.comprobar(anterior, informe):
+            errores.append(f"rehacer hasta el paso {paso}: el diario no reproduce el estado")
+        anterior = informe
+    if historial.rehacer() is not None:
+        errores.append("se puede rehacer más allá del último paso")
+    comprobador.diario.cerrar()
+
+    # Un cambio tras deshacer descarta los pasos que se podían rehacer
+    for _ in range(10):
+        historial.deshacer()
+    informe, rng = historial.deshacer(), random.Random(5)
+    editar(rng, informe, 0)
+    while not historial.registrar(informe):
+        editar(rng, informe, 0)
+    if historial.puede_rehacer() or len(historial) != pasos - 9:
+        errores.append(f"registrar tras deshacer: {len(historial)} pasos, se esperaban {pasos - 9}")
+    # Escribir en el mismo campo es un solo paso; deshacerlo vuelve a antes de escribir
+    antes = informe.comentarios_adicionales
+    for letra in "comentario":
+        informe.comentarios_adicionales += letra
+        historial.registrar(informe, agrupar="comentarios_adicionales")
+    if len(historial) != pasos - 8 or historial.deshacer().comentarios_adicionales != antes:
+        errores.append("los pasos con el mismo 'agrupar' no se han fundido en uno")
+    return {"deshacer": _percentiles(tiempos_deshacer), "rehacer": _percentiles(tiempos_rehacer),
+            "cambios_entre": _percentiles(comprobador.tiempos), "estados_comprobados": len(esperados), "errores": errores[:20], "total_errores": len(errores)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasos", type=int, default=100000)
+    parser.add_argument("--cada", type=int, default=97, help="Pasos entre estados comprobados")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        resultados = {"memoria": medir_memoria(args.pasos), "registrar": medir_registrar(),
+                      "recorrido": recorrer(args.pasos, args.cada, directorio)}
+    guardar_resultados("historial", resultados, args.salida)
+    return 1 if resultados["recorrido"]["total_errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Exactitud, memoria y rendimiento de la importación HL7 v2 (importacion_hl7.py).
+
+Escribe ficheros de mensajes ORU^R01 a partir de los estudios sintéticos de bench_informe
+(cada medida como un OBX, con unidades variadas: cm/mm, cm/s y m/s, coma decimal; uno de
+cada cinco mensajes en ISO-8859-1 y uno de cada siete con entramado MLLP y fin de línea
+CRLF) e intercala mensajes defectuosos: un ADT, un OBX con valor no numérico, uno con
+unidad desconocida (ambos con otro OBX válido, así que se importan) y un ORU sin medidas
+reconocidas. Después:
+- importa el fichero de verificación y compara cada medida, el paciente, la fecha y el
+  operador con el estudio original, y las incidencias con las esperadas;
+- para cada tamaño de --tamanos mide mensajes/s y el pico de memoria Python
+  (tracemalloc), que no debe crecer con el número de mensajes.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_hl7.py [--tamanos 1000,10000,50000] [--verificar 2000] [--salida resultados.json]
+"""
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "ERROR")
+os.environ.setdefault("ECOREPORT_LOG_NIVEL", "ERROR") # Una línea por incidencia falsearía la memoria
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from importacion_hl7 import leer_mensajes_hl7
+
+FECHA_INICIAL = datetime(2024, 1, 1, 8, 0)
+CADA_DEFECTUOSO = 50
+# Campo -> (código OBX, unidad, factor desde la unidad del modelo, decimales con coma)
+_OBX = {
+    ("medidas_vi", "septo_iv_mm"): ("IVSd", "cm", 0.1, False),
+    ("medidas_vi", "pared_posterior_vi_mm"): ("LVPWd", "mm", 1.0, False),
+    ("medidas_vi", "dtdvi_mm"): ("LVIDd", "cm", 0.1, True),
+    ("medidas_vi", "fevi_porcentaje"): ("10230-1", "%", 1.0, False),
+    ("medidas_auriculas", "ai_vol_ml_m2"): ("LAVI", "mL/m2", 1.0, False),
+    ("medidas_vd", "vd_diametro_basal_mm"): ("RVD1", "mm", 1.0, False),
+    ("medidas_vd", "tapse_mm"): ("TAPSE", "cm", 0.1, False),
+    ("presiones_llenado", "mitral_e_a_ratio"): ("MV E/A", "", 1.0, True),
+    ("presiones_llenado", "e_prima_septal_cms"): ("E' Sept", "m/s", 0.01, False),
+    ("presiones_llenado", "e_prima_lateral_cms"): ("E' Lat", "cm/s", 1.0, False),
+    ("presiones_llenado", "e_sobre_e_prima_ratio"): ("E/E' avg", "{ratio}", 1.0, False),
+    ("presiones_llenado", "it_velocidad_max_ms"): ("TR Vmax", "cm/s", 100.0, False),
+    ("vci", "diametro_max_mm"): ("IVC", "mm", 1.0, False),
+    ("vci", "mm_inspiracion"): ("IVC Insp", "cm", 0.1, False),
+}
+_DEFECTUOSOS = (
+    ("ADT^A01", [], "mensaje ADT^A01"),
+    # Con un OBX válido además del erróneo: el mensaje se importa igualmente
+    ("ORU^R01", ["OBX|1|NM|TAPSE^TAPSE||n/a|mm|||||F", "OBX|2|NM|LVEF||50|%|||||F"], "valor no numérico"),
+    ("ORU^R01", ["OBX|1|NM|IVC^IVC||0.9|in|||||F", "OBX|2|NM|LVEF||50|%|||||F"], "unidad 'in'"),
+    ("ORU^R01", ["OBX|1|NM|HR^Heart rate||72|/min|||||F"], "ninguna medida reconocida"),
+)
+
+
+def _mensaje(i: int, informe) -> str:
+    p = informe.paciente
+    fecha = (FECHA_INICIAL + timedelta(minutes=7 * i)).strftime("%Y%m%d%H%M")
+    segmentos = [f"MSH|^~\\&|ECOCART|CARDIO|HIS|HOSP|{fecha}||ORU^R01|M{i:08d}|P|2.5",
+                 f"PID|1||NHC{i:07d}^^^HOSP^MR||{p.apellidos or 'Apellido'}^{p.nombre or 'Nombre'}||19500101|{p.sexo or 'U'}",
+                 f"OBR|1|||ECO^Ecocardioscopia|||{fecha}"]
+    n = 0
+    for (seccion, atributo), (codigo, unidad, factor, coma) in _OBX.items():
+        valor = getattr(getattr(informe, seccion), atributo)
+        if valor is None:
+            continue
+        n += 1
+        texto = repr(valor * factor)
+        observador = "|||||^Gómez^Lucía" if n == 1 else "" # OBX-16
+        segmentos.append(f"OBX|{n}|NM|{codigo}^{codigo}^LOCAL||{texto.replace('.', ',') if coma else texto}|"
+                         f"{unidad}|||||F{observador}")
+    if informe.vci.colapso_mayor_50 is not None:
+        n += 1
+        segmentos.append(f"OBX|{n}|NM|IVC Collapse||{60 if informe.vci.colapso_mayor_50 else 30}|%|||||F")
+    if n == 0: # Un estudio sin medidas daría la incidencia "ninguna medida reconocida"
+        segmentos.append("OBX|1|NM|LVEF||55|%|||||F")
+    return "\r".join(segmentos)
+
+
+def _esperado(i: int, informe) -> dict:
+    esperado = {(seccion, atributo): getattr(getattr(informe, seccion), atributo) for seccion, atributo in _OBX}
+    if all(v is None for v in esperado.values()) and informe.vci.colapso_mayor_50 is None:
+        esperado[("medidas_vi", "fevi_porcentaje")] = 55.0
+    esperado[("vci", "colapso_mayor_50")] = informe.vci.colapso_mayor_50
+    esperado[("paciente", "nhc")] = f"NHC{i:07d}"
+    esperado[("paciente", "sexo")] = informe.paciente.sexo if informe.paciente.sexo in ("M", "F") else ""
+    esperado[("paciente", "fecha_estudio")] = FECHA_INICIAL + timedelta(minutes=7 * i)
+    return esperado
+
+
+def escribir_fichero(ruta: str, n: int, plantillas: list) -> Counter:
+    """Escribe n mensajes (uno de cada CADA_DEFECTUOSO, defectuoso) y devuelve cuántas
+    incidencias de cada tipo se esperan."""
+    incidencias = Counter()
+    with open(ruta, "wb") as f:
+        for i in range(n):
+            if i % CADA_DEFECTUOSO == CADA_DEFECTUOSO - 1:
+                tipo, obx, descripcion = _DEFECTUOSOS[(i // CADA_DEFECTUOSO) % len(_DEFECTUOSOS)]
+                texto = "\r".join([f"MSH|^~\\&|ECOCART||||20240101||{tipo}|M{i:08d}|P|2.5", f"PID|1||X{i}"] + obx)
+                incidencias[descripcion] += 1
+            else:
+                texto = _mensaje(i, plantillas[i % len(plantillas)])
+            codificacion = "latin-1" if i % 5 == 0 else "utf-8"
+            datos = (texto + "\r").encode(codificacion, errors="replace")
+            if i % 7 == 0:
+                datos = b"\x0b" + datos.replace(b"\r", b"\r\n") + b"\x1c\r"
+            f.write(datos)
+    return incidencias
+
+
+def verificar(ruta: str, n: int, plantillas: list, incidencias_esperadas: Counter) -> list:
+    errores = []
+    incidencias = []
+    importados = {informe.id_informe: informe for informe in leer_mensajes_hl7(ruta, incidencias=incidencias.append)}
+    for i in range(n):
+        if i % CADA_DEFECTUOSO == CADA_DEFECTUOSO - 1:
+            continue
+        informe = importados.get(f"HL7-ECOCART-M{i:08d}")
+        if informe is None:
+            errores.append(f"mensaje {i}: no importado")
+            continue
+        for (seccion, atributo), valor in _esperado(i, plantillas[i % len(plantillas)]).items():
+            obtenido = getattr(getattr(informe, seccion), atributo)
+            iguales = (obtenido == valor) if not isinstance(valor, float) else \
+                (obtenido is not None and math.isclose(obtenido, valor, rel_tol=1e-9))
+            if not iguales:
+                errores.append(f"mensaje {i}: {seccion}.{atributo} = {obtenido!r}, se esperaba {valor!r}")
+        if informe.realizado_por != "Lucía Gómez" and any(
+                getattr(getattr(informe, s), a) is not None for s, a in _OBX):
+            errores.append(f"mensaje {i}: realizado_por = {informe.realizado_por!r}")
+    recibidas = Counter()
+    for incidencia in incidencias:
+        tipo = next((d for _, _, d in _DEFECTUOSOS if d in incidencia.descripcion), incidencia.descripcion)
+        recibidas[tipo] += 1
+    if recibidas != incidencias_esperadas:
+        errores.append(f"incidencias {dict(recibidas)}, se esperaban {dict(incidencias_esperadas)}")
+    return errores
+
+
+def medir(ruta: str) -> dict:
+    # Dos pasadas: tracemalloc ralentiza la lectura y falsearía los mensajes/s
+    inicio = time.perf_counter()
+    mensajes = sum(1 for _ in leer_mensajes_hl7(ruta))
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    for _ in leer_mensajes_hl7(ruta):
+        pass
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"estudios": mensajes, "mensajes_s": round(mensajes / segundos), "pico_memoria_kib": round(pico / 1024),
+            "fichero_mib": round(os.path.getsize(ruta) / 2 ** 20, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default="1000,10000,50000")
+    parser.add_argument("--verificar", type=int, default=2000, help="Mensajes del fichero de verificación")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    plantillas = generar_estudios(300)
+    directorio = tempfile.mkdtemp(prefix="bench_hl7_")
+    resultados = {"verificacion": {}, "rendimiento": {}}
+    try:
+        ruta = os.path.join(directorio, "verificacion.hl7")
+        esperadas = escribir_fichero(ruta, args.verificar, plantillas)
+        errores = verificar(ruta, args.verificar, plantillas, esperadas)
+        resultados["verificacion"] = {"mensajes": args.verificar, "incidencias_esperadas": sum(esperadas.values()),
+                                      "errores": errores[:20], "total_errores": len(errores)}
+        for n in (int(t) for t in args.tamanos.split(",")):
+            ruta = os.path.join(directorio, f"mensajes_{n}.hl7")
+            escribir_fichero(ruta, n, plantillas)
+            resultados["rendimiento"][n] = medir(ruta)
+            os.remove(ruta)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    guardar_resultados("hl7", resultados, args.salida)
+    return 1 if resultados["verificacion"]["total_errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
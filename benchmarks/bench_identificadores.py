@@ -0,0 +1,110 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Prueba de estrés del generador de identificadores de estudio (utils/identificadores.py).
+
+Genera --total identificadores repartidos en bloques entre --procesos procesos (por
+defecto con fork, después de que el proceso principal haya generado los suyos, que es
+el caso en el que un estado heredado podría repetir la secuencia) y comprueba:
+- que no hay ningún duplicado entre todos los procesos;
+- que dentro de cada bloque son estrictamente crecientes;
+- que la marca de tiempo de cada identificador está dentro del intervalo de la prueba.
+Mide identificadores/s en un solo proceso con nuevo_id_informe y con el formato anterior
+(fecha con milisegundos), y cuántos duplicados daba el formato anterior en un bucle.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/bench_identificadores.py [--total 2000000] [--procesos 4] [--bloque 50000]
+                                               [--inicio fork|spawn|forkserver] [--salida resultados.json]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+
+from utils.identificadores import nuevo_id_informe, nuevo_ulid, milisegundos_ulid
+
+MUESTRA_RENDIMIENTO = 500_000
+
+
+def _id_anterior() -> str:
+    return f"ECO-{datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]}"
+
+
+def _generar_bloque(n: int) -> bytes:
+    """Trabajo de cada proceso: n identificadores separados por saltos de línea (más barato
+    de devolver al proceso principal que una lista de cadenas)."""
+    return "\n".join([nuevo_ulid() for _ in range(n)]).encode("ascii")
+
+
+def estres(total: int, procesos: int, bloque: int, inicio: str) -> dict:
+    vistos = set()
+    duplicados = 0
+    desordenados = 0
+    ms_inicio = time.time_ns() // 1_000_000
+
+    def _comprobar(ids):
+        nonlocal duplicados, desordenados
+        anterior = ""
+        for ulid in ids:
+            if ulid <= anterior:
+                desordenados += 1
+            anterior = ulid
+            if ulid in vistos:
+                duplicados += 1
+            vistos.add(ulid)
+
+    # El proceso principal genera antes de crear el pool: los hijos con fork heredan su estado
+    _comprobar([nuevo_ulid() for _ in range(bloque)])
+    segundos = time.perf_counter()
+    contexto = multiprocessing.get_context(inicio)
+    restantes = total - bloque
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        tamanos = [min(bloque, restantes - i) for i in range(0, restantes, bloque)]
+        for datos in pool.map(_generar_bloque, tamanos):
+            _comprobar(datos.decode("ascii").split("\n"))
+    segundos = time.perf_counter() - segundos
+    ms_fin = time.time_ns() // 1_000_000
+    fuera_de_plazo = sum(1 for ulid in vistos if not ms_inicio <= milisegundos_ulid(ulid) <= ms_fin + 1)
+    return {"identificadores": len(vistos) + duplicados, "procesos": procesos, "inicio": inicio,
+            "duplicados": duplicados, "desordenados_en_bloque": desordenados, "fuera_de_plazo": fuera_de_plazo,
+            "identificadores_s_pool": round((total - bloque) / segundos)}
+
+
+def rendimiento() -> dict:
+    resultados = {}
+    for nombre, funcion in (("nuevo_id_informe", nuevo_id_informe), ("formato_anterior", _id_anterior)):
+        inicio = time.perf_counter()
+        ids = [funcion() for _ in range(MUESTRA_RENDIMIENTO)]
+        segundos = time.perf_counter() - inicio
+        resultados[nombre] = {"identificadores_s": round(MUESTRA_RENDIMIENTO / segundos),
+                              "duplicados": MUESTRA_RENDIMIENTO - len(set(ids))}
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--total", type=int, default=2_000_000)
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--bloque", type=int, default=50_000)
+    parser.add_argument("--inicio", choices=multiprocessing.get_all_start_methods(),
+                        default="fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    resultados = {"rendimiento": rendimiento(), "estres": estres(args.total, args.procesos, args.bloque, args.inicio)}
+    guardar_resultados("identificadores", resultados, args.salida)
+    e = resultados["estres"]
+    return 1 if e["duplicados"] or e["desordenados_en_bloque"] or e["fuera_de_plazo"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Benchmark del tiempo de importación en frío del núcleo sin interfaz.
+
+Cada medición se hace en un intérprete nuevo y aislado (python -I -c ...: sin
+PYTHONPATH ni site-packages del usuario, pero con los del intérprete, donde está
+PyQt5), así que no hay módulos precargados. Se compara el núcleo (models + logic/*)
+con:
+- nucleo_antes: el mismo núcleo más PyQt5.QtWidgets, que es lo que costaba
+  importarlo cuando utils/error_handling cargaba QMessageBox al importarse;
+- gui: la interfaz completa (gui.main_window).
+Termina con código 1 si algún objetivo no se puede importar.
+
+Uso:
+    python benchmarks/bench_importacion.py [--repeticiones 20] [--salida resultados.json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from _comun import DIR_APP, guardar_resultados
+
+_PLANTILLA = (
+    "import sys, time; sys.path.insert(0, {dir_app!r}); "
+    "t = time.perf_counter(); {importaciones}; print(time.perf_counter() - t)"
+)
+
+OBJETIVOS = {
+    "nucleo": "import models, logic.calculations, logic.report_generator",
+    "nucleo_antes": "import PyQt5.QtWidgets, models, logic.calculations, logic.report_generator",
+    "batch": "import batch",
+    "gui": "import PyQt5.QtWidgets, gui.main_window",
+}
+
+
+def _medir(importaciones: str, repeticiones: int) -> dict:
+    codigo = _PLANTILLA.format(dir_app=DIR_APP, importaciones=importaciones)
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-I", "-c", codigo], capture_output=True, text=True, cwd=DIR_APP)
+        if salida.returncode != 0:
+            raise RuntimeError(salida.stderr.strip().splitlines()[-1] if salida.stderr else "fallo desconocido")
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]) * 1000)
+    return {
+        "mediana_ms": round(statistics.median(tiempos), 2),
+        "min_ms": round(min(tiempos), 2),
+        "max_ms": round(max(tiempos), 2),
+        "repeticiones": repeticiones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    resultados, errores = {}, []
+    for nombre, importaciones in OBJETIVOS.items():
+        try:
+            resultados[nombre] = _medir(importaciones, args.repeticiones)
+        except RuntimeError as e:
+            errores.append(f"{nombre}: {e}")
+            print(f"ERROR: no se pudo importar '{nombre}' ({importaciones}): {e}", file=sys.stderr)
+    nucleo = resultados.get("nucleo")
+    for referencia in ("nucleo_antes", "gui"):
+        if nucleo and referencia in resultados:
+            resultados[f"fraccion_nucleo_vs_{referencia}"] = round(
+                nucleo["mediana_ms"] / resultados[referencia]["mediana_ms"], 3)
+    resultados.update({"errores": errores, "total_errores": len(errores)})
+    guardar_resultados("importacion", resultados, args.salida)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
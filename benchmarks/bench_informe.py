@@ -0,0 +1,197 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Rendimiento de la generación del informe sobre todo el espacio de flags "No Valorado".
+
+Genera InformeEcoCompleto sintéticos (semilla fija) que cubren todas las secciones:
+- estudios aleatorios con medidas alrededor de los puntos de corte, valores None,
+  toggles presente/ausente y flags "No Valorado" activados al azar;
+- para cada sección, todas las combinaciones de sus propios flags (2^k) sobre
+  estudios base aleatorios.
+
+Mide, llamada a llamada, generar_informe_texto, construir_documento, cada _evaluar_*
+de _SECCIONES, las tres funciones de logic/calculations.py y cada renderizador (sobre
+documentos ya construidos), y escribe ops/s y latencias p50/p99 (µs) en JSON. Con --referencia compara contra un resultado anterior y termina con código 1
+si alguna función pierde más de --tolerancia de ops/s.
+
+Uso:
+    python benchmarks/bench_informe.py [--estudios 2000] [--rondas 3] [--salida actual.json]
+                                       [--referencia anterior.json --tolerancia 0.2]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import product
+
+# La consola del logger escribiría en la misma salida que el JSON de resultados
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+
+from models import CLAVES_NO_VALORADO
+from study_table import ESQUEMA, CATEGORIAS, F64, BOOL, ENTERO, FECHA, CATEGORIA, _construir_informe, flags_a_mascara
+from rangos_referencia import UMBRALES_POR_DEFECTO
+from logic.report_generator import generar_informe_texto, construir_documento, _SECCIONES
+from logic.renderizadores import RENDERIZADORES
+from logic.calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+
+# Rango de valores sintéticos por campo numérico (incluye los puntos de corte de config)
+RANGOS = {
+    "medidas_vi.septo_iv_mm": (6, 18),
+    "medidas_vi.pared_posterior_vi_mm": (6, 16),
+    "medidas_vi.dtdvi_mm": (35, 70),
+    "medidas_vi.fevi_porcentaje": (15, 75),
+    "medidas_auriculas.ai_vol_ml_m2": (18, 60),
+    "medidas_vd.vd_diametro_basal_mm": (25, 55),
+    "medidas_vd.tapse_mm": (8, 28),
+    "presiones_llenado.mitral_e_a_ratio": (0.4, 3.0),
+    "presiones_llenado.e_prima_septal_cms": (3, 14),
+    "presiones_llenado.e_prima_lateral_cms": (4, 18),
+    "presiones_llenado.it_velocidad_max_ms": (1.5, 4.5),
+    "presiones_llenado.e_sobre_e_prima_ratio": (5, 25),
+    "derrame_pericardico.cuantia_mm": (1, 30),
+    "vci.diametro_max_mm": (10, 30),
+    "vci.mm_inspiracion": (3, 28),
+}
+PROB_NONE = 0.25
+PROB_FLAG = 0.2
+CAMPOS_CALCULADOS = {"vexus.grado_vexus_calculado"} # Los rellena la aplicación, no el usuario
+
+
+def _valor_sintetico(rng: random.Random, col):
+    if col.nombre == "id_informe":
+        return f"BENCH-{rng.getrandbits(48):012x}"
+    if col.opcional and rng.random() < PROB_NONE:
+        return None
+    if col.tipo == F64:
+        minimo, maximo = RANGOS.get(col.nombre, (0, 100))
+        return round(rng.uniform(minimo, maximo), 1)
+    if col.tipo == BOOL:
+        return rng.random() < 0.5
+    if col.tipo == ENTERO:
+        return rng.randint(0, 3)
+    if col.tipo == FECHA:
+        return datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(500_000))
+    if col.tipo == CATEGORIA:
+        return rng.choice(CATEGORIAS[col.nombre])
+    return rng.choice(["", "Texto libre de prueba.", "Líneas B bilaterales en campos inferiores."])
+
+
+def estudio_aleatorio(rng: random.Random, flags=None):
+    valores = [None if col.nombre in CAMPOS_CALCULADOS else _valor_sintetico(rng, col) for col in ESQUEMA]
+    if flags is None:
+        flags = {clave: True for clave in CLAVES_NO_VALORADO if rng.random() < PROB_FLAG}
+    return _construir_informe(valores, flags_a_mascara(flags))
+
+
+def generar_estudios(n_aleatorios: int, semilla: int = 2024) -> list:
+    """Estudios aleatorios + todas las combinaciones de flags de cada sección."""
+    rng = random.Random(semilla)
+    estudios = [estudio_aleatorio(rng) for _ in range(n_aleatorios)]
+    for _, _, _, _, claves_flags in _SECCIONES:
+        for combinacion in product((False, True), repeat=len(claves_flags)):
+            estudios.append(estudio_aleatorio(rng, dict(zip(claves_flags, combinacion))))
+    # Extremos: todo "No Valorado" y nada marcado
+    estudios.append(estudio_aleatorio(rng, {clave: True for clave in CLAVES_NO_VALORADO}))
+    estudios.append(estudio_aleatorio(rng, {}))
+    return estudios
+
+
+def _funciones_a_medir() -> dict:
+    funciones = {"generar_informe_texto": generar_informe_texto, "construir_documento": construir_documento}
+    for _, _, evaluar, _, _ in _SECCIONES:
+        funciones[evaluar.__name__] = partial(evaluar, umbrales=UMBRALES_POR_DEFECTO)
+    funciones["calcular_clasificacion_fevi"] = lambda i: calcular_clasificacion_fevi(i.medidas_vi, i.medidas_auriculas)
+    funciones["estimar_presiones_llenado_vi"] = lambda i: estimar_presiones_llenado_vi(i.presiones_llenado, i.medidas_auriculas)
+    funciones["calcular_grado_vexus"] = lambda i: calcular_grado_vexus(i.vexus)
+    return funciones
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+def medir(funcion, estudios: list, rondas: int) -> dict:
+    """Tiempo de cada llamada (perf_counter_ns). ops/s se calcula sobre el tiempo total."""
+    reloj = time.perf_counter_ns
+    latencias = []
+    for _ in range(rondas):
+        for informe in estudios:
+            t = reloj()
+            funcion(informe)
+            latencias.append(reloj() - t)
+    latencias.sort()
+    total_s = sum(latencias) / 1e9
+    return {
+        "llamadas": len(latencias),
+        "ops_por_s": round(len(latencias) / total_s) if total_s > 0 else None,
+        "p50_us": round(_percentil(latencias, 0.50) / 1e3, 2),
+        "p99_us": round(_percentil(latencias, 0.99) / 1e3, 2),
+    }
+
+
+def cobertura_flags(estudios: list) -> dict:
+    """Combinaciones distintas de flags vistas por sección (máximo 2^k)."""
+    cobertura = {}
+    for clave, _, _, _, claves_flags in _SECCIONES:
+        vistas = {tuple(bool(e.param_no_valorado_flags.get(c)) for c in claves_flags) for e in estudios}
+        cobertura[clave] = f"{len(vistas)}/{2 ** len(claves_flags)}"
+    return cobertura
+
+
+def comparar(resultados: dict, ruta_referencia: str, tolerancia: float) -> dict:
+    with open(ruta_referencia, encoding="utf-8") as f:
+        referencia = json.load(f)["resultados"]["funciones"]
+    regresiones = {}
+    for nombre, actual in resultados["funciones"].items():
+        anterior = referencia.get(nombre)
+        if not anterior or not anterior.get("ops_por_s") or not actual["ops_por_s"]:
+            continue
+        relacion = actual["ops_por_s"] / anterior["ops_por_s"]
+        if relacion < 1 - tolerancia:
+            regresiones[nombre] = {"ops_por_s_anterior": anterior["ops_por_s"],
+                                   "ops_por_s_actual": actual["ops_por_s"], "relacion": round(relacion, 3)}
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudios", type=int, default=2000, help="Estudios aleatorios (además de las combinaciones por sección)")
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    parser.add_argument("--referencia", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Pérdida relativa de ops/s admitida")
+    args = parser.parse_args()
+
+    estudios = generar_estudios(args.estudios, args.semilla)
+    for informe in estudios[:50]: # Calentamiento (imports diferidos, cachés de formato)
+        generar_informe_texto(informe)
+
+    resultados = {
+        "estudios": len(estudios),
+        "rondas": args.rondas,
+        "semilla": args.semilla,
+        "cobertura_flags_por_seccion": cobertura_flags(estudios),
+        "funciones": {nombre: medir(funcion, estudios, args.rondas) for nombre, funcion in _funciones_a_medir().items()},
+    }
+    documentos = [construir_documento(informe) for informe in estudios]
+    for formato, renderizar in RENDERIZADORES.items():
+        resultados["funciones"][f"renderizar_{formato}"] = medir(renderizar, documentos, args.rondas)
+    regresiones = {}
+    if args.referencia:
+        regresiones = comparar(resultados, args.referencia, args.tolerancia)
+        resultados["regresiones"] = regresiones
+    guardar_resultados("generacion_informe", resultados, args.salida)
+    if regresiones:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
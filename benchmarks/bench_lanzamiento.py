@@ -0,0 +1,178 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Arranque en frío y en caliente de cada perfil de build.py y de la aplicación desde el código.
+
+Cada lanzamiento es un proceso nuevo con ECOREPORT_MEDIR_ARRANQUE=<fichero> (la aplicación
+anota el tiempo del primer pintado y se cierra) y, sin pantalla, QT_QPA_PLATFORM=offscreen.
+Por perfil se informa la mediana y el mínimo de:
+- pintado_ms: desde que se lanza el proceso hasta el primer pintado de la ventana (incluye el
+  arranque del intérprete y, en un_archivo, la descompresión en la carpeta temporal);
+- main_ms: lo que mide la propia aplicación desde main();
+- total_ms: hasta que el proceso termina (en un_archivo, también borra la carpeta temporal).
+En frío, antes de cada lanzamiento se expulsan de la caché de páginas los ficheros del perfil
+(os.posix_fadvise; con --drop-caches y permisos de root, toda la caché del sistema). Donde no
+hay posix_fadvise (Windows) solo cuenta como frío el primer lanzamiento tras reiniciar.
+En caliente, los lanzamientos siguen a uno de calentamiento.
+
+Perfiles: "fuente" (python main.py con el bytecode ya compilado; siempre disponible, sirve de
+referencia) y los de build.py (un_archivo, rapido) si están en dist/; con --construir se
+generan antes (hace falta PyInstaller). Los que no tienen ejecutable se omiten con un aviso.
+Termina con código 1 si algún lanzamiento falla.
+
+Uso:
+    python benchmarks/bench_lanzamiento.py [--perfiles fuente un_archivo rapido] [--repeticiones 5]
+                                           [--construir] [--drop-caches] [--salida resultados.json]
+"""
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from _comun import DIR_APP, RAIZ_REPO, guardar_resultados
+
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+import build
+
+PERFIL_FUENTE = "fuente"
+TIEMPO_MAXIMO_S = 120
+
+
+def _comando(perfil: str) -> list:
+    if perfil == PERFIL_FUENTE:
+        return [sys.executable, os.path.join(DIR_APP, "main.py")]
+    return [os.path.join(RAIZ_REPO, build.ruta_ejecutable(perfil))]
+
+
+def _rutas_perfil(perfil: str) -> list:
+    """Ficheros que lee el perfil al arrancar (para expulsarlos de la caché)."""
+    if perfil == PERFIL_FUENTE:
+        import PyQt5
+        biblioteca = os.path.dirname(os.__file__)
+        return [DIR_APP, os.path.dirname(PyQt5.__file__), biblioteca, os.path.realpath(sys.executable)]
+    ejecutable = _comando(perfil)[0]
+    return [os.path.dirname(ejecutable)] if perfil == build.PERFIL_RAPIDO else [ejecutable]
+
+
+def _ficheros(ruta: str):
+    if os.path.isfile(ruta):
+        yield ruta
+        return
+    for carpeta, subcarpetas, ficheros in os.walk(ruta):
+        subcarpetas[:] = [s for s in subcarpetas if s != "site-packages"] # De la biblioteca estándar, solo lo propio
+        for fichero in ficheros:
+            yield os.path.join(carpeta, fichero)
+
+
+def expulsar_de_cache(rutas: list, drop_caches: bool) -> int:
+    """Saca de la caché de páginas los ficheros de 'rutas'. Devuelve cuántos (-1: toda la caché)."""
+    if drop_caches:
+        try:
+            os.sync()
+            with open("/proc/sys/vm/drop_caches", "w") as f:
+                f.write("3\n")
+            return -1
+        except OSError as e:
+            print(f"Aviso: no se pudo vaciar la caché del sistema ({e}); se usa posix_fadvise.", file=sys.stderr)
+    if not hasattr(os, "posix_fadvise"):
+        return 0
+    expulsados = 0
+    for ruta in rutas:
+        for fichero in _ficheros(ruta):
+            try:
+                descriptor = os.open(fichero, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+                expulsados += 1
+            finally:
+                os.close(descriptor)
+    return expulsados
+
+
+def lanzar(perfil: str, directorio: str) -> dict:
+    fichero_medida = os.path.join(directorio, "arranque.txt")
+    if os.path.exists(fichero_medida):
+        os.remove(fichero_medida)
+    entorno = dict(os.environ, ECOREPORT_MEDIR_ARRANQUE=fichero_medida, ECOREPORT_LOG_NIVEL_CONSOLA="WARNING",
+                   ECOREPORT_DIARIO=os.path.join(directorio, "lanzamiento.diario"),
+                   ECOREPORT_ARCHIVO=os.path.join(directorio, "estudios.sqlite3"))
+    inicio = time.time()
+    proceso = subprocess.run(_comando(perfil), env=entorno, cwd=directorio, capture_output=True, text=True,
+                             timeout=TIEMPO_MAXIMO_S)
+    fin = time.time()
+    if not os.path.exists(fichero_medida):
+        raise RuntimeError(f"{perfil}: la aplicación no anotó el arranque (código {proceso.returncode}):\n"
+                           f"{proceso.stderr[-2000:]}")
+    with open(fichero_medida, encoding="utf-8") as f:
+        datos = dict(campo.split("=") for campo in f.read().split())
+    return {"pintado_ms": (float(datos["pintado_unix"]) - inicio) * 1000, "main_ms": float(datos["arranque_ms"]),
+            "total_ms": (fin - inicio) * 1000}
+
+
+def _resumen(medidas: list) -> dict:
+    resumen = {}
+    for clave in ("pintado_ms", "main_ms", "total_ms"):
+        valores = [m[clave] for m in medidas]
+        resumen[clave] = {"mediana": round(statistics.median(valores), 1), "min": round(min(valores), 1)}
+    return resumen
+
+
+def _tamano_mb(perfil: str) -> float:
+    rutas = [DIR_APP] if perfil == PERFIL_FUENTE else _rutas_perfil(perfil)
+    return round(sum(os.path.getsize(f) for ruta in rutas for f in _ficheros(ruta)) / 2 ** 20, 1)
+
+
+def medir_perfil(perfil: str, repeticiones: int, drop_caches: bool) -> dict:
+    with tempfile.TemporaryDirectory() as directorio:
+        frio, expulsados = [], 0
+        for _ in range(repeticiones):
+            expulsados = expulsar_de_cache(_rutas_perfil(perfil), drop_caches)
+            frio.append(lanzar(perfil, directorio))
+        lanzar(perfil, directorio) # Calentamiento
+        caliente = [lanzar(perfil, directorio) for _ in range(repeticiones)]
+    return {"tamano_mb": _tamano_mb(perfil), "ficheros_expulsados": expulsados,
+            "frio": _resumen(frio), "caliente": _resumen(caliente)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfiles", nargs="+", choices=(PERFIL_FUENTE,) + build.PERFILES,
+                        default=[PERFIL_FUENTE, *build.PERFILES])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--construir", action="store_true", help="Generar antes los perfiles con build.py")
+    parser.add_argument("--drop-caches", action="store_true", help="Vaciar toda la caché del sistema (root, Linux)")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    compileall.compile_dir(DIR_APP, quiet=1) # El perfil fuente, con el bytecode ya escrito
+    resultados, errores = {}, []
+    for perfil in args.perfiles:
+        if perfil != PERFIL_FUENTE:
+            if args.construir:
+                subprocess.run([sys.executable, "build.py", "--perfil", perfil], cwd=RAIZ_REPO, check=False)
+            if not os.path.exists(_comando(perfil)[0]):
+                print(f"Aviso: perfil '{perfil}' omitido, no existe {_comando(perfil)[0]} "
+                      "(generarlo con build.py --perfil o usar --construir).", file=sys.stderr)
+                resultados[perfil] = None
+                continue
+        try:
+            resultados[perfil] = medir_perfil(perfil, args.repeticiones, args.drop_caches)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            errores.append(str(e))
+    resultados.update({"errores": errores, "total_errores": len(errores)})
+    guardar_resultados("lanzamiento", resultados, args.salida)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
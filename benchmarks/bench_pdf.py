@@ -0,0 +1,102 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Rendimiento de la exportación PDF en lote (batch.generar_lote con --formatos pdf).
+
+Escribe --estudios estudios sintéticos en un JSONL temporal y los exporta a PDF con
+1, 2, 4... procesos (hasta --max-procesos, por defecto el número de CPUs). Cuenta las
+páginas escritas y da páginas/s, informes/s y la aceleración respecto a un proceso.
+Antes de medir valida cada PDF de la primera pasada (tabla xref y streams comprimidos).
+
+Uso:
+    python benchmarks/bench_pdf.py [--estudios 2000] [--max-procesos 8] [--salida resultados.json]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+from _comun import guardar_resultados
+from bench_informe import generar_estudios
+
+from batch import generar_lote
+from models import informe_a_dict
+
+_PAGINA = re.compile(rb"/Type /Page /Parent")
+_STREAM = re.compile(rb"/Length (\d+) /Filter /FlateDecode >>\nstream\n")
+
+
+def validar_pdf(datos: bytes) -> int:
+    """Comprueba la estructura del PDF y devuelve su número de páginas."""
+    final = re.search(rb"startxref\n(\d+)\n%%EOF\n$", datos)
+    assert final, "falta startxref/%%EOF"
+    inicio_xref = int(final.group(1))
+    assert datos[inicio_xref:inicio_xref + 4] == b"xref", "startxref no apunta a la tabla xref"
+    offsets = re.findall(rb"(\d{10}) 00000 n \n", datos[inicio_xref:])
+    for numero, offset in enumerate(offsets, 1):
+        assert datos[int(offset):].startswith(b"%d 0 obj\n" % numero), f"offset incorrecto del objeto {numero}"
+    for stream in _STREAM.finditer(datos):
+        longitud = int(stream.group(1))
+        zlib.decompress(datos[stream.end():stream.end() + longitud])
+        assert datos[stream.end() + longitud:].startswith(b"\nendstream"), "/Length incorrecto"
+    return len(_PAGINA.findall(datos))
+
+
+def _contar_paginas(dir_salida: str, validar: bool = False) -> int:
+    paginas = 0
+    for nombre in os.listdir(dir_salida):
+        with open(os.path.join(dir_salida, nombre), "rb") as f:
+            datos = f.read()
+        paginas += validar_pdf(datos) if validar else len(_PAGINA.findall(datos))
+    return paginas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudios", type=int, default=2000)
+    parser.add_argument("--max-procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    procesos = [1]
+    while procesos[-1] * 2 <= args.max_procesos:
+        procesos.append(procesos[-1] * 2)
+    if procesos[-1] != args.max_procesos and args.max_procesos > 1:
+        procesos.append(args.max_procesos)
+
+    dir_trabajo = tempfile.mkdtemp(prefix="ecoreport_bench_pdf_")
+    try:
+        entrada = os.path.join(dir_trabajo, "estudios.jsonl")
+        estudios = generar_estudios(args.estudios)[:args.estudios]
+        with open(entrada, "w", encoding="utf-8") as f:
+            for informe in estudios:
+                f.write(json.dumps(informe_a_dict(informe), ensure_ascii=False) + "\n")
+
+        resultados = {"estudios": len(estudios), "pasadas": []}
+        base = None
+        for i, n in enumerate(procesos):
+            dir_salida = os.path.join(dir_trabajo, f"pdf_{n}")
+            inicio = time.perf_counter()
+            generar_lote(entrada, dir_salida, n, formatos=("pdf",))
+            segundos = time.perf_counter() - inicio
+            paginas = _contar_paginas(dir_salida, validar=(i == 0))
+            paginas_s = paginas / segundos
+            base = base or paginas_s
+            resultados["pasadas"].append({"procesos": n, "segundos": round(segundos, 3), "paginas": paginas,
+                                          "paginas_s": round(paginas_s, 1), "informes_s": round(len(estudios) / segundos, 1),
+                                          "aceleracion": round(paginas_s / base, 2)})
+            shutil.rmtree(dir_salida)
+        guardar_resultados("pdf", resultados, args.salida)
+    finally:
+        shutil.rmtree(dir_trabajo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Comprobación exhaustiva y rendimiento de la tabla de decisión de presiones de llenado
+(logic/tabla_presiones.py).
+
+Genera todas las combinaciones de E/A (no disponible, por debajo, en y por encima de
+cada corte) y de los tres criterios adicionales (no medido, por debajo, en el corte,
+por encima), con los umbrales de ambos sexos y unos rangos alternativos, y compara:
+- estimar_presiones_llenado_vi (tabla) con el algoritmo de ramas original, copiado aquí
+  como referencia;
+- estimar_presiones_llenado de calculos_vectorizados con los mismos casos en arrays.
+Verifica también que las combinaciones cubren los 108 índices alcanzables de la tabla
+(4 bandas x 27 estados de criterios) y que etiqueta_presiones lee la misma fila que
+banda_e_a() + bits_criterios().
+
+Después mide llamadas/s de la versión de ramas y de la tabla (etiqueta_presiones, escalar,
+sin el envoltorio try/perfilado de calculations) y estudios/s de la versión vectorizada.
+Ramas y tabla se alternan --rondas veces: se informa la mejor ronda de cada una y la
+mediana del cociente tabla/ramas de cada ronda (> 1: la tabla escalar es más rápida).
+Termina con código 1 si hay alguna discrepancia; con --exigir-velocidad, también si el
+cociente es menor que 1 (depende de la carga del equipo, así que no se exige por defecto).
+
+Uso:
+    python benchmarks/bench_tabla_presiones.py [--repeticiones 200] [--rondas 15] [--exigir-velocidad]
+                                               [--salida resultados.json]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from itertools import product
+
+os.environ.setdefault("ECOREPORT_LOG_NIVEL_CONSOLA", "WARNING")
+
+import numpy as np
+
+from _comun import guardar_resultados
+
+from models import PresionesLlenadoVI, MedidasAuriculas
+from rangos_referencia import RANGOS_REFERENCIA, ReferenceRanges
+from logic.calculations import estimar_presiones_llenado_vi
+from logic.tabla_presiones import (BITS_CRITERIOS, ETIQUETAS_POR_INDICE, ETIQUETAS_PRESIONES, banda_e_a,
+                                   bits_criterios, etiqueta_presiones)
+from logic import calculos_vectorizados as cv
+
+EPSILON = 1e-6
+
+
+def _algoritmo_referencia(e_a, ai_vol, e_e_prima, it_vel, umbrales) -> str:
+    """Ramas y contadores de la implementación original de estimar_presiones_llenado_vi."""
+    if e_a is None:
+        return "No valorables (E/A no disponible)"
+    if e_a <= umbrales.e_a_normal_max:
+        return "Presiones de llenado normales (si datos consistentes)"
+    if e_a >= umbrales.e_a_elevada_min:
+        return "Presiones de llenado ELEVADAS (Patrón restrictivo)"
+    criterios_positivos = 0
+    criterios_evaluables = 0
+    if ai_vol is not None:
+        criterios_evaluables += 1
+        if ai_vol > umbrales.ai_vol_idx_dilatada_min:
+            criterios_positivos += 1
+    if e_e_prima is not None:
+        criterios_evaluables += 1
+        if e_e_prima > umbrales.e_e_prima_corte:
+            criterios_positivos += 1
+    if it_vel is not None:
+        criterios_evaluables += 1
+        if it_vel > umbrales.it_velocidad_corte_ms:
+            criterios_positivos += 1
+    if criterios_evaluables < 2:
+        return "Indeterminadas (datos insuficientes para E/A 0.8-2)"
+    if criterios_evaluables == 2:
+        if criterios_positivos == 2:
+            return "Presiones de llenado ELEVADAS"
+        elif criterios_positivos == 0:
+            return "Presiones de llenado normales"
+        else:
+            return "Indeterminadas (discordantes, valorar otras técnicas)"
+    if criterios_positivos >= 2:
+        return "Presiones de llenado ELEVADAS"
+    return "Presiones de llenado normales"
+
+
+def _valores_corte(corte: float) -> tuple:
+    return (None, corte - 1, corte - EPSILON, corte, corte + EPSILON, corte + 1)
+
+
+def casos(umbrales) -> list:
+    valores_e_a = (None, umbrales.e_a_normal_max - 0.1, umbrales.e_a_normal_max, umbrales.e_a_normal_max + EPSILON,
+                   (umbrales.e_a_normal_max + umbrales.e_a_elevada_min) / 2, umbrales.e_a_elevada_min - EPSILON,
+                   umbrales.e_a_elevada_min, umbrales.e_a_elevada_min + 1)
+    return list(product(valores_e_a, _valores_corte(umbrales.ai_vol_idx_dilatada_min),
+                        _valores_corte(umbrales.e_e_prima_corte), _valores_corte(umbrales.it_velocidad_corte_ms)))
+
+
+def _escalar(e_a, ai_vol, e_e_prima, it_vel, umbrales) -> str:
+    return estimar_presiones_llenado_vi(
+        PresionesLlenadoVI(mitral_e_a_ratio=e_a, e_sobre_e_prima_ratio=e_e_prima, it_velocidad_max_ms=it_vel),
+        MedidasAuriculas(ai_vol_ml_m2=ai_vol), umbrales)
+
+
+def _columna(valores) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+
+
+def verificar() -> dict:
+    juegos = {"M": RANGOS_REFERENCIA.para_sexo("M"), "F": RANGOS_REFERENCIA.para_sexo("F"),
+              "alternativos": ReferenceRanges.desde_config({"E_A_NORMAL_MAX": 1.0, "E_A_ELEVADA_MIN": 2.5, "E_E_PRIMA_CORTE_PRESIONES": 13,
+                                                           "IT_VELOCIDAD_CORTE_PRESIONES": 3.1}).para_sexo("M")}
+    resultado = {"casos": 0, "discrepancias_escalar": 0, "discrepancias_vectorizado": 0, "discrepancias_indice": 0}
+    for nombre, umbrales in juegos.items():
+        lista = casos(umbrales)
+        referencia = [_algoritmo_referencia(*caso, umbrales) for caso in lista]
+        escalar = [_escalar(*caso, umbrales) for caso in lista]
+        columnas = [_columna(c) for c in zip(*lista)]
+        vectorizado = [ETIQUETAS_PRESIONES[codigo] for codigo in cv.estimar_presiones_llenado(*columnas, umbrales)]
+        indices = [(banda_e_a(e_a, umbrales) << BITS_CRITERIOS) | bits_criterios(ai, ee, it, umbrales)
+                   for e_a, ai, ee, it in lista]
+        resultado["discrepancias_indice"] += sum(ETIQUETAS_POR_INDICE[indice] != etiqueta_presiones(*caso, umbrales)
+                                                 for indice, caso in zip(indices, lista))
+        indices = set(indices)
+        resultado["casos"] += len(lista)
+        resultado["discrepancias_escalar"] += sum(a != b for a, b in zip(referencia, escalar))
+        resultado["discrepancias_vectorizado"] += sum(a != b for a, b in zip(referencia, vectorizado))
+        resultado[f"indices_cubiertos_{nombre}"] = len(indices)
+        for caso, esperado, obtenido in zip(lista, referencia, escalar):
+            if esperado != obtenido:
+                print(f"[{nombre}] {caso}: esperado '{esperado}', tabla '{obtenido}'", file=sys.stderr)
+    return resultado
+
+
+def _llamadas_s(funcion, argumentos: list, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for e_a, ai, ee, it, umbrales in argumentos:
+            funcion(e_a, ai, ee, it, umbrales)
+    return repeticiones * len(argumentos) / (time.perf_counter() - inicio)
+
+
+def medir_rendimiento(repeticiones: int, rondas: int) -> dict:
+    umbrales = RANGOS_REFERENCIA.para_sexo("M")
+    lista = casos(umbrales)
+    datos = [(PresionesLlenadoVI(mitral_e_a_ratio=e_a, e_sobre_e_prima_ratio=ee, it_velocidad_max_ms=it),
+              MedidasAuriculas(ai_vol_ml_m2=ai)) for e_a, ai, ee, it in lista]
+    argumentos = [(p.mitral_e_a_ratio, a.ai_vol_ml_m2, p.e_sobre_e_prima_ratio, p.it_velocidad_max_ms, umbrales)
+                  for p, a in datos]
+
+    ramas, tabla = [], []
+    for _ in range(rondas): # Alternadas, para que ambas sufran igual el ruido del equipo
+        ramas.append(_llamadas_s(_algoritmo_referencia, argumentos, repeticiones))
+        tabla.append(_llamadas_s(etiqueta_presiones, argumentos, repeticiones))
+    cociente = statistics.median(t / r for t, r in zip(tabla, ramas))
+
+    columnas = [np.tile(_columna(c), repeticiones) for c in zip(*lista)]
+    inicio = time.perf_counter()
+    cv.estimar_presiones_llenado(*columnas, umbrales)
+    vectorizado = len(columnas[0]) / (time.perf_counter() - inicio)
+    return {"ramas_llamadas_s": round(max(ramas)), "tabla_llamadas_s": round(max(tabla)),
+            "tabla_frente_a_ramas": round(cociente, 3), "vectorizado_estudios_s": round(vectorizado)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--rondas", type=int, default=15)
+    parser.add_argument("--exigir-velocidad", action="store_true",
+                        help="Fallar también si la tabla escalar es más lenta que las ramas")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    resultados = {"verificacion": verificar(), "rendimiento": medir_rendimiento(args.repeticiones, args.rondas)}
+    v, r = resultados["verificacion"], resultados["rendimiento"]
+    errores = [f"{clave}: {v[clave]}" for clave in ("discrepancias_escalar", "discrepancias_vectorizado",
+                                                     "discrepancias_indice") if v[clave]]
+    errores += [f"índices cubiertos ({n}): {v[f'indices_cubiertos_{n}']} de {4 * 27}"
+                for n in ("M", "F", "alternativos") if v[f"indices_cubiertos_{n}"] != 4 * 27]
+    if args.exigir_velocidad and r["tabla_frente_a_ramas"] < 1:
+        errores.append(f"tabla escalar más lenta que las ramas (cociente {r['tabla_frente_a_ramas']})")
+    resultados.update({"errores": errores, "total_errores": len(errores)})
+    guardar_resultados("tabla_presiones", resultados, args.salida)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Paridad y rendimiento de los kernels vectorizados (logic/calculos_vectorizados.py)
+frente a las funciones escalares de logic/calculations.py.
+
+Genera una cohorte sintética con valores en torno a todos los puntos de corte y con
+NaN/None mezclados, comprueba que cada estudio recibe exactamente la misma
+clasificación por ambas vías (incluidas las ramas de "datos insuficientes") y mide
+estudios/segundo de cada una. Termina con código 1 si hay alguna discrepancia.
+
+Uso:
+    python benchmarks/bench_vectorizado.py [--estudios 200000] [--salida resultados.json]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from _comun import guardar_resultados
+
+import config
+from models import MedidasVI, MedidasAuriculas, PresionesLlenadoVI, VExUSScore
+from logic.calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+from logic import calculos_vectorizados as cv
+
+
+def _columna(rng, n, valores_frontera, proporcion_nan=0.2):
+    """Mezcla valores exactamente en los cortes, valores aleatorios y NaN."""
+    col = rng.choice(np.asarray(valores_frontera, dtype=np.float64), size=n)
+    aleatorios = rng.random(n) < 0.5
+    col[aleatorios] = rng.uniform(min(valores_frontera), max(valores_frontera), size=aleatorios.sum())
+    col[rng.random(n) < proporcion_nan] = np.nan
+    return col
+
+
+def generar_cohorte(n: int, semilla: int = 2024) -> dict:
+    rng = np.random.default_rng(semilla)
+    return {
+        "fevi": _columna(rng, n, [20, 40, 40.5, 49, 49.5, 70]),
+        "ai_vol": _columna(rng, n, [20, 34, 34.1, 60]),
+        "e_a": _columna(rng, n, [0.5, 0.8, 0.81, 1.5, 2.0, 3.0]),
+        "e_e_prima": _columna(rng, n, [5, 14, 14.1, 25]),
+        "it_vel": _columna(rng, n, [1.5, 2.8, 2.81, 4.0]),
+        "vci_patologica": rng.random(n) < 0.6,
+        "vsh": rng.integers(-1, 3, size=n).astype(np.int8),
+        "vp": rng.integers(-1, 3, size=n).astype(np.int8),
+        "vir": rng.integers(-1, 3, size=n).astype(np.int8),
+    }
+
+
+def _opt(valor):
+    return None if np.isnan(valor) else float(valor)
+
+
+def _patron(codigo, patrones):
+    return None if codigo < 0 else patrones[codigo]
+
+
+def clasificar_escalar(c: dict, n: int):
+    fevi, presiones, vexus = [], [], []
+    for i in range(n):
+        ai = MedidasAuriculas(ai_vol_ml_m2=_opt(c["ai_vol"][i]))
+        fevi.append(calcular_clasificacion_fevi(MedidasVI(fevi_porcentaje=_opt(c["fevi"][i])), ai))
+        pres = PresionesLlenadoVI(mitral_e_a_ratio=_opt(c["e_a"][i]), e_sobre_e_prima_ratio=_opt(c["e_e_prima"][i]),
+                                  it_velocidad_max_ms=_opt(c["it_vel"][i]))
+        presiones.append(estimar_presiones_llenado_vi(pres, ai))
+        vexus.append(calcular_grado_vexus(VExUSScore(
+            vci_patologica_vexus=bool(c["vci_patologica"][i]),
+            patron_vena_suprahepatica=_patron(c["vsh"][i], config.VSH_PATRONES),
+            patron_vena_porta=_patron(c["vp"][i], config.VP_PATRONES),
+            patron_vena_intrarrenal=_patron(c["vir"][i], config.VIR_PATRONES))))
+    return fevi, presiones, vexus
+
+
+def clasificar_vectorizado(c: dict):
+    return (cv.clasificar_fevi(c["fevi"], c["ai_vol"]),
+            cv.estimar_presiones_llenado(c["e_a"], c["ai_vol"], c["e_e_prima"], c["it_vel"]),
+            cv.calcular_grados_vexus(c["vci_patologica"], c["vsh"], c["vp"], c["vir"]))
+
+
+def comprobar_paridad(escalar, vectorizado) -> dict:
+    fevi_s, pres_s, vexus_s = escalar
+    fevi_v, pres_v, vexus_v = vectorizado
+    return {
+        "fevi": sum(cv.ETIQUETAS_FEVI[c] != s for c, s in zip(fevi_v, fevi_s)),
+        "presiones_llenado": sum(cv.ETIQUETAS_PRESIONES[c] != s for c, s in zip(pres_v, pres_s)),
+        "vexus": sum(int(c) != s for c, s in zip(vexus_v, vexus_s)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudios", type=int, default=200_000)
+    parser.add_argument("--estudios-escalar", type=int, default=50_000,
+                        help="Estudios usados para la paridad y el tiempo escalar (más lento)")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    n_escalar = min(args.estudios, args.estudios_escalar)
+    cohorte = generar_cohorte(args.estudios)
+    sub_cohorte = {k: v[:n_escalar] for k, v in cohorte.items()}
+
+    t = time.perf_counter()
+    escalar = clasificar_escalar(sub_cohorte, n_escalar)
+    t_escalar = time.perf_counter() - t
+
+    discrepancias = comprobar_paridad(escalar, clasificar_vectorizado(sub_cohorte))
+
+    t = time.perf_counter()
+    clasificar_vectorizado(cohorte)
+    t_vectorizado = time.perf_counter() - t
+
+    resultados = {
+        "estudios_escalar": n_escalar,
+        "estudios_vectorizado": args.estudios,
+        "escalar_estudios_por_s": round(n_escalar / t_escalar),
+        "vectorizado_estudios_por_s": round(args.estudios / t_vectorizado),
+        "aceleracion": round((args.estudios / t_vectorizado) / (n_escalar / t_escalar), 1),
+        "discrepancias": discrepancias,
+    }
+    guardar_resultados("clasificacion_vectorizada", resultados, args.salida)
+    if any(discrepancias.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,19 @@
 # -*- coding: utf-8 -*-
 """
 Script para generar el ejecutable de EcoReport SEMI usando PyInstaller.
+
+Perfiles (--perfil):
+- un_archivo (por defecto): un único ejecutable (--onefile). Cómodo de distribuir, pero en
+  cada arranque descomprime todo el runtime de Python y PyQt5 en una carpeta temporal.
+- rapido: carpeta con el ejecutable y sus bibliotecas (--onedir) que arranca sin
+  descomprimir nada; excluye los módulos de Qt y de Python que la aplicación no usa,
+  guarda el bytecode optimizado, no comprime con UPX y elimina las traducciones de Qt y
+  los plugins de imagen que no hacen falta.
+
+Cada perfil se genera en dist/<perfil>/. benchmarks/bench_lanzamiento.py mide el
+arranque en frío y en caliente de cada uno.
 """
+import argparse
 import os
 import subprocess
 import shutil
@@ -17,6 +29,67 @@ SOURCE_SUBFOLDER = "ecoreport_semi"
 RESOURCES_FOLDER_SOURCE = os.path.join(SOURCE_SUBFOLDER, "resources") # Ej: "ecoreport_semi/resources"
 RESOURCES_FOLDER_DEST_IN_BUNDLE = "resources" # <<< --- Este es el nombre de la carpeta DENTRO del bundle
 
+PERFIL_UN_ARCHIVO = "un_archivo"
+PERFIL_RAPIDO = "rapido"
+PERFILES = (PERFIL_UN_ARCHIVO, PERFIL_RAPIDO)
+
+# La aplicación solo importa QtCore, QtGui y QtWidgets (y ningún módulo de esta lista de
+# la biblioteca estándar): lo demás no se empaqueta en el perfil rápido.
+MODULOS_QT_NO_USADOS = (
+    "Qt3DAnimation", "Qt3DCore", "Qt3DExtras", "Qt3DInput", "Qt3DLogic", "Qt3DRender", "QtBluetooth",
+    "QtChart", "QtDBus", "QtDataVisualization", "QtDesigner", "QtHelp", "QtLocation", "QtMultimedia",
+    "QtMultimediaWidgets", "QtNetwork", "QtNetworkAuth", "QtNfc", "QtOpenGL", "QtPositioning",
+    "QtPrintSupport", "QtPurchasing", "QtQml", "QtQuick", "QtQuick3D", "QtQuickWidgets", "QtRemoteObjects",
+    "QtSensors", "QtSerialPort", "QtSql", "QtSvg", "QtTest", "QtTextToSpeech", "QtWebChannel",
+    "QtWebEngine", "QtWebEngineCore", "QtWebEngineWidgets", "QtWebKit", "QtWebKitWidgets",
+    "QtWebSockets", "QtWinExtras", "QtX11Extras", "QtXml", "QtXmlPatterns", "uic",
+)
+MODULOS_PYTHON_NO_USADOS = ("tkinter", "unittest", "test", "pydoc", "pydoc_data", "lib2to3", "xmlrpc")
+# Dentro del bundle rápido: no hay QTranslator (la interfaz ya está en español) y el único
+# plugin de imagen que se usa es el de .ico para el icono (los PNG los lee QtGui sin plugin).
+PODA_RAPIDO = (os.path.join("PyQt5", "Qt5", "translations"),)
+PLUGINS_IMAGEN_NECESARIOS = ("qico",)
+
+
+def ruta_ejecutable(perfil: str, dist: str = "dist") -> str:
+    """Ruta del ejecutable que genera build_executable(perfil)."""
+    nombre = APP_NAME + (".exe" if sys.platform == "win32" else "")
+    if perfil == PERFIL_RAPIDO:
+        return os.path.join(dist, perfil, APP_NAME, nombre)
+    return os.path.join(dist, perfil, nombre)
+
+
+def _ruta_entrada() -> str:
+    # build.py se puede lanzar desde la raíz del repositorio o desde ecoreport_semi/
+    return ENTRY_POINT if os.path.exists(ENTRY_POINT) else os.path.join(SOURCE_SUBFOLDER, ENTRY_POINT)
+
+
+def _opciones_perfil(perfil: str) -> list:
+    if perfil == PERFIL_UN_ARCHIVO:
+        return ['--onefile']   # Un solo archivo ejecutable
+    opciones = ['--onedir', '--noupx', '--optimize', '1'] # Sin descompresión al arrancar; bytecode con -O
+    for modulo in MODULOS_QT_NO_USADOS:
+        opciones += ['--exclude-module', f"PyQt5.{modulo}"]
+    for modulo in MODULOS_PYTHON_NO_USADOS:
+        opciones += ['--exclude-module', modulo]
+    return opciones
+
+
+def _podar_bundle(carpeta_bundle: str):
+    """Elimina del bundle rápido lo que PyInstaller recoge de Qt y la aplicación no carga."""
+    interno = os.path.join(carpeta_bundle, "_internal")
+    base = interno if os.path.isdir(interno) else carpeta_bundle
+    for relativa in PODA_RAPIDO:
+        ruta = os.path.join(base, relativa)
+        if os.path.isdir(ruta):
+            print(f"Eliminando del bundle: {relativa}")
+            shutil.rmtree(ruta)
+    plugins_imagen = os.path.join(base, "PyQt5", "Qt5", "plugins", "imageformats")
+    if os.path.isdir(plugins_imagen):
+        for fichero in os.listdir(plugins_imagen):
+            if not any(necesario in fichero for necesario in PLUGINS_IMAGEN_NECESARIOS):
+                os.remove(os.path.join(plugins_imagen, fichero))
+
 def check_dependencies():
     """Verifica e intenta instalar dependencias faltantes."""
     dependencies = {"PyQt5": "PyQt5", "PyInstaller": "pyinstaller"}
@@ -42,12 +115,14 @@ def check_dependencies():
     return True
 
 
-def build_executable():
-    """Construye el ejecutable con PyInstaller."""
-    print(f"Construyendo el ejecutable de {APP_NAME}...")
+def build_executable(perfil: str = PERFIL_UN_ARCHIVO):
+    """Construye el ejecutable con PyInstaller en dist/<perfil>/."""
+    print(f"Construyendo el ejecutable de {APP_NAME} (perfil '{perfil}')...")
+    dist_perfil = os.path.join('dist', perfil)
+    build_perfil = os.path.join('build', perfil)
 
-    # Limpiar directorios de construcción anteriores
-    for dir_to_clean in ['build', 'dist', f"{APP_NAME}.spec"]:
+    # Limpiar directorios de construcción anteriores (solo los de este perfil)
+    for dir_to_clean in [build_perfil, dist_perfil, f"{APP_NAME}.spec"]:
         if os.path.exists(dir_to_clean):
             print(f"Limpiando: {dir_to_clean}")
             if os.path.isdir(dir_to_clean):
@@ -60,9 +135,10 @@ def build_executable():
         'pyinstaller',
         '--name', APP_NAME,
         '--windowed',  # Aplicación GUI, sin consola al ejecutar
-        '--onefile',   # Un solo archivo ejecutable
+        '--distpath', dist_perfil,
+        '--workpath', build_perfil,
         # '--noconfirm', # Sobrescribir sin preguntar
-    ]
+    ] + _opciones_perfil(perfil)
 
     if os.path.exists(RESOURCES_FOLDER_SOURCE):
         # El formato es "origen_ruta_completa{os.pathsep}destino_en_bundle"
@@ -87,7 +163,7 @@ def build_executable():
     else:
         print(f"Advertencia: Carpeta de recursos no encontrada en {resources_path}. No se añadirán datos extra.")
         
-    pyinstaller_options.append(ENTRY_POINT)
+    pyinstaller_options.append(_ruta_entrada())
 
     print(f"\nEjecutando PyInstaller con las siguientes opciones:\n{' '.join(pyinstaller_options)}\n")
     
@@ -98,7 +174,9 @@ def build_executable():
         if process.returncode == 0:
             print("\n--- Salida de PyInstaller (stdout) ---")
             print(stdout)
-            print(f"\nEjecutable construido correctamente en: dist/{APP_NAME}.exe")
+            if perfil == PERFIL_RAPIDO:
+                _podar_bundle(os.path.dirname(ruta_ejecutable(perfil)))
+            print(f"\nEjecutable construido correctamente en: {ruta_ejecutable(perfil)}")
             return True
         else:
             print("\n--- Error al construir el ejecutable ---")
@@ -117,12 +195,17 @@ def build_executable():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el ejecutable de EcoReport SEMI con PyInstaller.")
+    parser.add_argument("--perfil", choices=PERFILES, default=PERFIL_UN_ARCHIVO,
+                        help="un_archivo: un solo .exe; rapido: carpeta que arranca sin descomprimir (ver docstring)")
+    args = parser.parse_args()
+
     print("Iniciando proceso de construcción para EcoReport SEMI...")
     if not check_dependencies():
         print("\nProceso de construcción detenido debido a dependencias faltantes.")
         sys.exit(1)
 
-    if build_executable():
+    if build_executable(args.perfil):
         print("\nProceso de construcción completado con éxito.")
     else:
         print("\nEl proceso de construcción falló.")
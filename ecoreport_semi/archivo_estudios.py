@@ -0,0 +1,248 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Archivo local de estudios (SQLite): guarda y recupera InformeEcoCompleto completos.
+
+Cada estudio es una fila con las columnas de búsqueda (id_informe, nhc, fecha_estudio,
+realizado_por) y el informe completo como JSON comprimido (informe_a_dict). Las
+búsquedas usan índices sobre id_informe (clave primaria), (nhc, fecha_estudio) y
+fecha_estudio, y devuelven resúmenes sin descomprimir el informe; solo cargar()
+reconstruye el modelo.
+
+La tabla 'evolucion' guarda, en la misma transacción que cada estudio, su punto de
+evolución (logic/evolucion.py) como JSON sin comprimir e indexado por (nhc, fecha): la
+serie de un paciente y su estudio previo se leen sin descomprimir ningún informe.
+"""
+import json
+import os
+import sqlite3
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import config
+from models import InformeEcoCompleto, informe_a_dict, informe_desde_dict
+from logic.evolucion import PuntoEvolucion, punto_evolucion
+from utils.perfilado import perfilar
+from utils.error_handling import log_message
+
+VERSION_ESQUEMA = 2 # 2: tabla "evolucion"
+LIMITE_RESULTADOS = 500
+PAGINA_ITERACION = 500 # Estudios por consulta al recorrer el archivo con iterar()
+
+ResumenEstudio = namedtuple("ResumenEstudio", "id_informe nhc fecha_estudio realizado_por")
+
+_ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS estudios (
+    id_informe    TEXT PRIMARY KEY,
+    nhc           TEXT NOT NULL,
+    fecha_estudio TEXT NOT NULL,
+    realizado_por TEXT NOT NULL,
+    guardado_en   TEXT NOT NULL,
+    datos         BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_estudios_nhc_fecha ON estudios (nhc, fecha_estudio);
+CREATE INDEX IF NOT EXISTS idx_estudios_fecha ON estudios (fecha_estudio);
+CREATE TABLE IF NOT EXISTS evolucion (
+    id_informe    TEXT PRIMARY KEY,
+    nhc           TEXT NOT NULL,
+    fecha_estudio TEXT NOT NULL,
+    valores       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evolucion_nhc_fecha ON evolucion (nhc, fecha_estudio);
+"""
+
+
+def _fecha_iso(fecha) -> str:
+    # ISO 8601 ordena igual como texto que como fecha: los rangos usan el índice
+    return fecha.isoformat() if isinstance(fecha, datetime) else str(fecha or "")
+
+
+def _comprimir(informe: InformeEcoCompleto) -> bytes:
+    texto = json.dumps(informe_a_dict(informe), ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(texto.encode("utf-8"), 6)
+
+
+def descomprimir_informe(datos: bytes) -> InformeEcoCompleto:
+    return informe_desde_dict(json.loads(zlib.decompress(datos).decode("utf-8")))
+
+
+def _fila_estudio(informe: InformeEcoCompleto, guardado_en: str) -> tuple:
+    return (informe.id_informe, informe.paciente.nhc.strip(), _fecha_iso(informe.paciente.fecha_estudio),
+            informe.realizado_por, guardado_en, _comprimir(informe))
+
+
+def _fila_evolucion(informe: InformeEcoCompleto) -> tuple:
+    punto = punto_evolucion(informe)
+    return (punto.id_informe, informe.paciente.nhc.strip(), punto.fecha_estudio,
+            json.dumps(punto.valores, ensure_ascii=False, separators=(",", ":")))
+
+
+def _punto(fila: tuple) -> PuntoEvolucion:
+    # fila: (id_informe, fecha_estudio, valores JSON)
+    return PuntoEvolucion(fila[0], fila[1], json.loads(fila[2]))
+
+
+class ArchivoEstudios:
+    """Archivo de estudios en un fichero SQLite. Usar como context manager o llamar a cerrar()."""
+
+    def __init__(self, ruta: Optional[str] = None):
+        self.ruta = ruta or config.ARCHIVO_ESTUDIOS_PATH
+        if self.ruta != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(self.ruta)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        version = self._conexion.execute("PRAGMA user_version").fetchone()[0]
+        if version > VERSION_ESQUEMA:
+            raise RuntimeError(f"El archivo '{self.ruta}' tiene un esquema más reciente ({version}) que esta versión de la aplicación.")
+        with self._conexion:
+            self._conexion.executescript(_ESQUEMA_SQL)
+            if 0 < version < 2:
+                self._indexar_evolucion()
+            self._conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+
+    def _indexar_evolucion(self):
+        """Migración a la versión 2: calcula el punto de evolución de los estudios ya guardados."""
+        filas = [_fila_evolucion(informe) for _resumen, informe in self.iterar()]
+        self._conexion.executemany("INSERT OR REPLACE INTO evolucion VALUES (?, ?, ?, ?)", filas)
+        log_message(f"Archivo de estudios '{self.ruta}': índice de evolución creado para {len(filas)} estudios.", "info")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self._conexion.close()
+
+    # --- Escritura ---
+    def guardar(self, informe: InformeEcoCompleto):
+        """Guarda el estudio; si ya existe uno con el mismo id_informe, lo sustituye."""
+        self.guardar_varios((informe,))
+
+    @perfilar()
+    def guardar_varios(self, informes: Iterable[InformeEcoCompleto]) -> int:
+        """Guarda muchos estudios en una sola transacción. Devuelve cuántos se guardaron."""
+        guardado_en = datetime.now().isoformat(timespec="seconds")
+        filas_evolucion = []
+
+        def filas():
+            # Un solo recorrido: 'informes' puede ser un generador que reutiliza el objeto
+            for informe in informes:
+                filas_evolucion.append(_fila_evolucion(informe))
+                yield _fila_estudio(informe, guardado_en)
+
+        with self._conexion:
+            cursor = self._conexion.executemany("INSERT OR REPLACE INTO estudios VALUES (?, ?, ?, ?, ?, ?)", filas())
+            self._conexion.executemany("INSERT OR REPLACE INTO evolucion VALUES (?, ?, ?, ?)", filas_evolucion)
+        return cursor.rowcount
+
+    def eliminar(self, id_informe: str) -> bool:
+        with self._conexion:
+            self._conexion.execute("DELETE FROM evolucion WHERE id_informe = ?", (id_informe,))
+            return self._conexion.execute("DELETE FROM estudios WHERE id_informe = ?", (id_informe,)).rowcount > 0
+
+    # --- Lectura ---
+    def __len__(self) -> int:
+        return self._conexion.execute("SELECT COUNT(*) FROM estudios").fetchone()[0]
+
+    def cargar(self, id_informe: str) -> Optional[InformeEcoCompleto]:
+        fila = self._conexion.execute("SELECT datos FROM estudios WHERE id_informe = ?", (id_informe,)).fetchone()
+        return descomprimir_informe(fila[0]) if fila else None
+
+    def buscar_por_nhc(self, nhc: str, limite: int = LIMITE_RESULTADOS) -> List[ResumenEstudio]:
+        """Estudios de un paciente, del más reciente al más antiguo."""
+        filas = self._conexion.execute(
+            "SELECT id_informe, nhc, fecha_estudio, realizado_por FROM estudios "
+            "WHERE nhc = ? ORDER BY fecha_estudio DESC LIMIT ?", (nhc.strip(), limite))
+        return [ResumenEstudio(*fila) for fila in filas]
+
+    def serie_evolucion(self, nhc: str, limite: int = LIMITE_RESULTADOS) -> List[PuntoEvolucion]:
+        """Puntos de evolución de los últimos 'limite' estudios de un paciente, del más
+        antiguo al más reciente (sin descomprimir los informes)."""
+        filas = self._conexion.execute(
+            "SELECT id_informe, fecha_estudio, valores FROM evolucion "
+            "WHERE nhc = ? ORDER BY fecha_estudio DESC, id_informe DESC LIMIT ?", (nhc.strip(), limite)).fetchall()
+        return [_punto(fila) for fila in reversed(filas)]
+
+    def estudio_previo(self, informe: InformeEcoCompleto) -> Optional[PuntoEvolucion]:
+        """Punto de evolución del último estudio del mismo paciente anterior (o del mismo día)
+        al del informe, sin contar el propio informe. None si no hay NHC o estudios previos."""
+        nhc = informe.paciente.nhc.strip()
+        if not nhc:
+            return None
+        condiciones, parametros = ["nhc = ?", "id_informe != ?"], [nhc, informe.id_informe]
+        fecha = _fecha_iso(informe.paciente.fecha_estudio)
+        if fecha:
+            condiciones.append("fecha_estudio <= ?")
+            parametros.append(fecha)
+        fila = self._conexion.execute(
+            f"SELECT id_informe, fecha_estudio, valores FROM evolucion WHERE {' AND '.join(condiciones)} "
+            "ORDER BY fecha_estudio DESC, id_informe DESC LIMIT 1", parametros).fetchone()
+        return _punto(fila) if fila else None
+
+    def buscar_por_fecha(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                         limite: int = LIMITE_RESULTADOS) -> List[ResumenEstudio]:
+        """Estudios con desde <= fecha_estudio < hasta (cualquiera de los dos puede omitirse),
+        del más reciente al más antiguo."""
+        condiciones, parametros = self._filtros(desde, hasta, None)
+        donde = f"WHERE {' AND '.join(condiciones)} " if condiciones else ""
+        filas = self._conexion.execute(
+            "SELECT id_informe, nhc, fecha_estudio, realizado_por FROM estudios "
+            f"{donde}ORDER BY fecha_estudio DESC LIMIT ?", (*parametros, limite))
+        return [ResumenEstudio(*fila) for fila in filas]
+
+    @staticmethod
+    def _filtros(desde: Optional[datetime], hasta: Optional[datetime], nhc: Optional[str]) -> Tuple[List[str], list]:
+        condiciones, parametros = [], []
+        if nhc is not None:
+            condiciones.append("nhc = ?")
+            parametros.append(nhc.strip())
+        if desde is not None:
+            condiciones.append("fecha_estudio >= ?")
+            parametros.append(_fecha_iso(desde))
+        if hasta is not None:
+            condiciones.append("fecha_estudio < ?")
+            parametros.append(_fecha_iso(hasta))
+        return condiciones, parametros
+
+    def contar(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None, nhc: Optional[str] = None) -> int:
+        """Número de estudios que recorrería iterar() con los mismos filtros."""
+        condiciones, parametros = self._filtros(desde, hasta, nhc)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._conexion.execute(f"SELECT COUNT(*) FROM estudios{donde}", parametros).fetchone()[0]
+
+    def iterar(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None, nhc: Optional[str] = None,
+               despues_de: Optional[Tuple[str, str]] = None,
+               descomprimir: bool = True) -> Iterator[Tuple[ResumenEstudio, InformeEcoCompleto]]:
+        """Recorre los estudios filtrados en orden (fecha_estudio, id_informe) ascendente,
+        descomprimiendo uno a uno. Pide páginas de PAGINA_ITERACION filas que continúan
+        tras la última clave vista, así que no mantiene un cursor abierto entre páginas
+        ni carga más de una página. 'despues_de' = (fecha_estudio ISO, id_informe) del
+        último estudio ya procesado, para continuar un recorrido interrumpido. Con
+        descomprimir=False devuelve los datos comprimidos tal cual, para que los descomprima
+        otro proceso con descomprimir_informe."""
+        condiciones, parametros = self._filtros(desde, hasta, nhc)
+        clave = despues_de
+        while True:
+            condiciones_pagina, parametros_pagina = list(condiciones), list(parametros)
+            if clave is not None:
+                # Forma expandida de (fecha_estudio, id_informe) > clave, que usa el índice por fecha
+                condiciones_pagina.append("fecha_estudio >= ? AND (fecha_estudio > ? OR id_informe > ?)")
+                parametros_pagina += [clave[0], clave[0], clave[1]]
+            donde = f"WHERE {' AND '.join(condiciones_pagina)} " if condiciones_pagina else ""
+            filas = self._conexion.execute(
+                "SELECT id_informe, nhc, fecha_estudio, realizado_por, datos FROM estudios "
+                f"{donde}ORDER BY fecha_estudio, id_informe LIMIT ?", (*parametros_pagina, PAGINA_ITERACION)).fetchall()
+            for *resumen, datos in filas:
+                yield ResumenEstudio(*resumen), descomprimir_informe(datos) if descomprimir else datos
+            if len(filas) < PAGINA_ITERACION:
+                return
+            clave = (filas[-1][2], filas[-1][0])
@@ -0,0 +1,304 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Generación de informes por lotes, sin interfaz gráfica.
+
+Lee estudios en JSONL (un InformeEcoCompleto por línea, anidado o con claves
+'seccion.campo'), CSV (columnas 'seccion.campo'), HL7 v2 (.hl7, mensajes ORU^R01 de
+los ecógrafos; importacion_hl7.py) o DICOM SR (un .dcm o un directorio de ficheros DICOM,
+de los que solo se importan los SR; importacion_dicom_sr.py), genera cada informe con
+generar_informe_texto en un pool de procesos y lo escribe a disco según se completa.
+Con --formatos cada estudio se evalúa una vez y se escribe en varios formatos
+(txt, md, html, json, pdf) desde el mismo documento estructurado. Cada proceso
+escribe sus ficheros directamente en --salida; el número de procesos es --procesos.
+Los estudios se leen de forma perezosa y solo hay un número acotado de lotes en
+vuelo, por lo que la memoria no crece con el tamaño del fichero de entrada.
+
+Con el subcomando 'archivar' los estudios se guardan en el archivo local
+(archivo_estudios.py) en lugar de generar sus informes. Con 'exportar' los informes
+de los estudios del archivo (por rango de fechas y/o NHC) se escriben en un único zip
+o JSONL (exportacion_estudios.py), con memoria acotada y reanudable con --reanudar.
+Con 'estadisticas' se resume la cohorte del archivo (clases FEVI, grados VExUS, tasa de
+presiones elevadas, medias y cuantiles de TAPSE, FEVI...) por mes, operador o en total,
+en una sola pasada y en paralelo (estadisticas_cohorte.py), y se escribe como JSON.
+
+Uso:
+    python ecoreport_semi/batch.py generar estudios.jsonl --salida informes/ --procesos 4 [--formatos txt,json]
+    python ecoreport_semi/batch.py archivar estudios.jsonl [--archivo estudios.sqlite3]
+    python ecoreport_semi/batch.py archivar medidas.hl7 [--correspondencias codigos.json]
+    python ecoreport_semi/batch.py archivar exportacion_pacs/ [--procesos 4] [--correspondencias codigos.json]
+    python ecoreport_semi/batch.py exportar informes.zip [--desde 2024-01-01] [--hasta 2024-07-01] [--nhc 123]
+                                            [--formato zip|jsonl] [--sin-compresion] [--reanudar]
+    python ecoreport_semi/batch.py estadisticas [--agrupar mes|realizado_por|total] [--desde 2024-01-01]
+                                                [--procesos 4] [--salida estadisticas.json]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque, defaultdict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Tuple, Dict, Optional
+
+from models import InformeEcoCompleto, informe_desde_dict
+from archivo_estudios import ArchivoEstudios
+from importacion_hl7 import leer_mensajes_hl7
+from importacion_dicom_sr import importar_sr
+from medidas_importadas import cargar_correspondencias
+from exportacion_estudios import exportar_estudios, FORMATO_ZIP, FORMATOS_EXPORTACION
+from estadisticas_cohorte import calcular_estadisticas, AGRUPACIONES, AGRUPACION_MES
+from rangos_referencia import ReferenceRanges
+from logic.report_generator import construir_documento
+from logic.renderizadores import RENDERIZADORES
+from logic.renderizador_pdf import ESCRITORES_BINARIOS
+from utils.error_handling import log_message
+from utils import perfilado
+
+LOTE_POR_DEFECTO = 64
+LOTES_EN_VUELO_POR_PROCESO = 2
+LOTE_ARCHIVO = 1000 # Estudios por transacción al archivar
+FORMATOS_POR_DEFECTO = ("txt",)
+FORMATOS_DISPONIBLES = tuple(RENDERIZADORES) + tuple(ESCRITORES_BINARIOS)
+EXTENSIONES_HL7 = (".hl7", ".oru")
+EXTENSIONES_DICOM = (".dcm", ".dicom")
+
+
+def leer_estudios(ruta_entrada: str, correspondencias: Optional[Dict[str, str]] = None,
+                  procesos_lectura: int = 1) -> Iterator[InformeEcoCompleto]:
+    """Genera los estudios del fichero (o del directorio DICOM) uno a uno. Las filas (o
+    mensajes HL7, o ficheros SR) inválidas se registran y se omiten. 'procesos_lectura'
+    solo se usa para leer directorios DICOM."""
+    extension = os.path.splitext(ruta_entrada)[1].lower()
+    if extension in EXTENSIONES_HL7:
+        yield from leer_mensajes_hl7(ruta_entrada, correspondencias)
+        return
+    if extension in EXTENSIONES_DICOM or os.path.isdir(ruta_entrada):
+        yield from importar_sr(ruta_entrada, correspondencias, procesos_lectura)
+        return
+    es_csv = extension == ".csv"
+    with open(ruta_entrada, encoding="utf-8", newline="") as f:
+        filas = csv.DictReader(f) if es_csv else f
+        for num_fila, fila in enumerate(filas, start=1):
+            # --- INICIO: Marcador para localización de errores (Lectura Estudio Lote) ---
+            try:
+                if not es_csv:
+                    if not fila.strip():
+                        continue
+                    fila = json.loads(fila)
+                yield informe_desde_dict(fila)
+            except (ValueError, TypeError, AttributeError) as e:
+                log_message(f"Fila {num_fila} de '{ruta_entrada}' omitida: {e}", "warning")
+            # --- FIN: Marcador para localización de errores (Lectura Estudio Lote) ---
+
+
+def _agrupar_en_lotes(estudios: Iterator[InformeEcoCompleto], tamano_lote: int) -> Iterator[List[Tuple[int, InformeEcoCompleto]]]:
+    numerados = enumerate(estudios, start=1)
+    while True:
+        lote = list(islice(numerados, tamano_lote))
+        if not lote:
+            return
+        yield lote
+
+
+def _nombre_archivo_informe(indice: int, informe: InformeEcoCompleto, formato: str = "txt") -> str:
+    # El índice de entrada evita sobrescrituras si dos estudios comparten id_informe
+    return f"{indice:07d}_EcoInforme_{informe.id_informe}.{formato}"
+
+
+def _procesar_lote(lote: List[Tuple[int, InformeEcoCompleto]], dir_salida: str,
+                   rangos: Optional[ReferenceRanges] = None,
+                   formatos: Tuple[str, ...] = FORMATOS_POR_DEFECTO) -> Tuple[int, int, float, Optional[dict]]:
+    """Trabajo de cada proceso: evalúa cada estudio una vez y escribe sus informes en
+    todos los formatos pedidos. Devuelve (pid, estudios escritos, segundos de trabajo,
+    medidas de perfilado del lote o None si el perfilado está desactivado)."""
+    inicio = time.perf_counter()
+    escritos = 0
+    for indice, informe in lote:
+        # --- INICIO: Marcador para localización de errores (Informe Lote) ---
+        try:
+            documento = construir_documento(informe, rangos)
+            for formato in formatos:
+                ruta = os.path.join(dir_salida, _nombre_archivo_informe(indice, informe, formato))
+                if formato in ESCRITORES_BINARIOS:
+                    with perfilado.medir(f"escritura.lote.{formato}"), open(ruta, "wb") as f:
+                        ESCRITORES_BINARIOS[formato](documento, f)
+                else:
+                    contenido = RENDERIZADORES[formato](documento)
+                    with perfilado.medir(f"escritura.lote.{formato}"), open(ruta, "w", encoding="utf-8") as f:
+                        f.write(contenido)
+            escritos += 1
+        except Exception as e:
+            log_message(f"Estudio {indice} ({informe.id_informe}) omitido: {e}", "error", exc_info=True)
+        # --- FIN: Marcador para localización de errores (Informe Lote) ---
+    return os.getpid(), escritos, time.perf_counter() - inicio, perfilado.extraer() if perfilado.ACTIVO else None
+
+
+def generar_lote(ruta_entrada: str, dir_salida: str, procesos: int, tamano_lote: int = LOTE_POR_DEFECTO,
+                 rangos: Optional[ReferenceRanges] = None,
+                 formatos: Tuple[str, ...] = FORMATOS_POR_DEFECTO,
+                 correspondencias: Optional[Dict[str, str]] = None) -> Dict[int, List[float]]:
+    """Genera todos los informes de ruta_entrada en dir_salida, con los valores de
+    referencia 'rangos' (por defecto, los de config), en cada uno de 'formatos'.
+    Devuelve las estadísticas por proceso: {pid: [informes, segundos]}."""
+    desconocidos = set(formatos) - set(FORMATOS_DISPONIBLES)
+    if desconocidos:
+        raise ValueError(f"Formatos no soportados: {', '.join(sorted(desconocidos))} (disponibles: {', '.join(FORMATOS_DISPONIBLES)})")
+    os.makedirs(dir_salida, exist_ok=True)
+    lotes = _agrupar_en_lotes(leer_estudios(ruta_entrada, correspondencias), tamano_lote)
+    estadisticas: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def _acumular(pid: int, escritos: int, segundos: float, medidas: Optional[dict]):
+        estadisticas[pid][0] += escritos
+        estadisticas[pid][1] += segundos
+        if medidas:
+            perfilado.combinar(medidas)
+
+    if procesos <= 1:
+        for lote in lotes:
+            _acumular(*_procesar_lote(lote, dir_salida, rangos, formatos))
+        return dict(estadisticas)
+
+    # Ventana acotada de lotes pendientes: el lector no se adelanta más de lo necesario
+    max_en_vuelo = procesos * LOTES_EN_VUELO_POR_PROCESO
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for lote in lotes:
+            pendientes.append(pool.submit(_procesar_lote, lote, dir_salida, rangos, formatos))
+            if len(pendientes) >= max_en_vuelo:
+                _acumular(*pendientes.popleft().result())
+        while pendientes:
+            _acumular(*pendientes.popleft().result())
+    return dict(estadisticas)
+
+
+def archivar_estudios(ruta_entrada: str, ruta_archivo: str = None,
+                      correspondencias: Optional[Dict[str, str]] = None, procesos: int = 1) -> int:
+    """Guarda todos los estudios de ruta_entrada en el archivo local. Devuelve cuántos.
+    Los directorios DICOM se leen con 'procesos' procesos."""
+    total = 0
+    with ArchivoEstudios(ruta_archivo) as archivo:
+        for lote in _agrupar_en_lotes(leer_estudios(ruta_entrada, correspondencias, procesos), LOTE_ARCHIVO):
+            total += archivo.guardar_varios(informe for _, informe in lote)
+    return total
+
+
+def _imprimir_rendimiento(estadisticas: Dict[int, List[float]], segundos_totales: float):
+    total = sum(n for n, _ in estadisticas.values())
+    print(f"\nInformes generados: {total} en {segundos_totales:.2f} s "
+          f"({total / segundos_totales if segundos_totales > 0 else 0:.1f} informes/s)")
+    for pid, (n, segundos) in sorted(estadisticas.items()):
+        ritmo = n / segundos if segundos > 0 else 0.0
+        print(f"  Proceso {pid}: {n} informes, {ritmo:.1f} informes/s (tiempo activo {segundos:.2f} s)")
+
+
+def _imprimir_progreso(inicio: float):
+    def progreso(hechos: int, total: int):
+        segundos = time.perf_counter() - inicio
+        porcentaje = 100 * hechos / total if total else 100.0
+        print(f"\r  {hechos}/{total} estudios ({porcentaje:.1f}%, {hechos / segundos if segundos > 0 else 0:.0f}/s)",
+              end="", file=sys.stderr, flush=True)
+    return progreso
+
+
+# --rangos es una ruta: ReferenceRanges.desde_json abre el fichero
+_AYUDA_RANGOS = 'Fichero JSON con valores de referencia alternativos, p. ej. rangos.json con {"SEPTUM_MAX_FEM": 9}'
+
+
+def _crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="EcoReport SEMI - generación de informes por lotes")
+    # Lo lee config.PERFILADO_ACTIVO al importar; aquí solo se declara para que argparse lo acepte
+    parser.add_argument("--profile", action="store_true", help="Medir tiempos y guardar un resumen JSON al terminar")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_generar = subparsers.add_parser("generar", help="Genera informes de texto desde un JSONL o CSV de estudios")
+    p_generar.add_argument("entrada", help="Fichero .jsonl, .csv, .hl7 o .dcm, o directorio de ficheros DICOM SR")
+    p_generar.add_argument("--salida", required=True, help="Directorio donde escribir los informes")
+    p_generar.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Número de procesos (por defecto, núcleos disponibles)")
+    p_generar.add_argument("--lote", type=int, default=LOTE_POR_DEFECTO, help="Estudios por tarea enviada a cada proceso")
+    p_generar.add_argument("--rangos", help=_AYUDA_RANGOS)
+    p_generar.add_argument("--formatos", default=",".join(FORMATOS_POR_DEFECTO),
+                           help=f"Formatos separados por comas ({', '.join(FORMATOS_DISPONIBLES)}); por defecto, txt")
+    p_generar.add_argument("--correspondencias", help='JSON con códigos de medida adicionales (OBX de HL7, conceptos de DICOM SR), p. ej. {"IVS-D": "medidas_vi.septo_iv_mm"}')
+
+    p_archivar = subparsers.add_parser("archivar", help="Guarda los estudios de un JSONL o CSV en el archivo local")
+    p_archivar.add_argument("entrada", help="Fichero .jsonl, .csv, .hl7 o .dcm, o directorio de ficheros DICOM SR")
+    p_archivar.add_argument("--archivo", help="Fichero SQLite del archivo (por defecto, el de la aplicación)")
+    p_archivar.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Procesos para leer directorios DICOM (por defecto, núcleos disponibles)")
+    p_archivar.add_argument("--correspondencias", help='JSON con códigos de medida adicionales (OBX de HL7, conceptos de DICOM SR), p. ej. {"IVS-D": "medidas_vi.septo_iv_mm"}')
+
+    p_exportar = subparsers.add_parser("exportar", help="Exporta los informes de los estudios del archivo a un zip o JSONL")
+    p_exportar.add_argument("salida", help="Fichero de salida (.zip, .jsonl o .jsonl.gz)")
+    p_exportar.add_argument("--archivo", help="Fichero SQLite del archivo (por defecto, el de la aplicación)")
+    p_exportar.add_argument("--formato", choices=FORMATOS_EXPORTACION, default=FORMATO_ZIP)
+    p_exportar.add_argument("--desde", type=datetime.fromisoformat, help="Fecha ISO inicial, incluida (p. ej. 2024-01-01)")
+    p_exportar.add_argument("--hasta", type=datetime.fromisoformat, help="Fecha ISO final, excluida")
+    p_exportar.add_argument("--nhc", help="Solo los estudios de este paciente")
+    p_exportar.add_argument("--sin-compresion", action="store_true", help="Zip sin deflate / JSONL sin gzip")
+    p_exportar.add_argument("--reanudar", action="store_true", help="Continuar una exportación interrumpida")
+
+    p_estadisticas = subparsers.add_parser("estadisticas", help="Estadísticas de la cohorte de estudios del archivo")
+    p_estadisticas.add_argument("--archivo", help="Fichero SQLite del archivo (por defecto, el de la aplicación)")
+    p_estadisticas.add_argument("--agrupar", choices=tuple(AGRUPACIONES), default=AGRUPACION_MES)
+    p_estadisticas.add_argument("--desde", type=datetime.fromisoformat, help="Fecha ISO inicial, incluida (p. ej. 2024-01-01)")
+    p_estadisticas.add_argument("--hasta", type=datetime.fromisoformat, help="Fecha ISO final, excluida")
+    p_estadisticas.add_argument("--nhc", help="Solo los estudios de este paciente")
+    p_estadisticas.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Número de procesos (por defecto, núcleos disponibles)")
+    p_estadisticas.add_argument("--rangos", help=_AYUDA_RANGOS)
+    p_estadisticas.add_argument("--salida", help="Fichero JSON de resultados (por defecto, la salida estándar)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = _crear_parser().parse_args(argv)
+    # --- INICIO: Marcador para localización de errores (Batch Main) ---
+    try:
+        if args.comando == "generar":
+            log_message(f"Generación por lotes: {args.entrada} -> {args.salida} ({args.procesos} procesos).", "info")
+            inicio = time.perf_counter()
+            rangos = ReferenceRanges.desde_json(args.rangos) if args.rangos else None
+            formatos = tuple(f.strip().lower() for f in args.formatos.split(",") if f.strip())
+            estadisticas = generar_lote(args.entrada, args.salida, args.procesos, max(1, args.lote), rangos, formatos,
+                                        cargar_correspondencias(args.correspondencias))
+            _imprimir_rendimiento(estadisticas, time.perf_counter() - inicio)
+        elif args.comando == "archivar":
+            log_message(f"Archivando estudios de {args.entrada}.", "info")
+            inicio = time.perf_counter()
+            total = archivar_estudios(args.entrada, args.archivo, cargar_correspondencias(args.correspondencias),
+                                      args.procesos)
+            print(f"Estudios archivados: {total} en {time.perf_counter() - inicio:.2f} s")
+        elif args.comando == "exportar":
+            log_message(f"Exportando informes del archivo a {args.salida}.", "info")
+            inicio = time.perf_counter()
+            with ArchivoEstudios(args.archivo) as archivo:
+                total = exportar_estudios(archivo, args.salida, args.formato, args.desde, args.hasta, args.nhc,
+                                          comprimir=not args.sin_compresion, reanudar=args.reanudar,
+                                          progreso=_imprimir_progreso(inicio))
+            print(f"\nInformes exportados: {total} en {time.perf_counter() - inicio:.2f} s")
+        elif args.comando == "estadisticas":
+            log_message(f"Calculando estadísticas de la cohorte por {args.agrupar}.", "info")
+            inicio = time.perf_counter()
+            rangos = ReferenceRanges.desde_json(args.rangos) if args.rangos else None
+            with ArchivoEstudios(args.archivo) as archivo:
+                estadisticas = calcular_estadisticas(archivo, args.agrupar, args.desde, args.hasta, args.nhc,
+                                                     args.procesos, rangos, progreso=_imprimir_progreso(inicio))
+            texto = json.dumps(estadisticas.a_dict(), ensure_ascii=False, indent=2)
+            if args.salida:
+                with open(args.salida, "w", encoding="utf-8") as f:
+                    f.write(texto + "\n")
+            else:
+                print(texto)
+            print(f"\nEstudios resumidos: {estadisticas.estudios} en {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
+        return 0
+    except Exception as e:
+        log_message(f"Error en la generación por lotes: {e}", "critical", exc_info=True)
+        return 1
+    # --- FIN: Marcador para localización de errores (Batch Main) ---
+
+
+if __name__ == "__main__":
+    sys.exit(main())
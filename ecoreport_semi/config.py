@@ -6,6 +6,8 @@ Configuraciones y constantes para la aplicación EcoReport SEMI.
 Valores de referencia basados en el infograma SEMI 'ecoscopia_en_icc_v05.pdf'.
 """
 import os
+import platform
+import re
 import sys
 from datetime import datetime
 
@@ -15,22 +17,28 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 RESOURCES_DIR_DEV = os.path.join(PROJECT_ROOT, "resources")
 LOG_DIR = os.path.join(PROJECT_ROOT, "logs") # Directorio para logs
 
-# Asegurar que el directorio de logs existe
-if not os.path.exists(LOG_DIR):
-    try:
-        os.makedirs(LOG_DIR, exist_ok=True)
-    except OSError as e:
-        print(f"Advertencia: No se pudo crear el directorio de logs en {LOG_DIR}: {e}")
-        # Fallback al directorio actual si falla la creación en la ubicación preferida
-        LOG_DIR = os.path.join(os.getcwd(), "ecoreport_semi_logs") # Evitar conflicto si ya existe 'logs'
+# El directorio de logs NO se crea al importar este módulo (importar config debe ser
+# barato y sin efectos en disco). Lo crea preparar_directorio_logs() cuando el logger
+# abre su fichero por primera vez.
+def preparar_directorio_logs() -> str:
+    """Asegura que el directorio de logs existe y devuelve la ruta del fichero de log.
+    Si no se puede crear en la ubicación preferida, usa un directorio alternativo."""
+    global LOG_DIR, LOG_FILE_PATH
+    if not os.path.exists(LOG_DIR):
         try:
             os.makedirs(LOG_DIR, exist_ok=True)
-            print(f"Usando directorio de logs alternativo: {LOG_DIR}")
-        except OSError as e_fallback:
-            print(f"CRÍTICO: No se pudo crear el directorio de logs. Error: {e_fallback}")
-            # Considerar terminar la app o usar una estrategia de no-logging.
-            # Por ahora, se continuará y el logger podría fallar.
-            pass
+        except OSError as e:
+            print(f"Advertencia: No se pudo crear el directorio de logs en {LOG_DIR}: {e}")
+            # Fallback al directorio actual si falla la creación en la ubicación preferida
+            LOG_DIR = os.path.join(os.getcwd(), "ecoreport_semi_logs") # Evitar conflicto si ya existe 'logs'
+            LOG_FILE_PATH = os.path.join(LOG_DIR, os.path.basename(LOG_FILE_PATH))
+            try:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                print(f"Usando directorio de logs alternativo: {LOG_DIR}")
+            except OSError as e_fallback:
+                print(f"CRÍTICO: No se pudo crear el directorio de logs. Error: {e_fallback}")
+                # Se continuará y el logger usará su configuración de fallback.
+    return LOG_FILE_PATH
 
 # --- FUNCIÓN HELPER PARA RUTAS DE RECURSOS ---
 def resource_path(relative_path: str) -> str:
@@ -50,7 +58,60 @@ def resource_path(relative_path: str) -> str:
 
     return os.path.join(base_path, relative_path)
 
+# Carpeta de los datos que deben sobrevivir a la sesión (archivo de estudios, diario de
+# recuperación). En el ejecutable, PROJECT_ROOT es la carpeta temporal de --onefile (se
+# borra al salir) o _internal/ del perfil rápido (se borra al regenerarlo y, en Archivos de
+# programa, es de solo lectura): se usa la carpeta de datos locales del usuario.
+def _directorio_datos() -> str:
+    if not getattr(sys, "frozen", False):
+        return os.path.join(PROJECT_ROOT, "datos")
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    elif sys.platform == "darwin":
+        base = os.path.join(os.path.expanduser("~"), "Library", "Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "EcoReportSEMI")
+
+DATOS_DIR = _directorio_datos()
+
 LOG_FILE_PATH = os.path.join(LOG_DIR, f"ecoreport_log_{datetime.now().strftime('%Y%m%d')}.log")
+# Niveles mínimos de log (DEBUG, INFO, WARNING, ERROR, CRITICAL). Los mensajes por debajo
+# de ambos niveles se descartan en log_message sin formatearse ni encolarse.
+LOG_NIVEL_ARCHIVO = os.environ.get("ECOREPORT_LOG_NIVEL", "DEBUG").upper()
+LOG_NIVEL_CONSOLA = os.environ.get("ECOREPORT_LOG_NIVEL_CONSOLA", "INFO").upper()
+# Segundos máximos que un mensaje puede quedar en el búfer del escritor antes de llegar a disco
+LOG_INTERVALO_FLUSH_S = float(os.environ.get("ECOREPORT_LOG_FLUSH_S", "1.0"))
+
+# Archivo local de estudios (SQLite, ver archivo_estudios.py). Se crea al abrirlo por primera vez.
+ARCHIVO_ESTUDIOS_PATH = os.environ.get("ECOREPORT_ARCHIVO", os.path.join(DATOS_DIR, "estudios.sqlite3"))
+
+# Diario de recuperación del estudio en curso (diario_recuperacion.py). Uno por equipo, por
+# si la carpeta de datos está en una unidad de red compartida. Tiene que estar en DATOS_DIR:
+# en el ejecutable --onefile, cada arranque usa otra carpeta temporal y no encontraría el
+# diario de la sesión que se cerró mal.
+DIARIO_RECUPERACION_PATH = os.environ.get("ECOREPORT_DIARIO", os.path.join(
+    DATOS_DIR, f"recuperacion_{re.sub(r'[^A-Za-z0-9_.-]+', '_', platform.node()) or 'equipo'}.diario"))
+# Segundos máximos que un cambio puede quedar en memoria antes de escribirse y sincronizarse (fsync)
+DIARIO_INTERVALO_SYNC_S = float(os.environ.get("ECOREPORT_DIARIO_SYNC_S", "2.0"))
+
+# Previsualización automática: milisegundos sin cambios antes de regenerar el informe
+PREVIEW_RETARDO_MS = 400
+
+# Pestaña de datos: las secciones se construyen al desplegarlas o verlas por primera vez.
+# ECOREPORT_UI_DIFERIDA=0 las construye todas al arrancar (para comparar el tiempo de arranque).
+UI_CONSTRUCCION_DIFERIDA = os.environ.get("ECOREPORT_UI_DIFERIDA", "1") != "0"
+# Con ECOREPORT_MEDIR_ARRANQUE, main() anota los ms hasta el primer pintado de la ventana y
+# cierra la aplicación (benchmarks/bench_arranque.py y bench_lanzamiento.py): "1" los imprime;
+# otro valor es la ruta de un fichero al que se añaden (el .exe con --windowed no tiene consola).
+# Sin ella (o con "0"), el tiempo solo va al log.
+MEDIR_ARRANQUE = os.environ.get("ECOREPORT_MEDIR_ARRANQUE", "0")
+MEDIR_ARRANQUE = None if MEDIR_ARRANQUE == "0" else MEDIR_ARRANQUE
+
+# Perfilado (utils/perfilado.py): ECOREPORT_PERFIL=1 o el argumento --profile. Al salir se
+# escribe un resumen JSON en ECOREPORT_PERFIL_SALIDA (por defecto, perfil_<fecha>.json en LOG_DIR)
+PERFILADO_ACTIVO = os.environ.get("ECOREPORT_PERFIL", "0") == "1" or "--profile" in sys.argv
+PERFIL_SALIDA = os.environ.get("ECOREPORT_PERFIL_SALIDA") # None: se decide al volcar
 
 # --- Información de la Aplicación ---
 APP_VERSION = "1.0.0"
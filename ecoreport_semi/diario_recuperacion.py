@@ -0,0 +1,284 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Diario de recuperación del estudio en curso, para no perderlo si la aplicación se cierra
+o el equipo se bloquea antes de guardarlo.
+
+Es un fichero de solo añadir con una línea por registro: '<crc32> <json>'. La primera es
+la base, con el estudio completo ({"b": informe, "s": sin_guardar}); después, un registro
+por cada cambio de campo que hacen las pestañas ({"c": "seccion.campo", "v": valor}) y la
+marca {"g": 1} al guardar el estudio en el archivo.
+
+Teclear no va a disco en cada pulsación: registrar() solo añade el cambio a una lista en
+memoria (sustituyendo el anterior si es del mismo campo, y omitiéndolo si repite el último
+valor) y un hilo escritor escribe lo acumulado con una sola escritura y un fsync como
+mucho cada config.DIARIO_INTERVALO_SYNC_S segundos, o antes si se juntan MAX_PENDIENTES.
+Cada cambio ocupa unas decenas de bytes.
+
+Al empezar otro estudio (nuevo, abierto o recuperado), y cuando el diario pasa de
+COMPACTAR_CADA líneas, el hilo escritor lo compacta: escribe la base con el estado actual
+en un fichero temporal, hace fsync y lo sustituye con os.replace, así que en disco siempre
+hay un diario válido.
+
+recuperar() reproduce el diario hasta la primera línea incompleta o con CRC incorrecto
+(una escritura interrumpida) y devuelve el estudio solo si tenía algo sin guardar.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from models import InformeEcoCompleto, informe_a_dict, informe_desde_dict
+from utils.error_handling import log_message
+
+MAX_PENDIENTES = 256
+COMPACTAR_CADA = 5000
+
+# Claves de los registros (cortas: cada cambio es una línea)
+_BASE = "b"
+_SIN_GUARDAR = "s"
+_CAMBIO = "c"
+_VALOR = "v"
+_GUARDADO = "g"
+_NADA = object()
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Valor no serializable en el diario: {valor!r}")
+
+
+def _linea(registro: dict) -> bytes:
+    datos = json.dumps(registro, ensure_ascii=False, separators=(",", ":"), default=_serializar).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(datos), datos)
+
+
+class _Reproduccion:
+    """Estado del estudio (dict anidado, como informe_a_dict) tras aplicar los registros."""
+    __slots__ = ("estado", "sin_guardar", "registros")
+
+    def __init__(self):
+        self.estado: Optional[Dict[str, Any]] = None
+        self.sin_guardar = False
+        self.registros = 0
+
+    def aplicar(self, registro: dict):
+        self.registros += 1
+        if _BASE in registro:
+            self.estado, self.sin_guardar = registro[_BASE], bool(registro.get(_SIN_GUARDAR))
+        elif self.estado is None:
+            return # Cambios sin base: no se puede saber a qué estudio pertenecen
+        elif _CAMBIO in registro:
+            seccion, _, campo = registro[_CAMBIO].partition(".")
+            destino = self.estado.setdefault(seccion, {}) if campo else self.estado
+            destino[campo or seccion] = registro.get(_VALOR)
+            self.sin_guardar = True
+        elif _GUARDADO in registro:
+            self.sin_guardar = False
+
+
+def reproducir(ruta: str) -> _Reproduccion:
+    """Aplica los registros válidos del diario en orden. Se detiene en la primera línea
+    incompleta o dañada: lo que haya detrás no es fiable."""
+    reproduccion = _Reproduccion()
+    with open(ruta, "rb") as f:
+        for linea in f:
+            if not linea.endswith(b"\n"):
+                break # Última escritura interrumpida
+            crc, _, datos = linea[:-1].partition(b" ")
+            try:
+                registro = json.loads(datos) if int(crc, 16) == zlib.crc32(datos) else None
+            except ValueError:
+                registro = None
+            if not isinstance(registro, dict):
+                break
+            reproduccion.aplicar(registro)
+    return reproduccion
+
+
+def _aplanar(estado: Dict[str, Any]) -> Dict[str, Any]:
+    plano = {}
+    for clave, valor in estado.items():
+        if isinstance(valor, dict):
+            plano.update({f"{clave}.{campo}": v for campo, v in valor.items()})
+        else:
+            plano[clave] = valor
+    return plano
+
+
+class DiarioRecuperacion:
+    """Diario del estudio en curso. registrar(), iniciar() y marcar_guardado() se llaman
+    desde la interfaz y no esperan al disco; sincronizar() y cerrar() sí."""
+
+    def __init__(self, ruta: Optional[str] = None, intervalo_sync_s: Optional[float] = None):
+        self.ruta = ruta or config.DIARIO_RECUPERACION_PATH
+        self.intervalo_sync_s = config.DIARIO_INTERVALO_SYNC_S if intervalo_sync_s is None else intervalo_sync_s
+        self.estadisticas = {"cambios": 0, "omitidos": 0, "escrituras": 0, "bytes": 0, "compactaciones": 0}
+        self._ultimos: Dict[str, Any] = {} # Último valor registrado de cada campo (hilo de la interfaz)
+        self._condicion = threading.Condition()
+        self._pendientes: List[dict] = []
+        self._primer_pendiente = 0.0
+        self._base: Optional[Tuple[dict, bool]] = None
+        self._forzar = False
+        self._cerrado = False
+        self._peticiones = 0 # sincronizar() espera a que _escritas alcance su petición
+        self._escritas = 0
+        # Solo del hilo escritor
+        self._f = None
+        self._reproduccion = _Reproduccion()
+        self._lineas_desde_base = 0
+        self._hilo = threading.Thread(target=self._bucle, name="DiarioRecuperacion", daemon=True)
+        self._hilo.start()
+
+    # --- Interfaz ---
+
+    def recuperar(self) -> Optional[InformeEcoCompleto]:
+        """Estudio del diario si quedó algo sin guardar; None si no. Hay que llamarlo antes
+        de iniciar(), que sustituye el diario."""
+        if not os.path.exists(self.ruta):
+            return None
+        # --- INICIO: Marcador para localización de errores (Recuperar Diario) ---
+        try:
+            reproduccion = reproducir(self.ruta)
+            if reproduccion.estado is None or not reproduccion.sin_guardar:
+                return None
+            informe = informe_desde_dict(reproduccion.estado)
+        except (OSError, ValueError, TypeError) as e:
+            log_message(f"No se pudo recuperar el diario '{self.ruta}': {e}", "error", exc_info=True)
+            return None
+        # --- FIN: Marcador para localización de errores (Recuperar Diario) ---
+        log_message(f"Diario de recuperación: estudio {informe.id_informe} recuperado "
+                    f"({reproduccion.registros} registros).", "info")
+        return informe
+
+    def iniciar(self, informe: InformeEcoCompleto, sin_guardar: bool = False):
+        """Empieza el diario de otro estudio. El hilo escritor lo compacta a una base con
+        'informe'; 'sin_guardar' indica que esa base ya tiene datos que no están en el archivo."""
+        estado = informe_a_dict(informe)
+        self._ultimos = _aplanar(estado)
+        with self._condicion:
+            self._pendientes = [] # Eran del estudio anterior
+            self._base = (estado, sin_guardar)
+            self._condicion.notify()
+
+    def registrar(self, clave: str, valor: Any):
+        """Cambio de un campo ('seccion.campo', 'campo' o 'param_no_valorado_flags.P_...')."""
+        if isinstance(valor, datetime):
+            valor = valor.isoformat()
+        anterior = self._ultimos.get(clave, _NADA)
+        if type(anterior) is type(valor) and anterior == valor:
+            self.estadisticas["omitidos"] += 1
+            return
+        self._ultimos[clave] = valor
+        with self._condicion:
+            self.estadisticas["cambios"] += 1
+            if self._pendientes and self._pendientes[-1].get(_CAMBIO) == clave:
+                self._pendientes[-1][_VALOR] = valor # Se sigue tecleando en el mismo campo
+                return
+            if not self._pendientes:
+                self._primer_pendiente = time.monotonic()
+            self._pendientes.append({_CAMBIO: clave, _VALOR: valor})
+            if len(self._pendientes) == 1 or len(self._pendientes) >= MAX_PENDIENTES:
+                self._condicion.notify()
+
+    def marcar_guardado(self):
+        with self._condicion:
+            if not self._pendientes:
+                self._primer_pendiente = time.monotonic()
+            self._pendientes.append({_GUARDADO: 1})
+            self._condicion.notify()
+
+    def sincronizar(self, timeout: Optional[float] = None) -> bool:
+        """Escribe y sincroniza ya lo pendiente. Devuelve False si no terminó a tiempo."""
+        with self._condicion:
+            self._peticiones += 1
+            peticion = self._peticiones
+            self._forzar = True
+            self._condicion.notify()
+            return self._condicion.wait_for(lambda: self._escritas >= peticion or not self._hilo.is_alive(), timeout)
+
+    def cerrar(self, timeout: Optional[float] = 5.0):
+        """Sincroniza lo pendiente y detiene el hilo escritor (al cerrar la ventana)."""
+        self.sincronizar(timeout)
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify()
+        self._hilo.join(timeout)
+
+    # --- Hilo escritor ---
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not (self._pendientes or self._base or self._forzar or self._cerrado):
+                    self._condicion.wait()
+                # Los cambios se agrupan durante el intervalo: un solo fsync para todos
+                while not (self._forzar or self._cerrado or self._base) and len(self._pendientes) < MAX_PENDIENTES:
+                    restante = self._primer_pendiente + self.intervalo_sync_s - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                registros, self._pendientes = self._pendientes, []
+                base, self._base = self._base, None
+                peticion, self._forzar = self._peticiones, False
+                cerrado = self._cerrado
+            # --- INICIO: Marcador para localización de errores (Escritura Diario) ---
+            try:
+                self._escribir(base, registros)
+            except (OSError, TypeError, ValueError) as e:
+                log_message(f"No se pudo escribir el diario de recuperación '{self.ruta}': {e}", "error")
+            # --- FIN: Marcador para localización de errores (Escritura Diario) ---
+            with self._condicion:
+                self._escritas = peticion
+                self._condicion.notify_all()
+            if cerrado:
+                if self._f is not None:
+                    self._f.close()
+                    self._f = None
+                return
+
+    def _escribir(self, base: Optional[Tuple[dict, bool]], registros: List[dict]):
+        if base is not None:
+            self._reproduccion = _Reproduccion()
+            self._reproduccion.aplicar({_BASE: base[0], _SIN_GUARDAR: base[1]})
+            self._compactar()
+        if not registros:
+            return
+        datos = b"".join(_linea(registro) for registro in registros)
+        for registro in registros:
+            self._reproduccion.aplicar(registro)
+        if self._f is None:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            self._f = open(self.ruta, "ab")
+        self._f.write(datos)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.estadisticas["escrituras"] += 1
+        self.estadisticas["bytes"] += len(datos)
+        self._lineas_desde_base += len(registros)
+        if self._lineas_desde_base >= COMPACTAR_CADA:
+            self._compactar()
+
+    def _compactar(self):
+        """Sustituye el diario por una sola base con el estado actual."""
+        reproduccion = self._reproduccion
+        if reproduccion.estado is None:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "wb") as f:
+            f.write(_linea({_BASE: reproduccion.estado, _SIN_GUARDAR: reproduccion.sin_guardar}))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._f is not None: # En Windows no se puede sustituir un fichero abierto
+            self._f.close()
+            self._f = None
+        os.replace(temporal, self.ruta)
+        self._lineas_desde_base = 0
+        self.estadisticas["compactaciones"] += 1
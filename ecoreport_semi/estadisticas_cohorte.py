@@ -0,0 +1,324 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Estadísticas de una cohorte de estudios del archivo local, en una sola pasada.
+
+Los estudios se recorren por páginas (ArchivoEstudios.iterar) y cada uno se clasifica
+con las funciones de logic/calculations.py (clase FEVI, estimación de presiones de
+llenado, grado VExUS) y los valores de referencia de su sexo. Nada se guarda por
+estudio; cada grupo (mes, operador o total) acumula solo agregados en línea:
+- recuentos por clase FEVI, grado VExUS y resultado de presiones de llenado;
+- media y varianza de Welford, mínimo y máximo de cada medida continua;
+- cuantiles aproximados con un esbozo de cubetas logarítmicas (error relativo ALFA_CUANTILES).
+
+Todos los agregados se pueden combinar: con procesos > 1 cada proceso descomprime y
+resume un bloque de LOTE_ESTADISTICAS estudios y el proceso principal combina los
+resultados parciales según llegan, con un número acotado de bloques en vuelo. La
+memoria depende del número de grupos, no del de estudios.
+"""
+import math
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from archivo_estudios import ArchivoEstudios, ResumenEstudio, descomprimir_informe
+from models import InformeEcoCompleto
+from rangos_referencia import ReferenceRanges, RANGOS_REFERENCIA
+from logic.calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+from logic.tabla_presiones import (ETIQUETAS_PRESIONES, PRESIONES_ELEVADAS, PRESIONES_ELEVADAS_RESTRICTIVO,
+                                   PRESIONES_NORMALES, PRESIONES_NORMALES_SI_CONSISTENTES)
+from utils.error_handling import log_message
+
+ALFA_CUANTILES = 0.01 # Error relativo de los cuantiles aproximados
+LOTE_ESTADISTICAS = 512 # Estudios por bloque enviado a cada proceso
+BLOQUES_EN_VUELO_POR_PROCESO = 2
+CUANTILES_RESUMEN = (("p25", 0.25), ("mediana", 0.5), ("p75", 0.75))
+
+# Medidas continuas: nombre -> (sección del informe, atributo)
+MEDIDAS_CONTINUAS = {
+    "fevi_porcentaje": ("medidas_vi", "fevi_porcentaje"),
+    "tapse_mm": ("medidas_vd", "tapse_mm"),
+    "ai_vol_ml_m2": ("medidas_auriculas", "ai_vol_ml_m2"),
+    "e_sobre_e_prima_ratio": ("presiones_llenado", "e_sobre_e_prima_ratio"),
+}
+
+_PRESIONES_ELEVADAS = {ETIQUETAS_PRESIONES[PRESIONES_ELEVADAS], ETIQUETAS_PRESIONES[PRESIONES_ELEVADAS_RESTRICTIVO]}
+_PRESIONES_CONCLUYENTES = _PRESIONES_ELEVADAS | {ETIQUETAS_PRESIONES[PRESIONES_NORMALES],
+                                                 ETIQUETAS_PRESIONES[PRESIONES_NORMALES_SI_CONSISTENTES]}
+
+AGRUPACION_TOTAL = "total"
+AGRUPACION_MES = "mes"
+AGRUPACION_OPERADOR = "realizado_por"
+# Clave de grupo de cada estudio a partir de su resumen (sin descomprimir el informe)
+AGRUPACIONES: Dict[str, Callable[[ResumenEstudio], str]] = {
+    AGRUPACION_TOTAL: lambda resumen: AGRUPACION_TOTAL,
+    AGRUPACION_MES: lambda resumen: resumen.fecha_estudio[:7] or "sin fecha",
+    AGRUPACION_OPERADOR: lambda resumen: resumen.realizado_por.strip() or "no consta",
+}
+
+
+# --- Agregados en línea ---
+
+class MediaVarianza:
+    """Media y varianza por el método de Welford; combinar() usa la fórmula de Chan para
+    unir dos particiones sin volver a ver sus valores."""
+    __slots__ = ("n", "media", "_m2", "minimo", "maximo")
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def anadir(self, x: float):
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (x - self.media)
+        self.minimo = min(self.minimo, x)
+        self.maximo = max(self.maximo, x)
+
+    def combinar(self, otra: "MediaVarianza"):
+        if otra.n == 0:
+            return
+        n = self.n + otra.n
+        delta = otra.media - self.media
+        self.media += delta * otra.n / n
+        self._m2 += otra._m2 + delta * delta * self.n * otra.n / n
+        self.n = n
+        self.minimo = min(self.minimo, otra.minimo)
+        self.maximo = max(self.maximo, otra.maximo)
+
+    @property
+    def varianza(self) -> Optional[float]:
+        """Varianza muestral (n - 1); None con menos de dos valores."""
+        return self._m2 / (self.n - 1) if self.n > 1 else None
+
+
+class CuantilesAproximados:
+    """Esbozo de cuantiles con cubetas logarítmicas: cada valor x > 0 cuenta en la cubeta
+    ceil(log_gamma(x)), con gamma = (1 + alfa) / (1 - alfa), y el cuantil devuelto está a
+    menos de un error relativo alfa del valor real. Los negativos usan cubetas propias
+    sobre |x| y el cero tiene su contador. Combinar es sumar cubetas, así que el resultado
+    no depende del orden ni de cómo se repartieron los estudios."""
+    __slots__ = ("alfa", "_log_gamma", "_positivas", "_negativas", "_ceros", "n")
+
+    def __init__(self, alfa: float = ALFA_CUANTILES):
+        self.alfa = alfa
+        self._log_gamma = math.log((1 + alfa) / (1 - alfa))
+        self._positivas = Counter()
+        self._negativas = Counter()
+        self._ceros = 0
+        self.n = 0
+
+    def anadir(self, x: float):
+        self.n += 1
+        if x > 0:
+            self._positivas[math.ceil(math.log(x) / self._log_gamma)] += 1
+        elif x < 0:
+            self._negativas[math.ceil(math.log(-x) / self._log_gamma)] += 1
+        else:
+            self._ceros += 1
+
+    def combinar(self, otro: "CuantilesAproximados"):
+        if otro.alfa != self.alfa:
+            raise ValueError("No se pueden combinar esbozos de cuantiles con distinto error relativo")
+        self._positivas.update(otro._positivas)
+        self._negativas.update(otro._negativas)
+        self._ceros += otro._ceros
+        self.n += otro.n
+
+    def _valor_cubeta(self, indice: int) -> float:
+        # Punto de la cubeta (gamma^(i-1), gamma^i] con el mismo error relativo a ambos extremos
+        gamma = math.exp(self._log_gamma)
+        return 2 * gamma ** indice / (gamma + 1)
+
+    def cuantil(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        rango = q * (self.n - 1)
+        acumulado = 0
+        for indice in sorted(self._negativas, reverse=True):
+            acumulado += self._negativas[indice]
+            if acumulado > rango:
+                return -self._valor_cubeta(indice)
+        acumulado += self._ceros
+        if acumulado > rango:
+            return 0.0
+        for indice in sorted(self._positivas):
+            acumulado += self._positivas[indice]
+            if acumulado > rango:
+                return self._valor_cubeta(indice)
+        return self._valor_cubeta(max(self._positivas)) if self._positivas else 0.0
+
+
+class MedidaContinua:
+    __slots__ = ("momentos", "cuantiles")
+
+    def __init__(self):
+        self.momentos = MediaVarianza()
+        self.cuantiles = CuantilesAproximados()
+
+    def anadir(self, x: float):
+        self.momentos.anadir(x)
+        self.cuantiles.anadir(x)
+
+    def combinar(self, otra: "MedidaContinua"):
+        self.momentos.combinar(otra.momentos)
+        self.cuantiles.combinar(otra.cuantiles)
+
+    def a_dict(self) -> dict:
+        m = self.momentos
+        if m.n == 0:
+            return {"n": 0}
+        resultado = {"n": m.n, "media": m.media, "desviacion": math.sqrt(m.varianza) if m.varianza is not None else None,
+                     "minimo": m.minimo, "maximo": m.maximo}
+        for nombre, q in CUANTILES_RESUMEN:
+            # La cubeta puede salirse del rango observado; se acota a [mínimo, máximo]
+            resultado[nombre] = min(max(self.cuantiles.cuantil(q), m.minimo), m.maximo)
+        return resultado
+
+
+class AgregadoCohorte:
+    """Todo lo que se acumula de un grupo de estudios."""
+
+    def __init__(self):
+        self.estudios = 0
+        self.clasificacion_fevi = Counter()
+        self.grado_vexus = Counter()
+        self.presiones_llenado = Counter()
+        self.medidas = {nombre: MedidaContinua() for nombre in MEDIDAS_CONTINUAS}
+
+    def anadir(self, informe: InformeEcoCompleto, rangos: ReferenceRanges):
+        umbrales = rangos.para_sexo(informe.paciente.sexo)
+        self.estudios += 1
+        self.clasificacion_fevi[calcular_clasificacion_fevi(informe.medidas_vi, informe.medidas_auriculas, umbrales)] += 1
+        self.grado_vexus[calcular_grado_vexus(informe.vexus)] += 1
+        self.presiones_llenado[estimar_presiones_llenado_vi(informe.presiones_llenado, informe.medidas_auriculas, umbrales)] += 1
+        for nombre, (seccion, atributo) in MEDIDAS_CONTINUAS.items():
+            valor = getattr(getattr(informe, seccion), atributo)
+            if valor is not None:
+                self.medidas[nombre].anadir(float(valor))
+
+    def combinar(self, otro: "AgregadoCohorte"):
+        self.estudios += otro.estudios
+        self.clasificacion_fevi.update(otro.clasificacion_fevi)
+        self.grado_vexus.update(otro.grado_vexus)
+        self.presiones_llenado.update(otro.presiones_llenado)
+        for nombre, medida in otro.medidas.items():
+            self.medidas[nombre].combinar(medida)
+
+    def a_dict(self) -> dict:
+        concluyentes = sum(n for etiqueta, n in self.presiones_llenado.items() if etiqueta in _PRESIONES_CONCLUYENTES)
+        elevadas = sum(n for etiqueta, n in self.presiones_llenado.items() if etiqueta in _PRESIONES_ELEVADAS)
+        return {
+            "estudios": self.estudios,
+            "clasificacion_fevi": dict(self.clasificacion_fevi.most_common()),
+            # -1 es el código de error de calcular_grado_vexus
+            "grado_vexus": {str(grado): self.grado_vexus[grado] for grado in sorted(self.grado_vexus)},
+            "presiones_llenado": dict(self.presiones_llenado.most_common()),
+            "tasa_presiones_elevadas": elevadas / concluyentes if concluyentes else None,
+            "medidas": {nombre: medida.a_dict() for nombre, medida in self.medidas.items()},
+        }
+
+
+class EstadisticasCohorte:
+    """Agregados por grupo. combinar() une los resultados parciales de varios procesos."""
+
+    def __init__(self, agrupacion: str = AGRUPACION_MES):
+        if agrupacion not in AGRUPACIONES:
+            raise ValueError(f"Agrupación no soportada: {agrupacion} (disponibles: {', '.join(AGRUPACIONES)})")
+        self.agrupacion = agrupacion
+        self.grupos: Dict[str, AgregadoCohorte] = {}
+        self.omitidos = 0
+
+    def anadir(self, resumen: ResumenEstudio, informe: InformeEcoCompleto, rangos: ReferenceRanges = RANGOS_REFERENCIA):
+        clave = AGRUPACIONES[self.agrupacion](resumen)
+        grupo = self.grupos.get(clave)
+        if grupo is None:
+            grupo = self.grupos[clave] = AgregadoCohorte()
+        grupo.anadir(informe, rangos)
+
+    def combinar(self, otras: "EstadisticasCohorte"):
+        for clave, agregado in otras.grupos.items():
+            if clave in self.grupos:
+                self.grupos[clave].combinar(agregado)
+            else:
+                self.grupos[clave] = agregado
+        self.omitidos += otras.omitidos
+
+    @property
+    def estudios(self) -> int:
+        return sum(grupo.estudios for grupo in self.grupos.values())
+
+    def a_dict(self) -> dict:
+        return {"agrupacion": self.agrupacion, "estudios": self.estudios, "omitidos": self.omitidos,
+                "grupos": {clave: self.grupos[clave].a_dict() for clave in sorted(self.grupos)}}
+
+
+# --- Recorrido del archivo ---
+
+def _resumir_bloque(bloque: List[Tuple[ResumenEstudio, bytes]], agrupacion: str,
+                    rangos: ReferenceRanges) -> EstadisticasCohorte:
+    """Trabajo de cada proceso: descomprime y resume un bloque de estudios."""
+    parciales = EstadisticasCohorte(agrupacion)
+    for resumen, datos in bloque:
+        # --- INICIO: Marcador para localización de errores (Estadística Estudio) ---
+        try:
+            parciales.anadir(resumen, descomprimir_informe(datos), rangos)
+        except Exception as e:
+            parciales.omitidos += 1
+            log_message(f"Estudio {resumen.id_informe} omitido de las estadísticas: {e}", "error", exc_info=True)
+        # --- FIN: Marcador para localización de errores (Estadística Estudio) ---
+    return parciales
+
+
+def _bloques(filas: Iterable[Tuple[ResumenEstudio, bytes]]) -> Iterable[List[Tuple[ResumenEstudio, bytes]]]:
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, LOTE_ESTADISTICAS))
+        if not bloque:
+            return
+        yield bloque
+
+
+def calcular_estadisticas(archivo: ArchivoEstudios, agrupacion: str = AGRUPACION_MES,
+                          desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                          nhc: Optional[str] = None, procesos: int = 1,
+                          rangos: Optional[ReferenceRanges] = None,
+                          progreso: Optional[Callable[[int, int], None]] = None) -> EstadisticasCohorte:
+    """Estadísticas de los estudios con desde <= fecha_estudio < hasta (y del paciente
+    'nhc', si se indica), agrupadas según 'agrupacion'. 'progreso(hechos, total)' se llama
+    tras cada bloque."""
+    resultado = EstadisticasCohorte(agrupacion)
+    rangos = rangos or RANGOS_REFERENCIA
+    total = archivo.contar(desde, hasta, nhc) if progreso else 0
+    bloques = _bloques(archivo.iterar(desde, hasta, nhc, descomprimir=False))
+    hechos = 0
+
+    def _acumular(parciales: EstadisticasCohorte):
+        nonlocal hechos
+        resultado.combinar(parciales)
+        hechos += parciales.estudios + parciales.omitidos
+        if progreso:
+            progreso(hechos, total)
+
+    if procesos <= 1:
+        for bloque in bloques:
+            _acumular(_resumir_bloque(bloque, agrupacion, rangos))
+        return resultado
+
+    max_en_vuelo = procesos * BLOQUES_EN_VUELO_POR_PROCESO
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for bloque in bloques:
+            pendientes.append(pool.submit(_resumir_bloque, bloque, agrupacion, rangos))
+            if len(pendientes) >= max_en_vuelo:
+                _acumular(pendientes.popleft().result())
+        while pendientes:
+            _acumular(pendientes.popleft().result())
+    return resultado
@@ -0,0 +1,269 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Exportación de muchos informes a un único fichero (zip o JSONL) con memoria acotada.
+
+Los estudios se leen del archivo local por páginas (ArchivoEstudios.iterar), en orden
+(fecha_estudio, id_informe); cada uno se redacta con generar_informe_texto y se escribe
+en cuanto está listo. En memoria solo hay una página de estudios y el bloque en curso,
+da igual cuántos estudios se exporten:
+- zip: una entrada "AAAAMMDD_HHMMSS_<id_informe>.txt" por estudio, con deflate o sin
+  comprimir. El directorio central se va escribiendo en un fichero auxiliar y se copia
+  al final (con registros ZIP64 si hay más de 65535 entradas o pasa de 4 GB), en lugar
+  de acumularlo en memoria como hace zipfile.
+- jsonl: una línea JSON por estudio; con compresión, un miembro gzip por bloque (los
+  miembros concatenados forman un .gz válido).
+
+Mientras dura, la exportación se escribe en '<salida>.parcial' y cada LOTE_EXPORTACION
+estudios deja un punto de control en '<salida>.parcial.json'. Si se interrumpe,
+reanudar=True recorta lo escrito después del último punto de control y sigue por el
+estudio siguiente; el resultado es idéntico al de una exportación sin cortes. Al
+terminar, '<salida>.parcial' se renombra a '<salida>'.
+"""
+import gzip
+import json
+import os
+import struct
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Callable, Optional
+
+from archivo_estudios import ArchivoEstudios, ResumenEstudio
+from rangos_referencia import ReferenceRanges
+from logic.report_generator import generar_informe_texto
+from utils.error_handling import log_message
+from utils import perfilado
+
+FORMATO_ZIP = "zip"
+FORMATO_JSONL = "jsonl"
+FORMATOS_EXPORTACION = (FORMATO_ZIP, FORMATO_JSONL)
+LOTE_EXPORTACION = 256 # Estudios entre puntos de control (y por miembro gzip en JSONL)
+NIVEL_COMPRESION = 6
+
+_LIMITE_ZIP32 = 0xFFFFFFFF
+_LIMITE_ENTRADAS_ZIP32 = 0xFFFF
+_FLAG_NOMBRE_UTF8 = 0x0800
+
+
+def _abrir_recortado(ruta: str, posicion: Optional[int]):
+    """Abre 'ruta' para escribir al final. Con 'posicion' (reanudación) recorta antes lo
+    escrito después del último punto de control; sin ella, empieza un fichero vacío."""
+    if posicion is None:
+        return open(ruta, "wb")
+    f = open(ruta, "r+b")
+    f.truncate(posicion)
+    f.seek(posicion)
+    return f
+
+
+def _sincronizar(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# --- Escritores ---
+
+class _EscritorZip:
+    """Zip escrito de forma secuencial: cabecera local + datos por entrada, y el
+    directorio central en un fichero auxiliar que se copia al cerrar."""
+
+    def __init__(self, ruta: str, comprimir: bool, estado: Optional[dict]):
+        self._ruta_indice = ruta + ".indice"
+        self._metodo = zlib.DEFLATED if comprimir else 0
+        self._f = _abrir_recortado(ruta, estado["bytes"] if estado else None)
+        self._indice = _abrir_recortado(self._ruta_indice, estado["bytes_indice"] if estado else None)
+        self._posicion = self._f.tell()
+        self._entradas = estado["entradas"] if estado else 0
+
+    @staticmethod
+    def _fecha_dos(fecha_iso: str):
+        try:
+            fecha = datetime.fromisoformat(fecha_iso)
+        except ValueError:
+            fecha = datetime(1980, 1, 1)
+        if fecha.year < 1980:
+            fecha = datetime(1980, 1, 1)
+        return (fecha.hour << 11) | (fecha.minute << 5) | (fecha.second // 2), \
+               ((fecha.year - 1980) << 9) | (fecha.month << 5) | fecha.day
+
+    @staticmethod
+    def nombre_entrada(resumen: ResumenEstudio) -> str:
+        compacta = resumen.fecha_estudio[:19].replace("-", "").replace(":", "").replace("T", "_")
+        return f"{compacta}_{resumen.id_informe}.txt"
+
+    def escribir(self, resumen: ResumenEstudio, texto: str):
+        nombre = self.nombre_entrada(resumen).encode("utf-8")
+        datos = texto.encode("utf-8")
+        crc = zlib.crc32(datos)
+        if self._metodo:
+            compresor = zlib.compressobj(NIVEL_COMPRESION, zlib.DEFLATED, -15)
+            comprimidos = compresor.compress(datos) + compresor.flush()
+        else:
+            comprimidos = datos
+        hora, fecha = self._fecha_dos(resumen.fecha_estudio)
+        offset = self._posicion
+        self._f.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, _FLAG_NOMBRE_UTF8, self._metodo, hora, fecha,
+                                  crc, len(comprimidos), len(datos), len(nombre), 0) + nombre)
+        self._f.write(comprimidos)
+        self._posicion += 30 + len(nombre) + len(comprimidos)
+
+        # Entrada del directorio central; el offset va en un extra ZIP64 si no cabe en 32 bits
+        extra = struct.pack("<HHQ", 0x0001, 8, offset) if offset >= _LIMITE_ZIP32 else b""
+        self._indice.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 45 if extra else 20, 45 if extra else 20,
+                                       _FLAG_NOMBRE_UTF8, self._metodo, hora, fecha, crc, len(comprimidos), len(datos),
+                                       len(nombre), len(extra), 0, 0, 0, 0, min(offset, _LIMITE_ZIP32))
+                           + nombre + extra)
+        self._entradas += 1
+
+    def punto_control(self) -> dict:
+        _sincronizar(self._f)
+        _sincronizar(self._indice)
+        return {"bytes": self._posicion, "bytes_indice": self._indice.tell(), "entradas": self._entradas}
+
+    def finalizar(self):
+        inicio_directorio = self._posicion
+        self._indice.flush()
+        with open(self._ruta_indice, "rb") as indice:
+            while True:
+                bloque = indice.read(1 << 16)
+                if not bloque:
+                    break
+                self._f.write(bloque)
+        tamano_directorio = self._f.tell() - inicio_directorio
+        if (self._entradas > _LIMITE_ENTRADAS_ZIP32 or inicio_directorio >= _LIMITE_ZIP32
+                or tamano_directorio >= _LIMITE_ZIP32):
+            inicio_zip64 = self._f.tell()
+            self._f.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, self._entradas, self._entradas,
+                                      tamano_directorio, inicio_directorio))
+            self._f.write(struct.pack("<IIQI", 0x07064B50, 0, inicio_zip64, 1))
+        self._f.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(self._entradas, _LIMITE_ENTRADAS_ZIP32),
+                                  min(self._entradas, _LIMITE_ENTRADAS_ZIP32), min(tamano_directorio, _LIMITE_ZIP32),
+                                  min(inicio_directorio, _LIMITE_ZIP32), 0))
+        _sincronizar(self._f)
+
+    def cerrar(self):
+        self._f.close()
+        self._indice.close()
+
+    def eliminar_auxiliares(self):
+        os.remove(self._ruta_indice)
+
+
+class _EscritorJsonl:
+    """Una línea JSON por estudio. Con compresión, cada bloque es un miembro gzip."""
+
+    def __init__(self, ruta: str, comprimir: bool, estado: Optional[dict]):
+        self._comprimir = comprimir
+        self._f = _abrir_recortado(ruta, estado["bytes"] if estado else None)
+        self._bloque = []
+
+    def escribir(self, resumen: ResumenEstudio, texto: str):
+        linea = json.dumps({"id_informe": resumen.id_informe, "nhc": resumen.nhc, "fecha_estudio": resumen.fecha_estudio,
+                            "realizado_por": resumen.realizado_por, "informe": texto}, ensure_ascii=False) + "\n"
+        if self._comprimir:
+            self._bloque.append(linea.encode("utf-8"))
+        else:
+            self._f.write(linea.encode("utf-8"))
+
+    def _volcar_bloque(self):
+        if self._bloque:
+            # mtime=0: la salida no depende de cuándo se exporta
+            self._f.write(gzip.compress(b"".join(self._bloque), NIVEL_COMPRESION, mtime=0))
+            self._bloque = []
+
+    def punto_control(self) -> dict:
+        self._volcar_bloque()
+        _sincronizar(self._f)
+        return {"bytes": self._f.tell()}
+
+    def finalizar(self):
+        self._volcar_bloque()
+        _sincronizar(self._f)
+
+    def cerrar(self):
+        self._f.close()
+
+    def eliminar_auxiliares(self):
+        pass
+
+
+_ESCRITORES = {FORMATO_ZIP: _EscritorZip, FORMATO_JSONL: _EscritorJsonl}
+
+
+# --- Exportación ---
+
+def _guardar_estado(ruta_estado: str, estado: dict):
+    # Escritura atómica: un corte nunca deja un punto de control a medias
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta_estado)), suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(temporal, ruta_estado)
+
+
+def exportar_estudios(archivo: ArchivoEstudios, ruta_salida: str, formato: str = FORMATO_ZIP,
+                      desde: Optional[datetime] = None, hasta: Optional[datetime] = None, nhc: Optional[str] = None,
+                      comprimir: bool = True, reanudar: bool = False,
+                      progreso: Optional[Callable[[int, int], None]] = None,
+                      rangos: Optional[ReferenceRanges] = None) -> int:
+    """Exporta los informes de los estudios con desde <= fecha_estudio < hasta (y, si se
+    indica, del NHC dado) a ruta_salida. 'progreso(exportados, total)' se llama en cada
+    punto de control y al terminar. Devuelve el número de estudios exportados, incluidos
+    los de la ejecución interrumpida si se reanuda.
+
+    Al reanudar se continúa tras el último estudio exportado en orden (fecha, id): los
+    estudios añadidos al archivo después, con fechas anteriores, no se incluyen."""
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato de exportación no soportado: {formato} (disponibles: {', '.join(FORMATOS_EXPORTACION)})")
+    ruta_parcial = ruta_salida + ".parcial"
+    ruta_estado = ruta_parcial + ".json"
+    filtros = {"desde": desde.isoformat() if desde else None, "hasta": hasta.isoformat() if hasta else None,
+               "nhc": nhc.strip() if nhc else None}
+
+    estado = None
+    if reanudar and os.path.exists(ruta_estado):
+        with open(ruta_estado, encoding="utf-8") as f:
+            estado = json.load(f)
+        if (estado["formato"], estado["comprimir"], estado["filtros"]) != (formato, comprimir, filtros):
+            raise ValueError(f"La exportación parcial de '{ruta_salida}' se hizo con otro formato, compresión o filtros; "
+                             "repítala con los mismos parámetros o empiece de cero sin reanudar.")
+        log_message(f"Reanudando la exportación de '{ruta_salida}' tras {estado['exportados']} estudios.", "info")
+    elif reanudar:
+        log_message(f"No hay exportación parcial de '{ruta_salida}'; se empieza de cero.", "info")
+    elif os.path.exists(ruta_estado):
+        os.remove(ruta_estado) # Se descarta la exportación parcial anterior
+
+    total = archivo.contar(desde, hasta, nhc)
+    exportados = estado["exportados"] if estado else 0
+    ultima_clave = tuple(estado["ultima_clave"]) if estado and estado["ultima_clave"] else None
+    escritor = _ESCRITORES[formato](ruta_parcial, comprimir, estado["escritor"] if estado else None)
+    # --- INICIO: Marcador para localización de errores (Exportación Estudios) ---
+    try:
+        desde_control = 0
+        for resumen, informe in archivo.iterar(desde, hasta, nhc, despues_de=ultima_clave):
+            texto = generar_informe_texto(informe, rangos)
+            with perfilado.medir(f"escritura.exportacion.{formato}"):
+                escritor.escribir(resumen, texto)
+            exportados += 1
+            ultima_clave = (resumen.fecha_estudio, resumen.id_informe)
+            desde_control += 1
+            if desde_control >= LOTE_EXPORTACION:
+                _guardar_estado(ruta_estado, {"formato": formato, "comprimir": comprimir, "filtros": filtros,
+                                              "exportados": exportados, "ultima_clave": ultima_clave,
+                                              "escritor": escritor.punto_control()})
+                desde_control = 0
+                if progreso:
+                    progreso(exportados, total)
+        escritor.finalizar()
+    finally:
+        escritor.cerrar()
+    # --- FIN: Marcador para localización de errores (Exportación Estudios) ---
+    os.replace(ruta_parcial, ruta_salida)
+    escritor.eliminar_auxiliares()
+    if os.path.exists(ruta_estado):
+        os.remove(ruta_estado)
+    if progreso:
+        progreso(exportados, total)
+    log_message(f"Exportados {exportados} informes a '{ruta_salida}'.", "info")
+    return exportados
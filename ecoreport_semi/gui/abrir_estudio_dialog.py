@@ -0,0 +1,86 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Diálogo "Abrir Estudio": busca en el archivo local por NHC (o muestra los más recientes)
+y devuelve el id_informe elegido.
+"""
+from typing import Optional
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                             QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, QDialogButtonBox)
+from PyQt5.QtCore import Qt, pyqtSlot
+
+from archivo_estudios import ArchivoEstudios
+from utils.error_handling import log_message
+
+ESTUDIOS_RECIENTES = 100
+
+
+class AbrirEstudioDialog(QDialog):
+    def __init__(self, archivo: ArchivoEstudios, parent=None):
+        super().__init__(parent)
+        self.archivo = archivo
+        self.setWindowTitle("Abrir Estudio")
+        self.resize(640, 420)
+        self._init_ui()
+        self.buscar()
+
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+
+        busqueda_layout = QHBoxLayout()
+        busqueda_layout.addWidget(QLabel("NHC:"))
+        self.nhc_edit = QLineEdit()
+        self.nhc_edit.setPlaceholderText("Vacío para ver los estudios más recientes")
+        self.nhc_edit.returnPressed.connect(self.buscar)
+        busqueda_layout.addWidget(self.nhc_edit)
+        btn_buscar = QPushButton("Buscar")
+        btn_buscar.clicked.connect(self.buscar)
+        busqueda_layout.addWidget(btn_buscar)
+        layout.addLayout(busqueda_layout)
+
+        self.tabla = QTableWidget(0, 4)
+        self.tabla.setHorizontalHeaderLabels(["Fecha", "NHC", "ID Informe", "Realizado por"])
+        self.tabla.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tabla.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.tabla.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tabla.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.tabla.doubleClicked.connect(self.accept)
+        layout.addWidget(self.tabla)
+
+        self.estado_label = QLabel()
+        layout.addWidget(self.estado_label)
+
+        botones = QDialogButtonBox(QDialogButtonBox.Open | QDialogButtonBox.Cancel)
+        botones.accepted.connect(self.accept)
+        botones.rejected.connect(self.reject)
+        layout.addWidget(botones)
+
+    @pyqtSlot()
+    def buscar(self):
+        # --- INICIO: Marcador para localización de errores (Buscar Estudios) ---
+        try:
+            nhc = self.nhc_edit.text().strip()
+            if nhc:
+                resultados = self.archivo.buscar_por_nhc(nhc)
+            else:
+                resultados = self.archivo.buscar_por_fecha(limite=ESTUDIOS_RECIENTES)
+            self.tabla.setRowCount(len(resultados))
+            for fila, resumen in enumerate(resultados):
+                fecha = resumen.fecha_estudio[:16].replace("T", " ")
+                for columna, texto in enumerate((fecha, resumen.nhc, resumen.id_informe, resumen.realizado_por)):
+                    item = QTableWidgetItem(texto)
+                    item.setData(Qt.UserRole, resumen.id_informe)
+                    self.tabla.setItem(fila, columna, item)
+            if resultados:
+                self.tabla.selectRow(0)
+            self.estado_label.setText(f"{len(resultados)} estudio(s)" if nhc else f"{len(resultados)} estudio(s) más reciente(s)")
+        except Exception as e:
+            log_message(f"Error buscando estudios en el archivo: {e}", "error", exc_info=True)
+            self.estado_label.setText(f"Error en la búsqueda: {e}")
+        # --- FIN: Marcador para localización de errores (Buscar Estudios) ---
+
+    def id_seleccionado(self) -> Optional[str]:
+        item = self.tabla.item(self.tabla.currentRow(), 0)
+        return item.data(Qt.UserRole) if item is not None else None
@@ -4,9 +4,10 @@
 """
 Ventana principal de la aplicación EcoReport SEMI.
 """
+import os
 from PyQt5.QtWidgets import QMainWindow, QTabWidget, QStatusBar, QAction, QMessageBox, QFileDialog
-from PyQt5.QtCore import Qt, pyqtSlot
-from PyQt5.QtGui import QIcon # Asegúrate que QIcon está importado
+from PyQt5.QtCore import Qt, pyqtSlot, pyqtSignal, QTimer
+from PyQt5.QtGui import QIcon, QKeySequence # Asegúrate que QIcon está importado
 
 import config
 from models import InformeEcoCompleto
@@ -17,17 +18,44 @@ from .tabs.datos_eco_tab import DatosEcoTab # NUEVA IMPORTACIÓN
 # from .tabs.eco_avanzada_tab import EcoAvanzadaTab
 # from .tabs.congestion_tab import CongestionTab
 from .tabs.informe_tab import InformeTab # Esta se mantiene
+from .tabs.paciente_tab import PacienteTab
+from .abrir_estudio_dialog import AbrirEstudioDialog
+from .perfil_dialog import PerfilDialog
+from archivo_estudios import ArchivoEstudios
+from diario_recuperacion import DiarioRecuperacion
+from historial_cambios import HistorialCambios, cambios_entre
+from importacion_dicom_sr import importar_sr
+from medidas_importadas import completar_informe
 
-from logic.report_generator import generar_informe_texto
-from utils.error_handling import log_message
+from logic.report_generator import construir_documento
+from logic.renderizadores import RENDERIZADORES, renderizar_texto
+from logic.renderizador_pdf import ESCRITORES_BINARIOS
+from utils.error_handling import log_message, detener_logging
+from utils import perfilado
+
+# Campos del paciente de los que depende cuál es su estudio previo (párrafo de evolución)
+CLAVES_ESTUDIO_PREVIO = ("paciente.nhc", "paciente.fecha_estudio")
 
 class MainWindow(QMainWindow):
+    primer_pintado = pyqtSignal() # Una vez, cuando la ventana ya se ha pintado entera (main.py mide el arranque)
+
     def __init__(self):
         super().__init__()
+        self._pintada = False
         try:
             log_message("Inicializando MainWindow.", "debug")
-            self.current_informe = InformeEcoCompleto()
+            self._archivo_estudios = None # Se abre al guardar/abrir el primer estudio
+            # Si la sesión anterior terminó con un estudio sin guardar, se continúa con él
+            self._diario = DiarioRecuperacion()
+            recuperado = self._diario.recuperar()
+            self.current_informe = recuperado or InformeEcoCompleto()
+            self._diario.iniciar(self.current_informe, sin_guardar=recuperado is not None)
+            self._historial = HistorialCambios(self.current_informe) # Deshacer/rehacer
+            self._estudio_previo = self._buscar_estudio_previo(self.current_informe) # Párrafo de evolución
             self.init_ui()
+            self.informe_final_tab.estudio_previo = self._estudio_previo
+            if recuperado is not None:
+                self.status_bar.showMessage(f"Recuperado el estudio {recuperado.id_informe}, que no se había guardado.", 10000)
             log_message("UI de MainWindow inicializada.", "debug")
         except Exception as e:
             log_message(f"Error crítico inicializando MainWindow: {e}", "critical", exc_info=True)
@@ -53,8 +81,22 @@ class MainWindow(QMainWindow):
         nuevo_action = QAction("&Nuevo Informe", self)
         nuevo_action.triggered.connect(self.nuevo_informe)
         file_menu.addAction(nuevo_action)
+
+        abrir_action = QAction("&Abrir Estudio...", self)
+        abrir_action.setShortcut("Ctrl+O")
+        abrir_action.triggered.connect(self.abrir_estudio)
+        file_menu.addAction(abrir_action)
+
+        importar_sr_action = QAction("&Importar Medidas DICOM SR...", self)
+        importar_sr_action.triggered.connect(self.importar_medidas_sr)
+        file_menu.addAction(importar_sr_action)
+
+        guardar_action = QAction("&Guardar Estudio", self)
+        guardar_action.setShortcut("Ctrl+S")
+        guardar_action.triggered.connect(self.guardar_estudio)
+        file_menu.addAction(guardar_action)
         
-        exportar_action = QAction("&Exportar Informe Texto...", self)
+        exportar_action = QAction("&Exportar Informe...", self)
         exportar_action.triggered.connect(self.exportar_informe_texto)
         file_menu.addAction(exportar_action)
 
@@ -62,20 +104,49 @@ class MainWindow(QMainWindow):
         exit_action = QAction("&Salir", self)
         exit_action.triggered.connect(self.close) # self.close llama a closeEvent
         file_menu.addAction(exit_action)
+
+        edit_menu = self.menu_bar.addMenu("&Edición")
+        self.deshacer_action = QAction("&Deshacer", self)
+        self.deshacer_action.setShortcut(QKeySequence.Undo)
+        self.deshacer_action.triggered.connect(self.deshacer)
+        edit_menu.addAction(self.deshacer_action)
+        self.rehacer_action = QAction("&Rehacer", self)
+        self.rehacer_action.setShortcuts([QKeySequence("Ctrl+Y"), QKeySequence("Ctrl+Shift+Z")])
+        self.rehacer_action.triggered.connect(self.rehacer)
+        edit_menu.addAction(self.rehacer_action)
+        self._actualizar_acciones_historial()
         
         help_menu = self.menu_bar.addMenu("A&yuda")
         about_action = QAction("&Acerca de", self)
         about_action.triggered.connect(self.mostrar_acerca_de)
         help_menu.addAction(about_action)
 
+        # Acción oculta (sin entrada en los menús): tiempos de utils/perfilado.py
+        perfil_action = QAction("Perfilado de rendimiento", self)
+        perfil_action.setShortcut("Ctrl+Shift+P")
+        perfil_action.triggered.connect(self.mostrar_perfilado)
+        self.addAction(perfil_action)
+
         self.tabs_widget = QTabWidget()
+
+        # Identificación del paciente (NHC, nombre, fecha): el NHC enlaza sus estudios previos
+        self.paciente_tab = PacienteTab(self.current_informe.paciente)
+        self.paciente_tab.campo_modificado.connect(self._diario.registrar)
+        self.paciente_tab.campo_modificado.connect(self._on_campo_paciente_modificado)
         
         # Crear e instanciar la nueva pestaña unificada
         self.datos_eco_tab = DatosEcoTab(self.current_informe) # NUEVA PESTAÑA
         
         # La pestaña de informe final se mantiene
         self.informe_final_tab = InformeTab(self.current_informe, self) # Pasar self (MainWindow)
+        self.datos_eco_tab.modelo_modificado.connect(self.informe_final_tab.programar_preview)
+        self.datos_eco_tab.campo_modificado.connect(self._diario.registrar)
+        self.informe_final_tab.campo_modificado.connect(self._diario.registrar)
+        self.datos_eco_tab.modelo_modificado.connect(self._registrar_en_historial)
+        # Escribir en un mismo campo de texto (comentarios) es un solo paso de deshacer
+        self.informe_final_tab.campo_modificado.connect(lambda clave, _: self._registrar_en_historial(clave))
 
+        self.tabs_widget.addTab(self.paciente_tab, "Paciente")
         self.tabs_widget.addTab(self.datos_eco_tab, "Datos Ecocardiográficos") # NOMBRE DE LA NUEVA PESTAÑA
         self.tabs_widget.addTab(self.informe_final_tab, "Informe Final y Acciones")
 
@@ -93,19 +164,160 @@ class MainWindow(QMainWindow):
                                              "¿Desea borrar los datos actuales y empezar un nuevo informe?",
                                              QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if respuesta == QMessageBox.Yes:
-                self.current_informe = InformeEcoCompleto()
-                # Actualizar las pestañas con el nuevo modelo vacío
-                self.datos_eco_tab.set_modelo(self.current_informe) # ACTUALIZADO
-                self.informe_final_tab.set_modelo(self.current_informe)
+                self._establecer_informe_actual(InformeEcoCompleto())
                 self.status_bar.showMessage("Nuevo informe iniciado.", 3000)
                 log_message("Nuevo informe creado. Campos reiniciados.", "info")
         except Exception as e:
             log_message(f"Error al crear nuevo informe: {e}", "error", exc_info=True)
             QMessageBox.warning(self, "Error", f"No se pudo reiniciar el informe: {e}")
 
+    def _establecer_informe_actual(self, informe: InformeEcoCompleto, sin_guardar: bool = False):
+        self._historial.reiniciar(informe) # Otro estudio: no se puede deshacer hacia el anterior
+        self._cargar_en_pestanas(informe, sin_guardar)
+
+    def _cargar_en_pestanas(self, informe: InformeEcoCompleto, sin_guardar: bool):
+        self._diario.iniciar(informe, sin_guardar) # Antes de recargar las pestañas, que emiten sus campos
+        self._estudio_previo = self._buscar_estudio_previo(informe)
+        self._mostrar_en_pestanas(informe)
+
+    def _mostrar_en_pestanas(self, informe: InformeEcoCompleto):
+        """Pone 'informe' como estudio actual en las pestañas (sin tocar el diario)."""
+        self.current_informe = informe
+        # Actualizar las pestañas con el nuevo modelo
+        self.paciente_tab.set_modelo(self.current_informe.paciente)
+        self.datos_eco_tab.set_modelo(self.current_informe) # ACTUALIZADO
+        self.informe_final_tab.set_modelo(self.current_informe, self._estudio_previo)
+        self._actualizar_acciones_historial()
+
+    def _buscar_estudio_previo(self, informe: InformeEcoCompleto):
+        """Punto de evolución del estudio previo del paciente en el archivo local (índice por
+        NHC y fecha, sin descomprimir estudios), o None. Sin NHC no se abre el archivo."""
+        if not informe.paciente.nhc.strip():
+            return None
+        try:
+            return self._obtener_archivo_estudios().estudio_previo(informe)
+        except Exception as e:
+            log_message(f"No se pudo buscar el estudio previo del paciente: {e}", "warning", exc_info=True)
+            return None
+
+    def _actualizar_estudio_previo(self):
+        self._estudio_previo = self._buscar_estudio_previo(self.current_informe)
+        self.informe_final_tab.estudio_previo = self._estudio_previo
+
+    def _on_campo_paciente_modificado(self, clave: str, _valor):
+        self._registrar_en_historial(clave)
+        if clave in CLAVES_ESTUDIO_PREVIO: # Otro paciente u otra fecha: otro estudio previo
+            self._actualizar_estudio_previo()
+        self.informe_final_tab.programar_preview()
+
+    def _registrar_en_historial(self, agrupar=None):
+        if self._historial.registrar(self.current_informe, agrupar):
+            self._actualizar_acciones_historial()
+
+    def _actualizar_acciones_historial(self):
+        self.deshacer_action.setEnabled(self._historial.puede_deshacer())
+        self.rehacer_action.setEnabled(self._historial.puede_rehacer())
+
+    @pyqtSlot()
+    def deshacer(self):
+        self._aplicar_paso_historial(self._historial.deshacer(), "Deshecho el último cambio.")
+
+    @pyqtSlot()
+    def rehacer(self):
+        self._aplicar_paso_historial(self._historial.rehacer(), "Rehecho el cambio.")
+
+    def _aplicar_paso_historial(self, informe: InformeEcoCompleto, mensaje: str):
+        try:
+            if informe is None:
+                return
+            # Es el mismo estudio: el diario no se reinicia (reescribirlo entero en cada Ctrl+Z),
+            # solo se anotan los campos que cambian, y el estudio previo solo se vuelve a
+            # buscar si cambia el NHC o la fecha
+            cambios = cambios_entre(self.current_informe, informe)
+            for clave, valor in cambios:
+                self._diario.registrar(clave, valor)
+            if any(clave in CLAVES_ESTUDIO_PREVIO for clave, _ in cambios):
+                self._estudio_previo = self._buscar_estudio_previo(informe)
+            self._mostrar_en_pestanas(informe)
+            self.informe_final_tab.programar_preview()
+            self.status_bar.showMessage(mensaje, 3000)
+        except Exception as e:
+            log_message(f"Error al deshacer/rehacer: {e}", "error", exc_info=True)
+            QMessageBox.warning(self, "Error", f"No se pudo aplicar el cambio: {e}")
+
+    def _obtener_archivo_estudios(self) -> ArchivoEstudios:
+        if self._archivo_estudios is None:
+            self._archivo_estudios = ArchivoEstudios()
+            log_message(f"Archivo de estudios abierto: {self._archivo_estudios.ruta}", "info")
+        return self._archivo_estudios
+
+    @pyqtSlot()
+    def guardar_estudio(self):
+        try:
+            log_message("Acción: Guardar Estudio seleccionada.", "info")
+            self._actualizar_modelo_desde_ui() # Asegurar datos actualizados
+            self._obtener_archivo_estudios().guardar(self.current_informe)
+            self._diario.marcar_guardado()
+            self.status_bar.showMessage(f"Estudio {self.current_informe.id_informe} guardado en el archivo local.", 5000)
+            log_message(f"Estudio guardado en el archivo: {self.current_informe.id_informe}", "info")
+        except Exception as e:
+            log_message(f"Error al guardar el estudio: {e}", "error", exc_info=True)
+            QMessageBox.critical(self, "Error al Guardar", f"No se pudo guardar el estudio: {e}")
+
+    @pyqtSlot()
+    def abrir_estudio(self):
+        try:
+            log_message("Acción: Abrir Estudio seleccionada.", "info")
+            archivo = self._obtener_archivo_estudios()
+            dialogo = AbrirEstudioDialog(archivo, self)
+            if dialogo.exec_() != AbrirEstudioDialog.Accepted or not dialogo.id_seleccionado():
+                return
+            informe = archivo.cargar(dialogo.id_seleccionado())
+            if informe is None:
+                QMessageBox.warning(self, "Abrir Estudio", "El estudio seleccionado ya no está en el archivo.")
+                return
+            self._establecer_informe_actual(informe)
+            self.status_bar.showMessage(f"Estudio {informe.id_informe} abierto.", 5000)
+            log_message(f"Estudio abierto desde el archivo: {informe.id_informe}", "info")
+        except Exception as e:
+            log_message(f"Error al abrir un estudio del archivo: {e}", "error", exc_info=True)
+            QMessageBox.critical(self, "Error al Abrir", f"No se pudo abrir el estudio: {e}")
+
+    @pyqtSlot()
+    def importar_medidas_sr(self):
+        """Rellena el informe actual con las medidas del DICOM SR de la carpeta del estudio
+        exportada por el ecógrafo. Solo se leen los SR: las imágenes se descartan por su
+        cabecera, así que la carga no depende de su tamaño."""
+        try:
+            log_message("Acción: Importar Medidas DICOM SR seleccionada.", "info")
+            carpeta = QFileDialog.getExistingDirectory(self, "Carpeta del estudio con el DICOM SR")
+            if not carpeta:
+                return
+            incidencias = []
+            informes = list(importar_sr(carpeta, incidencias=incidencias.append))
+            if not informes:
+                detalle = "\n".join(f"{os.path.basename(i.ruta)}: {i.descripcion}" for i in incidencias[:5])
+                QMessageBox.warning(self, "Importar Medidas DICOM SR",
+                                    "No se ha encontrado ningún DICOM SR con medidas reconocidas en la carpeta."
+                                    + (f"\n\n{detalle}" if detalle else ""))
+                return
+            # Con varios SR (p. ej. uno por cada revisión de las medidas), el más reciente
+            importado = max(informes, key=lambda informe: informe.paciente.fecha_estudio)
+            self._actualizar_modelo_desde_ui() # No perder lo ya tecleado
+            asignados = completar_informe(self.current_informe, importado)
+            self._cargar_en_pestanas(self.current_informe, sin_guardar=True)
+            self._registrar_en_historial() # La importación se puede deshacer
+            self.status_bar.showMessage(f"{len(asignados)} datos importados del DICOM SR"
+                                        f"{f' ({len(incidencias)} incidencias, ver log)' if incidencias else ''}.", 5000)
+            log_message(f"Medidas importadas de DICOM SR ({importado.id_informe}): {', '.join(asignados)}", "info")
+        except Exception as e:
+            log_message(f"Error al importar medidas DICOM SR: {e}", "error", exc_info=True)
+            QMessageBox.critical(self, "Error al Importar", f"No se pudieron importar las medidas: {e}")
+
     def _actualizar_modelo_desde_ui(self):
         """Método para asegurar que el modelo central tiene los datos de la UI."""
         log_message("Actualizando modelo central desde UI antes de generar informe.", "debug")
+        self.paciente_tab.actualizar_modelo()
         if hasattr(self.datos_eco_tab, 'actualizar_modelo'): # ACTUALIZADO
             self.datos_eco_tab.actualizar_modelo()
         if hasattr(self.informe_final_tab, 'actualizar_modelo'): # Para "Realizado por" y "Comentarios"
@@ -117,7 +329,8 @@ class MainWindow(QMainWindow):
             log_message("Acción: Exportar Informe Texto seleccionada.", "info")
             self._actualizar_modelo_desde_ui() # Asegurar datos actualizados
             
-            informe_texto_generado = generar_informe_texto(self.current_informe)
+            documento = construir_documento(self.current_informe, previo=self._estudio_previo) # Una evaluación para cualquier formato
+            informe_texto_generado = renderizar_texto(documento)
             self.informe_final_tab.mostrar_informe_texto(informe_texto_generado) # Actualizar preview
 
             opciones = QFileDialog.Options()
@@ -125,11 +338,18 @@ class MainWindow(QMainWindow):
             default_filename = f"EcoInforme_{self.current_informe.id_informe}.txt"
             nombre_archivo, _ = QFileDialog.getSaveFileName(self, "Guardar Informe como Texto", 
                                                            default_filename,
-                                                           "Archivos de Texto (*.txt);;Todos los Archivos (*)", 
+                                                           "Archivos de Texto (*.txt);;PDF (*.pdf);;Markdown (*.md);;HTML (*.html);;JSON (*.json);;Todos los Archivos (*)", 
                                                            options=opciones)
             if nombre_archivo:
-                with open(nombre_archivo, 'w', encoding='utf-8') as f:
-                    f.write(informe_texto_generado)
+                # El formato se elige por la extensión; cualquier otra se guarda como texto
+                formato = os.path.splitext(nombre_archivo)[1].lower().lstrip(".")
+                if formato in ESCRITORES_BINARIOS:
+                    with perfilado.medir(f"escritura.exportar_informe.{formato}"), open(nombre_archivo, 'wb') as f:
+                        ESCRITORES_BINARIOS[formato](documento, f)
+                else:
+                    contenido = RENDERIZADORES.get(formato, renderizar_texto)(documento)
+                    with perfilado.medir(f"escritura.exportar_informe.{formato}"), open(nombre_archivo, 'w', encoding='utf-8') as f:
+                        f.write(contenido)
                 self.status_bar.showMessage(f"Informe guardado en: {nombre_archivo}", 5000)
                 log_message(f"Informe de texto exportado a: {nombre_archivo}", "info")
         except Exception as e:
@@ -148,9 +368,27 @@ class MainWindow(QMainWindow):
         except Exception as e:
             log_message(f"Error al mostrar 'Acerca de': {e}", "error", exc_info=True)
 
+    @pyqtSlot()
+    def mostrar_perfilado(self):
+        try:
+            PerfilDialog(self).exec_()
+        except Exception as e:
+            log_message(f"Error al mostrar el perfilado: {e}", "error", exc_info=True)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._pintada:
+            self._pintada = True
+            QTimer.singleShot(0, self.primer_pintado.emit) # Después de pintar también las pestañas
+
     def closeEvent(self, event):
         try:
             log_message("Evento closeEvent detectado. Cerrando aplicación sin confirmación.", "info")
+            self.informe_final_tab.detener_preview()
+            if self._archivo_estudios is not None:
+                self._archivo_estudios.cerrar()
+            self._diario.cerrar() # Sincronizar los últimos cambios
+            detener_logging() # Escribir a disco lo que quede en la cola del log
             event.accept()
         except Exception as e:
             log_message(f"Error durante closeEvent: {e}", "error", exc_info=True)
@@ -0,0 +1,105 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Diálogo oculto de perfilado (Ctrl+Mayús+P en la ventana principal): muestra las medidas
+de utils/perfilado.py de la sesión en curso y el histograma de la fila seleccionada.
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QPlainTextEdit,
+                             QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, QFileDialog)
+from PyQt5.QtCore import Qt, pyqtSlot
+from PyQt5.QtGui import QFont
+
+from utils import perfilado
+from utils.error_handling import log_message
+
+_COLUMNAS = (("Medida", None), ("Llamadas", "llamadas"), ("Total (ms)", "total_ms"), ("Media (µs)", "media_us"),
+             ("p50 (µs)", "p50_us"), ("p99 (µs)", "p99_us"), ("Máx (µs)", "max_us"))
+ANCHO_BARRA = 40
+
+
+class PerfilDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Perfilado de rendimiento")
+        self.resize(900, 560)
+        self._medidas = {}
+        self._init_ui()
+        self.actualizar()
+
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+        if not perfilado.ACTIVO:
+            layout.addWidget(QLabel("El perfilado está desactivado. Inicie la aplicación con ECOREPORT_PERFIL=1 "
+                                    "o con el argumento --profile."))
+
+        self.tabla = QTableWidget(0, len(_COLUMNAS))
+        self.tabla.setHorizontalHeaderLabels([titulo for titulo, _ in _COLUMNAS])
+        self.tabla.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tabla.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.tabla.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tabla.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.tabla.itemSelectionChanged.connect(self._mostrar_histograma)
+        layout.addWidget(self.tabla, 3)
+
+        self.histograma_text = QPlainTextEdit()
+        self.histograma_text.setReadOnly(True)
+        self.histograma_text.setFont(QFont("Courier New", 9))
+        layout.addWidget(self.histograma_text, 2)
+
+        botones_layout = QHBoxLayout()
+        for texto, slot in (("Actualizar", self.actualizar), ("Reiniciar", self.reiniciar),
+                            ("Guardar JSON...", self.guardar), ("Cerrar", self.accept)):
+            boton = QPushButton(texto)
+            boton.clicked.connect(slot)
+            botones_layout.addWidget(boton)
+        layout.addLayout(botones_layout)
+
+    @pyqtSlot()
+    def actualizar(self):
+        # --- INICIO: Marcador para localización de errores (Actualizar Perfil) ---
+        try:
+            self._medidas = perfilado.resumen()
+            self.tabla.setRowCount(len(self._medidas))
+            for fila, (nombre, datos) in enumerate(self._medidas.items()):
+                for columna, (_, clave) in enumerate(_COLUMNAS):
+                    item = QTableWidgetItem(nombre if clave is None else f"{datos[clave]:g}")
+                    if clave is not None:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    item.setData(Qt.UserRole, nombre)
+                    self.tabla.setItem(fila, columna, item)
+            if self._medidas:
+                self.tabla.selectRow(0)
+            else:
+                self.histograma_text.setPlainText("Sin medidas todavía.")
+        except Exception as e:
+            log_message(f"Error mostrando el perfilado: {e}", "error", exc_info=True)
+        # --- FIN: Marcador para localización de errores (Actualizar Perfil) ---
+
+    @pyqtSlot()
+    def _mostrar_histograma(self):
+        filas = self.tabla.selectionModel().selectedRows()
+        if not filas:
+            return
+        nombre = self.tabla.item(filas[0].row(), 0).data(Qt.UserRole)
+        histograma = self._medidas.get(nombre, {}).get("histograma", {})
+        maximo = max(histograma.values(), default=1)
+        lineas = [nombre]
+        for cubeta, n in histograma.items():
+            lineas.append(f"{cubeta:>16} | {'#' * max(1, round(ANCHO_BARRA * n / maximo)):<{ANCHO_BARRA}} {n}")
+        self.histograma_text.setPlainText("\n".join(lineas))
+
+    @pyqtSlot()
+    def reiniciar(self):
+        perfilado.reiniciar()
+        self.actualizar()
+
+    @pyqtSlot()
+    def guardar(self):
+        try:
+            ruta, _ = QFileDialog.getSaveFileName(self, "Guardar perfil", "perfil.json", "JSON (*.json)")
+            if ruta:
+                perfilado.volcar_resumen(ruta)
+                log_message(f"Perfil de rendimiento guardado en: {ruta}", "info")
+        except Exception as e:
+            log_message(f"Error guardando el perfil: {e}", "error", exc_info=True)
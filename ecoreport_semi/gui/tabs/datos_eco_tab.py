@@ -3,11 +3,13 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGroupBox, QLabel,
                              QLineEdit, QFormLayout, QCheckBox, QComboBox,
-                             QScrollArea, QRadioButton, QHBoxLayout, QButtonGroup)
+                             QScrollArea, QRadioButton, QHBoxLayout, QButtonGroup, QToolButton)
 from PyQt5.QtGui import QDoubleValidator, QPixmap
-from PyQt5.QtCore import Qt, pyqtSignal
-from functools import partial
-from typing import Tuple, Dict, Any, Optional, List 
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+from functools import partial, lru_cache
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Tuple, Dict, Any, Optional, List, Callable
 import os
 
 from models import (InformeEcoCompleto,
@@ -23,11 +25,149 @@ from models import (InformeEcoCompleto,
                     P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
 import config
 from utils.error_handling import log_message
+from utils.perfilado import perfilar
+
+# --- Registro de enlaces campo <-> control ---
+# Tipos de control de entrada de un parámetro
+TIPO_NUMERO = "numero"   # QLineEdit numérico -> float o None
+TIPO_TEXTO = "texto"     # QLineEdit de texto libre -> str
+TIPO_CASILLA = "casilla" # QCheckBox -> bool
+TIPO_COMBO = "combo"     # QComboBox -> texto elegido o None si está vacío
+TIPO_RADIOS = "radios"   # QButtonGroup -> valor asociado al texto del radio marcado
+
+@dataclass(frozen=True)
+class EnlaceCampo:
+    """Cómo se sincroniza un parámetro P_* entre su control de la pestaña y el modelo."""
+    submodelo: str # Atributo de InformeEcoCompleto (p. ej. "medidas_vi")
+    atributo: str  # Campo del sub-modelo (p. ej. "septo_iv_mm")
+    tipo: str
+    valor_nv: Any = None # Valor en el modelo si es "No Valorado" (o si no aplica); también el valor de reinicio
+    depende_de: Optional[str] = None # Clave del "Presente/Ausente" que habilita este campo
+    valores_radio: Optional[Dict[str, Any]] = None # Texto del radio -> valor (por defecto, el propio texto)
+
+# Un parámetro nuevo necesita una entrada aquí y su control en el método _construir_* de su
+# sección (SECCIONES_UI). El orden es el de carga/guardado: cada "Presente/Ausente" va antes
+# de los campos que dependen de él.
+ENLACES_CAMPOS: Dict[str, EnlaceCampo] = {
+    P_VI_SEPTO: EnlaceCampo("medidas_vi", "septo_iv_mm", TIPO_NUMERO),
+    P_VI_PARED_POST: EnlaceCampo("medidas_vi", "pared_posterior_vi_mm", TIPO_NUMERO),
+    P_VI_DTDVI: EnlaceCampo("medidas_vi", "dtdvi_mm", TIPO_NUMERO),
+    P_FEVI_CUALITATIVA: EnlaceCampo("medidas_vi", "fevi_cualitativa", TIPO_RADIOS, valores_radio={"No Estimar": None}),
+    P_FEVI_PORCENTAJE: EnlaceCampo("medidas_vi", "fevi_porcentaje", TIPO_NUMERO),
+    P_AI_VOL_IDX: EnlaceCampo("medidas_auriculas", "ai_vol_ml_m2", TIPO_NUMERO),
+    P_VD_DIAM_BASAL: EnlaceCampo("medidas_vd", "vd_diametro_basal_mm", TIPO_NUMERO),
+    P_VD_TAPSE: EnlaceCampo("medidas_vd", "tapse_mm", TIPO_NUMERO),
+    P_VALV_EST_AO: EnlaceCampo("valvulopatias", "estenosis_aortica_sig", TIPO_CASILLA, False),
+    P_VALV_INS_AO: EnlaceCampo("valvulopatias", "insuficiencia_aortica_sig", TIPO_CASILLA, False),
+    P_VALV_INS_MI: EnlaceCampo("valvulopatias", "insuficiencia_mitral_sig", TIPO_CASILLA, False),
+    P_VALV_INS_TR: EnlaceCampo("valvulopatias", "insuficiencia_tricuspidea_sig", TIPO_CASILLA, False),
+    P_PRES_LLEN_E_A: EnlaceCampo("presiones_llenado", "mitral_e_a_ratio", TIPO_NUMERO),
+    P_PRES_LLEN_E_SEPTAL: EnlaceCampo("presiones_llenado", "e_prima_septal_cms", TIPO_NUMERO),
+    P_PRES_LLEN_E_LATERAL: EnlaceCampo("presiones_llenado", "e_prima_lateral_cms", TIPO_NUMERO),
+    P_PRES_LLEN_IT_VEL: EnlaceCampo("presiones_llenado", "it_velocidad_max_ms", TIPO_NUMERO),
+    P_PRES_LLEN_E_E_PRIMA_RATIO: EnlaceCampo("presiones_llenado", "e_sobre_e_prima_ratio", TIPO_NUMERO),
+    P_DERR_PERIC_PRESENTE: EnlaceCampo("derrame_pericardico", "presente", TIPO_RADIOS, False,
+                                       valores_radio={"Ausente": False, "Presente": True}),
+    P_DERR_PERIC_CUANTIA: EnlaceCampo("derrame_pericardico", "cuantia_mm", TIPO_NUMERO, depende_de=P_DERR_PERIC_PRESENTE),
+    P_LINEAS_B_PRESENTE: EnlaceCampo("lineas_b", "presentes", TIPO_RADIOS, False,
+                                     valores_radio={"Ausentes": False, "Presentes (>3/espacio)": True}),
+    P_LINEAS_B_DESC: EnlaceCampo("lineas_b", "descripcion_hallazgos", TIPO_TEXTO, "", depende_de=P_LINEAS_B_PRESENTE),
+    P_DERR_PLEURAL_PRESENTE: EnlaceCampo("derrame_pleural", "presente", TIPO_RADIOS, False,
+                                         valores_radio={"Ausente": False, "Presente": True}),
+    P_DERR_PLEURAL_TIPO: EnlaceCampo("derrame_pleural", "tipo_cuantificacion", TIPO_COMBO, depende_de=P_DERR_PLEURAL_PRESENTE),
+    P_DERR_PLEURAL_LOC: EnlaceCampo("derrame_pleural", "localizacion", TIPO_COMBO, depende_de=P_DERR_PLEURAL_PRESENTE),
+    P_VCI_DIAM: EnlaceCampo("vci", "diametro_max_mm", TIPO_NUMERO),
+    P_VCI_COLAPSO_RADIO: EnlaceCampo("vci", "colapso_mayor_50", TIPO_RADIOS,
+                                     valores_radio={">50%": True, "<50%": False, "NV Colapso": None}),
+    P_VCI_MM_INSPIRACION: EnlaceCampo("vci", "mm_inspiracion", TIPO_NUMERO),
+    P_VEXUS_VCI_DILATADA: EnlaceCampo("vexus", "vci_patologica_vexus", TIPO_CASILLA, False),
+    P_VEXUS_VSH: EnlaceCampo("vexus", "patron_vena_suprahepatica", TIPO_COMBO),
+    P_VEXUS_VP: EnlaceCampo("vexus", "patron_vena_porta", TIPO_COMBO),
+    P_VEXUS_VIR: EnlaceCampo("vexus", "patron_vena_intrarrenal", TIPO_COMBO),
+}
+
+# Clave "Presente/Ausente" -> claves de los campos que habilita
+DEPENDIENTES: Dict[str, List[str]] = {}
+for _clave, _enlace in ENLACES_CAMPOS.items():
+    if _enlace.depende_de:
+        DEPENDIENTES.setdefault(_enlace.depende_de, []).append(_clave)
+
+# Secciones de la pestaña: (título, sub-modelos de sus parámetros, método de DatosEcoTab que crea
+# sus filas). Un campo y el "Presente/Ausente" del que depende van siempre en la misma sección.
+SECCIONES_UI: Tuple[Tuple[str, Tuple[str, ...], str], ...] = (
+    ("Eco Básica (VI, AI, VD)", ("medidas_vi", "medidas_auriculas", "medidas_vd"), "_construir_eco_basica"),
+    ("Eco Avanzada (Valvulopatías, Presiones, Pericardio)", ("valvulopatias", "presiones_llenado", "derrame_pericardico"),
+     "_construir_eco_avanzada"),
+    ("Congestión (Pulmonar y Sistémica)", ("lineas_b", "derrame_pleural", "vci", "vexus"), "_construir_congestion"),
+)
+
+
+@lru_cache(maxsize=None)
+def _imagen_vexus(ancho: int) -> Tuple[Optional[QPixmap], str]:
+    """Imagen de referencia VExUS escalada a 'ancho': se decodifica una sola vez por proceso.
+    Devuelve (pixmap, "") o (None, texto a mostrar en su lugar)."""
+    image_path = config.resource_path("vexus_patterns.png") # Asume que la imagen se llama así
+    if not os.path.exists(image_path):
+        log_message(f"Imagen VExUS no encontrada: {image_path}", "warning")
+        return None, f"Imagen VExUS no encontrada:\n{image_path}"
+    pixmap = QPixmap(image_path)
+    if pixmap.isNull():
+        log_message(f"Pixmap VExUS nulo: {image_path}", "error")
+        return None, "Error al cargar imagen VExUS."
+    return pixmap.scaledToWidth(ancho, Qt.SmoothTransformation), ""
+
+
+class SeccionPlegable(QWidget):
+    """Sección de DatosEcoTab con una cabecera que la pliega y despliega. Sus controles se
+    crean con construir() la primera vez que está desplegada y a la vista; hasta entonces el
+    cuerpo solo reserva una altura aproximada para que la barra de desplazamiento no salte."""
+    ALTURA_FILA_ESTIMADA = 34
+
+    def __init__(self, titulo: str, claves: List[str], construir_filas: Callable[[QFormLayout], None],
+                 al_construir: Callable[["SeccionPlegable"], None], parent=None):
+        super().__init__(parent)
+        self.claves = claves # Parámetros P_* de la sección, en el orden de ENLACES_CAMPOS
+        self.construida = False
+        self._construir_filas = construir_filas
+        self._al_construir = al_construir
+        layout = QVBoxLayout(self); layout.setContentsMargins(0,0,0,0); layout.setSpacing(2)
+        self.cabecera = QToolButton(); self.cabecera.setText(titulo)
+        self.cabecera.setCheckable(True); self.cabecera.setChecked(True)
+        self.cabecera.setToolButtonStyle(Qt.ToolButtonTextBesideIcon); self.cabecera.setArrowType(Qt.DownArrow)
+        self.cabecera.setStyleSheet("QToolButton { border: none; font-weight: bold; }")
+        self.cabecera.toggled.connect(self._on_desplegar)
+        self.cuerpo = QGroupBox(); self.cuerpo.setMinimumHeight(len(claves) * self.ALTURA_FILA_ESTIMADA)
+        layout.addWidget(self.cabecera); layout.addWidget(self.cuerpo)
+
+    def desplegada(self) -> bool:
+        return self.cabecera.isChecked()
+
+    def a_la_vista(self) -> bool:
+        return self.desplegada() and not self.cuerpo.visibleRegion().isEmpty()
+
+    @perfilar()
+    def construir(self):
+        if self.construida:
+            return
+        form = QFormLayout(); form.setLabelAlignment(Qt.AlignLeft); form.setRowWrapPolicy(QFormLayout.WrapLongRows); form.setSpacing(8)
+        self._construir_filas(form)
+        self.cuerpo.setLayout(form); self.cuerpo.setMinimumHeight(0)
+        self.construida = True
+        self._al_construir(self)
+
+    def _on_desplegar(self, desplegada: bool):
+        self.cabecera.setArrowType(Qt.DownArrow if desplegada else Qt.RightArrow)
+        self.cuerpo.setVisible(desplegada)
+        if desplegada:
+            self.construir()
+
 
 class DatosEcoTab(QWidget):
     FEVI_CUALITATIVA_OPCIONES = ["No Estimar", "Preservada", "Ligeramente deprimida", "Severamente deprimida"]
     modelo_modificado = pyqtSignal()
+    campo_modificado = pyqtSignal(str, object) # 'seccion.campo' y valor nuevo (diario de recuperación)
     TARGET_IMAGE_WIDTH = 350 
+    SHORT_LINE_EDIT_WIDTH = 70
 
     def __init__(self, modelo_informe: InformeEcoCompleto, parent=None):
         super().__init__(parent)
@@ -37,6 +177,14 @@ class DatosEcoTab(QWidget):
         self.percentage_validator = QDoubleValidator(0, 100, 2, self)
         self.percentage_validator.setNotation(QDoubleValidator.StandardNotation)
         self.param_controls: Dict[str, Dict[str, Any]] = {}
+        self._pausas_sincronizacion = 0 # > 0 mientras se rellenan controles desde el modelo
+        self.secciones: List[SeccionPlegable] = []
+        self._imagen_cargada = False
+        # Tras desplazar, redimensionar o construir una sección se comprueba qué ha quedado a la vista
+        self._temporizador_visibles = QTimer(self)
+        self._temporizador_visibles.setSingleShot(True)
+        self._temporizador_visibles.setInterval(0)
+        self._temporizador_visibles.timeout.connect(self._construir_visibles)
         self._init_ui()
         self.cargar_modelo_en_ui()
         log_message("Pestaña DatosEcoTab (simplificada y con imagen) inicializada.", "debug")
@@ -65,117 +213,142 @@ class DatosEcoTab(QWidget):
         if button_group_for_radios:
              self.param_controls[param_key]["button_group"] = button_group_for_radios
         nv_checkbox.stateChanged.connect(partial(self._on_nv_checkbox_changed, param_key))
-        if isinstance(widget_entrada, QLineEdit): widget_entrada.editingFinished.connect(self.actualizar_modelo_y_emitir)
-        elif isinstance(widget_entrada, QComboBox): widget_entrada.currentIndexChanged.connect(self.actualizar_modelo_y_emitir)
-        elif isinstance(widget_entrada, QCheckBox) and widget_entrada != nv_checkbox : widget_entrada.stateChanged.connect(self.actualizar_modelo_y_emitir)
-        elif button_group_for_radios : button_group_for_radios.buttonClicked.connect(self.actualizar_modelo_y_emitir)
+        sincronizar = partial(self._on_campo_editado, param_key) # Solo este campo (y sus dependientes)
+        if isinstance(widget_entrada, QLineEdit): widget_entrada.editingFinished.connect(sincronizar)
+        elif isinstance(widget_entrada, QComboBox): widget_entrada.currentIndexChanged.connect(sincronizar)
+        elif isinstance(widget_entrada, QCheckBox) and widget_entrada != nv_checkbox : widget_entrada.stateChanged.connect(sincronizar)
+        elif button_group_for_radios : button_group_for_radios.buttonClicked.connect(sincronizar)
         return line_layout
         
     def _on_nv_checkbox_changed(self, param_key: str, state: int):
         controls = self.param_controls.get(param_key)
         if not controls: return
         is_nv = (state == Qt.Checked)
-        input_widget_or_container = controls["input"]
-        
-        # Habilitar/deshabilitar el widget de entrada principal o los componentes de un contenedor
-        if isinstance(input_widget_or_container, QButtonGroup): # Caso especial para FEVI Cualitativa y otros grupos de radio
-            for rb in input_widget_or_container.buttons():
-                rb.setEnabled(not is_nv)
-            if is_nv: # Resetear a "No Estimar" o similar
-                if param_key == P_FEVI_CUALITATIVA: self.fevi_radio_ninguna.setChecked(True)
-                elif param_key == P_DERR_PERIC_PRESENTE: self.derr_per_radio_ausente.setChecked(True) # Asume que "Ausente" es el default
-                elif param_key == P_LINEAS_B_PRESENTE: self.lineas_b_radio_ausente.setChecked(True)
-                elif param_key == P_DERR_PLEURAL_PRESENTE: self.derr_pleural_radio_ausente.setChecked(True)
-                elif param_key == P_VCI_COLAPSO_RADIO: # Reset VCI colapso radios
-                    self.vci_colapso_radio_mayor.setAutoExclusive(False); self.vci_colapso_radio_mayor.setChecked(False); self.vci_colapso_radio_mayor.setAutoExclusive(True)
-                    self.vci_colapso_radio_menor.setAutoExclusive(False); self.vci_colapso_radio_menor.setChecked(False); self.vci_colapso_radio_menor.setAutoExclusive(True)
-
-        elif isinstance(input_widget_or_container, QWidget) and not isinstance(input_widget_or_container, (QLineEdit, QComboBox, QCheckBox)):
-             # Podría ser un QWidget contenedor (ej. para FEVI cualitativa o VCI colapso)
-            for child_widget in input_widget_or_container.findChildren(QWidget): # Deshabilitar todos los hijos
-                if not isinstance(child_widget, QLabel): # No deshabilitar QLabel
-                    child_widget.setEnabled(not is_nv)
-            if is_nv and param_key == P_FEVI_CUALITATIVA: self.fevi_radio_ninguna.setChecked(True)
-        else: # Es un widget de entrada simple
-            input_widget_or_container.setEnabled(not is_nv)
-        
-        if is_nv: # Limpiar valor si se marca NV
-            if isinstance(input_widget_or_container, QLineEdit): input_widget_or_container.clear()
-            elif isinstance(input_widget_or_container, QComboBox): input_widget_or_container.setCurrentIndex(0)
-            elif isinstance(input_widget_or_container, QCheckBox): input_widget_or_container.setChecked(False)
-            # Limpieza de QButtonGroup ya manejada arriba
-        
-        # Si este NV afecta a otros campos (como un "Presente" que controla "Cuantía")
-        # Llamar a _on_sub_checkbox_changed para actualizar el estado de los dependientes.
-        # Esto es un poco complejo porque _on_sub_checkbox_changed también es llamado por el stateChanged del "Presente".
-        # Necesitamos evitar llamadas recursivas o asegurar que el estado es consistente.
-        # Por ahora, el _on_sub_checkbox_changed debería verificar el estado NV de su control primario.
-
-        self.actualizar_modelo_y_emitir()
+        with self._pausar_sincronizacion():
+            self._habilitar_control(controls, not is_nv)
+            if is_nv: # Limpiar valor si se marca NV
+                self._escribir_control(ENLACES_CAMPOS[param_key], controls, ENLACES_CAMPOS[param_key].valor_nv)
+        self._on_campo_editado(param_key)
 
-    def actualizar_modelo_y_emitir(self, *args):
-        self.actualizar_modelo()
+    def _on_campo_editado(self, param_key: str, *args):
+        """Sincroniza con el modelo solo el parámetro editado (y, si es un "Presente/Ausente",
+        los campos que dependen de él)."""
+        if self._pausas_sincronizacion:
+            return # Los controles se están rellenando desde el modelo
+        dependientes = DEPENDIENTES.get(param_key, ())
+        if dependientes:
+            self._actualizar_dependientes(param_key)
+        self._guardar_campo(param_key)
+        for clave_dependiente in dependientes:
+            self._guardar_campo(clave_dependiente)
         self.modelo_modificado.emit()
 
-    def _on_sub_checkbox_changed(self, master_checkbox_or_radio_group: QWidget, secondary_param_key: str, affected_secondary_widgets: List[QWidget]):
-        # Determinar si el control maestro permite que los secundarios estén activos
-        enable_secondaries = False
-        master_is_nv = False
+    @contextmanager
+    def _pausar_sincronizacion(self):
+        # Las señales que emiten los controles al rellenarlos por código no tocan el modelo
+        self._pausas_sincronizacion += 1
+        try:
+            yield
+        finally:
+            self._pausas_sincronizacion -= 1
 
-        # Encontrar el checkbox NV del control maestro
-        for pk, ctrl_dict in self.param_controls.items():
-            if ctrl_dict["input"] == master_checkbox_or_radio_group or ctrl_dict.get("button_group") == master_checkbox_or_radio_group:
-                master_is_nv = ctrl_dict["nv_check"].isChecked()
-                break
-        
-        if not master_is_nv: # Solo proceder si el control maestro no está marcado como NV
-            if isinstance(master_checkbox_or_radio_group, QCheckBox): # Ej. Valvulopatía Sig.
-                enable_secondaries = master_checkbox_or_radio_group.isChecked()
-            elif isinstance(master_checkbox_or_radio_group, QButtonGroup): # Ej. Derrame Presente/Ausente
-                # Asumimos que "Presente" es el que habilita
-                for rb in master_checkbox_or_radio_group.buttons():
-                    if rb.text().lower().startswith("presente") and rb.isChecked():
-                        enable_secondaries = True
-                        break
-        
-        for widget_sec in affected_secondary_widgets:
-            widget_sec.setEnabled(enable_secondaries)
-            # Habilitar/deshabilitar el checkbox NV del widget secundario
-            sec_nv_check = None
-            for pk_sec, ctrl_dict_sec in self.param_controls.items():
-                if ctrl_dict_sec["input"] == widget_sec:
-                    sec_nv_check = ctrl_dict_sec["nv_check"]
-                    break
-            if sec_nv_check:
-                sec_nv_check.setEnabled(enable_secondaries)
-                if not enable_secondaries: # Si el secundario se deshabilita, desmarcar su NV y limpiar
-                    sec_nv_check.setChecked(False) 
-            
-            if not enable_secondaries:
-                if isinstance(widget_sec, QLineEdit): widget_sec.clear()
-                elif isinstance(widget_sec, QComboBox): widget_sec.setCurrentIndex(0)
-        
-        self.actualizar_modelo_y_emitir()
+    def _habilitar_control(self, controls: Dict[str, Any], habilitado: bool):
+        button_group = controls.get("button_group")
+        if button_group: # Para QButtonGroups (FEVI cualitativa, Derrame presente/ausente, etc.)
+            for rb in button_group.buttons():
+                rb.setEnabled(habilitado)
+        else: # Para QLineEdit, QComboBox, QCheckBox individuales
+            controls["input"].setEnabled(habilitado)
 
+    def _leer_control(self, enlace: EnlaceCampo, controls: Dict[str, Any]) -> Any:
+        widget = controls["input"]
+        if enlace.tipo == TIPO_NUMERO: return self._safe_text_to_float(widget)
+        if enlace.tipo == TIPO_TEXTO: return widget.text().strip()
+        if enlace.tipo == TIPO_CASILLA: return widget.isChecked()
+        if enlace.tipo == TIPO_COMBO: return widget.currentText() or None
+        # TIPO_RADIOS
+        marcado = controls["button_group"].checkedButton()
+        if marcado is None: return enlace.valor_nv
+        return (enlace.valores_radio or {}).get(marcado.text(), marcado.text())
 
-    def _init_ui(self):
-        # ... (main_tab_layout, scroll_area, scroll_content_widget, content_layout como antes) ...
-        # ... (SHORT_LINE_EDIT_WIDTH como antes) ...
-        # === La estructura interna de _init_ui para crear los QGroupBox y QFormLayouts
-        #     CON LOS CAMPOS Y SUS _crear_linea_parametro DEBE SER LA MISMA QUE TE DI
-        #     EN LA RESPUESTA ANTERIOR (la que ajustaba los QLineEdit y los radios NV al lado).
-        #     Solo asegúrate de que las claves P_... sean correctas y que los widgets
-        #     se creen y se añadan al param_controls.
-        #     VOY A REPETIR LA ESTRUCTURA CON LAS CLAVES CORRECTAS Y LA NUEVA VCI:
+    def _escribir_control(self, enlace: EnlaceCampo, controls: Dict[str, Any], valor: Any):
+        widget = controls["input"]
+        if enlace.tipo == TIPO_NUMERO: widget.setText(str(valor or ""))
+        elif enlace.tipo == TIPO_TEXTO: widget.setText(valor or "")
+        elif enlace.tipo == TIPO_CASILLA: widget.setChecked(bool(valor))
+        elif enlace.tipo == TIPO_COMBO: widget.setCurrentText(valor or "")
+        else: # TIPO_RADIOS: el radio de ese valor o, si no hay ninguno, el del valor de reinicio
+            valores = enlace.valores_radio or {}
+            botones = controls["button_group"].buttons()
+            for buscado in (valor, enlace.valor_nv):
+                for rb in botones:
+                    if valores.get(rb.text(), rb.text()) == buscado:
+                        rb.setChecked(True)
+                        return
 
+    def _guardar_campo(self, param_key: str):
+        enlace = ENLACES_CAMPOS[param_key]
+        controls = self.param_controls[param_key]
+        es_nv = controls["nv_check"].isChecked()
+        self.modelo_informe.param_no_valorado_flags[param_key] = es_nv
+        if es_nv or (enlace.depende_de and not self._valor_en_modelo(enlace.depende_de)):
+            valor = enlace.valor_nv
+        else:
+            valor = self._leer_control(enlace, controls)
+        setattr(getattr(self.modelo_informe, enlace.submodelo), enlace.atributo, valor)
+        self.campo_modificado.emit(f"param_no_valorado_flags.{param_key}", es_nv)
+        self.campo_modificado.emit(f"{enlace.submodelo}.{enlace.atributo}", valor)
+
+    def _valor_en_modelo(self, param_key: str) -> Any:
+        enlace = ENLACES_CAMPOS[param_key]
+        return getattr(getattr(self.modelo_informe, enlace.submodelo), enlace.atributo)
+
+    def _actualizar_dependientes(self, clave_maestra: str, limpiar: bool = True):
+        """Habilita los campos que dependen de un "Presente/Ausente" solo si está en
+        "Presente" y no es NV. Con 'limpiar', los que quedan deshabilitados se reinician."""
+        controles_maestro = self.param_controls[clave_maestra]
+        habilitar = (not controles_maestro["nv_check"].isChecked()
+                     and bool(self._leer_control(ENLACES_CAMPOS[clave_maestra], controles_maestro)))
+        with self._pausar_sincronizacion():
+            for clave in DEPENDIENTES.get(clave_maestra, ()):
+                controls = self.param_controls[clave]
+                if not habilitar and limpiar: # Si el secundario se deshabilita, desmarcar su NV y limpiar
+                    controls["nv_check"].setChecked(False)
+                    self._escribir_control(ENLACES_CAMPOS[clave], controls, ENLACES_CAMPOS[clave].valor_nv)
+                controls["nv_check"].setEnabled(habilitar)
+                self._habilitar_control(controls, habilitar and not controls["nv_check"].isChecked())
+
+
+    def _init_ui(self):
+        # Solo el esqueleto: los controles de cada sección se crean en su _construir_* (SECCIONES_UI)
         main_tab_layout = QHBoxLayout(self); main_tab_layout.setContentsMargins(5,5,5,5)
-        scroll_area = QScrollArea(); scroll_area.setWidgetResizable(True); scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.scroll_area = QScrollArea(); self.scroll_area.setWidgetResizable(True); self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.scroll_content_widget = QWidget(); content_layout = QVBoxLayout(self.scroll_content_widget)
         content_layout.setSpacing(15); content_layout.setContentsMargins(5,5,10,5)
-        SHORT_LINE_EDIT_WIDTH = 70
 
-        # === Eco Básica ===
-        eco_basica_group = QGroupBox("Eco Básica (VI, AI, VD)"); eco_basica_form = QFormLayout(); eco_basica_form.setLabelAlignment(Qt.AlignLeft); eco_basica_form.setRowWrapPolicy(QFormLayout.WrapLongRows); eco_basica_form.setSpacing(8)
+        # Secciones plegables; sus controles se crean al desplegarlas o verlas por primera vez
+        for titulo, submodelos, metodo in SECCIONES_UI:
+            claves = [clave for clave, enlace in ENLACES_CAMPOS.items() if enlace.submodelo in submodelos]
+            seccion = SeccionPlegable(titulo, claves, getattr(self, metodo), self._on_seccion_construida)
+            seccion.cabecera.toggled.connect(lambda _desplegada: self._temporizador_visibles.start()) # Plegar deja otras a la vista
+            self.secciones.append(seccion); content_layout.addWidget(seccion)
+            if not config.UI_CONSTRUCCION_DIFERIDA:
+                seccion.construir()
+
+        content_layout.addStretch(1)
+        self.scroll_content_widget.setLayout(content_layout)
+        self.scroll_area.setWidget(self.scroll_content_widget)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(lambda _valor: self._temporizador_visibles.start()) # start(int) cambiaría el intervalo
+        main_tab_layout.addWidget(self.scroll_area, 2)
+        self.vexus_image_label = QLabel() # La imagen se decodifica tras el primer pintado (showEvent)
+        self.vexus_image_label.setAlignment(Qt.AlignCenter | Qt.AlignTop); self.vexus_image_label.setMinimumWidth(DatosEcoTab.TARGET_IMAGE_WIDTH + 20)
+        main_tab_layout.addWidget(self.vexus_image_label, 1)
+        self.setLayout(main_tab_layout)
+        if not config.UI_CONSTRUCCION_DIFERIDA:
+            self._cargar_imagen_vexus()
+
+    def _construir_eco_basica(self, eco_basica_form: QFormLayout):
+        SHORT_LINE_EDIT_WIDTH = self.SHORT_LINE_EDIT_WIDTH
         self.septo_iv_edit = QLineEdit(); self.septo_iv_edit.setFixedWidth(SHORT_LINE_EDIT_WIDTH); self.septo_iv_edit.setValidator(self.numeric_validator); self.septo_iv_edit.setPlaceholderText("mm")
         eco_basica_form.addRow("Septo IV:", self._crear_linea_parametro(P_VI_SEPTO, self.septo_iv_edit, "mm"))
         self.pared_posterior_edit = QLineEdit(); self.pared_posterior_edit.setFixedWidth(SHORT_LINE_EDIT_WIDTH); self.pared_posterior_edit.setValidator(self.numeric_validator); self.pared_posterior_edit.setPlaceholderText("mm")
@@ -197,10 +370,9 @@ class DatosEcoTab(QWidget):
         eco_basica_form.addRow("Diámetro Basal VD:", self._crear_linea_parametro(P_VD_DIAM_BASAL, self.diam_basal_vd_edit, "mm"))
         self.tapse_edit = QLineEdit(); self.tapse_edit.setFixedWidth(SHORT_LINE_EDIT_WIDTH); self.tapse_edit.setValidator(self.numeric_validator); self.tapse_edit.setPlaceholderText("mm")
         eco_basica_form.addRow("TAPSE:", self._crear_linea_parametro(P_VD_TAPSE, self.tapse_edit, "mm"))
-        eco_basica_group.setLayout(eco_basica_form); content_layout.addWidget(eco_basica_group)
 
-        # === Eco Avanzada ===
-        eco_avanzada_group = QGroupBox("Eco Avanzada (Valvulopatías, Presiones, Pericardio)"); eco_avanzada_form = QFormLayout(); eco_avanzada_form.setLabelAlignment(Qt.AlignLeft); eco_avanzada_form.setRowWrapPolicy(QFormLayout.WrapLongRows); eco_avanzada_form.setSpacing(8)
+    def _construir_eco_avanzada(self, eco_avanzada_form: QFormLayout):
+        SHORT_LINE_EDIT_WIDTH = self.SHORT_LINE_EDIT_WIDTH
         self.est_ao_check = QCheckBox("Estenosis Aórtica Sig."); eco_avanzada_form.addRow("EAo Sig.:", self._crear_linea_parametro(P_VALV_EST_AO, self.est_ao_check))
         self.ins_ao_check = QCheckBox("Insuficiencia Aórtica Sig."); eco_avanzada_form.addRow("IAo Sig.:", self._crear_linea_parametro(P_VALV_INS_AO, self.ins_ao_check))
         self.ins_mi_check = QCheckBox("Insuficiencia Mitral Sig."); eco_avanzada_form.addRow("IM Sig.:", self._crear_linea_parametro(P_VALV_INS_MI, self.ins_mi_check))
@@ -226,10 +398,9 @@ class DatosEcoTab(QWidget):
         eco_avanzada_form.addRow("Derrame Pericárdico:", self._crear_linea_parametro(P_DERR_PERIC_PRESENTE, derr_per_radio_widget, button_group_for_radios=self.derr_per_radio_group))
         self.derr_per_cuantia_edit = QLineEdit(); self.derr_per_cuantia_edit.setFixedWidth(SHORT_LINE_EDIT_WIDTH); self.derr_per_cuantia_edit.setValidator(self.numeric_validator); self.derr_per_cuantia_edit.setPlaceholderText("mm")
         eco_avanzada_form.addRow("Cuantía Derr. Pericárdico:", self._crear_linea_parametro(P_DERR_PERIC_CUANTIA, self.derr_per_cuantia_edit, "mm"))
-        eco_avanzada_group.setLayout(eco_avanzada_form); content_layout.addWidget(eco_avanzada_group)
 
-        # === Congestión ===
-        congestion_group = QGroupBox("Congestión (Pulmonar y Sistémica)"); congestion_form = QFormLayout(); congestion_form.setLabelAlignment(Qt.AlignLeft); congestion_form.setRowWrapPolicy(QFormLayout.WrapLongRows); congestion_form.setSpacing(8)
+    def _construir_congestion(self, congestion_form: QFormLayout):
+        SHORT_LINE_EDIT_WIDTH = self.SHORT_LINE_EDIT_WIDTH
         # Líneas B con RadioButtons Ausente/Presente
         lineas_b_radio_layout = QHBoxLayout(); lineas_b_radio_layout.setContentsMargins(0,0,0,0)
         self.lineas_b_radio_group = QButtonGroup(self)
@@ -277,203 +448,66 @@ class DatosEcoTab(QWidget):
         congestion_form.addRow("VExUS - Patrón V. Porta:", self._crear_linea_parametro(P_VEXUS_VP, self.vp_patron_combo))
         self.vir_patron_combo = QComboBox(); self.vir_patron_combo.addItems([""] + config.VIR_PATRONES)
         congestion_form.addRow("VExUS - Patrón V. Intrarrenal:", self._crear_linea_parametro(P_VEXUS_VIR, self.vir_patron_combo))
-        congestion_group.setLayout(congestion_form); content_layout.addWidget(congestion_group)
 
-        content_layout.addStretch(1)
-        self.scroll_content_widget.setLayout(content_layout)
-        scroll_area.setWidget(self.scroll_content_widget)
-        main_tab_layout.addWidget(scroll_area, 2)
-        self.vexus_image_label = QLabel()
-        image_path =config.resource_path("vexus_patterns.png") # Asume que la imagen se llama así
-        if os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull(): self.vexus_image_label.setPixmap(pixmap.scaledToWidth(DatosEcoTab.TARGET_IMAGE_WIDTH, Qt.SmoothTransformation))
-            else: self.vexus_image_label.setText("Error al cargar imagen VExUS."); log_message(f"Pixmap VExUS nulo: {image_path}", "error")
-        else: self.vexus_image_label.setText(f"Imagen VExUS no encontrada:\n{image_path}"); log_message(f"Imagen VExUS no encontrada: {image_path}", "warning")
-        self.vexus_image_label.setAlignment(Qt.AlignCenter | Qt.AlignTop); self.vexus_image_label.setMinimumWidth(DatosEcoTab.TARGET_IMAGE_WIDTH + 20)
-        main_tab_layout.addWidget(self.vexus_image_label, 1)
-        self.setLayout(main_tab_layout)
+    def _on_seccion_construida(self, seccion: SeccionPlegable):
+        # Sincronización diferida: la sección lee ahora el modelo actual
+        self._cargar_claves(seccion.claves)
+        self._temporizador_visibles.start() # Su tamaño real puede dejar a la vista la siguiente
 
-        # Conectar señales de los RadioButton groups que actúan como "Presente/Ausente"
-        self.derr_per_radio_group.buttonClicked.connect(partial(self._on_sub_checkbox_changed, self.derr_per_radio_group, P_DERR_PERIC_CUANTIA, [self.derr_per_cuantia_edit]))
-        self.lineas_b_radio_group.buttonClicked.connect(partial(self._on_sub_checkbox_changed, self.lineas_b_radio_group, P_LINEAS_B_DESC, [self.lineas_b_desc_edit]))
-        self.derr_pleural_radio_group.buttonClicked.connect(partial(self._on_sub_checkbox_changed, self.derr_pleural_radio_group, P_DERR_PLEURAL_TIPO, [self.derr_pleural_tipo_combo, self.derr_pleural_loc_combo]))
-    
-    # (MÉTODOS cargar_modelo_en_ui y actualizar_modelo COMPLETOS Y ACTUALIZADOS ABAJO)
+    def _construir_visibles(self):
+        for seccion in self.secciones:
+            if not seccion.construida and seccion.a_la_vista():
+                seccion.construir()
 
+    def _cargar_imagen_vexus(self):
+        if self._imagen_cargada:
+            return
+        self._imagen_cargada = True
+        pixmap, texto = _imagen_vexus(DatosEcoTab.TARGET_IMAGE_WIDTH)
+        if pixmap is not None: self.vexus_image_label.setPixmap(pixmap)
+        else: self.vexus_image_label.setText(texto)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._construir_visibles() # Lo que ya está a la vista entra en el primer pintado
+        self._temporizador_visibles.start()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._imagen_cargada:
+            QTimer.singleShot(0, self._cargar_imagen_vexus) # Tras el primer pintado de la pestaña
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._temporizador_visibles.start()
+    
+    @perfilar()
     def cargar_modelo_en_ui(self):
-        for param_key, controls in self.param_controls.items():
-            input_widget_or_container = controls["input"]
-            nv_check = controls["nv_check"]
-            button_group = controls.get("button_group")
-
-            es_no_valorado = self.modelo_informe.param_no_valorado_flags.get(param_key, False)
-            nv_check.setChecked(es_no_valorado)
-            
-            # Habilitar/Deshabilitar el widget de entrada o los componentes del contenedor
-            if button_group: # Para QButtonGroups (FEVI cualitativa, Derrame presente/ausente, etc.)
-                for rb_in_group in button_group.buttons():
-                    rb_in_group.setEnabled(not es_no_valorado)
-            else: # Para QLineEdit, QComboBox, QCheckBox individuales
-                input_widget_or_container.setEnabled(not es_no_valorado)
-            
-            if es_no_valorado: # Si es NV, limpiar/resetear
-                if isinstance(input_widget_or_container, QLineEdit): input_widget_or_container.clear()
-                elif isinstance(input_widget_or_container, QComboBox): input_widget_or_container.setCurrentIndex(0)
-                elif isinstance(input_widget_or_container, QCheckBox) and input_widget_or_container != nv_check : input_widget_or_container.setChecked(False)
-                elif button_group: # FEVI, Derrame presente/ausente, etc.
-                    if param_key == P_FEVI_CUALITATIVA: self.fevi_radio_ninguna.setChecked(True)
-                    elif param_key in [P_DERR_PERIC_PRESENTE, P_LINEAS_B_PRESENTE, P_DERR_PLEURAL_PRESENTE]:
-                         # Asumir que el primer radio es "Ausente" o "No Estimar"
-                         button_group.buttons()[0].setChecked(True)
-                    elif param_key == P_VCI_COLAPSO_RADIO:
-                        self.vci_colapso_radio_no_val.setChecked(True)
-                continue 
-
-            # Cargar valor del modelo si NO es NV
-            if param_key == P_VI_SEPTO: input_widget_or_container.setText(str(self.modelo_informe.medidas_vi.septo_iv_mm or ""))
-            elif param_key == P_VI_PARED_POST: input_widget_or_container.setText(str(self.modelo_informe.medidas_vi.pared_posterior_vi_mm or ""))
-            elif param_key == P_VI_DTDVI: input_widget_or_container.setText(str(self.modelo_informe.medidas_vi.dtdvi_mm or ""))
-            elif param_key == P_FEVI_CUALITATIVA:
-                fevi_cual_val = self.modelo_informe.medidas_vi.fevi_cualitativa
-                found = False
-                for rb in button_group.buttons():
-                    if rb.text() == fevi_cual_val: rb.setChecked(True); found=True; break
-                if not found: self.fevi_radio_ninguna.setChecked(True)
-            elif param_key == P_FEVI_PORCENTAJE: input_widget_or_container.setText(str(self.modelo_informe.medidas_vi.fevi_porcentaje or ""))
-            elif param_key == P_AI_VOL_IDX: input_widget_or_container.setText(str(self.modelo_informe.medidas_auriculas.ai_vol_ml_m2 or ""))
-            elif param_key == P_VD_DIAM_BASAL: input_widget_or_container.setText(str(self.modelo_informe.medidas_vd.vd_diametro_basal_mm or ""))
-            elif param_key == P_VD_TAPSE: input_widget_or_container.setText(str(self.modelo_informe.medidas_vd.tapse_mm or ""))
-            elif param_key == P_VALV_EST_AO: input_widget_or_container.setChecked(self.modelo_informe.valvulopatias.estenosis_aortica_sig)
-            elif param_key == P_VALV_INS_AO: input_widget_or_container.setChecked(self.modelo_informe.valvulopatias.insuficiencia_aortica_sig)
-            elif param_key == P_VALV_INS_MI: input_widget_or_container.setChecked(self.modelo_informe.valvulopatias.insuficiencia_mitral_sig)
-            elif param_key == P_VALV_INS_TR: input_widget_or_container.setChecked(self.modelo_informe.valvulopatias.insuficiencia_tricuspidea_sig)
-            elif param_key == P_PRES_LLEN_E_A: input_widget_or_container.setText(str(self.modelo_informe.presiones_llenado.mitral_e_a_ratio or ""))
-            elif param_key == P_PRES_LLEN_E_SEPTAL: input_widget_or_container.setText(str(self.modelo_informe.presiones_llenado.e_prima_septal_cms or ""))
-            elif param_key == P_PRES_LLEN_E_LATERAL: input_widget_or_container.setText(str(self.modelo_informe.presiones_llenado.e_prima_lateral_cms or ""))
-            elif param_key == P_PRES_LLEN_E_E_PRIMA_RATIO: input_widget_or_container.setText(str(self.modelo_informe.presiones_llenado.e_sobre_e_prima_ratio or ""))
-            elif param_key == P_PRES_LLEN_IT_VEL: input_widget_or_container.setText(str(self.modelo_informe.presiones_llenado.it_velocidad_max_ms or ""))
-            elif param_key == P_DERR_PERIC_PRESENTE:
-                if self.modelo_informe.derrame_pericardico.presente: self.derr_per_radio_presente.setChecked(True)
-                else: self.derr_per_radio_ausente.setChecked(True)
-                self._on_sub_checkbox_changed(self.derr_per_radio_group, P_DERR_PERIC_CUANTIA, [self.derr_per_cuantia_edit])
-            elif param_key == P_DERR_PERIC_CUANTIA: input_widget_or_container.setText(str(self.modelo_informe.derrame_pericardico.cuantia_mm or ""))
-            elif param_key == P_LINEAS_B_PRESENTE:
-                if self.modelo_informe.lineas_b.presentes: self.lineas_b_radio_presente.setChecked(True)
-                else: self.lineas_b_radio_ausente.setChecked(True)
-                self._on_sub_checkbox_changed(self.lineas_b_radio_group, P_LINEAS_B_DESC, [self.lineas_b_desc_edit])
-            elif param_key == P_LINEAS_B_DESC: input_widget_or_container.setText(self.modelo_informe.lineas_b.descripcion_hallazgos or "")
-            elif param_key == P_DERR_PLEURAL_PRESENTE:
-                if self.modelo_informe.derrame_pleural.presente: self.derr_pleural_radio_presente.setChecked(True)
-                else: self.derr_pleural_radio_ausente.setChecked(True)
-                self._on_sub_checkbox_changed(self.derr_pleural_radio_group, P_DERR_PLEURAL_TIPO, [self.derr_pleural_tipo_combo, self.derr_pleural_loc_combo])
-            elif param_key == P_DERR_PLEURAL_TIPO: input_widget_or_container.setCurrentText(self.modelo_informe.derrame_pleural.tipo_cuantificacion or "")
-            elif param_key == P_DERR_PLEURAL_LOC: input_widget_or_container.setCurrentText(self.modelo_informe.derrame_pleural.localizacion or "")
-            elif param_key == P_VCI_DIAM: input_widget_or_container.setText(str(self.modelo_informe.vci.diametro_max_mm or ""))
-            elif param_key == P_VCI_COLAPSO_RADIO:
-                if self.modelo_informe.vci.colapso_mayor_50 is True: self.vci_colapso_radio_mayor.setChecked(True)
-                elif self.modelo_informe.vci.colapso_mayor_50 is False: self.vci_colapso_radio_menor.setChecked(True)
-                else: self.vci_colapso_radio_no_val.setChecked(True)
-            elif param_key == P_VCI_MM_INSPIRACION: input_widget_or_container.setText(str(self.modelo_informe.vci.mm_inspiracion or ""))
-            elif param_key == P_VEXUS_VCI_DILATADA: input_widget_or_container.setChecked(self.modelo_informe.vexus.vci_patologica_vexus)
-            elif param_key == P_VEXUS_VSH: input_widget_or_container.setCurrentText(self.modelo_informe.vexus.patron_vena_suprahepatica or "")
-            elif param_key == P_VEXUS_VP: input_widget_or_container.setCurrentText(self.modelo_informe.vexus.patron_vena_porta or "")
-            elif param_key == P_VEXUS_VIR: input_widget_or_container.setCurrentText(self.modelo_informe.vexus.patron_vena_intrarrenal or "")
+        """Rellena los controles ya creados; las secciones sin construir leen el modelo al construirse."""
+        self._cargar_claves([clave for clave in ENLACES_CAMPOS if clave in self.param_controls])
         log_message("Modelo cargado en UI de DatosEcoTab.", "debug")
 
+    def _cargar_claves(self, claves: List[str]):
+        flags = self.modelo_informe.param_no_valorado_flags
+        with self._pausar_sincronizacion():
+            for param_key in claves:
+                enlace = ENLACES_CAMPOS[param_key]
+                controls = self.param_controls[param_key]
+                es_no_valorado = flags.get(param_key, False)
+                controls["nv_check"].setChecked(es_no_valorado)
+                self._habilitar_control(controls, not es_no_valorado)
+                valor = enlace.valor_nv if es_no_valorado else self._valor_en_modelo(param_key)
+                self._escribir_control(enlace, controls, valor)
+            # Con todos los valores ya cargados, habilitar o no los campos dependientes
+            for clave_maestra in DEPENDIENTES:
+                if clave_maestra in claves:
+                    self._actualizar_dependientes(clave_maestra, limpiar=False)
 
+    @perfilar()
     def actualizar_modelo(self):
-        flags = self.modelo_informe.param_no_valorado_flags
-        for param_key, controls in self.param_controls.items():
-            is_nv = controls["nv_check"].isChecked()
-            flags[param_key] = is_nv
-            input_widget_or_container = controls["input"]
-            button_group = controls.get("button_group")
-
-            if is_nv:
-                # VI
-                if param_key == P_VI_SEPTO: self.modelo_informe.medidas_vi.septo_iv_mm = None
-                elif param_key == P_VI_PARED_POST: self.modelo_informe.medidas_vi.pared_posterior_vi_mm = None
-                elif param_key == P_VI_DTDVI: self.modelo_informe.medidas_vi.dtdvi_mm = None
-                elif param_key == P_FEVI_CUALITATIVA: self.modelo_informe.medidas_vi.fevi_cualitativa = None
-                elif param_key == P_FEVI_PORCENTAJE: self.modelo_informe.medidas_vi.fevi_porcentaje = None
-                elif param_key == P_AI_VOL_IDX: self.modelo_informe.medidas_auriculas.ai_vol_ml_m2 = None
-                elif param_key == P_VD_DIAM_BASAL: self.modelo_informe.medidas_vd.vd_diametro_basal_mm = None
-                elif param_key == P_VD_TAPSE: self.modelo_informe.medidas_vd.tapse_mm = None
-                # Valvulopatías
-                elif param_key == P_VALV_EST_AO: self.modelo_informe.valvulopatias.estenosis_aortica_sig = False
-                elif param_key == P_VALV_INS_AO: self.modelo_informe.valvulopatias.insuficiencia_aortica_sig = False
-                elif param_key == P_VALV_INS_MI: self.modelo_informe.valvulopatias.insuficiencia_mitral_sig = False
-                elif param_key == P_VALV_INS_TR: self.modelo_informe.valvulopatias.insuficiencia_tricuspidea_sig = False
-                # Presiones Llenado
-                elif param_key == P_PRES_LLEN_E_A: self.modelo_informe.presiones_llenado.mitral_e_a_ratio = None
-                elif param_key == P_PRES_LLEN_E_SEPTAL: self.modelo_informe.presiones_llenado.e_prima_septal_cms = None
-                elif param_key == P_PRES_LLEN_E_LATERAL: self.modelo_informe.presiones_llenado.e_prima_lateral_cms = None
-                elif param_key == P_PRES_LLEN_E_E_PRIMA_RATIO: self.modelo_informe.presiones_llenado.e_sobre_e_prima_ratio = None
-                elif param_key == P_PRES_LLEN_IT_VEL: self.modelo_informe.presiones_llenado.it_velocidad_max_ms = None
-                # Derrame Pericárdico
-                elif param_key == P_DERR_PERIC_PRESENTE: self.modelo_informe.derrame_pericardico.presente = False # o None si tu modelo lo permite
-                elif param_key == P_DERR_PERIC_CUANTIA: self.modelo_informe.derrame_pericardico.cuantia_mm = None
-                # Líneas B
-                elif param_key == P_LINEAS_B_PRESENTE: self.modelo_informe.lineas_b.presentes = False # o None
-                elif param_key == P_LINEAS_B_DESC: self.modelo_informe.lineas_b.descripcion_hallazgos = ""
-                # Derrame Pleural
-                elif param_key == P_DERR_PLEURAL_PRESENTE: self.modelo_informe.derrame_pleural.presente = False # o None
-                elif param_key == P_DERR_PLEURAL_TIPO: self.modelo_informe.derrame_pleural.tipo_cuantificacion = None
-                elif param_key == P_DERR_PLEURAL_LOC: self.modelo_informe.derrame_pleural.localizacion = None
-                # VCI
-                elif param_key == P_VCI_DIAM: self.modelo_informe.vci.diametro_max_mm = None
-                elif param_key == P_VCI_COLAPSO_RADIO: self.modelo_informe.vci.colapso_mayor_50 = None
-                elif param_key == P_VCI_MM_INSPIRACION: self.modelo_informe.vci.mm_inspiracion = None
-                # VExUS
-                elif param_key == P_VEXUS_VCI_DILATADA: self.modelo_informe.vexus.vci_patologica_vexus = False
-                elif param_key == P_VEXUS_VSH: self.modelo_informe.vexus.patron_vena_suprahepatica = None
-                elif param_key == P_VEXUS_VP: self.modelo_informe.vexus.patron_vena_porta = None
-                elif param_key == P_VEXUS_VIR: self.modelo_informe.vexus.patron_vena_intrarrenal = None
-                continue
-
-            # Si NO es NV, guardar el valor del widget
-            if param_key == P_VI_SEPTO: self.modelo_informe.medidas_vi.septo_iv_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VI_PARED_POST: self.modelo_informe.medidas_vi.pared_posterior_vi_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VI_DTDVI: self.modelo_informe.medidas_vi.dtdvi_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_FEVI_CUALITATIVA:
-                selected_rb = button_group.checkedButton() if button_group else None
-                self.modelo_informe.medidas_vi.fevi_cualitativa = selected_rb.text() if selected_rb and selected_rb.text() != "No Estimar" else None
-            elif param_key == P_FEVI_PORCENTAJE: self.modelo_informe.medidas_vi.fevi_porcentaje = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_AI_VOL_IDX: self.modelo_informe.medidas_auriculas.ai_vol_ml_m2 = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VD_DIAM_BASAL: self.modelo_informe.medidas_vd.vd_diametro_basal_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VD_TAPSE: self.modelo_informe.medidas_vd.tapse_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VALV_EST_AO: self.modelo_informe.valvulopatias.estenosis_aortica_sig = input_widget_or_container.isChecked()
-            elif param_key == P_VALV_INS_AO: self.modelo_informe.valvulopatias.insuficiencia_aortica_sig = input_widget_or_container.isChecked()
-            elif param_key == P_VALV_INS_MI: self.modelo_informe.valvulopatias.insuficiencia_mitral_sig = input_widget_or_container.isChecked()
-            elif param_key == P_VALV_INS_TR: self.modelo_informe.valvulopatias.insuficiencia_tricuspidea_sig = input_widget_or_container.isChecked()
-            elif param_key == P_PRES_LLEN_E_A: self.modelo_informe.presiones_llenado.mitral_e_a_ratio = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_PRES_LLEN_E_SEPTAL: self.modelo_informe.presiones_llenado.e_prima_septal_cms = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_PRES_LLEN_E_LATERAL: self.modelo_informe.presiones_llenado.e_prima_lateral_cms = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_PRES_LLEN_E_E_PRIMA_RATIO: self.modelo_informe.presiones_llenado.e_sobre_e_prima_ratio = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_PRES_LLEN_IT_VEL: self.modelo_informe.presiones_llenado.it_velocidad_max_ms = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_DERR_PERIC_PRESENTE:
-                self.modelo_informe.derrame_pericardico.presente = self.derr_per_radio_presente.isChecked() if button_group else False
-            elif param_key == P_DERR_PERIC_CUANTIA: self.modelo_informe.derrame_pericardico.cuantia_mm = self._safe_text_to_float(input_widget_or_container) if self.modelo_informe.derrame_pericardico.presente else None
-            elif param_key == P_LINEAS_B_PRESENTE:
-                self.modelo_informe.lineas_b.presentes = self.lineas_b_radio_presente.isChecked() if button_group else False
-            elif param_key == P_LINEAS_B_DESC: self.modelo_informe.lineas_b.descripcion_hallazgos = input_widget_or_container.text().strip() if self.modelo_informe.lineas_b.presentes else ""
-            elif param_key == P_DERR_PLEURAL_PRESENTE:
-                self.modelo_informe.derrame_pleural.presente = self.derr_pleural_radio_presente.isChecked() if button_group else False
-            elif param_key == P_DERR_PLEURAL_TIPO: self.modelo_informe.derrame_pleural.tipo_cuantificacion = input_widget_or_container.currentText() if self.modelo_informe.derrame_pleural.presente and input_widget_or_container.currentText() else None
-            elif param_key == P_DERR_PLEURAL_LOC: self.modelo_informe.derrame_pleural.localizacion = input_widget_or_container.currentText() if self.modelo_informe.derrame_pleural.presente and input_widget_or_container.currentText() else None
-            elif param_key == P_VCI_DIAM: self.modelo_informe.vci.diametro_max_mm = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VCI_COLAPSO_RADIO:
-                if self.vci_colapso_radio_mayor.isChecked(): self.modelo_informe.vci.colapso_mayor_50 = True
-                elif self.vci_colapso_radio_menor.isChecked(): self.modelo_informe.vci.colapso_mayor_50 = False
-                else: self.modelo_informe.vci.colapso_mayor_50 = None # Si "NV Colapso" está activo
-            elif param_key == P_VCI_MM_INSPIRACION: self.modelo_informe.vci.mm_inspiracion = self._safe_text_to_float(input_widget_or_container)
-            elif param_key == P_VEXUS_VCI_DILATADA: self.modelo_informe.vexus.vci_patologica_vexus = input_widget_or_container.isChecked()
-            elif param_key == P_VEXUS_VSH: self.modelo_informe.vexus.patron_vena_suprahepatica = input_widget_or_container.currentText() if input_widget_or_container.currentText() else None
-            elif param_key == P_VEXUS_VP: self.modelo_informe.vexus.patron_vena_porta = input_widget_or_container.currentText() if input_widget_or_container.currentText() else None
-            elif param_key == P_VEXUS_VIR: self.modelo_informe.vexus.patron_vena_intrarrenal = input_widget_or_container.currentText() if input_widget_or_container.currentText() else None
-
-        # log_message(f"Modelo DatosEcoTab actualizado desde UI. Param: {param_key}", "debug") # Mover fuera del bucle
+        for param_key in ENLACES_CAMPOS:
+            if param_key in self.param_controls: # Los de secciones sin construir no se han editado
+                self._guardar_campo(param_key)
         log_message("Modelo DatosEcoTab completamente actualizado desde UI.", "debug")
 
     def set_modelo(self, nuevo_modelo_informe: InformeEcoCompleto):
@@ -2,17 +2,62 @@
 # En caso de incidencias, contactar con alejandro2196vr@gmail.com
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTextEdit, 
-                             QPushButton, QGroupBox, QFormLayout, QLineEdit, QHBoxLayout, QApplication) # Añadido QHBoxLayout, QApplication
-from PyQt5.QtCore import pyqtSlot
-from models import InformeEcoCompleto
+                             QPushButton, QGroupBox, QFormLayout, QLineEdit, QHBoxLayout, QApplication,
+                             QCheckBox, QMessageBox) # Añadido QHBoxLayout, QApplication
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QTimer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import config
+from models import InformeEcoCompleto, instantanea_informe
 from utils.error_handling import log_message
-from logic.report_generator import generar_informe_texto # Necesario para el botón de preview
+from logic.report_generator import GeneradorInformeIncremental # Necesario para el botón de preview
+from logic.evolucion import PuntoEvolucion
+
+class _TrabajadorPreview(QObject):
+    """Genera el informe en un hilo aparte, siempre sobre instantáneas del modelo, y
+    entrega (secuencia, texto) al hilo de la interfaz mediante la señal 'resultado'.
+    Las peticiones que ya tienen otra más reciente detrás no llegan a generarse."""
+    resultado = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="EcoReportPreview")
+        self._generador = GeneradorInformeIncremental() # Solo se usa desde el hilo del executor
+        self._ultima_secuencia = 0
+
+    def solicitar(self, secuencia: int, instantanea: InformeEcoCompleto, previo: Optional[PuntoEvolucion] = None):
+        self._ultima_secuencia = secuencia
+        self._executor.submit(self._generar, secuencia, instantanea, previo)
+
+    def _generar(self, secuencia: int, instantanea: InformeEcoCompleto, previo: Optional[PuntoEvolucion]):
+        if secuencia != self._ultima_secuencia:
+            return # Hay una petición más reciente en cola
+        self.resultado.emit(secuencia, self._generador.generar(instantanea, previo=previo))
+
+    def detener(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
 
 class InformeTab(QWidget):
+    campo_modificado = pyqtSignal(str, object) # 'seccion.campo' y valor nuevo (diario de recuperación)
+
     def __init__(self, modelo_informe: InformeEcoCompleto, main_window_ref, parent=None): # main_window_ref para llamar a _actualizar_modelo_desde_ui
         super().__init__(parent)
         self.modelo_informe = modelo_informe
+        self.estudio_previo: Optional[PuntoEvolucion] = None # Para el párrafo de evolución (lo fija MainWindow)
         self.main_window = main_window_ref # Guardar referencia a la ventana principal
+        self._generador_preview = GeneradorInformeIncremental() # Solo recalcula las secciones modificadas
+        # Previsualización automática (opcional): temporizador de espera + hilo trabajador
+        self._secuencia_preview = 0 # Cada petición numerada; se descartan resultados antiguos
+        self._instantanea_preview = None # Última instantánea enviada (comparte sub-modelos sin cambios)
+        self._trabajador_preview = _TrabajadorPreview(self)
+        self._trabajador_preview.resultado.connect(self._on_preview_listo)
+        self._temporizador_preview = QTimer(self)
+        self._temporizador_preview.setSingleShot(True)
+        self._temporizador_preview.setInterval(config.PREVIEW_RETARDO_MS)
+        self._temporizador_preview.timeout.connect(self._lanzar_preview_en_segundo_plano)
+        self._cargando_modelo = False # Los controles se están rellenando desde el modelo
         self._init_ui()
         self._conectar_senales()
         self.cargar_modelo_en_ui()
@@ -41,6 +86,9 @@ class InformeTab(QWidget):
         botones_layout_h.addWidget(self.btn_generar_preview)
         self.btn_copiar_informe = QPushButton("Copiar Informe al Portapapeles")
         botones_layout_h.addWidget(self.btn_copiar_informe)
+        self.preview_auto_checkbox = QCheckBox("Previsualización automática")
+        self.preview_auto_checkbox.setToolTip("Regenera el informe en segundo plano al modificar los datos")
+        botones_layout_h.addWidget(self.preview_auto_checkbox)
         botones_layout_h.addStretch() # Empuja los botones a la izquierda
         preview_layout_v.addLayout(botones_layout_h) # Añadir layout de botones primero
 
@@ -60,19 +108,35 @@ class InformeTab(QWidget):
         
         self.btn_generar_preview.clicked.connect(self.on_generar_preview_clicked)
         self.btn_copiar_informe.clicked.connect(self.on_copiar_informe_clicked)
+        self.preview_auto_checkbox.toggled.connect(self.programar_preview)
 
     def actualizar_modelo_meta(self): # Actualiza solo los metadatos de esta pestaña
-        self.modelo_informe.realizado_por = self.realizado_por_edit.text().strip()
-        self.modelo_informe.comentarios_adicionales = self.comentarios_edit.toPlainText().strip()
+        if self._cargando_modelo:
+            return # setPlainText emite textChanged
+        modelo = self.modelo_informe
+        anteriores = (modelo.realizado_por, modelo.comentarios_adicionales)
+        modelo.realizado_por = self.realizado_por_edit.text().strip()
+        modelo.comentarios_adicionales = self.comentarios_edit.toPlainText().strip()
+        actuales = (modelo.realizado_por, modelo.comentarios_adicionales)
+        for clave, anterior, actual in zip(("realizado_por", "comentarios_adicionales"), anteriores, actuales):
+            if actual != anterior: # Solo el campo que se ha editado
+                self.campo_modificado.emit(clave, actual)
         log_message("Metadatos de InformeTab actualizados.", "debug")
+        self.programar_preview()
 
     def cargar_modelo_en_ui(self):
-        self.realizado_por_edit.setText(self.modelo_informe.realizado_por or "")
-        self.comentarios_edit.setPlainText(self.modelo_informe.comentarios_adicionales or "")
+        self._cargando_modelo = True
+        try:
+            self.realizado_por_edit.setText(self.modelo_informe.realizado_por or "")
+            self.comentarios_edit.setPlainText(self.modelo_informe.comentarios_adicionales or "")
+        finally:
+            self._cargando_modelo = False
         self.mostrar_informe_texto("Pulse 'Generar/Actualizar Previsualización' para ver el informe.")
 
-    def set_modelo(self, nuevo_modelo_informe: InformeEcoCompleto):
+    def set_modelo(self, nuevo_modelo_informe: InformeEcoCompleto, estudio_previo: Optional[PuntoEvolucion] = None):
         self.modelo_informe = nuevo_modelo_informe
+        self.estudio_previo = estudio_previo
+        self._instantanea_preview = None
         self.cargar_modelo_en_ui()
         log_message("Modelo general recargado en InformeTab.", "debug")
 
@@ -94,7 +158,8 @@ class InformeTab(QWidget):
             # Actualizar los metadatos de esta propia pestaña por si acaso
             self.actualizar_modelo_meta()
 
-            informe_generado = generar_informe_texto(self.modelo_informe)
+            informe_generado = self._generador_preview.generar(self.modelo_informe, previo=self.estudio_previo)
+            self._secuencia_preview += 1 # Cualquier resultado automático en curso queda obsoleto
             self.mostrar_informe_texto(informe_generado)
             log_message("Previsualización del informe generada/actualizada.", "debug")
         except Exception as e:
@@ -102,6 +167,37 @@ class InformeTab(QWidget):
             QMessageBox.critical(self, "Error", f"No se pudo generar la previsualización: {e}")
             self.mostrar_informe_texto(f"Error al generar previsualización:\n{e}")
 
+    @pyqtSlot()
+    def programar_preview(self):
+        """Reinicia la espera de la previsualización automática (si está activada).
+        Se llama en cada cambio del modelo; solo se genera cuando los cambios se detienen."""
+        if self.preview_auto_checkbox.isChecked():
+            self._temporizador_preview.start()
+
+    @pyqtSlot()
+    def _lanzar_preview_en_segundo_plano(self):
+        # --- INICIO: Marcador para localización de errores (Preview Automática) ---
+        try:
+            self._instantanea_preview = instantanea_informe(self.modelo_informe, self._instantanea_preview)
+            self._secuencia_preview += 1
+            self._trabajador_preview.solicitar(self._secuencia_preview, self._instantanea_preview, self.estudio_previo)
+        except Exception as e:
+            log_message(f"Error preparando la previsualización automática: {e}", "error", exc_info=True)
+        # --- FIN: Marcador para localización de errores (Preview Automática) ---
+
+    @pyqtSlot(int, str)
+    def _on_preview_listo(self, secuencia: int, texto: str):
+        if secuencia != self._secuencia_preview:
+            return # Resultado de un estado del modelo ya superado
+        barra = self.texto_informe_display.verticalScrollBar()
+        posicion = barra.value()
+        self.mostrar_informe_texto(texto)
+        barra.setValue(posicion) # Mantener la zona que se estaba leyendo
+
+    def detener_preview(self):
+        self._temporizador_preview.stop()
+        self._trabajador_preview.detener()
+
     @pyqtSlot()
     def on_copiar_informe_clicked(self):
         try:
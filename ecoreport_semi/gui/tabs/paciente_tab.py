@@ -4,20 +4,23 @@
 """
 Pestaña para los datos del paciente.
 """
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QFormLayout, QLineEdit, QDateEdit, QLabel
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QFormLayout, QLineEdit, QDateEdit, QLabel, QComboBox
 from PyQt5.QtCore import pyqtSignal, QDate # Import QDate
 from datetime import datetime
 
 from models import DatosPaciente # El sub-modelo específico para esta pestaña
+from rangos_referencia import SEXO_MASCULINO, SEXO_FEMENINO
 from utils.error_handling import log_message
 
 class PacienteTab(QWidget):
     # Señal emitida cuando los datos de esta pestaña cambian y deben reflejarse en el modelo
     datos_paciente_modificados = pyqtSignal(DatosPaciente)
+    campo_modificado = pyqtSignal(str, object) # 'paciente.campo' y valor nuevo (diario de recuperación)
 
     def __init__(self, modelo_paciente: DatosPaciente, parent=None):
         super().__init__(parent)
         self.modelo = modelo_paciente
+        self._cargando_modelo = False # Los controles se están rellenando desde el modelo
         self._init_ui()
         self._conectar_senales()
         self.cargar_modelo_en_ui() # Cargar datos iniciales si el modelo ya tiene
@@ -40,6 +43,13 @@ class PacienteTab(QWidget):
             self.apellidos_edit = QLineEdit()
             form_layout.addRow("Apellidos:", self.apellidos_edit)
 
+            # Sexo: determina los valores de referencia (HVI). Vacío = masculinos.
+            self.sexo_combo = QComboBox()
+            self.sexo_combo.addItem("No especificado", "")
+            self.sexo_combo.addItem("Hombre", SEXO_MASCULINO)
+            self.sexo_combo.addItem("Mujer", SEXO_FEMENINO)
+            form_layout.addRow("Sexo:", self.sexo_combo)
+
             self.fecha_estudio_edit = QDateEdit()
             self.fecha_estudio_edit.setCalendarPopup(True)
             self.fecha_estudio_edit.setDate(QDate.currentDate()) # Fecha actual por defecto
@@ -67,6 +77,7 @@ class PacienteTab(QWidget):
         self.nhc_edit.editingFinished.connect(self.actualizar_modelo)
         self.nombre_edit.editingFinished.connect(self.actualizar_modelo)
         self.apellidos_edit.editingFinished.connect(self.actualizar_modelo)
+        self.sexo_combo.currentIndexChanged.connect(self.actualizar_modelo)
         self.fecha_estudio_edit.dateChanged.connect(self.actualizar_modelo)
 
     def set_modelo(self, nuevo_modelo_paciente: DatosPaciente):
@@ -83,10 +94,12 @@ class PacienteTab(QWidget):
     def cargar_modelo_en_ui(self):
         """Carga los datos del modelo en los widgets de la UI."""
         # --- INICIO: Marcador para localización de errores (Cargar Modelo UI PacienteTab) ---
+        self._cargando_modelo = True # setDate y setCurrentIndex emiten sus señales
         try:
             self.nhc_edit.setText(self.modelo.nhc or "")
             self.nombre_edit.setText(self.modelo.nombre or "")
             self.apellidos_edit.setText(self.modelo.apellidos or "")
+            self.sexo_combo.setCurrentIndex(max(0, self.sexo_combo.findData(self.modelo.sexo or "")))
             
             # Para QDateEdit, convertir datetime a QDate
             if isinstance(self.modelo.fecha_estudio, datetime):
@@ -99,19 +112,33 @@ class PacienteTab(QWidget):
 
         except Exception as e:
             log_message(f"Error cargando modelo en UI de PacienteTab: {e}", "error", exc_info=True)
+        finally:
+            self._cargando_modelo = False
         # --- FIN: Marcador para localización de errores (Cargar Modelo UI PacienteTab) ---
 
     def actualizar_modelo(self):
         """Actualiza el objeto self.modelo con los datos de la UI."""
+        if self._cargando_modelo:
+            return
         # --- INICIO: Marcador para localización de errores (Actualizar Modelo PacienteTab) ---
         try:
+            campos = ("nhc", "nombre", "apellidos", "sexo", "fecha_estudio")
+            anteriores = [getattr(self.modelo, campo) for campo in campos]
             self.modelo.nhc = self.nhc_edit.text().strip()
             self.modelo.nombre = self.nombre_edit.text().strip()
             self.modelo.apellidos = self.apellidos_edit.text().strip()
+            self.modelo.sexo = self.sexo_combo.currentData() or ""
             
-            # Convertir QDate a datetime.date o datetime
+            # Convertir QDate a datetime; si el día no cambia se conserva la hora (estudios importados)
             qdate_obj = self.fecha_estudio_edit.date()
-            self.modelo.fecha_estudio = datetime(qdate_obj.year(), qdate_obj.month(), qdate_obj.day())
+            fecha = self.modelo.fecha_estudio
+            if not (isinstance(fecha, datetime) and (fecha.year, fecha.month, fecha.day) == (qdate_obj.year(), qdate_obj.month(), qdate_obj.day())):
+                hora = fecha.time() if isinstance(fecha, datetime) else datetime.min.time()
+                self.modelo.fecha_estudio = datetime.combine(qdate_obj.toPyDate(), hora)
+
+            for campo, anterior in zip(campos, anteriores):
+                if getattr(self.modelo, campo) != anterior: # Solo el campo que se ha editado
+                    self.campo_modificado.emit(f"paciente.{campo}", getattr(self.modelo, campo))
 
             log_message(f"Modelo PacienteTab actualizado: NHC={self.modelo.nhc}", "debug")
             self.datos_paciente_modificados.emit(self.modelo) # Emitir señal si es necesario
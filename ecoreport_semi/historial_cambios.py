@@ -0,0 +1,110 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Historial de deshacer/rehacer del estudio en curso.
+
+Cada paso es una instantánea de solo lectura del informe (models.instantanea_informe)
+tomada a partir de la del paso anterior, así que comparte con ella los sub-modelos que no
+han cambiado (por versión) y el dict de flags si es igual: cada paso ocupa lo que cambió
+más el objeto InformeEcoCompleto que los agrupa. Deshacer y rehacer solo mueven el índice
+del paso actual; el informe modificable se obtiene con models.informe_desde_instantanea.
+
+Al registrar un paso después de deshacer, los pasos que se podían rehacer se descartan.
+cambios_entre() da los campos que difieren entre dos estados, para anotar en el diario de
+recuperación solo lo que cambia al deshacer o rehacer.
+"""
+from dataclasses import fields, is_dataclass
+from typing import Any, List, Optional, Tuple
+
+from models import InformeEcoCompleto, informe_desde_instantanea, instantanea_informe
+
+
+def _mismo_contenido(a: InformeEcoCompleto, b: InformeEcoCompleto) -> bool:
+    """Con 'b' tomada a partir de 'a', los sub-modelos iguales son el mismo objeto."""
+    for f in fields(InformeEcoCompleto):
+        valor_a, valor_b = getattr(a, f.name), getattr(b, f.name)
+        if valor_a is not valor_b and (is_dataclass(valor_a) or isinstance(valor_a, dict) or valor_a != valor_b):
+            return False
+    return True
+
+
+def cambios_entre(anterior: InformeEcoCompleto, nuevo: InformeEcoCompleto) -> List[Tuple[str, Any]]:
+    """Campos de 'nuevo' distintos de 'anterior' como (clave, valor), con las claves del
+    diario de recuperación: 'seccion.campo', 'campo' o 'param_no_valorado_flags.P_...' (False
+    si el flag deja de estar marcado). Los sub-modelos con la misma versión tienen el mismo
+    contenido y no se recorren."""
+    cambios = []
+    for f in fields(InformeEcoCompleto):
+        valor_a, valor_b = getattr(anterior, f.name), getattr(nuevo, f.name)
+        if is_dataclass(valor_b):
+            if valor_a is valor_b or valor_a.version == valor_b.version:
+                continue
+            for campo in fields(valor_b):
+                a, b = getattr(valor_a, campo.name), getattr(valor_b, campo.name)
+                if type(a) is not type(b) or a != b:
+                    cambios.append((f"{f.name}.{campo.name}", b))
+        elif isinstance(valor_b, dict):
+            for clave in sorted(valor_a.keys() | valor_b.keys()):
+                if bool(valor_a.get(clave)) != bool(valor_b.get(clave)):
+                    cambios.append((f"{f.name}.{clave}", bool(valor_b.get(clave))))
+        elif valor_a != valor_b:
+            cambios.append((f.name, valor_b))
+    return cambios
+
+
+class HistorialCambios:
+    """Pasos del estudio en curso. registrar() se llama después de cada modificación."""
+
+    def __init__(self, informe: Optional[InformeEcoCompleto] = None):
+        self._pasos: List[InformeEcoCompleto] = []
+        self._agrupaciones: List[Optional[str]] = []
+        self._indice = -1
+        self.reiniciar(informe or InformeEcoCompleto())
+
+    def reiniciar(self, informe: InformeEcoCompleto):
+        """Empieza el historial de otro estudio (nuevo, abierto o recuperado)."""
+        self._pasos = [instantanea_informe(informe)]
+        self._agrupaciones = [None]
+        self._indice = 0
+
+    def registrar(self, informe: InformeEcoCompleto, agrupar: Optional[str] = None) -> bool:
+        """Añade un paso con el estado actual de 'informe' si difiere del paso actual.
+        Los pasos seguidos con el mismo 'agrupar' (p. ej. el campo de texto que se está
+        escribiendo) se funden en uno. Devuelve si el historial cambió."""
+        actual = self._pasos[self._indice]
+        instantanea = instantanea_informe(informe, actual)
+        if _mismo_contenido(actual, instantanea):
+            return False
+        del self._pasos[self._indice + 1:], self._agrupaciones[self._indice + 1:]
+        if agrupar is not None and self._indice > 0 and self._agrupaciones[self._indice] == agrupar:
+            self._pasos[self._indice] = instantanea
+            return True
+        self._pasos.append(instantanea)
+        self._agrupaciones.append(agrupar)
+        self._indice += 1
+        return True
+
+    def puede_deshacer(self) -> bool:
+        return self._indice > 0
+
+    def puede_rehacer(self) -> bool:
+        return self._indice < len(self._pasos) - 1
+
+    def deshacer(self) -> Optional[InformeEcoCompleto]:
+        """Informe modificable con el estado del paso anterior, o None si no hay."""
+        if not self.puede_deshacer():
+            return None
+        self._indice -= 1
+        self._agrupaciones[self._indice] = None # Lo que se escriba después es otro paso
+        return informe_desde_instantanea(self._pasos[self._indice])
+
+    def rehacer(self) -> Optional[InformeEcoCompleto]:
+        if not self.puede_rehacer():
+            return None
+        self._indice += 1
+        self._agrupaciones[self._indice] = None
+        return informe_desde_instantanea(self._pasos[self._indice])
+
+    def __len__(self) -> int:
+        return len(self._pasos)
@@ -0,0 +1,404 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Importación de medidas desde informes estructurados DICOM SR (ecógrafos, estaciones de
+trabajo, PACS), sin dependencias externas.
+
+Solo se lee lo que hace falta:
+- de cada fichero, primero la meta-información (grupo 0002). Si la clase SOP no es de SR
+  (imágenes, multiframes, DICOMDIR...) el fichero se descarta ahí, sea cual sea su tamaño;
+- del SR, los elementos del paciente y del estudio y el árbol de contenido (0040,A730).
+  Los demás elementos se saltan con seek sin leer su valor y la lectura termina al pasar
+  el árbol de contenido, así que los datos de píxel y los elementos grandes del final
+  no se tocan.
+Se aceptan las sintaxis de transferencia little endian explícita e implícita (también
+con deflate) y secuencias e ítems de longitud definida o indefinida.
+
+De cada SR se toman:
+- (0010,0020) NHC, (0010,0010) apellidos^nombre y (0010,0040) sexo;
+- la fecha del estudio (0008,0020/0030) o, si falta, la del contenido (0008,0023/0033);
+- realizado_por del primer ítem PNAME "Person Observer Name" (DCM 121008) o, si no hay,
+  de OperatorsName (0008,1070);
+- cada ítem NUM cuyo concepto (código o, si no tiene correspondencia, CodeMeaning) esté en
+  las correspondencias (medidas_importadas.py), convertido desde su unidad UCUM. Si un
+  campo aparece varias veces, se queda el último valor.
+El id_informe es "SR-<SOP Instance UID>", de modo que importar dos veces el mismo SR
+sustituye el estudio en el archivo en lugar de duplicarlo.
+
+importar_sr recibe un fichero o un directorio (con sus subdirectorios) y reparte los
+ficheros entre procesos con un número acotado de tareas en vuelo. Los problemas de un
+fichero se registran como incidencias y la importación sigue con el siguiente.
+"""
+import os
+import struct
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from medidas_importadas import (CAMPOS_IMPORTABLES, CORRESPONDENCIAS_MEDIDAS, ErrorMapeo, buscar_campo,
+                                convertir_unidad, valor_campo)
+from models import InformeEcoCompleto, informe_desde_dict
+from utils.error_handling import log_message
+
+PREFIJO_CLASE_SR = "1.2.840.10008.5.1.4.1.1.88."
+SINTAXIS_IMPLICITA = "1.2.840.10008.1.2"
+SINTAXIS_DEFLATE = "1.2.840.10008.1.2.1.99"
+SINTAXIS_BIG_ENDIAN = "1.2.840.10008.1.2.2"
+TAREAS_EN_VUELO_POR_PROCESO = 4
+
+IncidenciaDICOM = namedtuple("IncidenciaDICOM", "ruta descripcion")
+
+# --- Tags (grupo << 16 | elemento) ---
+_SOP_CLASE_META = 0x00020002
+_SINTAXIS_META = 0x00020010
+_SOP_CLASE = 0x00080016
+_SOP_INSTANCIA = 0x00080018
+_FECHA_ESTUDIO = 0x00080020
+_FECHA_CONTENIDO = 0x00080023
+_HORA_ESTUDIO = 0x00080030
+_HORA_CONTENIDO = 0x00080033
+_MODALIDAD = 0x00080060
+_CODIGO = 0x00080100
+_SIGNIFICADO = 0x00080104
+_OPERADOR = 0x00081070
+_NOMBRE_PACIENTE = 0x00100010
+_ID_PACIENTE = 0x00100020
+_SEXO = 0x00100040
+_UNIDADES = 0x004008EA
+_TIPO_VALOR = 0x0040A040
+_CONCEPTO = 0x0040A043
+_NOMBRE_PERSONA = 0x0040A123
+_VALORES_MEDIDOS = 0x0040A300
+_VALOR_NUMERICO = 0x0040A30A
+_CONTENIDO = 0x0040A730
+
+_ITEM = 0xFFFEE000
+_FIN_ITEM = 0xFFFEE00D
+_FIN_SECUENCIA = 0xFFFEE0DD
+_INDEFINIDA = 0xFFFFFFFF
+
+# Secuencias que se recorren y elementos cuyo valor se lee; todo lo demás se salta
+_SECUENCIAS = frozenset((_CONCEPTO, _VALORES_MEDIDOS, _UNIDADES, _CONTENIDO))
+_VALORES = frozenset((_SOP_CLASE, _SOP_INSTANCIA, _FECHA_ESTUDIO, _FECHA_CONTENIDO, _HORA_ESTUDIO,
+                      _HORA_CONTENIDO, _MODALIDAD, _CODIGO, _SIGNIFICADO, _OPERADOR, _NOMBRE_PACIENTE,
+                      _ID_PACIENTE, _SEXO, _TIPO_VALOR, _NOMBRE_PERSONA, _VALOR_NUMERICO))
+# VR explícitos con dos bytes reservados y longitud de 4 bytes
+_VR_LONGITUD_LARGA = frozenset((b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN",
+                                b"UR", b"UT", b"UV"))
+_CODIGO_OBSERVADOR = "121008" # DCM: Person Observer Name
+
+_CABECERA_IMPLICITA = struct.Struct("<HHI")
+_CABECERA_EXPLICITA = struct.Struct("<HH2sH")
+_LONGITUD_LARGA = struct.Struct("<I")
+
+
+class ErrorDICOM(ValueError):
+    pass
+
+
+class NoEsSR(ErrorDICOM):
+    """El fichero no es DICOM o no es un informe estructurado."""
+
+
+# --- Lectura perezosa de elementos ---
+
+class _Lector:
+    __slots__ = ("f", "explicita")
+
+    def __init__(self, f, explicita: bool):
+        self.f = f
+        self.explicita = explicita
+
+    def cabecera(self) -> Optional[Tuple[int, bytes, int]]:
+        """(tag, VR, longitud) del siguiente elemento, o None al final del fichero."""
+        datos = self.f.read(8)
+        if len(datos) < 8:
+            if datos:
+                raise ErrorDICOM("fichero truncado")
+            return None
+        grupo, elemento, longitud = _CABECERA_IMPLICITA.unpack(datos)
+        if not self.explicita or grupo == 0xFFFE: # Los ítems y delimitadores nunca llevan VR
+            return grupo << 16 | elemento, b"", longitud
+        _, _, vr, longitud = _CABECERA_EXPLICITA.unpack(datos)
+        if vr in _VR_LONGITUD_LARGA:
+            extra = self.f.read(4)
+            if len(extra) < 4:
+                raise ErrorDICOM("fichero truncado")
+            longitud = _LONGITUD_LARGA.unpack(extra)[0]
+        return grupo << 16 | elemento, vr, longitud
+
+
+def _leer_conjunto(lector: _Lector, fin: Optional[int], ultimo_tag: Optional[int] = None) -> Dict[int, object]:
+    """Elementos de un conjunto de datos hasta la posición 'fin' o, si es None, hasta el
+    delimitador de ítem. En el nivel superior ('ultimo_tag') la lectura termina en el
+    primer elemento posterior a ese tag o al final del fichero."""
+    datos = {}
+    f = lector.f
+    while fin is None or f.tell() < fin:
+        cabecera = lector.cabecera()
+        if cabecera is None:
+            if ultimo_tag is None:
+                raise ErrorDICOM("fichero truncado dentro de un ítem")
+            break
+        tag, vr, longitud = cabecera
+        if tag == _FIN_ITEM or (ultimo_tag is not None and tag > ultimo_tag):
+            break
+        if tag in _SECUENCIAS:
+            datos[tag] = _leer_secuencia(lector, longitud)
+        elif longitud == _INDEFINIDA:
+            # Secuencia que no interesa o píxeles encapsulados. Con VR UN, el contenido va en implícito
+            _saltar_secuencia(_Lector(f, False) if vr == b"UN" else lector)
+        elif tag in _VALORES:
+            datos[tag] = f.read(longitud)
+        else:
+            f.seek(longitud, 1)
+    return datos
+
+
+def _leer_secuencia(lector: _Lector, longitud: int) -> List[Dict[int, object]]:
+    f = lector.f
+    fin = None if longitud == _INDEFINIDA else f.tell() + longitud
+    items = []
+    while fin is None or f.tell() < fin:
+        cabecera = lector.cabecera()
+        if cabecera is None:
+            raise ErrorDICOM("fichero truncado dentro de una secuencia")
+        tag, _, longitud_item = cabecera
+        if tag == _FIN_SECUENCIA:
+            break
+        if tag != _ITEM:
+            raise ErrorDICOM(f"se esperaba un ítem de secuencia y se encontró ({tag >> 16:04X},{tag & 0xFFFF:04X})")
+        items.append(_leer_conjunto(lector, None if longitud_item == _INDEFINIDA else f.tell() + longitud_item))
+    return items
+
+
+def _saltar_secuencia(lector: _Lector):
+    """Salta un elemento de longitud indefinida sin leer los valores de sus ítems."""
+    while True:
+        cabecera = lector.cabecera()
+        if cabecera is None:
+            raise ErrorDICOM("fichero truncado dentro de una secuencia")
+        tag, _, longitud = cabecera
+        if tag == _FIN_SECUENCIA:
+            return
+        if longitud == _INDEFINIDA:
+            _leer_conjunto(lector, None) # Ítem de longitud indefinida: se recorre hasta su delimitador
+        else:
+            lector.f.seek(longitud, 1)
+
+
+def _texto(valor) -> str:
+    if not valor:
+        return ""
+    try:
+        texto = valor.decode("utf-8")
+    except UnicodeDecodeError:
+        texto = valor.decode("latin-1")
+    return texto.strip(" \0")
+
+
+def _leer_meta(f) -> Dict[int, str]:
+    """Meta-información del fichero (grupo 0002, siempre little endian explícito). Deja el
+    fichero al principio del conjunto de datos."""
+    prefijo = f.read(132)
+    if len(prefijo) < 132 or prefijo[128:] != b"DICM":
+        raise NoEsSR("no es un fichero DICOM (falta el prefijo DICM)")
+    lector = _Lector(f, True)
+    meta = {}
+    while True:
+        posicion = f.tell()
+        cabecera = lector.cabecera()
+        if cabecera is None or cabecera[0] >> 16 != 0x0002:
+            f.seek(posicion)
+            return meta
+        tag, _, longitud = cabecera
+        meta[tag] = _texto(f.read(longitud))
+
+
+def _leer_elementos_sr(ruta: str) -> Dict[int, object]:
+    """Elementos del SR que usa la importación: paciente, estudio y árbol de contenido."""
+    with open(ruta, "rb") as f:
+        meta = _leer_meta(f)
+        clase = meta.get(_SOP_CLASE_META, "")
+        if clase and not clase.startswith(PREFIJO_CLASE_SR):
+            raise NoEsSR(f"la clase SOP {clase} no es un informe estructurado")
+        sintaxis = meta.get(_SINTAXIS_META, "")
+        if sintaxis == SINTAXIS_BIG_ENDIAN:
+            raise ErrorDICOM("sintaxis de transferencia big endian no soportada")
+        if sintaxis == SINTAXIS_DEFLATE:
+            # Solo se comprimen SR pequeños: se descomprime el conjunto de datos entero
+            try:
+                lector = _Lector(BytesIO(zlib.decompress(f.read(), -zlib.MAX_WBITS)), True)
+            except zlib.error as e:
+                raise ErrorDICOM(f"fichero truncado o dañado ({e})") from None
+        else:
+            # El resto de sintaxis (JPEG, RLE...) solo cambian la codificación de los píxeles
+            lector = _Lector(f, sintaxis != SINTAXIS_IMPLICITA)
+        datos = _leer_conjunto(lector, None, ultimo_tag=_CONTENIDO)
+    if not clase and _texto(datos.get(_MODALIDAD)) != "SR" and \
+            not _texto(datos.get(_SOP_CLASE)).startswith(PREFIJO_CLASE_SR):
+        raise NoEsSR("el fichero no es un informe estructurado")
+    if _CONTENIDO not in datos:
+        # También cuando el fichero termina dentro de un elemento que se ha saltado con seek
+        raise ErrorDICOM("SR sin árbol de contenido (0040,A730): fichero truncado o incompleto")
+    return datos
+
+
+# --- Interpretación del árbol de contenido ---
+
+def _fecha_dicom(fecha: str, hora: str) -> Optional[datetime]:
+    """Fecha DA (AAAAMMDD) y hora TM (HH[MM[SS[.F]]]) de DICOM."""
+    fecha = fecha.replace(".", "").replace("-", "")
+    hora = hora.split(".", 1)[0].replace(":", "")
+    if len(fecha) != 8 or not fecha.isdigit() or not (hora.isdigit() or not hora):
+        return None
+    try:
+        return datetime.strptime(fecha + hora[:6].ljust(6, "0"), "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+
+def _nombre_persona(valor: str) -> Tuple[str, str]:
+    """(apellidos, nombre) de un valor PN: 'Apellidos^Nombre^...' (solo el grupo alfabético)."""
+    componentes = valor.split("=", 1)[0].split("^")
+    return componentes[0].strip(), (componentes[1].strip() if len(componentes) > 1 else "")
+
+
+def _primero(items) -> Dict[int, object]:
+    return items[0] if items else {}
+
+
+def _recorrer(items, medidas: list, observadores: list):
+    """Ítems NUM (concepto, valor medido) y nombres de observador, en orden del documento."""
+    for item in items:
+        tipo = _texto(item.get(_TIPO_VALOR))
+        concepto = _primero(item.get(_CONCEPTO))
+        if tipo == "NUM":
+            medidas.append((concepto, _primero(item.get(_VALORES_MEDIDOS))))
+        elif tipo == "PNAME" and _texto(concepto.get(_CODIGO)) == _CODIGO_OBSERVADOR:
+            observadores.append(_texto(item.get(_NOMBRE_PERSONA)))
+        if _CONTENIDO in item:
+            _recorrer(item[_CONTENIDO], medidas, observadores)
+
+
+def _medida(concepto: dict, valor_medido: dict, correspondencias: Dict[str, str]) -> Optional[Tuple[str, float]]:
+    codigo, significado = _texto(concepto.get(_CODIGO)), _texto(concepto.get(_SIGNIFICADO))
+    campo = buscar_campo(correspondencias, codigo, significado)
+    if campo is None or not valor_medido: # Sin correspondencia, o NUM sin valor
+        return None
+    texto = _texto(valor_medido.get(_VALOR_NUMERICO)).split("\\", 1)[0].strip()
+    try:
+        numero = float(texto)
+    except ValueError:
+        raise ErrorMapeo(f"{significado or codigo}: valor no numérico '{texto}'") from None
+    unidad = _texto(_primero(valor_medido.get(_UNIDADES)).get(_CODIGO))
+    try:
+        return campo, convertir_unidad(numero, unidad, campo)
+    except ErrorMapeo as e:
+        raise ErrorMapeo(f"{significado or codigo}: {e}") from None
+
+
+def leer_sr(ruta: str, correspondencias: Optional[Dict[str, str]] = None,
+            avisar: Optional[Callable[[str], None]] = None) -> InformeEcoCompleto:
+    """InformeEcoCompleto con las medidas de un fichero DICOM SR. Lanza NoEsSR si el
+    fichero no es un SR y ErrorDICOM si no se puede leer o no tiene medidas reconocidas.
+    Las medidas con problemas (unidad desconocida...) se omiten y se pasan a 'avisar'."""
+    correspondencias = correspondencias or CORRESPONDENCIAS_MEDIDAS
+    datos_sr = _leer_elementos_sr(ruta)
+    medidas, observadores = [], []
+    _recorrer(datos_sr.get(_CONTENIDO) or [], medidas, observadores)
+
+    uid = _texto(datos_sr.get(_SOP_INSTANCIA))
+    datos = {"id_informe": f"SR-{uid}" if uid else None}
+    for concepto, valor_medido in medidas:
+        try:
+            medida = _medida(concepto, valor_medido, correspondencias)
+        except ErrorMapeo as e:
+            if avisar:
+                avisar(str(e))
+            continue
+        if medida is not None:
+            campo, numero = medida
+            datos[campo] = valor_campo(campo, numero)
+    if not any(clave in CAMPOS_IMPORTABLES for clave in datos):
+        raise ErrorDICOM("ninguna medida reconocida")
+
+    datos["paciente.nhc"] = _texto(datos_sr.get(_ID_PACIENTE))
+    datos["paciente.apellidos"], datos["paciente.nombre"] = _nombre_persona(_texto(datos_sr.get(_NOMBRE_PACIENTE)))
+    sexo = _texto(datos_sr.get(_SEXO)).upper()
+    datos["paciente.sexo"] = sexo if sexo in ("M", "F") else ""
+    fecha = _fecha_dicom(_texto(datos_sr.get(_FECHA_ESTUDIO)), _texto(datos_sr.get(_HORA_ESTUDIO))) or \
+        _fecha_dicom(_texto(datos_sr.get(_FECHA_CONTENIDO)), _texto(datos_sr.get(_HORA_CONTENIDO)))
+    if fecha is not None:
+        datos["paciente.fecha_estudio"] = fecha
+    observador = next((o for o in observadores if o), "") or _texto(datos_sr.get(_OPERADOR)).split("\\", 1)[0]
+    if observador:
+        apellidos, nombre = _nombre_persona(observador)
+        datos["realizado_por"] = " ".join(p for p in (nombre, apellidos) if p)
+    return informe_desde_dict(datos)
+
+
+# --- Importación de ficheros y directorios ---
+
+def _importar_fichero(ruta: str, correspondencias: Dict[str, str],
+                      exigir_sr: bool) -> Tuple[Optional[InformeEcoCompleto], List[str]]:
+    """(informe o None, incidencias) de un fichero. En un directorio, los ficheros que no
+    son SR (imágenes del mismo estudio, DICOMDIR, miniaturas...) se omiten sin incidencia."""
+    avisos = []
+    # --- INICIO: Marcador para localización de errores (Fichero DICOM SR) ---
+    try:
+        informe = leer_sr(ruta, correspondencias, avisos.append)
+    except NoEsSR as e:
+        return None, [str(e)] if exigir_sr else []
+    except (ErrorDICOM, ValueError, TypeError, OSError, RecursionError) as e:
+        return None, avisos + [str(e)]
+    # --- FIN: Marcador para localización de errores (Fichero DICOM SR) ---
+    return informe, avisos
+
+
+def _ficheros(ruta: str) -> Iterator[Tuple[str, bool]]:
+    if not os.path.isdir(ruta):
+        yield ruta, True
+        return
+    for raiz, directorios, nombres in os.walk(ruta):
+        directorios.sort()
+        for nombre in sorted(nombres):
+            yield os.path.join(raiz, nombre), False
+
+
+def importar_sr(ruta: str, correspondencias: Optional[Dict[str, str]] = None, procesos: int = 1,
+                incidencias: Optional[Callable[[IncidenciaDICOM], None]] = None) -> Iterator[InformeEcoCompleto]:
+    """Genera un InformeEcoCompleto por cada SR con medidas reconocidas de 'ruta' (un
+    fichero o un directorio), en el orden de los ficheros. Cada incidencia se registra en
+    el log y, si se indica, se pasa a 'incidencias'."""
+    correspondencias = correspondencias or CORRESPONDENCIAS_MEDIDAS
+
+    def _resultados():
+        if procesos <= 1:
+            for ruta_fichero, exigir_sr in _ficheros(ruta):
+                yield ruta_fichero, _importar_fichero(ruta_fichero, correspondencias, exigir_sr)
+            return
+        # Ventana acotada: el recorrido del directorio no se adelanta más de lo necesario
+        max_en_vuelo = procesos * TAREAS_EN_VUELO_POR_PROCESO
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            pendientes = deque()
+            for ruta_fichero, exigir_sr in _ficheros(ruta):
+                pendientes.append((ruta_fichero, pool.submit(_importar_fichero, ruta_fichero, correspondencias, exigir_sr)))
+                if len(pendientes) >= max_en_vuelo:
+                    ruta_lista, futuro = pendientes.popleft()
+                    yield ruta_lista, futuro.result()
+            while pendientes:
+                ruta_lista, futuro = pendientes.popleft()
+                yield ruta_lista, futuro.result()
+
+    for ruta_fichero, (informe, avisos) in _resultados():
+        for descripcion in avisos:
+            log_message(f"DICOM SR '{ruta_fichero}': {descripcion}", "warning")
+            if incidencias:
+                incidencias(IncidenciaDICOM(ruta_fichero, descripcion))
+        if informe is not None:
+            yield informe
@@ -0,0 +1,247 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Importación de medidas desde ficheros HL7 v2 con mensajes ORU^R01 (ecógrafos, PACS).
+
+El fichero se lee por bloques de TAMANO_LECTURA bytes y se parte en segmentos (fin de
+segmento CR, LF o CRLF; los caracteres de entramado MLLP se descartan). Un mensaje
+empieza en cada segmento MSH y solo se guardan en memoria sus segmentos, así que la
+memoria no depende del número de mensajes del fichero. Cada segmento se decodifica como
+UTF-8 y, si no lo es, como ISO-8859-1.
+
+De cada mensaje ORU se toman:
+- PID-3 (NHC), PID-5 (apellidos^nombre) y PID-8 (sexo);
+- la fecha del estudio de OBR-7 (o, si falta, de OBX-14 o MSH-7);
+- realizado_por del primer OBX-16 (observador responsable) con nombre;
+- cada OBX cuyo identificador (OBX-3: código o texto) esté en las correspondencias
+  (medidas_importadas.py) se convierte a la unidad del campo del modelo según OBX-6 y se asigna. Si un campo llega
+  varias veces, se queda el último valor. Los OBX con estado X, D o W se ignoran, igual
+  que los códigos sin correspondencia (los equipos envían muchas medidas que el informe
+  no usa).
+El id_informe es "HL7-<MSH-3>-<MSH-10>", de modo que importar dos veces el mismo fichero
+sustituye los estudios en el archivo en lugar de duplicarlos.
+
+Los problemas de un mensaje (tipo distinto de ORU, unidad desconocida, valor no numérico,
+ninguna medida reconocida...) se registran como incidencias y la lectura sigue con el
+siguiente; un OBX erróneo no invalida el resto del mensaje.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from medidas_importadas import (CAMPOS_IMPORTABLES, CORRESPONDENCIAS_MEDIDAS, ErrorMapeo, buscar_campo,
+                                convertir_unidad, valor_campo)
+from models import InformeEcoCompleto, informe_desde_dict
+from utils.error_handling import log_message
+
+TAMANO_LECTURA = 1 << 16
+ESTADOS_OBX_DESCARTADOS = {"X", "D", "W"} # No se pudo obtener, borrado, erróneo
+
+IncidenciaHL7 = namedtuple("IncidenciaHL7", "mensaje id_control descripcion")
+
+_FIN_SEGMENTO = re.compile(rb"[\r\n]+")
+_ENTRAMADO_MLLP = b"\x0b\x1c"
+_CARACTER_ID = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class ErrorMapeoHL7(ErrorMapeo):
+    pass
+
+
+# --- Lectura por segmentos y mensajes ---
+
+def _decodificar(segmento: bytes) -> str:
+    try:
+        return segmento.decode("utf-8")
+    except UnicodeDecodeError:
+        return segmento.decode("latin-1")
+
+
+def _segmentos(f) -> Iterator[str]:
+    resto = b""
+    while True:
+        bloque = f.read(TAMANO_LECTURA)
+        if not bloque:
+            break
+        partes = _FIN_SEGMENTO.split(resto + bloque.translate(None, _ENTRAMADO_MLLP))
+        resto = partes.pop() # Puede ser un segmento incompleto: se completa con el bloque siguiente
+        for parte in partes:
+            if parte:
+                yield _decodificar(parte)
+    if resto.strip():
+        yield _decodificar(resto)
+
+
+def _mensajes(f) -> Iterator[Tuple[int, List[str]]]:
+    """(número de mensaje, segmentos) de cada mensaje. Los segmentos anteriores al primer
+    MSH y los de envoltura de fichero/lote (FHS, BHS, BTS, FTS) se descartan."""
+    numero = 0
+    actual: List[str] = []
+    for segmento in _segmentos(f):
+        tipo = segmento[:3]
+        if tipo == "MSH":
+            if actual:
+                yield numero, actual
+            numero += 1
+            actual = [segmento]
+        elif tipo in ("FHS", "BHS", "BTS", "FTS"):
+            continue
+        elif actual:
+            actual.append(segmento)
+    if actual:
+        yield numero, actual
+
+
+# --- Interpretación de un mensaje ---
+
+class _Codificacion:
+    """Separadores de MSH-1/MSH-2 y acceso a campos y componentes."""
+    __slots__ = ("campo", "componente", "repeticion", "escape", "subcomponente")
+
+    def __init__(self, msh: str):
+        if len(msh) < 8:
+            raise ErrorMapeoHL7("Segmento MSH incompleto")
+        self.campo = msh[3]
+        caracteres = msh[4:8]
+        self.componente, self.repeticion, self.escape, self.subcomponente = caracteres
+
+    def campos(self, segmento: str) -> List[str]:
+        campos = segmento.split(self.campo)
+        if campos[0] == "MSH":
+            # MSH-1 es el propio separador: MSH-n queda en campos[n] como en el resto de segmentos
+            campos.insert(1, self.campo)
+        return campos
+
+    def componentes(self, valor: str) -> List[str]:
+        return valor.split(self.repeticion, 1)[0].split(self.componente)
+
+    def texto(self, valor: str) -> str:
+        if self.escape not in valor:
+            return valor
+        sustituciones = {"F": self.campo, "S": self.componente, "R": self.repeticion,
+                         "E": self.escape, "T": self.subcomponente}
+        partes = valor.split(self.escape)
+        # Las secuencias de escape quedan en las posiciones impares: \F\ -> separador de campo
+        return "".join(sustituciones.get(p, "") if i % 2 else p for i, p in enumerate(partes))
+
+
+def _campo(campos: List[str], n: int) -> str:
+    return campos[n] if n < len(campos) else ""
+
+
+def _fecha_hl7(valor: str) -> Optional[datetime]:
+    """Fecha HL7 AAAA[MM[DD[HH[MM[SS[.S...]]]]]][+/-ZZZZ]; la zona horaria se descarta."""
+    if not valor:
+        return None
+    digitos = re.split(r"[+\-.]", valor.strip(), 1)[0][:14]
+    digitos = digitos[:len(digitos) - len(digitos) % 2]
+    if len(digitos) < 8 or not digitos.isdigit():
+        return None
+    return datetime.strptime(digitos, "%Y%m%d%H%M%S"[:len(digitos) - 2])
+
+
+def _numero(valor: str, tipo_valor: str, codificacion: _Codificacion) -> float:
+    if tipo_valor == "SN": # Numérico estructurado: [comparador]^número
+        componentes = codificacion.componentes(valor)
+        valor = componentes[1] if len(componentes) > 1 else componentes[0]
+    texto = codificacion.componentes(valor)[0].strip().replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        raise ErrorMapeoHL7(f"valor no numérico '{texto}'") from None
+
+
+def _id_informe(aplicacion: str, id_control: str) -> Optional[str]:
+    if not id_control:
+        return None # informe_desde_dict genera uno nuevo
+    partes = [_CARACTER_ID.sub("_", p).strip("_") for p in (aplicacion, id_control)]
+    return "HL7-" + "-".join(p for p in partes if p)
+
+
+def _interpretar(codificacion: _Codificacion, segmentos: List[str], correspondencias: Dict[str, str],
+                 avisar: Callable[[str], None]) -> InformeEcoCompleto:
+    msh = codificacion.campos(segmentos[0])
+    tipo_mensaje = codificacion.componentes(_campo(msh, 9))
+    if tipo_mensaje[0] != "ORU":
+        raise ErrorMapeoHL7(f"mensaje {'^'.join(tipo_mensaje)} (solo se importan ORU^R01)")
+
+    datos = {"id_informe": _id_informe(codificacion.componentes(_campo(msh, 3))[0], _campo(msh, 10).strip())}
+    fecha = fecha_obx = None
+    for segmento in segmentos[1:]:
+        campos = codificacion.campos(segmento)
+        tipo = campos[0]
+        if tipo == "PID":
+            datos["paciente.nhc"] = codificacion.texto(codificacion.componentes(_campo(campos, 3))[0])
+            nombre = codificacion.componentes(_campo(campos, 5))
+            datos["paciente.apellidos"] = codificacion.texto(nombre[0])
+            datos["paciente.nombre"] = codificacion.texto(nombre[1]) if len(nombre) > 1 else ""
+            sexo = _campo(campos, 8).strip().upper()
+            datos["paciente.sexo"] = sexo if sexo in ("M", "F") else ""
+        elif tipo == "OBR" and fecha is None:
+            fecha = _fecha_hl7(codificacion.componentes(_campo(campos, 7))[0])
+        elif tipo == "OBX":
+            _interpretar_obx(campos, codificacion, correspondencias, datos, avisar)
+            if fecha is None and fecha_obx is None:
+                fecha_obx = _fecha_hl7(codificacion.componentes(_campo(campos, 14))[0])
+
+    if not any(clave in CAMPOS_IMPORTABLES for clave in datos):
+        raise ErrorMapeoHL7("ninguna medida reconocida")
+    fecha = fecha or fecha_obx or _fecha_hl7(codificacion.componentes(_campo(msh, 7))[0])
+    if fecha is not None:
+        datos["paciente.fecha_estudio"] = fecha
+    return informe_desde_dict(datos)
+
+
+def _interpretar_obx(campos: List[str], codificacion: _Codificacion, correspondencias: Dict[str, str],
+                     datos: dict, avisar: Callable[[str], None]):
+    identificador = codificacion.componentes(_campo(campos, 3))
+    if _campo(campos, 11).strip().upper() in ESTADOS_OBX_DESCARTADOS:
+        return
+    if "realizado_por" not in datos:
+        observador = codificacion.componentes(_campo(campos, 16))
+        if len(observador) > 1 and observador[1]:
+            datos["realizado_por"] = codificacion.texto(" ".join(p for p in observador[2:3] + observador[1:2] if p))
+    campo = buscar_campo(correspondencias, *identificador[:2]) # Código y, si no hay correspondencia, texto
+    if campo is None:
+        return
+    valor = _campo(campos, 5)
+    if not valor.strip():
+        return
+    unidad = codificacion.componentes(_campo(campos, 6))
+    try:
+        numero = convertir_unidad(_numero(valor, _campo(campos, 2).strip().upper(), codificacion),
+                                  unidad[0] or (unidad[1] if len(unidad) > 1 else ""), campo)
+    except ErrorMapeo as e:
+        avisar(f"OBX-{_campo(campos, 1) or '?'} {'^'.join(identificador[:2])}: {e}")
+        return
+    datos[campo] = valor_campo(campo, numero)
+
+
+def leer_mensajes_hl7(ruta: str, correspondencias: Optional[Dict[str, str]] = None,
+                      incidencias: Optional[Callable[[IncidenciaHL7], None]] = None) -> Iterator[InformeEcoCompleto]:
+    """Genera un InformeEcoCompleto por cada mensaje ORU con medidas reconocidas. Cada
+    incidencia se registra en el log y, si se indica, se pasa a 'incidencias'."""
+    correspondencias = correspondencias or CORRESPONDENCIAS_MEDIDAS
+
+    def _notificar(numero: int, id_control: str, descripcion: str):
+        incidencia = IncidenciaHL7(numero, id_control, descripcion)
+        log_message(f"HL7 '{ruta}', mensaje {numero} ({id_control or 'sin MSH-10'}): {descripcion}", "warning")
+        if incidencias:
+            incidencias(incidencia)
+
+    with open(ruta, "rb") as f:
+        for numero, segmentos in _mensajes(f):
+            # --- INICIO: Marcador para localización de errores (Mensaje HL7) ---
+            id_control = ""
+            try:
+                codificacion = _Codificacion(segmentos[0])
+                id_control = _campo(codificacion.campos(segmentos[0]), 10).strip()
+                informe = _interpretar(codificacion, segmentos, correspondencias,
+                                       lambda descripcion: _notificar(numero, id_control, descripcion))
+            except (ErrorMapeoHL7, ValueError, TypeError) as e:
+                _notificar(numero, id_control, str(e))
+            else:
+                yield informe
+            # --- FIN: Marcador para localización de errores (Mensaje HL7) ---
@@ -6,10 +6,15 @@ Funciones para cálculos derivados basados en los datos del informe.
 Ej: Clasificación FEVI, estimación de presiones de llenado VI, score VExUS.
 """
 from models import InformeEcoCompleto, MedidasVI, MedidasAuriculas, PresionesLlenadoVI, VExUSScore
+from rangos_referencia import UmbralesReferencia, UMBRALES_POR_DEFECTO
 import config
 from utils.error_handling import log_message
+from utils.perfilado import perfilar
+from .tabla_presiones import etiqueta_presiones
 
-def calcular_clasificacion_fevi(medidas_vi: MedidasVI, medidas_ai: MedidasAuriculas) -> str:
+@perfilar()
+def calcular_clasificacion_fevi(medidas_vi: MedidasVI, medidas_ai: MedidasAuriculas,
+                                umbrales: UmbralesReferencia = UMBRALES_POR_DEFECTO) -> str:
     # --- INICIO: Marcador para localización de errores (Cálculo FEVI) ---
     try:
         if medidas_vi.fevi_porcentaje is None:
@@ -18,12 +23,12 @@ def calcular_clasificacion_fevi(medidas_vi: MedidasVI, medidas_ai: MedidasAuricu
         fevi = medidas_vi.fevi_porcentaje
         ai_vol = medidas_ai.ai_vol_ml_m2
 
-        if fevi <= config.FEVI_REDUCIDA_MAX:
+        if fevi <= umbrales.fevi_reducida_max:
             return "IC FEVI Reducida"
-        elif fevi <= config.FEVI_LIGERAMENTE_REDUCIDA_MAX: # Entre >40 y <=49
+        elif fevi <= umbrales.fevi_ligeramente_reducida_max: # Entre >40 y <=49
             return "IC FEVI Ligeramente Reducida"
         else: # FEVI > 49% (Preservada)
-            if ai_vol is not None and ai_vol > config.AI_MIN_FA_CRITERIA: # (>34 ml/m2)
+            if ai_vol is not None and ai_vol > umbrales.ai_vol_idx_dilatada_min: # (>34 ml/m2)
                 # Considerar si ritmo sinusal vs FA afecta este umbral según infograma
                 return "Alta probabilidad de IC FEVI Preservada"
             else:
@@ -34,75 +39,22 @@ def calcular_clasificacion_fevi(medidas_vi: MedidasVI, medidas_ai: MedidasAuricu
     # --- FIN: Marcador para localización de errores (Cálculo FEVI) ---
 
 
-def estimar_presiones_llenado_vi(presiones_data: PresionesLlenadoVI, ai_data: MedidasAuriculas) -> str:
+@perfilar()
+def estimar_presiones_llenado_vi(presiones_data: PresionesLlenadoVI, ai_data: MedidasAuriculas,
+                                 umbrales: UmbralesReferencia = UMBRALES_POR_DEFECTO) -> str:
     # --- INICIO: Marcador para localización de errores (Cálculo Presiones Llenado) ---
-    # Lógica basada en el algoritmo del infograma SEMI para E/A, E/e', Vol AI, Vel IT
-    # Esta es una implementación parcial y simplificada.
+    # Algoritmo del infograma SEMI (E/A y, si es intermedio, Vol AI, E/e' y Vel IT)
+    # compilado como tabla de decisión en logic/tabla_presiones.py
     try:
-        e_a = presiones_data.mitral_e_a_ratio
-        e_e_prima = presiones_data.e_sobre_e_prima_ratio # Asumimos que este valor ya está calculado o ingresado
-        ai_vol = ai_data.ai_vol_ml_m2
-        it_vel = presiones_data.it_velocidad_max_ms
-
-        if e_a is None:
-            return "No valorables (E/A no disponible)"
-
-        if e_a <= config.E_A_NORMAL_MAX: # E/A <= 0.8
-            # Y si E/e' también es bajo (ej <8), sería más seguro "Normales"
-            # Si E/A <= 0.8 pero E/e' > 14, es indeterminado/discordante
-            return "Presiones de llenado normales (si datos consistentes)"
-        
-        if e_a >= config.E_A_ELEVADA_MIN: # E/A >= 2
-            return "Presiones de llenado ELEVADAS (Patrón restrictivo)"
-
-        # Caso E/A entre 0.8 y 2 (excluyendo 2)
-        # Aplicar los 3 criterios adicionales:
-        # 1. AI > 34 ml/m2
-        # 2. E/e' > 14
-        # 3. Vel IT > 2.8 m/s
-        criterios_positivos = 0
-        criterios_evaluables = 0
-
-        if ai_vol is not None:
-            criterios_evaluables += 1
-            if ai_vol > config.AI_MIN_FA_CRITERIA: # >34 ml/m2
-                criterios_positivos += 1
-        
-        if e_e_prima is not None:
-            criterios_evaluables += 1
-            if e_e_prima > config.E_E_PRIMA_CORTE: # >14
-                criterios_positivos += 1
-        
-        if it_vel is not None:
-            criterios_evaluables += 1
-            if it_vel > config.IT_VELOCIDAD_CORTE: # >2.8 m/s
-                criterios_positivos += 1
-
-        if criterios_evaluables < 2: # No se pueden aplicar las reglas del infograma
-             return "Indeterminadas (datos insuficientes para E/A 0.8-2)"
-        
-        if criterios_evaluables == 2:
-            if criterios_positivos == 2:
-                return "Presiones de llenado ELEVADAS"
-            elif criterios_positivos == 0:
-                 return "Presiones de llenado normales"
-            else: # 1 positivo, 1 negativo
-                 return "Indeterminadas (discordantes, valorar otras técnicas)"
-
-        if criterios_evaluables == 3:
-            if criterios_positivos >= 2:
-                return "Presiones de llenado ELEVADAS"
-            else: # 0 o 1 positivo
-                return "Presiones de llenado normales"
-        
-        return "Indeterminadas (lógica no cubierta para E/A 0.8-2)"
-
+        return etiqueta_presiones(presiones_data.mitral_e_a_ratio, ai_data.ai_vol_ml_m2,
+                                  presiones_data.e_sobre_e_prima_ratio, presiones_data.it_velocidad_max_ms, umbrales)
     except Exception as e:
         log_message(f"Error estimando presiones de llenado VI: {e}", "error", exc_info=True)
         return "Error en cálculo Presiones Llenado"
     # --- FIN: Marcador para localización de errores (Cálculo Presiones Llenado) ---
 
 
+@perfilar()
 def calcular_grado_vexus(vexus_data: VExUSScore) -> int:
     # --- INICIO: Marcador para localización de errores (Cálculo VExUS) ---
     # Lógica basada en el score VExUS (VCI > 2cm + patrones de flujo en VSH, VP, VIR)
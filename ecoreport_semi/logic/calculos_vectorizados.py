@@ -0,0 +1,91 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Versiones vectorizadas (NumPy) de las clasificaciones de logic/calculations.py,
+para clasificar cohortes completas (registros, auditorías) de una sola vez.
+
+Las entradas son arrays columnares (una posición por estudio) con NaN como "no medido".
+Los patrones VExUS se codifican como índice en config.VSH_PATRONES / VP_PATRONES /
+VIR_PATRONES (-1 = sin patrón). Las salidas son códigos enteros (int8); la etiqueta
+textual equivalente a la de la función escalar es ETIQUETAS_*[codigo].
+
+NumPy es una dependencia opcional: solo se necesita para este módulo.
+"""
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from rangos_referencia import UmbralesReferencia, UMBRALES_POR_DEFECTO
+# Códigos de estimar_presiones_llenado_vi: los define la tabla de decisión
+from .tabla_presiones import (PRESIONES_NO_VALORABLES, PRESIONES_NORMALES_SI_CONSISTENTES, PRESIONES_ELEVADAS_RESTRICTIVO,
+                              PRESIONES_INDETERMINADAS_INSUFICIENTES, PRESIONES_ELEVADAS, PRESIONES_NORMALES,
+                              PRESIONES_INDETERMINADAS_DISCORDANTES, ETIQUETAS_PRESIONES, TABLA_PRESIONES,
+                              BANDA_E_A_NO_DISPONIBLE, BANDA_E_A_NORMAL, BANDA_E_A_INTERMEDIA, BANDA_E_A_RESTRICTIVA,
+                              BITS_CRITERIOS, bit_evaluable, bit_positivo)
+
+# --- Códigos de calcular_clasificacion_fevi ---
+FEVI_NO_VALORADA = 0
+FEVI_REDUCIDA = 1
+FEVI_LIGERAMENTE_REDUCIDA = 2
+FEVI_PRESERVADA_ALTA_PROBABILIDAD_IC = 3
+FEVI_PRESERVADA = 4
+ETIQUETAS_FEVI = (
+    "No valorada",
+    "IC FEVI Reducida",
+    "IC FEVI Ligeramente Reducida",
+    "Alta probabilidad de IC FEVI Preservada",
+    "FEVI Preservada (valorar otras posibilidades si AI normal)",
+)
+
+PATRON_AUSENTE = -1
+_INDICE_PATRON_GRAVE = 2 # Posición del patrón "Grave (...)" en las listas de config
+
+
+def codificar_patrones(valores: Iterable[Optional[str]], patrones: Sequence[str]) -> np.ndarray:
+    """Convierte patrones textuales (como en VExUSScore) en códigos int8; None/'' -> PATRON_AUSENTE."""
+    indices = {patron: i for i, patron in enumerate(patrones)}
+    return np.fromiter((indices.get(v, PATRON_AUSENTE) for v in valores), dtype=np.int8)
+
+
+def clasificar_fevi(fevi: np.ndarray, ai_vol: np.ndarray, umbrales: UmbralesReferencia = UMBRALES_POR_DEFECTO) -> np.ndarray:
+    """Equivalente vectorizado de calcular_clasificacion_fevi. Devuelve códigos FEVI_*."""
+    fevi = np.asarray(fevi, dtype=np.float64)
+    ai_vol = np.asarray(ai_vol, dtype=np.float64)
+    # Las comparaciones con NaN son falsas, igual que el 'is not None' de la versión escalar
+    ai_dilatada = ai_vol > umbrales.ai_vol_idx_dilatada_min
+    return np.select(
+        [np.isnan(fevi), fevi <= umbrales.fevi_reducida_max, fevi <= umbrales.fevi_ligeramente_reducida_max, ai_dilatada],
+        [FEVI_NO_VALORADA, FEVI_REDUCIDA, FEVI_LIGERAMENTE_REDUCIDA, FEVI_PRESERVADA_ALTA_PROBABILIDAD_IC],
+        default=FEVI_PRESERVADA,
+    ).astype(np.int8)
+
+
+_TABLA_PRESIONES = np.frombuffer(TABLA_PRESIONES, dtype=np.int8)
+
+
+def estimar_presiones_llenado(e_a: np.ndarray, ai_vol: np.ndarray, e_e_prima: np.ndarray, it_vel: np.ndarray,
+                              umbrales: UmbralesReferencia = UMBRALES_POR_DEFECTO) -> np.ndarray:
+    """Equivalente vectorizado de estimar_presiones_llenado_vi: calcula el índice de la
+    tabla de decisión de cada estudio y la indexa. Devuelve códigos PRESIONES_*."""
+    e_a = np.asarray(e_a, dtype=np.float64)
+    banda = np.select([np.isnan(e_a), e_a <= umbrales.e_a_normal_max, e_a >= umbrales.e_a_elevada_min],
+                      [BANDA_E_A_NO_DISPONIBLE, BANDA_E_A_NORMAL, BANDA_E_A_RESTRICTIVA],
+                      default=BANDA_E_A_INTERMEDIA).astype(np.uint8)
+    indice = banda << BITS_CRITERIOS
+    for criterio, (valores, corte) in enumerate(((ai_vol, umbrales.ai_vol_idx_dilatada_min),
+                                                 (e_e_prima, umbrales.e_e_prima_corte),
+                                                 (it_vel, umbrales.it_velocidad_corte_ms))):
+        valores = np.asarray(valores, dtype=np.float64)
+        # Las comparaciones con NaN son falsas: un criterio no medido no es positivo
+        indice |= np.where(~np.isnan(valores), np.uint8(bit_evaluable(criterio)), np.uint8(0))
+        indice |= np.where(valores > corte, np.uint8(bit_positivo(criterio)), np.uint8(0))
+    return _TABLA_PRESIONES[indice]
+
+
+def calcular_grados_vexus(vci_patologica: np.ndarray, vsh: np.ndarray, vp: np.ndarray, vir: np.ndarray) -> np.ndarray:
+    """Equivalente vectorizado de calcular_grado_vexus. Devuelve el grado (0-3) como int8."""
+    vci_patologica = np.asarray(vci_patologica, dtype=bool)
+    graves = sum((np.asarray(p) == _INDICE_PATRON_GRAVE).astype(np.int8) for p in (vsh, vp, vir))
+    grados = np.minimum(graves, 2) + 1 # 0 graves -> 1, 1 grave -> 2, 2 o más -> 3
+    return np.where(vci_patologica, grados, 0).astype(np.int8)
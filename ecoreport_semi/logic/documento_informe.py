@@ -0,0 +1,93 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Representación intermedia (estructurada) de un informe de ecocardioscopia.
+
+report_generator.py evalúa cada estudio una sola vez y produce un DocumentoInforme:
+secciones con hallazgos tipados (parámetro, estado, valor, unidad y código de
+interpretación), sin redacción. Los renderizadores (logic/renderizadores.py) lo
+convierten en texto, Markdown, HTML o JSON sin repetir la evaluación clínica.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# Estado de cada hallazgo
+ESTADO_NO_VALORADO = "no_valorado" # Marcado "No Valorado" (NV)
+ESTADO_MEDIDO = "medido"           # Valor introducido (medida, patrón, descripción...)
+ESTADO_PRESENTE = "presente"       # Hallazgo de tipo sí/no presente
+ESTADO_AUSENTE = "ausente"         # Hallazgo de tipo sí/no valorado y ausente
+ESTADO_CALCULADO = "calculado"     # Resultado derivado (clasificación, estimación, score)
+
+
+@dataclass(frozen=True)
+class Hallazgo:
+    parametro: str # Clave P_* de models.py o nombre del resultado calculado (p. ej. "grado_vexus")
+    estado: str
+    valor: Any = None
+    unidad: str = ""
+    interpretacion: Optional[str] = None # Código estable (p. ej. "dilatado", "pvc_elevada")
+    detalle: Optional[str] = None # Etiqueta en texto tal como la devuelven models/calculations
+    valor_anterior: Any = None # Solo en la sección "evolucion": valor en el estudio previo
+
+
+@dataclass(frozen=True)
+class SeccionInforme:
+    clave: str
+    titulo: str
+    hallazgos: Tuple[Hallazgo, ...]
+
+    def hallazgo(self, parametro: str) -> Optional[Hallazgo]:
+        for h in self.hallazgos:
+            if h.parametro == parametro:
+                return h
+        return None
+
+
+@dataclass(frozen=True)
+class CabeceraPaciente:
+    nhc: str = ""
+    nombre: str = ""
+    apellidos: str = ""
+    sexo: str = ""
+
+    def vacia(self) -> bool:
+        return not (self.nhc.strip() or self.nombre.strip() or self.apellidos.strip() or self.sexo.strip())
+
+
+@dataclass(frozen=True)
+class DocumentoInforme:
+    id_informe: str
+    fecha_estudio: Optional[datetime]
+    realizado_por: str
+    comentarios_adicionales: str
+    secciones: Tuple[SeccionInforme, ...]
+    paciente: CabeceraPaciente = CabeceraPaciente() # Solo la usan los formatos con cabecera (PDF, JSON)
+
+
+def _hallazgo_a_dict(h: Hallazgo) -> Dict[str, Any]:
+    datos = {"parametro": h.parametro, "estado": h.estado}
+    if h.valor is not None: datos["valor"] = h.valor
+    if h.unidad: datos["unidad"] = h.unidad
+    if h.interpretacion: datos["interpretacion"] = h.interpretacion
+    if h.detalle: datos["detalle"] = h.detalle
+    if h.valor_anterior is not None: datos["valor_anterior"] = h.valor_anterior
+    return datos
+
+
+def documento_a_dict(documento: DocumentoInforme) -> Dict[str, Any]:
+    """Diccionario serializable a JSON (las secciones sin hallazgos y la cabecera de
+    paciente vacía se omiten)."""
+    datos = {
+        "id_informe": documento.id_informe,
+        "fecha_estudio": documento.fecha_estudio.isoformat() if documento.fecha_estudio else None,
+        "realizado_por": documento.realizado_por.strip(),
+        "comentarios_adicionales": documento.comentarios_adicionales.strip(),
+        "secciones": [{"clave": s.clave, "titulo": s.titulo, "hallazgos": [_hallazgo_a_dict(h) for h in s.hallazgos]}
+                      for s in documento.secciones if s.hallazgos],
+    }
+    if not documento.paciente.vacia():
+        p = documento.paciente
+        datos["paciente"] = {"nhc": p.nhc.strip(), "nombre": p.nombre.strip(), "apellidos": p.apellidos.strip(), "sexo": p.sexo}
+    return datos
@@ -0,0 +1,119 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Evolución de un paciente entre estudios: los parámetros que se comparan de un estudio
+a otro (medidas y clasificaciones de logic/calculations.py) y su diferencia.
+
+Cada estudio se resume en un PuntoEvolucion (id, fecha y valores de PARAMETROS_EVOLUCION).
+El archivo local guarda el punto de cada estudio en una tabla indexada por (nhc, fecha),
+así que la serie de un paciente se lee sin descomprimir sus estudios
+(ArchivoEstudios.serie_evolucion). report_generator.py compara el estudio actual con el
+punto del estudio previo y añade la sección "evolucion" al documento.
+"""
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import (InformeEcoCompleto, P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE, P_VI_DTDVI, P_AI_VOL_IDX, P_VD_TAPSE,
+                    P_PRES_LLEN_E_E_PRIMA_RATIO, P_PRES_LLEN_IT_VEL, P_VCI_DIAM,
+                    P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
+from rangos_referencia import UmbralesReferencia, RANGOS_REFERENCIA
+from .calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+from .tabla_presiones import ETIQUETAS_PRESIONES, PRESIONES_NO_VALORABLES
+
+PuntoEvolucion = namedtuple("PuntoEvolucion", "id_informe fecha_estudio valores") # valores: {clave: valor}
+# Un parámetro valorado en los dos estudios cuyo valor ha cambiado
+CambioEvolucion = namedtuple("CambioEvolucion", "clave unidad valor_anterior valor_actual")
+
+_CLAVES_VEXUS = (P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
+
+
+def _medida(seccion: str, atributo: str, flag: str) -> Callable[[InformeEcoCompleto, UmbralesReferencia], Any]:
+    def extraer(informe, _umbrales):
+        return None if informe.param_no_valorado_flags.get(flag) else getattr(getattr(informe, seccion), atributo)
+    return extraer
+
+
+def _clasificacion_fevi(informe, umbrales):
+    flags = informe.param_no_valorado_flags
+    if flags.get(P_FEVI_CUALITATIVA) and flags.get(P_FEVI_PORCENTAJE):
+        return None
+    clase = calcular_clasificacion_fevi(informe.medidas_vi, informe.medidas_auriculas, umbrales)
+    return clase if clase and clase != "No valorada" and "Error" not in clase else None
+
+
+def _presiones_llenado(informe, umbrales):
+    estimacion = estimar_presiones_llenado_vi(informe.presiones_llenado, informe.medidas_auriculas, umbrales)
+    return None if estimacion == ETIQUETAS_PRESIONES[PRESIONES_NO_VALORABLES] or "Error" in estimacion else estimacion
+
+
+def _grado_vexus(informe, _umbrales):
+    vexus = informe.vexus
+    if all(informe.param_no_valorado_flags.get(k) for k in _CLAVES_VEXUS):
+        return None
+    if not (vexus.vci_patologica_vexus or vexus.patron_vena_suprahepatica or vexus.patron_vena_porta
+            or vexus.patron_vena_intrarrenal):
+        return None # Sin ningún dato de VExUS el grado 0 no es una medida
+    grado = calcular_grado_vexus(vexus)
+    return grado if grado is not None and grado >= 0 else None
+
+
+# (clave, unidad, función(informe, umbrales) -> valor o None). El orden es el de la redacción;
+# los nombres de cada parámetro en el texto están en logic/renderizadores.py.
+PARAMETROS_EVOLUCION: Tuple[Tuple[str, str, Callable[[InformeEcoCompleto, UmbralesReferencia], Any]], ...] = (
+    ("fevi_porcentaje", "%", _medida("medidas_vi", "fevi_porcentaje", P_FEVI_PORCENTAJE)),
+    ("clasificacion_fevi", "", _clasificacion_fevi),
+    ("dtdvi_mm", "mm", _medida("medidas_vi", "dtdvi_mm", P_VI_DTDVI)),
+    ("ai_vol_ml_m2", "ml/m²", _medida("medidas_auriculas", "ai_vol_ml_m2", P_AI_VOL_IDX)),
+    ("tapse_mm", "mm", _medida("medidas_vd", "tapse_mm", P_VD_TAPSE)),
+    ("e_sobre_e_prima_ratio", "", _medida("presiones_llenado", "e_sobre_e_prima_ratio", P_PRES_LLEN_E_E_PRIMA_RATIO)),
+    ("it_velocidad_max_ms", "m/s", _medida("presiones_llenado", "it_velocidad_max_ms", P_PRES_LLEN_IT_VEL)),
+    ("presiones_llenado", "", _presiones_llenado),
+    ("vci_diametro_max_mm", "mm", _medida("vci", "diametro_max_mm", P_VCI_DIAM)),
+    ("grado_vexus", "", _grado_vexus),
+)
+UNIDADES_EVOLUCION = {clave: unidad for clave, unidad, _extraer in PARAMETROS_EVOLUCION}
+# Diferencias menores que esta no cuentan como cambio (ruido de medida / redondeo)
+TOLERANCIAS = {"fevi_porcentaje": 0.5, "dtdvi_mm": 0.5, "ai_vol_ml_m2": 0.5, "tapse_mm": 0.5,
+               "e_sobre_e_prima_ratio": 0.05, "it_velocidad_max_ms": 0.05, "vci_diametro_max_mm": 0.5}
+
+
+def _fecha_iso(fecha) -> str:
+    return fecha.isoformat() if isinstance(fecha, datetime) else str(fecha or "")
+
+
+def punto_evolucion(informe: InformeEcoCompleto, umbrales: Optional[UmbralesReferencia] = None) -> PuntoEvolucion:
+    """Valores comparables del estudio (solo los que tienen valor). 'umbrales' por defecto:
+    los de config para el sexo del paciente."""
+    umbrales = umbrales or RANGOS_REFERENCIA.para_sexo(informe.paciente.sexo)
+    valores = {}
+    for clave, _unidad, extraer in PARAMETROS_EVOLUCION:
+        valor = extraer(informe, umbrales)
+        if valor is not None:
+            valores[clave] = valor
+    return PuntoEvolucion(informe.id_informe, _fecha_iso(informe.paciente.fecha_estudio), valores)
+
+
+def _distintos(clave: str, anterior, actual) -> bool:
+    if isinstance(anterior, (int, float)) and isinstance(actual, (int, float)) and clave in TOLERANCIAS:
+        return abs(actual - anterior) >= TOLERANCIAS[clave]
+    return anterior != actual
+
+
+def comparar(anterior: PuntoEvolucion, actual: PuntoEvolucion) -> Tuple[List[CambioEvolucion], List[str]]:
+    """(cambios, claves sin cambios) de los parámetros valorados en los dos estudios."""
+    cambios, sin_cambios = [], []
+    for clave, unidad, _extraer in PARAMETROS_EVOLUCION:
+        valor_anterior, valor_actual = anterior.valores.get(clave), actual.valores.get(clave)
+        if valor_anterior is None or valor_actual is None:
+            continue
+        if _distintos(clave, valor_anterior, valor_actual):
+            cambios.append(CambioEvolucion(clave, unidad, valor_anterior, valor_actual))
+        else:
+            sin_cambios.append(clave)
+    return cambios, sin_cambios
+
+
+def punto_desde_dict(datos: Dict[str, Any]) -> PuntoEvolucion:
+    return PuntoEvolucion(datos["id_informe"], datos["fecha_estudio"], dict(datos["valores"]))
@@ -0,0 +1,254 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Renderizador PDF de un DocumentoInforme, sin dependencias externas.
+
+Escribe un PDF 1.4 en A4 con las fuentes estándar Helvetica/Helvetica-Bold
+(WinAnsiEncoding, que cubre los acentos del español), así que no hay que incrustar
+fuentes ni instalar nada. Cada página lleva la cabecera con los datos del paciente
+y un pie con la firma de la aplicación y la numeración; el informe termina con el
+bloque "Realizado por".
+
+escribir_pdf va escribiendo los objetos en el fichero según los genera (solo se
+guardan sus posiciones para la tabla xref), de modo que el modo lote puede escribir
+directamente a disco desde cada proceso.
+"""
+import io
+import unicodedata
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Tuple
+
+import config
+from .documento_informe import DocumentoInforme
+from .renderizadores import TITULO_INFORME, SIN_HALLAZGOS, parrafos_por_seccion
+from utils.perfilado import perfilar
+
+# --- Página (puntos PDF, A4) ---
+ANCHO_PAGINA = 595
+ALTO_PAGINA = 842
+MARGEN = 56
+ANCHO_UTIL = ANCHO_PAGINA - 2 * MARGEN
+Y_INICIO_CUERPO = ALTO_PAGINA - MARGEN - 62 # Debajo de la cabecera
+Y_FIN_CUERPO = MARGEN + 24                  # Encima del pie
+
+# Estilos: (fuente, tamaño, interlineado)
+_NORMAL = ("F1", 10, 13.5)
+_NEGRITA = ("F2", 10, 13.5)
+_APARTADO = ("F2", 11, 15)
+_TITULO = ("F2", 13, 16)
+_CABECERA = ("F1", 9, 11.5)
+_PIE = ("F1", 7.5, 9)
+
+# Anchos de glifo (1/1000 em) de las métricas AFM estándar, caracteres 32..126
+_ANCHOS_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584)
+_ANCHOS_HELVETICA_NEGRITA = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584)
+# Signos de fuera de ASCII sin letra base (las letras acentuadas miden como su base)
+_ANCHOS_EXTRA = {"²": 333, "³": 333, "º": 365, "ª": 370, "°": 400, "¿": 611, "¡": 333, "«": 556, "»": 556,
+                 "·": 278, "€": 556, "–": 556, "—": 1000, "“": 333, "”": 333, "‘": 222, "’": 222, "•": 350, "…": 1000}
+
+_FUENTES = {"F1": ("Helvetica", _ANCHOS_HELVETICA), "F2": ("Helvetica-Bold", _ANCHOS_HELVETICA_NEGRITA)}
+
+
+def _ancho_caracter(caracter: str, anchos: tuple) -> int:
+    codigo = ord(caracter)
+    if 32 <= codigo <= 126:
+        return anchos[codigo - 32]
+    if caracter in _ANCHOS_EXTRA:
+        return _ANCHOS_EXTRA[caracter]
+    base = unicodedata.normalize("NFD", caracter)[0]
+    if 32 <= ord(base) <= 126:
+        return anchos[ord(base) - 32]
+    return 556
+
+
+def ancho_texto(texto: str, fuente: str, tamano: float) -> float:
+    anchos = _FUENTES[fuente][1]
+    return sum(_ancho_caracter(c, anchos) for c in texto) * tamano / 1000
+
+
+def _partir_lineas(texto: str, fuente: str, tamano: float, ancho_maximo: float) -> List[str]:
+    """Ajuste de línea por palabras; respeta los saltos de línea del texto y corta
+    por caracteres las palabras que no caben solas en una línea."""
+    lineas = []
+    ancho_espacio = ancho_texto(" ", fuente, tamano)
+    for linea_original in texto.split("\n"):
+        actual, ancho_actual = "", 0.0
+        for palabra in linea_original.split():
+            ancho_palabra = ancho_texto(palabra, fuente, tamano)
+            while ancho_palabra > ancho_maximo: # Palabra más larga que la línea
+                if actual:
+                    lineas.append(actual)
+                    actual, ancho_actual = "", 0.0
+                corte = len(palabra) - 1
+                while corte > 1 and ancho_texto(palabra[:corte], fuente, tamano) > ancho_maximo:
+                    corte -= 1
+                lineas.append(palabra[:corte])
+                palabra = palabra[corte:]
+                ancho_palabra = ancho_texto(palabra, fuente, tamano)
+            if actual and ancho_actual + ancho_espacio + ancho_palabra <= ancho_maximo:
+                actual += " " + palabra
+                ancho_actual += ancho_espacio + ancho_palabra
+            else:
+                if actual:
+                    lineas.append(actual)
+                actual, ancho_actual = palabra, ancho_palabra
+        lineas.append(actual)
+    return lineas
+
+
+def _literal(texto: str) -> bytes:
+    """Cadena literal PDF en WinAnsiEncoding (lo que no se puede codificar queda como '?')."""
+    datos = texto.encode("cp1252", errors="replace")
+    return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+# --- Maquetación ---
+
+# Un bloque es (estilo, texto, espacio_antes, líneas que deben quedar en la misma página)
+_Bloque = Tuple[tuple, str, float, int]
+
+
+def _bloques(documento: DocumentoInforme) -> List[_Bloque]:
+    bloques: List[_Bloque] = [(_APARTADO, "HALLAZGOS ECOCARDIOGRÁFICOS", 0, 2)]
+    parrafos = parrafos_por_seccion(documento)
+    for titulo, parrafo in parrafos:
+        bloques.append((_NEGRITA, titulo, 8, 2)) # El título no se queda solo al final de página
+        bloques.append((_NORMAL, parrafo, 0, 1))
+    if not parrafos:
+        bloques.append((_NORMAL, SIN_HALLAZGOS, 4, 1))
+    if documento.comentarios_adicionales.strip():
+        bloques.append((_APARTADO, "CONCLUSIÓN / COMENTARIOS ADICIONALES", 16, 2))
+        bloques.append((_NORMAL, documento.comentarios_adicionales.strip(), 0, 1))
+    if documento.realizado_por.strip():
+        bloques.append((_NEGRITA, f"Realizado por: {documento.realizado_por.strip()}", 28, 1))
+    return bloques
+
+
+def _paginar(documento: DocumentoInforme) -> List[List[tuple]]:
+    """Reparte los bloques en páginas. Cada página es una lista de (estilo, x, y, texto)."""
+    paginas: List[List[tuple]] = [[]]
+    y = Y_INICIO_CUERPO
+    for estilo, texto, espacio_antes, juntas in _bloques(documento):
+        fuente, tamano, interlineado = estilo
+        lineas = _partir_lineas(texto, fuente, tamano, ANCHO_UTIL)
+        if paginas[-1]:
+            y -= espacio_antes
+        # Si el título y la primera línea de lo que sigue no caben, salto de página
+        if paginas[-1] and y - interlineado * juntas < Y_FIN_CUERPO:
+            paginas.append([])
+            y = Y_INICIO_CUERPO
+        for linea in lineas:
+            if y - interlineado < Y_FIN_CUERPO:
+                paginas.append([])
+                y = Y_INICIO_CUERPO
+            y -= interlineado
+            if linea:
+                paginas[-1].append((estilo, MARGEN, y, linea))
+    return paginas
+
+
+def _texto_cabecera(documento: DocumentoInforme) -> List[str]:
+    p = documento.paciente
+    nombre = ", ".join(parte for parte in (p.apellidos.strip(), p.nombre.strip()) if parte) or "—"
+    fecha = documento.fecha_estudio.strftime("%d/%m/%Y %H:%M") if documento.fecha_estudio else "—"
+    sexo = {"M": "Hombre", "F": "Mujer"}.get(p.sexo, "No consta")
+    return [f"Paciente: {nombre}    NHC: {p.nhc.strip() or '—'}    Sexo: {sexo}",
+            f"Fecha del estudio: {fecha}    Informe: {documento.id_informe}"]
+
+
+def _contenido_pagina(lineas: List[tuple], cabecera: List[str], numero: int, total: int) -> bytes:
+    partes = []
+
+    def texto(estilo, x, y, cadena):
+        fuente, tamano, _ = estilo
+        partes.append(b"BT /%s %g Tf %.2f %.2f Td %s Tj ET" % (fuente.encode(), tamano, x, y, _literal(cadena)))
+
+    y = ALTO_PAGINA - MARGEN
+    texto(_TITULO, MARGEN, y - _TITULO[1], TITULO_INFORME)
+    y -= _TITULO[2] + 6
+    for linea in cabecera:
+        y -= _CABECERA[2]
+        texto(_CABECERA, MARGEN, y, linea)
+    y -= 8
+    partes.append(b"0.5 w %d %.2f m %d %.2f l S" % (MARGEN, y, ANCHO_PAGINA - MARGEN, y))
+
+    for estilo, x, y_linea, cadena in lineas:
+        texto(estilo, x, y_linea, cadena)
+
+    y_pie = MARGEN
+    partes.append(b"0.5 w %d %d m %d %d l S" % (MARGEN, y_pie + 12, ANCHO_PAGINA - MARGEN, y_pie + 12))
+    texto(_PIE, MARGEN, y_pie, config.APP_AUTHOR_SIGNATURE)
+    pagina = f"Página {numero} de {total}"
+    texto(_PIE, ANCHO_PAGINA - MARGEN - ancho_texto(pagina, _PIE[0], _PIE[1]), y_pie, pagina)
+    return b"\n".join(partes)
+
+
+# --- Escritura del fichero ---
+
+@perfilar()
+def escribir_pdf(documento: DocumentoInforme, destino: BinaryIO) -> int:
+    """Escribe el informe en PDF en 'destino' (abierto en binario). Devuelve el número de páginas.
+    La salida es determinista: no lleva fecha de creación."""
+    paginas = _paginar(documento)
+    cabecera = _texto_cabecera(documento)
+    n = len(paginas)
+    # Objetos: 1 catálogo, 2 árbol de páginas, 3-4 fuentes, 5 info; después página y contenido por cada página
+    id_pagina = lambda i: 6 + 2 * i
+    offsets: List[int] = []
+    posicion = 0
+
+    def escribir(datos: bytes):
+        nonlocal posicion
+        destino.write(datos)
+        posicion += len(datos)
+
+    def objeto(cuerpo: bytes):
+        offsets.append(posicion)
+        escribir(b"%d 0 obj\n" % len(offsets) + cuerpo + b"\nendobj\n")
+
+    escribir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    objeto(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = b" ".join(b"%d 0 R" % id_pagina(i) for i in range(n))
+    objeto(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n))
+    for clave in ("F1", "F2"):
+        objeto(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % _FUENTES[clave][0].encode())
+    objeto(b"<< /Title %s /Author %s /Producer %s >>" % (
+        _literal(f"{TITULO_INFORME} - {documento.id_informe}"),
+        _literal(documento.realizado_por.strip() or config.APP_NAME),
+        _literal(f"{config.APP_NAME} v{config.APP_VERSION}")))
+    for i, lineas in enumerate(paginas):
+        objeto(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+               % (ANCHO_PAGINA, ALTO_PAGINA, id_pagina(i) + 1))
+        contenido = zlib.compress(_contenido_pagina(lineas, cabecera, i + 1, n))
+        objeto(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+
+    inicio_xref = posicion
+    escribir(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+    escribir(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    escribir(b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, inicio_xref))
+    return n
+
+
+def renderizar_pdf(documento: DocumentoInforme) -> bytes:
+    buffer = io.BytesIO()
+    escribir_pdf(documento, buffer)
+    return buffer.getvalue()
+
+
+# Extensión de fichero -> función que escribe el formato binario en un fichero abierto ('wb')
+ESCRITORES_BINARIOS: Dict[str, Callable[[DocumentoInforme, BinaryIO], int]] = {
+    "pdf": escribir_pdf,
+}
@@ -0,0 +1,419 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Renderizadores de un DocumentoInforme (logic/documento_informe.py).
+
+La redacción en español de cada sección vive aquí y solo lee los hallazgos ya
+evaluados; ninguna decisión clínica se repite al cambiar de formato.
+- renderizar_texto: el informe narrativo de siempre (mismo texto, byte a byte).
+- renderizar_markdown / renderizar_html: los mismos párrafos con un título por sección.
+- renderizar_json: la estructura completa de hallazgos.
+El PDF (binario) está en logic/renderizador_pdf.py.
+"""
+import html
+import json
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from models import (P_VI_SEPTO, P_VI_PARED_POST, P_VI_DTDVI, P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE,
+                    P_AI_VOL_IDX, P_VD_DIAM_BASAL, P_VD_TAPSE,
+                    P_VALV_EST_AO, P_VALV_INS_AO, P_VALV_INS_MI, P_VALV_INS_TR,
+                    P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL,
+                    P_DERR_PERIC_PRESENTE, P_DERR_PERIC_CUANTIA,
+                    P_LINEAS_B_PRESENTE, P_LINEAS_B_DESC,
+                    P_DERR_PLEURAL_PRESENTE, P_DERR_PLEURAL_TIPO, P_DERR_PLEURAL_LOC,
+                    P_VCI_DIAM, P_VCI_COLAPSO_RADIO, P_VCI_MM_INSPIRACION,
+                    P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
+from .documento_informe import (DocumentoInforme, SeccionInforme, Hallazgo, documento_a_dict,
+                                ESTADO_NO_VALORADO, ESTADO_MEDIDO, ESTADO_PRESENTE, ESTADO_AUSENTE)
+from utils.perfilado import perfilar
+
+TITULO_INFORME = "INFORME DE ECOCARDIOSCOPIA CLÍNICA A PIE DE CAMA"
+SIN_HALLAZGOS = "No se detallaron hallazgos ecocardiográficos específicos o todos los apartados fueron omitidos/no valorados."
+
+
+def _format_valor_narrativo(valor, unidad="", decimales=1, default_si_none="no se especificó", prefijo_valor=" "):
+    """Formatea un valor para el informe narrativo, manejando None."""
+    if valor is None:
+        return default_si_none
+    if isinstance(valor, float):
+        return f"{prefijo_valor}{valor:.{decimales}f}{unidad}"
+    if isinstance(valor, str) and valor == "": # Manejar string vacío como no especificado
+        return default_si_none
+    return f"{prefijo_valor}{valor}{unidad}"
+
+def _construir_frase(componentes: List[str]) -> str:
+    """Une componentes en una frase, manejando comas y 'y'."""
+    componentes_validos = [c for c in componentes if c and c.strip() != ""]
+    if not componentes_validos:
+        return ""
+    if len(componentes_validos) == 1:
+        return componentes_validos[0]
+    return ", ".join(componentes_validos[:-1]) + " y " + componentes_validos[-1]
+
+def _es_nv(h: Optional[Hallazgo]) -> bool:
+    return h is not None and h.estado == ESTADO_NO_VALORADO
+
+def _estado(seccion: SeccionInforme, parametro: str) -> Optional[str]:
+    h = seccion.hallazgo(parametro)
+    return h.estado if h is not None else None
+
+
+# --- Frases de las medidas: (texto si es NV, texto con el valor) ---
+_FRASES_MEDIDA: Dict[str, tuple] = {
+    P_VI_SEPTO: ("grosor del septo interventricular no valorado",
+                 lambda v: f"septo interventricular de{_format_valor_narrativo(v, ' mm')}"),
+    P_VI_PARED_POST: ("grosor de la pared posterior no valorado",
+                      lambda v: f"pared posterior de{_format_valor_narrativo(v, ' mm')}"),
+    P_VI_DTDVI: ("DTDVI no valorado",
+                 lambda v: f"diámetro telediastólico (DTDVI) de{_format_valor_narrativo(v, ' mm')}"),
+    P_FEVI_CUALITATIVA: ("estimación visual cualitativa de FEVI no valorada",
+                         lambda v: f"una estimación visual cualitativa {v.lower()}"),
+    P_FEVI_PORCENTAJE: ("FEVI cuantitativa no valorada",
+                        lambda v: f"una FEVI cuantitativa del{_format_valor_narrativo(v, '%', 0)}"),
+    P_VD_DIAM_BASAL: ("diámetro basal del VD no valorado",
+                      lambda v: f"diámetro basal del ventrículo derecho de{_format_valor_narrativo(v, ' mm')}"),
+    P_VD_TAPSE: ("TAPSE no valorado",
+                 lambda v: f"TAPSE de{_format_valor_narrativo(v, ' mm')}"),
+    P_PRES_LLEN_E_A: (None, lambda v: f"ratio E/A mitral de{_format_valor_narrativo(v, decimales=2)}"),
+    P_PRES_LLEN_E_SEPTAL: (None, lambda v: f"e' septal de{_format_valor_narrativo(v, ' cm/s')}"),
+    P_PRES_LLEN_E_LATERAL: (None, lambda v: f"e' lateral de{_format_valor_narrativo(v, ' cm/s')}"),
+    P_PRES_LLEN_IT_VEL: (None, lambda v: f"velocidad máxima de IT de{_format_valor_narrativo(v, ' m/s')}"),
+    P_VCI_DIAM: ("diámetro máximo no valorado",
+                 lambda v: f"diámetro máximo de {_format_valor_narrativo(v, ' mm', prefijo_valor='')}"),
+    P_VCI_COLAPSO_RADIO: ("colapso inspiratorio no valorado",
+                          lambda v: f"colapso inspiratorio {'>50%' if v else '<50%'}"),
+    P_VCI_MM_INSPIRACION: ("diámetro en inspiración no valorado",
+                           lambda v: f"diámetro en inspiración de {_format_valor_narrativo(v, ' mm', prefijo_valor='')}"),
+}
+
+# Añadido entre paréntesis según la interpretación de la medida
+_SUFIJOS_INTERPRETACION = {
+    "dilatado": " (dilatado)",
+    "no_dilatado": " (no dilatado)",
+    "disminuido": " (disminuido, sugiere disfunción sistólica del VD)",
+    "conservado": " (conservado)",
+}
+
+def _frases_medidas(seccion: SeccionInforme, parametros: tuple) -> List[str]:
+    frases = []
+    for h in seccion.hallazgos:
+        if h.parametro not in parametros: continue
+        frase_nv, frase_valor = _FRASES_MEDIDA[h.parametro]
+        if h.estado == ESTADO_NO_VALORADO:
+            frases.append(frase_nv)
+        else:
+            frases.append(frase_valor(h.valor) + _SUFIJOS_INTERPRETACION.get(h.interpretacion, ""))
+    return frases
+
+
+# --- Redacción por sección ---
+
+@perfilar()
+def _redactar_vi_dimensiones(seccion: SeccionInforme) -> Optional[str]:
+    frases_dim = _frases_medidas(seccion, (P_VI_SEPTO, P_VI_PARED_POST, P_VI_DTDVI))
+    if not frases_dim: return None
+    texto = f"El ventrículo izquierdo presenta {_construir_frase(frases_dim)}."
+    hvi = seccion.hallazgo("hipertrofia_vi")
+    if hvi is not None:
+        if hvi.valor:
+            texto += f" Se observan signos sugerentes de hipertrofia ventricular izquierda ({hvi.detalle})."
+        else:
+            texto += " No se observan signos de hipertrofia ventricular izquierda."
+    return texto
+
+@perfilar()
+def _redactar_fevi(seccion: SeccionInforme) -> Optional[str]:
+    frases_fevi = _frases_medidas(seccion, (P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE))
+    if not frases_fevi: return None
+    texto = f"En cuanto a la función sistólica del ventrículo izquierdo, se objetiva {_construir_frase(frases_fevi)}."
+    clasificacion = seccion.hallazgo("clasificacion_fevi")
+    if clasificacion is not None:
+        texto += f" Esto corresponde a una {clasificacion.valor.lower()}."
+    return texto
+
+@perfilar()
+def _redactar_ai_volumen(seccion: SeccionInforme) -> Optional[str]:
+    h = seccion.hallazgo(P_AI_VOL_IDX)
+    if h is None: return None
+    if h.estado == ESTADO_NO_VALORADO: return "El volumen de la aurícula izquierda no fue valorado."
+    dilatada_texto = ", sugestivo de dilatación auricular izquierda" if h.interpretacion == "dilatada" else ""
+    return f"La aurícula izquierda presenta un volumen indexado de{_format_valor_narrativo(h.valor, ' ml/m²')}{dilatada_texto}."
+
+@perfilar()
+def _redactar_vd_funcion(seccion: SeccionInforme) -> Optional[str]:
+    frases_vd = _frases_medidas(seccion, (P_VD_DIAM_BASAL, P_VD_TAPSE))
+    if not frases_vd: return None
+    return f"Respecto al ventrículo derecho, se observa {_construir_frase(frases_vd)}."
+
+_NOMBRES_VALVULOPATIAS = {
+    P_VALV_EST_AO: "estenosis aórtica",
+    P_VALV_INS_AO: "insuficiencia aórtica",
+    P_VALV_INS_MI: "insuficiencia mitral",
+    P_VALV_INS_TR: "insuficiencia tricuspídea",
+}
+
+@perfilar()
+def _redactar_valvulopatias(seccion: SeccionInforme) -> Optional[str]:
+    sigs_encontradas = [f"{_NOMBRES_VALVULOPATIAS[h.parametro]} significativa" for h in seccion.hallazgos if h.estado == ESTADO_PRESENTE]
+    no_valoradas = [_NOMBRES_VALVULOPATIAS[h.parametro] for h in seccion.hallazgos if h.estado == ESTADO_NO_VALORADO]
+    frases_valv = []
+    if sigs_encontradas:
+        frases_valv.append(f"Se identifican: {_construir_frase(sigs_encontradas)}.")
+    elif not no_valoradas: # Todas las valvulopatías fueron evaluadas y ninguna se marcó
+        frases_valv.append("No se identificaron valvulopatías significativas.")
+    if no_valoradas:
+        frases_valv.append(f"La valoración detallada de {_construir_frase(no_valoradas)} no se realizó o no fue concluyente.")
+    return " ".join(frases_valv) if frases_valv else None
+
+_PARAMETROS_PRESIONES = (P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL)
+
+@perfilar()
+def _redactar_presiones_llenado(seccion: SeccionInforme) -> Optional[str]:
+    if not seccion.hallazgos: return None
+    if all(_estado(seccion, p) == ESTADO_NO_VALORADO for p in _PARAMETROS_PRESIONES):
+        return "La estimación de presiones de llenado del VI no fue valorada."
+    estimacion = seccion.hallazgo("estimacion_presiones_llenado")
+    frase_resultado = ""
+    if estimacion is not None:
+        frase_resultado = f"La estimación de las presiones de llenado del ventrículo izquierdo sugiere: {estimacion.valor.lower()}."
+    detalles_params = [_FRASES_MEDIDA[h.parametro][1](h.valor) for h in seccion.hallazgos
+                       if h.parametro in _PARAMETROS_PRESIONES and h.estado == ESTADO_MEDIDO]
+    if frase_resultado and detalles_params:
+        return f"{frase_resultado} Basado en: {_construir_frase(detalles_params)}."
+    elif frase_resultado:
+        return frase_resultado
+    elif detalles_params: # Hay datos pero la estimación no fue concluyente
+        return f"Se valoraron los siguientes parámetros para presiones de llenado: {_construir_frase(detalles_params)}, sin una estimación concluyente."
+    return None
+
+@perfilar()
+def _redactar_derrames_y_lineasb(seccion: SeccionInforme) -> Optional[str]:
+    frases_total = []
+
+    # Derrame Pericárdico
+    dper = seccion.hallazgo(P_DERR_PERIC_PRESENTE)
+    if _es_nv(dper) and _es_nv(seccion.hallazgo(P_DERR_PERIC_CUANTIA)):
+        frases_total.append("Derrame pericárdico no valorado.")
+    elif dper.estado == ESTADO_PRESENTE:
+        frases_total.append(f"Se observa derrame pericárdico {dper.detalle}.")
+    elif dper.estado == ESTADO_AUSENTE:
+        frases_total.append("No se objetiva derrame pericárdico.")
+
+    # Líneas B
+    lineas_b = seccion.hallazgo(P_LINEAS_B_PRESENTE)
+    descripcion = seccion.hallazgo(P_LINEAS_B_DESC)
+    if _es_nv(lineas_b) and _es_nv(descripcion):
+        frases_total.append("Líneas B no valoradas.")
+    elif lineas_b.estado == ESTADO_PRESENTE:
+        if descripcion is not None and descripcion.estado == ESTADO_MEDIDO:
+            frases_total.append(f"Presencia de líneas B: {descripcion.valor}.")
+        else:
+            frases_total.append("Presencia de líneas B sugestivas de congestión intersticial.")
+    elif lineas_b.estado == ESTADO_AUSENTE:
+        frases_total.append("No se identifican líneas B patológicas.")
+
+    # Derrame Pleural
+    dple = seccion.hallazgo(P_DERR_PLEURAL_PRESENTE)
+    tipo, localizacion = seccion.hallazgo(P_DERR_PLEURAL_TIPO), seccion.hallazgo(P_DERR_PLEURAL_LOC)
+    if _es_nv(dple) and _es_nv(tipo) and _es_nv(localizacion):
+        frases_total.append("Derrame pleural no valorado.")
+    elif dple.estado == ESTADO_PRESENTE:
+        detalles_dple = [h.valor.lower() for h in (tipo, localizacion) if h is not None and h.estado == ESTADO_MEDIDO]
+        if detalles_dple: frases_total.append(f"Derrame pleural {' y '.join(detalles_dple)}.")
+        else: frases_total.append("Derrame pleural presente (detalles no especificados).")
+    elif dple.estado == ESTADO_AUSENTE:
+        frases_total.append("No se evidencia derrame pleural.")
+
+    return " ".join(frases_total) if frases_total else None
+
+_PARAMETROS_VCI = (P_VCI_DIAM, P_VCI_COLAPSO_RADIO, P_VCI_MM_INSPIRACION)
+_PARAMETROS_VEXUS = (P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
+_NOMBRES_VENAS_VEXUS = {P_VEXUS_VSH: "V. Suprahepática", P_VEXUS_VP: "V. Porta", P_VEXUS_VIR: "V. Intrarrenal"}
+
+@perfilar()
+def _redactar_congestion_sistemica(seccion: SeccionInforme) -> Optional[str]:
+    frases_sist = []
+
+    # VCI
+    if all(_estado(seccion, p) == ESTADO_NO_VALORADO for p in _PARAMETROS_VCI):
+        frases_sist.append("Vena cava inferior no valorada.")
+    else:
+        partes_vci_narradas = _frases_medidas(seccion, _PARAMETROS_VCI)
+        if partes_vci_narradas:
+            texto_vci = f"La vena cava inferior presenta {_construir_frase(partes_vci_narradas)}."
+            pvc = seccion.hallazgo("pvc_elevada")
+            if pvc is not None:
+                texto_vci += " Sugestiva de PVC elevada." if pvc.valor else " No sugestiva de PVC elevada."
+            frases_sist.append(texto_vci)
+        else:
+            frases_sist.append("Valoración de la VCI incompleta.")
+
+    # VExUS
+    if all(_estado(seccion, p) == ESTADO_NO_VALORADO for p in _PARAMETROS_VEXUS):
+        frases_sist.append("Score VExUS no calculado (parámetros no valorados).")
+    else:
+        grado = seccion.hallazgo("grado_vexus")
+        if grado is not None and grado.valor is not None:
+            frases_sist.append(f"El score VExUS para congestión sistémica es de grado {grado.valor}.")
+            detalles_vexus = [f"{_NOMBRES_VENAS_VEXUS[h.parametro]} con patrón {h.valor.split('(')[0].lower().strip()}"
+                              for h in seccion.hallazgos if h.interpretacion == "contribuyente"]
+            if detalles_vexus: frases_sist.append(f"Hallazgos contribuyentes: {_construir_frase(detalles_vexus)}.")
+        else:
+            frases_sist.append("Datos para VExUS incompletos para un cálculo definitivo.")
+
+    return " ".join(frases_sist) if frases_sist else None
+
+# Nombre en el texto y decimales de cada parámetro de logic/evolucion.py (None: texto, sin decimales)
+_NOMBRES_EVOLUCION = {
+    "fevi_porcentaje": ("FEVI", 0), "clasificacion_fevi": ("clasificación de la FEVI", None),
+    "dtdvi_mm": ("DTDVI", 1), "ai_vol_ml_m2": ("volumen AI indexado", 1), "tapse_mm": ("TAPSE", 1),
+    "e_sobre_e_prima_ratio": ("E/e'", 1), "it_velocidad_max_ms": ("velocidad máxima de IT", 2),
+    "presiones_llenado": ("presiones de llenado", None), "vci_diametro_max_mm": ("diámetro de VCI", 1),
+    "grado_vexus": ("grado VExUS", None),
+}
+
+def _valor_evolucion(h: Hallazgo, valor) -> str:
+    decimales = _NOMBRES_EVOLUCION[h.parametro][1]
+    texto = _format_valor_narrativo(valor, "", decimales or 0, prefijo_valor="")
+    return texto + h.unidad if h.unidad == "%" else texto # "%" va pegado a cada valor; el resto, al final
+
+def _fecha_evolucion(fecha_iso) -> str:
+    try:
+        return datetime.fromisoformat(fecha_iso).strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        return str(fecha_iso or "")
+
+@perfilar()
+def _redactar_evolucion(seccion: SeccionInforme) -> Optional[str]:
+    previo = seccion.hallazgo("estudio_previo")
+    fecha = f" del {_fecha_evolucion(previo.valor)}" if previo is not None and previo.valor else ""
+    cambios, sin_cambios = [], []
+    for h in seccion.hallazgos:
+        if h.parametro not in _NOMBRES_EVOLUCION: continue
+        nombre = _NOMBRES_EVOLUCION[h.parametro][0]
+        if h.interpretacion == "sin_cambios":
+            sin_cambios.append(nombre)
+        elif isinstance(h.valor, str): # Clasificaciones: "de X a Y"
+            cambios.append(f"{nombre} de {h.valor_anterior} a {h.valor}")
+        else:
+            unidad = f" {h.unidad}" if h.unidad and h.unidad != "%" else ""
+            cambios.append(f"{nombre} {_valor_evolucion(h, h.valor_anterior)} → {_valor_evolucion(h, h.valor)}{unidad}")
+    if not cambios and not sin_cambios: return None
+    frases = []
+    if cambios: frases.append(f"Evolución respecto al estudio previo{fecha}: {_construir_frase(cambios)}.")
+    if sin_cambios:
+        frases.append(f"Sin cambios en {_construir_frase(sin_cambios)}" + ("." if cambios else f" respecto al estudio previo{fecha}."))
+    return " ".join(frases)
+
+
+_REDACTORES: Dict[str, Callable[[SeccionInforme], Optional[str]]] = {
+    "vi_dimensiones": _redactar_vi_dimensiones,
+    "fevi": _redactar_fevi,
+    "ai_volumen": _redactar_ai_volumen,
+    "vd_funcion": _redactar_vd_funcion,
+    "valvulopatias": _redactar_valvulopatias,
+    "presiones_llenado": _redactar_presiones_llenado,
+    "derrames_lineas_b": _redactar_derrames_y_lineasb,
+    "congestion_sistemica": _redactar_congestion_sistemica,
+    "evolucion": _redactar_evolucion,
+}
+
+
+def redactar_seccion(seccion: SeccionInforme) -> Optional[str]:
+    """Párrafo narrativo de una sección, o None si no hay nada que contar."""
+    if not seccion.hallazgos:
+        return None
+    return _REDACTORES[seccion.clave](seccion)
+
+
+def ensamblar_texto(realizado_por: str, comentarios_adicionales: str, cuerpo_informe: List[str]) -> str:
+    """Une cabecera, párrafos de hallazgos y comentarios en el texto final del informe."""
+    parrafos_finales = []
+    parrafos_finales.append(TITULO_INFORME)
+    parrafos_finales.append("==============================================")
+
+    if realizado_por and realizado_por.strip() != "":
+        parrafos_finales.append(f"Realizado por: {realizado_por.strip()}\n")
+
+    if cuerpo_informe: # Si hay algún hallazgo que reportar
+        parrafos_finales.append("\n--- HALLAZGOS ECOCARDIOGRÁFICOS ---")
+        parrafos_finales.append("\n\n".join(cuerpo_informe)) # Unir párrafos de hallazgos con doble salto
+    else: # Si todo se omitió o estaba NV y no generó texto.
+        parrafos_finales.append("\n" + SIN_HALLAZGOS)
+
+    if comentarios_adicionales and comentarios_adicionales.strip() != "":
+        parrafos_finales.append("\n\n--- CONCLUSIÓN / COMENTARIOS ADICIONALES ---")
+        parrafos_finales.append(comentarios_adicionales.strip())
+
+    parrafos_finales.append("\n==============================================")
+    return "\n".join(parrafos_finales).strip()
+
+
+def parrafos_por_seccion(documento: DocumentoInforme) -> List[tuple]:
+    """(título, párrafo) de cada sección con algo que redactar, en orden."""
+    parrafos = []
+    for seccion in documento.secciones:
+        parrafo = redactar_seccion(seccion)
+        if parrafo: parrafos.append((seccion.titulo, parrafo))
+    return parrafos
+
+
+# --- Formatos ---
+
+@perfilar()
+def renderizar_texto(documento: DocumentoInforme) -> str:
+    cuerpo_informe = [parrafo for _titulo, parrafo in parrafos_por_seccion(documento)]
+    return ensamblar_texto(documento.realizado_por, documento.comentarios_adicionales, cuerpo_informe)
+
+
+@perfilar()
+def renderizar_markdown(documento: DocumentoInforme) -> str:
+    lineas = [f"# {TITULO_INFORME}", ""]
+    if documento.realizado_por.strip():
+        lineas += [f"**Realizado por:** {documento.realizado_por.strip()}", ""]
+    lineas += ["## Hallazgos ecocardiográficos", ""]
+    parrafos = parrafos_por_seccion(documento)
+    for titulo, parrafo in parrafos:
+        lineas += [f"### {titulo}", "", parrafo, ""]
+    if not parrafos:
+        lineas += [SIN_HALLAZGOS, ""]
+    if documento.comentarios_adicionales.strip():
+        lineas += ["## Conclusión / comentarios adicionales", "", documento.comentarios_adicionales.strip(), ""]
+    return "\n".join(lineas)
+
+
+@perfilar()
+def renderizar_html(documento: DocumentoInforme) -> str:
+    e = html.escape
+    partes = ["<!DOCTYPE html>", '<html lang="es">', "<head>", '<meta charset="utf-8">',
+              f"<title>{e(TITULO_INFORME)} - {e(documento.id_informe)}</title>", "</head>", "<body>",
+              f"<h1>{e(TITULO_INFORME)}</h1>"]
+    if documento.realizado_por.strip():
+        partes.append(f"<p><strong>Realizado por:</strong> {e(documento.realizado_por.strip())}</p>")
+    partes.append("<h2>Hallazgos ecocardiográficos</h2>")
+    parrafos = parrafos_por_seccion(documento)
+    for titulo, parrafo in parrafos:
+        partes.append(f'<section><h3>{e(titulo)}</h3><p>{e(parrafo)}</p></section>')
+    if not parrafos:
+        partes.append(f"<p>{e(SIN_HALLAZGOS)}</p>")
+    if documento.comentarios_adicionales.strip():
+        comentarios = e(documento.comentarios_adicionales.strip()).replace("\n", "<br>\n")
+        partes += ["<h2>Conclusión / comentarios adicionales</h2>", f"<p>{comentarios}</p>"]
+    partes += ["</body>", "</html>", ""]
+    return "\n".join(partes)
+
+
+@perfilar()
+def renderizar_json(documento: DocumentoInforme) -> str:
+    return json.dumps(documento_a_dict(documento), ensure_ascii=False, indent=2)
+
+
+# Extensión de fichero -> renderizador
+RENDERIZADORES: Dict[str, Callable[[DocumentoInforme], str]] = {
+    "txt": renderizar_texto,
+    "md": renderizar_markdown,
+    "html": renderizar_html,
+    "json": renderizar_json,
+}
@@ -2,13 +2,16 @@
 # En caso de incidencias, contactar con alejandro2196vr@gmail.com
 # -*- coding: utf-8 -*-
 """
-Lógica para generar el texto del informe estructurado
-basado en el modelo InformeEcoCompleto, en formato narrativo,
+Lógica para generar el informe estructurado basado en el modelo InformeEcoCompleto,
 considerando campos vacíos y flags "No Valorado" por parámetro.
+
+La evaluación clínica produce un DocumentoInforme (logic/documento_informe.py) con los
+hallazgos de cada sección; el texto narrativo y los demás formatos salen de ese
+documento con los renderizadores de logic/renderizadores.py.
 """
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Callable
 
-from models import (InformeEcoCompleto, MedidasVI, MedidasAuriculas, PresionesLlenadoVI, VExUSScore,
+from models import (InformeEcoCompleto,
                     P_VI_SEPTO, P_VI_PARED_POST, P_VI_DTDVI, P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE,
                     P_AI_VOL_IDX, P_VD_DIAM_BASAL, P_VD_TAPSE,
                     P_VALV_EST_AO, P_VALV_INS_AO, P_VALV_INS_MI, P_VALV_INS_TR,
@@ -22,407 +25,349 @@ from models import (InformeEcoCompleto, MedidasVI, MedidasAuriculas, PresionesLl
                     P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)
                     # Y ASEGÚRATE DE NO IMPORTAR P_VCI_COLAPSO (la antigua)
 from .calculations import calcular_clasificacion_fevi, estimar_presiones_llenado_vi, calcular_grado_vexus
+from .evolucion import PuntoEvolucion, UNIDADES_EVOLUCION, punto_evolucion, comparar
+from .documento_informe import (DocumentoInforme, SeccionInforme, Hallazgo, CabeceraPaciente,
+                                ESTADO_NO_VALORADO, ESTADO_MEDIDO, ESTADO_PRESENTE, ESTADO_AUSENTE, ESTADO_CALCULADO)
+from .renderizadores import redactar_seccion, ensamblar_texto, renderizar_texto
+from rangos_referencia import ReferenceRanges, UmbralesReferencia, RANGOS_REFERENCIA
+from utils.perfilado import perfilar
 import config
 from utils.error_handling import log_message
 
-def _format_valor_narrativo(valor, unidad="", decimales=1, default_si_none="no se especificó", prefijo_valor=" "):
-    """Formatea un valor para el informe narrativo, manejando None."""
-    if valor is None:
-        return default_si_none
-    if isinstance(valor, float):
-        return f"{prefijo_valor}{valor:.{decimales}f}{unidad}"
-    if isinstance(valor, str) and valor == "": # Manejar string vacío como no especificado
-        return default_si_none
-    return f"{prefijo_valor}{valor}{unidad}"
-
-def _construir_frase(componentes: List[str]) -> str:
-    """Une componentes en una frase, manejando comas y 'y'."""
-    componentes_validos = [c for c in componentes if c and c.strip() != ""]
-    if not componentes_validos:
-        return ""
-    if len(componentes_validos) == 1:
-        return componentes_validos[0]
-    return ", ".join(componentes_validos[:-1]) + " y " + componentes_validos[-1]
-
-# --- Funciones Helper por Sección para el Informe Narrativo ---
-
-def _narrar_vi_dimensiones(informe: InformeEcoCompleto) -> Optional[str]:
+def _hallazgo_medida(flags: Dict[str, bool], parametro: str, valor, unidad: str = "",
+                     interpretacion: Optional[str] = None) -> Optional[Hallazgo]:
+    """NV si el parámetro está marcado "No Valorado", medido si tiene valor, None si no hay nada."""
+    if flags.get(parametro): return Hallazgo(parametro, ESTADO_NO_VALORADO)
+    if valor is not None: return Hallazgo(parametro, ESTADO_MEDIDO, valor, unidad, interpretacion)
+    return None
+
+def _hallazgos_medidas(flags: Dict[str, bool], medidas) -> List[Hallazgo]:
+    """medidas: [(parámetro, valor, unidad)]; omite los que no tienen ni valor ni NV."""
+    return [h for h in (_hallazgo_medida(flags, p, v, u) for p, v, u in medidas) if h is not None]
+
+def _hallazgo_presencia(flags: Dict[str, bool], parametro: str, presente: bool, detalle: Optional[str] = None,
+                        interpretacion: Optional[str] = None) -> Hallazgo:
+    # Si está presente se describe aunque el flag NV esté marcado (el NV solo cuenta si no hay hallazgo)
+    if presente: return Hallazgo(parametro, ESTADO_PRESENTE, True, interpretacion=interpretacion, detalle=detalle)
+    if flags.get(parametro): return Hallazgo(parametro, ESTADO_NO_VALORADO)
+    return Hallazgo(parametro, ESTADO_AUSENTE, False)
+
+# --- Evaluación por sección: hallazgos estructurados, sin redacción (ver logic/renderizadores.py) ---
+
+@perfilar()
+def _evaluar_vi_dimensiones(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
     mvi = informe.medidas_vi
-    frases_dim = []
-
-    # Septo
-    if flags.get(P_VI_SEPTO): frases_dim.append("grosor del septo interventricular no valorado")
-    elif mvi.septo_iv_mm is not None: frases_dim.append(f"septo interventricular de{_format_valor_narrativo(mvi.septo_iv_mm, ' mm')}")
-    
-    # Pared Posterior
-    if flags.get(P_VI_PARED_POST): frases_dim.append("grosor de la pared posterior no valorado")
-    elif mvi.pared_posterior_vi_mm is not None: frases_dim.append(f"pared posterior de{_format_valor_narrativo(mvi.pared_posterior_vi_mm, ' mm')}")
-
-    # DTDVI
-    if flags.get(P_VI_DTDVI): frases_dim.append("DTDVI no valorado")
-    elif mvi.dtdvi_mm is not None: frases_dim.append(f"diámetro telediastólico (DTDVI) de{_format_valor_narrativo(mvi.dtdvi_mm, ' mm')}")
-
-    if not frases_dim: return None # No hay nada que decir de dimensiones
-
-    texto_principal_dim = f"El ventrículo izquierdo presenta {_construir_frase(frases_dim)}."
-    
-    # Hipertrofia (basada en las propiedades del modelo que ya consideran los datos)
-    # Solo se añade si hay datos para evaluarla y no se marcó como "no valorado" para septo/pared
-    hvi_prop_texto = mvi.hipertrofia_vi_presente # "Sí (detalles)", "No", "No valorado"
-    frase_hvi = ""
-    if not (flags.get(P_VI_SEPTO) and flags.get(P_VI_PARED_POST)): # Si al menos uno no está NV
+    hallazgos = _hallazgos_medidas(flags, ((P_VI_SEPTO, mvi.septo_iv_mm, "mm"),
+                                           (P_VI_PARED_POST, mvi.pared_posterior_vi_mm, "mm"),
+                                           (P_VI_DTDVI, mvi.dtdvi_mm, "mm")))
+    if not hallazgos: return () # No hay nada que decir de dimensiones
+
+    # Hipertrofia: solo si al menos septo o pared no están marcados como "no valorado"
+    if not (flags.get(P_VI_SEPTO) and flags.get(P_VI_PARED_POST)):
+        hvi_prop_texto = mvi.evaluar_hipertrofia_vi(umbrales) # "Sí (detalles)", "No", "No valorado"
         if hvi_prop_texto and hvi_prop_texto != "No valorado":
             if "Sí" in hvi_prop_texto:
-                frase_hvi = f" Se observan signos sugerentes de hipertrofia ventricular izquierda ({hvi_prop_texto.replace('Sí (','').replace(')','')})."
+                hallazgos.append(Hallazgo("hipertrofia_vi", ESTADO_CALCULADO, True, interpretacion="hvi",
+                                          detalle=hvi_prop_texto.replace('Sí (','').replace(')','')))
             elif "No" in hvi_prop_texto:
-                frase_hvi = " No se observan signos de hipertrofia ventricular izquierda."
-    
-    return texto_principal_dim + frase_hvi
+                hallazgos.append(Hallazgo("hipertrofia_vi", ESTADO_CALCULADO, False, interpretacion="sin_hvi"))
+    return tuple(hallazgos)
 
-def _narrar_fevi(informe: InformeEcoCompleto) -> Optional[str]:
+@perfilar()
+def _evaluar_fevi(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
     mvi = informe.medidas_vi
-    frases_fevi = []
-
-    # FEVI Cualitativa
-    if flags.get(P_FEVI_CUALITATIVA): frases_fevi.append("estimación visual cualitativa de FEVI no valorada")
-    elif mvi.fevi_cualitativa and mvi.fevi_cualitativa != "No Estimar": # "No Estimar" se omite
-        frases_fevi.append(f"una estimación visual cualitativa {mvi.fevi_cualitativa.lower()}")
-
-    # FEVI Cuantitativa
-    if flags.get(P_FEVI_PORCENTAJE): frases_fevi.append("FEVI cuantitativa no valorada")
-    elif mvi.fevi_porcentaje is not None:
-        frases_fevi.append(f"una FEVI cuantitativa del{_format_valor_narrativo(mvi.fevi_porcentaje, '%', 0)}")
+    fevi_cualitativa = mvi.fevi_cualitativa if mvi.fevi_cualitativa != "No Estimar" else None # "No Estimar" se omite
+    hallazgos = _hallazgos_medidas(flags, ((P_FEVI_CUALITATIVA, fevi_cualitativa or None, ""),
+                                           (P_FEVI_PORCENTAJE, mvi.fevi_porcentaje, "%")))
+    if not hallazgos: return ()
 
-    if not frases_fevi: return None
-
-    texto_base_fevi = f"En cuanto a la función sistólica del ventrículo izquierdo, se objetiva {_construir_frase(frases_fevi)}."
-    
-    # Clasificación FEVI
-    # Solo se añade si hay datos para la clasificación y la FEVI no está marcada como no valorada.
-    # (Asumimos que calcular_clasificacion_fevi necesita al menos el porcentaje o cualitativa)
+    # Clasificación FEVI, salvo que ambas estimaciones estén marcadas como no valoradas
     if not (flags.get(P_FEVI_CUALITATIVA) and flags.get(P_FEVI_PORCENTAJE)):
-        clasif_fevi = calcular_clasificacion_fevi(mvi, informe.medidas_auriculas)
+        clasif_fevi = calcular_clasificacion_fevi(mvi, informe.medidas_auriculas, umbrales)
         if clasif_fevi and clasif_fevi != "No valorada": # "No valorada" es el default de la función de cálculo
-            return texto_base_fevi + f" Esto corresponde a una {clasif_fevi.lower()}."
-    
-    return texto_base_fevi
-
-def _narrar_ai_volumen(informe: InformeEcoCompleto) -> Optional[str]:
-    flags = informe.param_no_valorado_flags
-    mai = informe.medidas_auriculas
-
-    if flags.get(P_AI_VOL_IDX): return "El volumen de la aurícula izquierda no fue valorado."
-    if mai.ai_vol_ml_m2 is not None:
-        dilatada_texto = ""
-        if mai.ai_vol_ml_m2 > getattr(config, 'AI_VOL_IDX_NORMAL_MAX_RS', 34): # Umbral de config
-            dilatada_texto = ", sugestivo de dilatación auricular izquierda"
-        return f"La aurícula izquierda presenta un volumen indexado de{_format_valor_narrativo(mai.ai_vol_ml_m2, ' ml/m²')}{dilatada_texto}."
-    return None
-
-def _narrar_vd_funcion(informe: InformeEcoCompleto) -> Optional[str]:
+            hallazgos.append(Hallazgo("clasificacion_fevi", ESTADO_CALCULADO, clasif_fevi))
+    return tuple(hallazgos)
+
+@perfilar()
+def _evaluar_ai_volumen(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
+    vol = informe.medidas_auriculas.ai_vol_ml_m2
+    interpretacion = None
+    if vol is not None:
+        interpretacion = "dilatada" if vol > umbrales.ai_vol_idx_normal_max_rs else "normal"
+    h = _hallazgo_medida(informe.param_no_valorado_flags, P_AI_VOL_IDX, vol, "ml/m²", interpretacion)
+    return (h,) if h else ()
+
+@perfilar()
+def _evaluar_vd_funcion(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
     mvd = informe.medidas_vd
-    frases_vd = []
-
-    # Diámetro Basal VD
-    if flags.get(P_VD_DIAM_BASAL): frases_vd.append("diámetro basal del VD no valorado")
-    elif mvd.vd_diametro_basal_mm is not None:
-        dilatacion_prop = mvd.vd_dilatado # "Sí", "No", "No valorado"
-        texto_diam = f"diámetro basal del ventrículo derecho de{_format_valor_narrativo(mvd.vd_diametro_basal_mm, ' mm')}"
-        if dilatacion_prop == "Sí": texto_diam += " (dilatado)"
-        elif dilatacion_prop == "No": texto_diam += " (no dilatado)"
-        frases_vd.append(texto_diam)
-
-    # TAPSE
-    if flags.get(P_VD_TAPSE): frases_vd.append("TAPSE no valorado")
-    elif mvd.tapse_mm is not None:
-        tapse_prop = mvd.tapse_disminuido
-        texto_tapse = f"TAPSE de{_format_valor_narrativo(mvd.tapse_mm, ' mm')}"
-        if tapse_prop == "Sí": texto_tapse += " (disminuido, sugiere disfunción sistólica del VD)"
-        elif tapse_prop == "No": texto_tapse += " (conservado)"
-        frases_vd.append(texto_tapse)
-    
-    if not frases_vd: return None
-    return f"Respecto al ventrículo derecho, se observa {_construir_frase(frases_vd)}."
-
-
-def _narrar_valvulopatias(informe: InformeEcoCompleto) -> Optional[str]:
+    dilatacion = {"Sí": "dilatado", "No": "no_dilatado"}.get(mvd.evaluar_dilatacion(umbrales))
+    tapse = {"Sí": "disminuido", "No": "conservado"}.get(mvd.evaluar_tapse(umbrales))
+    return tuple(h for h in (_hallazgo_medida(flags, P_VD_DIAM_BASAL, mvd.vd_diametro_basal_mm, "mm", dilatacion),
+                             _hallazgo_medida(flags, P_VD_TAPSE, mvd.tapse_mm, "mm", tapse)) if h)
+
+@perfilar()
+def _evaluar_valvulopatias(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
     valv = informe.valvulopatias
-    sigs_encontradas = []
-    no_valoradas = []
-
-    if flags.get(P_VALV_EST_AO): no_valoradas.append("estenosis aórtica")
-    elif valv.estenosis_aortica_sig: sigs_encontradas.append("estenosis aórtica significativa")
-    
-    if flags.get(P_VALV_INS_AO): no_valoradas.append("insuficiencia aórtica")
-    elif valv.insuficiencia_aortica_sig: sigs_encontradas.append("insuficiencia aórtica significativa")
-
-    if flags.get(P_VALV_INS_MI): no_valoradas.append("insuficiencia mitral")
-    elif valv.insuficiencia_mitral_sig: sigs_encontradas.append("insuficiencia mitral significativa")
-
-    if flags.get(P_VALV_INS_TR): no_valoradas.append("insuficiencia tricuspídea")
-    elif valv.insuficiencia_tricuspidea_sig: sigs_encontradas.append("insuficiencia tricuspídea significativa")
-
-    frases_valv = []
-    if sigs_encontradas:
-        frases_valv.append(f"Se identifican: {_construir_frase(sigs_encontradas)}.")
-    elif not no_valoradas and not flags.get(P_VALV_EST_AO) and not flags.get(P_VALV_INS_AO) and not flags.get(P_VALV_INS_MI) and not flags.get(P_VALV_INS_TR): # Todos los checkboxes de valvulopatía fueron evaluados (no NV) y ninguno se marcó
-        frases_valv.append("No se identificaron valvulopatías significativas.")
-        
-    if no_valoradas:
-        frases_valv.append(f"La valoración detallada de {_construir_frase(no_valoradas)} no se realizó o no fue concluyente.")
-        
-    return " ".join(frases_valv) if frases_valv else None
-
-
-def _narrar_presiones_llenado(informe: InformeEcoCompleto) -> Optional[str]:
+    hallazgos = []
+    for parametro, significativa in ((P_VALV_EST_AO, valv.estenosis_aortica_sig), (P_VALV_INS_AO, valv.insuficiencia_aortica_sig),
+                                     (P_VALV_INS_MI, valv.insuficiencia_mitral_sig), (P_VALV_INS_TR, valv.insuficiencia_tricuspidea_sig)):
+        if flags.get(parametro): hallazgos.append(Hallazgo(parametro, ESTADO_NO_VALORADO))
+        elif significativa: hallazgos.append(Hallazgo(parametro, ESTADO_PRESENTE, True, interpretacion="significativa"))
+        else: hallazgos.append(Hallazgo(parametro, ESTADO_AUSENTE, False))
+    return tuple(hallazgos)
+
+@perfilar()
+def _evaluar_presiones_llenado(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
     pres_llen = informe.presiones_llenado
-    
-    # Comprobar si todos los parámetros individuales de presiones de llenado están marcados como NV
-    todos_nv = all(flags.get(k, False) for k in [P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL])
-    # Comprobar si todos los parámetros individuales de presiones de llenado son None (no introducidos)
-    todos_none = all(getattr(pres_llen, attr) is None for attr in ["mitral_e_a_ratio", "e_prima_septal_cms", "e_prima_lateral_cms", "it_velocidad_max_ms"])
+    parametros = [P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL]
 
+    # Todos los parámetros individuales marcados como NV
+    if all(flags.get(k, False) for k in parametros):
+        return tuple(Hallazgo(k, ESTADO_NO_VALORADO) for k in parametros)
+    # Ningún dato introducido y ninguno marcado como NV individualmente: se omite la sección
+    todos_none = all(getattr(pres_llen, attr) is None for attr in ["mitral_e_a_ratio", "e_prima_septal_cms", "e_prima_lateral_cms", "it_velocidad_max_ms"])
+    if todos_none and not any(flags.get(k, False) for k in parametros):
+        return ()
 
-    if todos_nv: return "La estimación de presiones de llenado del VI no fue valorada."
-    if todos_none and not any(flags.get(k, False) for k in [P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL]):
-        # Ningún dato introducido y ninguno marcado como NV individualmente
-        return None # Omitir la sección si no hay datos ni se marcó como NV
+    hallazgos = _hallazgos_medidas(flags, ((P_PRES_LLEN_E_A, pres_llen.mitral_e_a_ratio, ""),
+                                           (P_PRES_LLEN_E_SEPTAL, pres_llen.e_prima_septal_cms, "cm/s"),
+                                           (P_PRES_LLEN_E_LATERAL, pres_llen.e_prima_lateral_cms, "cm/s"),
+                                           (P_PRES_LLEN_IT_VEL, pres_llen.it_velocidad_max_ms, "m/s")))
+    if pres_llen.e_sobre_e_prima_ratio is not None: # Entra en la estimación aunque no se narre
+        hallazgos.append(Hallazgo(P_PRES_LLEN_E_E_PRIMA_RATIO, ESTADO_MEDIDO, pres_llen.e_sobre_e_prima_ratio))
 
-    texto_estimacion = estimar_presiones_llenado_vi(pres_llen, informe.medidas_auriculas)
-    
-    frase_resultado = ""
+    texto_estimacion = estimar_presiones_llenado_vi(pres_llen, informe.medidas_auriculas, umbrales)
     if texto_estimacion and "Error" not in texto_estimacion and texto_estimacion != "No valoradas (E/A no disponible)":
-        frase_resultado = f"La estimación de las presiones de llenado del ventrículo izquierdo sugiere: {texto_estimacion.lower()}."
-    
-    # Añadir detalles de los parámetros si fueron valorados
-    detalles_params = []
-    if not flags.get(P_PRES_LLEN_E_A) and pres_llen.mitral_e_a_ratio is not None:
-        detalles_params.append(f"ratio E/A mitral de{_format_valor_narrativo(pres_llen.mitral_e_a_ratio, decimales=2)}")
-    if not flags.get(P_PRES_LLEN_E_SEPTAL) and pres_llen.e_prima_septal_cms is not None:
-        detalles_params.append(f"e' septal de{_format_valor_narrativo(pres_llen.e_prima_septal_cms, ' cm/s')}")
-    if not flags.get(P_PRES_LLEN_E_LATERAL) and pres_llen.e_prima_lateral_cms is not None:
-        detalles_params.append(f"e' lateral de{_format_valor_narrativo(pres_llen.e_prima_lateral_cms, ' cm/s')}")
-    if not flags.get(P_PRES_LLEN_IT_VEL) and pres_llen.it_velocidad_max_ms is not None:
-        detalles_params.append(f"velocidad máxima de IT de{_format_valor_narrativo(pres_llen.it_velocidad_max_ms, ' m/s')}")
-
-    if frase_resultado and detalles_params:
-        return f"{frase_resultado} Basado en: {_construir_frase(detalles_params)}."
-    elif frase_resultado:
-        return frase_resultado
-    elif detalles_params: # Hay datos pero la estimación no fue concluyente
-        return f"Se valoraron los siguientes parámetros para presiones de llenado: {_construir_frase(detalles_params)}, sin una estimación concluyente."
-    
-    return None
+        hallazgos.append(Hallazgo("estimacion_presiones_llenado", ESTADO_CALCULADO, texto_estimacion))
+    return tuple(hallazgos)
 
+_GRADOS_DERRAME = ("Leve", "Moderado", "Severo")
 
-def _narrar_derrames_y_lineasb(informe: InformeEcoCompleto) -> Optional[str]:
+@perfilar()
+def _evaluar_derrames_y_lineasb(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
-    frases_total = []
+    hallazgos = []
 
     # Derrame Pericárdico
-    dp_presente_nv = flags.get(P_DERR_PERIC_PRESENTE, False)
-    dp_cuantia_nv = flags.get(P_DERR_PERIC_CUANTIA, False)
     dper = informe.derrame_pericardico
-    
-    if dp_presente_nv and dp_cuantia_nv : # Ambos NV
-        frases_total.append("Derrame pericárdico no valorado.")
+    if flags.get(P_DERR_PERIC_PRESENTE, False) and flags.get(P_DERR_PERIC_CUANTIA, False): # Ambos NV
+        hallazgos += [Hallazgo(P_DERR_PERIC_PRESENTE, ESTADO_NO_VALORADO), Hallazgo(P_DERR_PERIC_CUANTIA, ESTADO_NO_VALORADO)]
     else:
-        if dper.presente:
-            clasif_texto = dper.clasificacion.lower().replace("sí, ", "") # "leve (x mm)"
-            frases_total.append(f"Se observa derrame pericárdico {clasif_texto}.")
-        elif not dp_presente_nv : # Se valoró "presente" y fue False
-            frases_total.append("No se objetiva derrame pericárdico.")
-        # Si "presente" es NV pero "cuantía" no, o viceversa, es un estado mixto un poco raro.
-        # Se podría refinar, pero por ahora si uno de los dos se valoró, se intenta describir.
+        clasificacion = dper.clasificar(umbrales) if dper.presente else None # "Sí, Leve (x mm)"
+        hallazgos.append(_hallazgo_presencia(
+            flags, P_DERR_PERIC_PRESENTE, dper.presente,
+            detalle=clasificacion.lower().replace("sí, ", "") if clasificacion else None,
+            interpretacion=next((g.lower() for g in _GRADOS_DERRAME if clasificacion and g in clasificacion), None)))
+        h = _hallazgo_medida(flags, P_DERR_PERIC_CUANTIA, dper.cuantia_mm if dper.presente else None, "mm")
+        if h: hallazgos.append(h)
 
     # Líneas B
-    lb_presente_nv = flags.get(P_LINEAS_B_PRESENTE, False)
-    lb_desc_nv = flags.get(P_LINEAS_B_DESC, False)
     lineas_b_obj = informe.lineas_b
-
-    if lb_presente_nv and lb_desc_nv:
-        frases_total.append("Líneas B no valoradas.")
+    lb_desc_nv = flags.get(P_LINEAS_B_DESC, False)
+    if flags.get(P_LINEAS_B_PRESENTE, False) and lb_desc_nv:
+        hallazgos += [Hallazgo(P_LINEAS_B_PRESENTE, ESTADO_NO_VALORADO), Hallazgo(P_LINEAS_B_DESC, ESTADO_NO_VALORADO)]
     else:
-        if lineas_b_obj.presentes:
-            texto_lb = "Presencia de líneas B"
-            if not lb_desc_nv and lineas_b_obj.descripcion_hallazgos and lineas_b_obj.descripcion_hallazgos.strip() != "":
-                texto_lb += f": {lineas_b_obj.descripcion_hallazgos.strip()}."
-            else:
-                texto_lb += " sugestivas de congestión intersticial."
-            frases_total.append(texto_lb)
-        elif not lb_presente_nv: # Se valoró y no hay
-            frases_total.append("No se identifican líneas B patológicas.")
+        hallazgos.append(_hallazgo_presencia(flags, P_LINEAS_B_PRESENTE, lineas_b_obj.presentes))
+        descripcion = (lineas_b_obj.descripcion_hallazgos or "").strip() if lineas_b_obj.presentes else ""
+        h = _hallazgo_medida(flags, P_LINEAS_B_DESC, descripcion or None)
+        if h: hallazgos.append(h)
 
     # Derrame Pleural
-    dpl_presente_nv = flags.get(P_DERR_PLEURAL_PRESENTE, False)
-    dpl_tipo_nv = flags.get(P_DERR_PLEURAL_TIPO, False)
-    dpl_loc_nv = flags.get(P_DERR_PLEURAL_LOC, False)
     dple = informe.derrame_pleural
-
-    if dpl_presente_nv and dpl_tipo_nv and dpl_loc_nv:
-        frases_total.append("Derrame pleural no valorado.")
+    claves_pleural = (P_DERR_PLEURAL_PRESENTE, P_DERR_PLEURAL_TIPO, P_DERR_PLEURAL_LOC)
+    if all(flags.get(k, False) for k in claves_pleural):
+        hallazgos += [Hallazgo(k, ESTADO_NO_VALORADO) for k in claves_pleural]
     else:
-        if dple.presente:
-            texto_dple = "Derrame pleural"
-            detalles_dple = []
-            if not dpl_tipo_nv and dple.tipo_cuantificacion: detalles_dple.append(dple.tipo_cuantificacion.lower())
-            if not dpl_loc_nv and dple.localizacion: detalles_dple.append(dple.localizacion.lower())
-            if detalles_dple: texto_dple += f" {' y '.join(detalles_dple)}."
-            else: texto_dple += " presente (detalles no especificados)."
-            frases_total.append(texto_dple)
-        elif not dpl_presente_nv:
-            frases_total.append("No se evidencia derrame pleural.")
-            
-    return " ".join(frases_total) if frases_total else None
-
-
-def _narrar_congestion_sistemica(informe: InformeEcoCompleto) -> Optional[str]:
+        hallazgos.append(_hallazgo_presencia(flags, P_DERR_PLEURAL_PRESENTE, dple.presente))
+        hallazgos += _hallazgos_medidas(flags, ((P_DERR_PLEURAL_TIPO, (dple.tipo_cuantificacion or None) if dple.presente else None, ""),
+                                                (P_DERR_PLEURAL_LOC, (dple.localizacion or None) if dple.presente else None, "")))
+    return tuple(hallazgos)
+
+_PATRONES_VEXUS = ((P_VEXUS_VSH, "patron_vena_suprahepatica", config.VSH_PATRONES),
+                   (P_VEXUS_VP, "patron_vena_porta", config.VP_PATRONES),
+                   (P_VEXUS_VIR, "patron_vena_intrarrenal", config.VIR_PATRONES))
+
+@perfilar()
+def _evaluar_congestion_sistemica(informe: InformeEcoCompleto, umbrales: UmbralesReferencia) -> Tuple[Hallazgo, ...]:
     flags = informe.param_no_valorado_flags
-    frases_sist = []
-    vci = informe.vci # Acceder al objeto VenaCavaInferior del informe
+    vci = informe.vci
+    hallazgos = []
 
-    # VCI
+    # VCI: diámetro máximo, colapso >50% / <50% y mm en inspiración, cada uno con su flag NV
     vci_diam_nv = flags.get(P_VCI_DIAM, False)
-    # Para el colapso, ahora son dos campos en el modelo: colapso_mayor_50 (bool) y mm_inspiracion (float)
-    # y dos flags de "No Valorado": P_VCI_COLAPSO_RADIO y P_VCI_MM_INSPIRACION
     vci_col_radio_nv = flags.get(P_VCI_COLAPSO_RADIO, False)
-    vci_mm_insp_nv = flags.get(P_VCI_MM_INSPIRACION, False)
-
-    # Si todos los componentes de la VCI están marcados como NV
-    if vci_diam_nv and vci_col_radio_nv and vci_mm_insp_nv:
-        frases_sist.append("Vena cava inferior no valorada.")
-    else:
-        # La propiedad hallazgos_vci en models.VenaCavaInferior ya debería estar construyendo
-        # un texto descriptivo adecuado usando vci.diametro_max_mm, vci.colapso_mayor_50, y vci.mm_inspiracion.
-        # Solo necesitamos asegurar que si un componente individual fue marcado NV, se refleje.
-
-        partes_vci_narradas = []
-        # Diámetro
-        if vci_diam_nv:
-            partes_vci_narradas.append("diámetro máximo no valorado")
-        elif vci.diametro_max_mm is not None:
-            partes_vci_narradas.append(f"diámetro máximo de {_format_valor_narrativo(vci.diametro_max_mm, ' mm', prefijo_valor='')}")
-
-        # Colapso (Radio)
-        if vci_col_radio_nv:
-            partes_vci_narradas.append("colapso inspiratorio no valorado")
-        elif vci.colapso_mayor_50 is not None:
-            partes_vci_narradas.append(f"colapso inspiratorio {'>50%' if vci.colapso_mayor_50 else '<50%'}")
-
-        # mm Inspiración
-        if vci_mm_insp_nv:
-            partes_vci_narradas.append("diámetro en inspiración no valorado")
-        elif vci.mm_inspiracion is not None:
-            partes_vci_narradas.append(f"diámetro en inspiración de {_format_valor_narrativo(vci.mm_inspiracion, ' mm', prefijo_valor='')}")
-
-        if partes_vci_narradas:
-            texto_vci = f"La vena cava inferior presenta {_construir_frase(partes_vci_narradas)}."
-            # Añadir interpretación de PVC si hay suficientes datos y no están NV
-            if not vci_diam_nv and not vci_col_radio_nv and \
-               vci.diametro_max_mm is not None and vci.colapso_mayor_50 is not None:
-                diam_pat_vci = getattr(config, 'VCI_DIAMETRO_PATOLOGICO_PVC', 21)
-                colapso_problematico = not vci.colapso_mayor_50 # <50% es problemático si VCI dilatada
-
-                if vci.diametro_max_mm > diam_pat_vci and colapso_problematico:
-                    texto_vci += " Sugestiva de PVC elevada."
-                else:
-                    texto_vci += " No sugestiva de PVC elevada."
-            frases_sist.append(texto_vci)
-        elif not (vci_diam_nv and vci_col_radio_nv and vci_mm_insp_nv): # Si no todos NV pero no se pudo narrar
-             frases_sist.append("Valoración de la VCI incompleta.")
-
-
-    # VExUS (esta parte debería estar bien si las P_... para VExUS son correctas)
-    vexus_vci_dil_nv = flags.get(P_VEXUS_VCI_DILATADA, False)
-    vexus_vsh_nv = flags.get(P_VEXUS_VSH, False)
-    vexus_vp_nv = flags.get(P_VEXUS_VP, False)
-    vexus_vir_nv = flags.get(P_VEXUS_VIR, False)
-
-    if all([vexus_vci_dil_nv, vexus_vsh_nv, vexus_vp_nv, vexus_vir_nv]):
-        frases_sist.append("Score VExUS no calculado (parámetros no valorados).")
-    else:
-        # Asegurarse que el modelo VExUS tiene los datos antes de calcular
-        if not vexus_vci_dil_nv : informe.vexus.vci_patologica_vexus # Ya debería estar en el modelo
-        # ... (los patrones venosos ya deberían estar en informe.vexus desde la UI)
-
-        grado_calc = calcular_grado_vexus(informe.vexus) # La función de cálculo usa los datos del modelo
-        if grado_calc is not None and grado_calc != -1: # -1 podría indicar error/insuficiente
-            frases_sist.append(f"El score VExUS para congestión sistémica es de grado {grado_calc}.")
-            if grado_calc > 0:
-                detalles_vexus = []
-                if not vexus_vsh_nv and informe.vexus.patron_vena_suprahepatica and informe.vexus.patron_vena_suprahepatica != getattr(config, 'VSH_PATRONES', [""])[0]:
-                    detalles_vexus.append(f"V. Suprahepática con patrón {informe.vexus.patron_vena_suprahepatica.split('(')[0].lower().strip()}")
-                if not vexus_vp_nv and informe.vexus.patron_vena_porta and informe.vexus.patron_vena_porta != getattr(config, 'VP_PATRONES', [""])[0]:
-                    detalles_vexus.append(f"V. Porta con patrón {informe.vexus.patron_vena_porta.split('(')[0].lower().strip()}")
-                if not vexus_vir_nv and informe.vexus.patron_vena_intrarrenal and informe.vexus.patron_vena_intrarrenal != getattr(config, 'VIR_PATRONES', [""])[0]:
-                    detalles_vexus.append(f"V. Intrarrenal con patrón {informe.vexus.patron_vena_intrarrenal.split('(')[0].lower().strip()}")
-                if detalles_vexus: frases_sist.append(f"Hallazgos contribuyentes: {_construir_frase(detalles_vexus)}.")
-        elif not all([vexus_vci_dil_nv, vexus_vsh_nv, vexus_vp_nv, vexus_vir_nv]):
-             frases_sist.append("Datos para VExUS incompletos para un cálculo definitivo.")
-
-    return " ".join(frases_sist) if frases_sist else None
-
-
-def generar_informe_texto(informe: InformeEcoCompleto) -> str:
+    hallazgos += _hallazgos_medidas(flags, ((P_VCI_DIAM, vci.diametro_max_mm, "mm"),
+                                            (P_VCI_COLAPSO_RADIO, vci.colapso_mayor_50, ""),
+                                            (P_VCI_MM_INSPIRACION, vci.mm_inspiracion, "mm")))
+    # Interpretación de PVC si hay diámetro y colapso valorados
+    if not vci_diam_nv and not vci_col_radio_nv and vci.diametro_max_mm is not None and vci.colapso_mayor_50 is not None:
+        # <50% de colapso es problemático si la VCI está dilatada
+        pvc_elevada = vci.diametro_max_mm > umbrales.vci_diametro_patologico_mm and not vci.colapso_mayor_50
+        hallazgos.append(Hallazgo("pvc_elevada", ESTADO_CALCULADO, pvc_elevada,
+                                  interpretacion="pvc_elevada" if pvc_elevada else "pvc_no_elevada"))
+
+    # VExUS
+    claves_vexus = (P_VEXUS_VCI_DILATADA,) + tuple(clave for clave, _, _ in _PATRONES_VEXUS)
+    if all(flags.get(k, False) for k in claves_vexus):
+        hallazgos += [Hallazgo(k, ESTADO_NO_VALORADO) for k in claves_vexus]
+        return tuple(hallazgos)
+
+    grado_calc = calcular_grado_vexus(informe.vexus) # La función de cálculo usa los datos del modelo
+    grado_valido = grado_calc is not None and grado_calc != -1 # -1 indica error/datos insuficientes
+    h = _hallazgo_medida(flags, P_VEXUS_VCI_DILATADA, informe.vexus.vci_patologica_vexus)
+    if h: hallazgos.append(h)
+    for clave, atributo, patrones in _PATRONES_VEXUS:
+        patron = getattr(informe.vexus, atributo)
+        contribuyente = grado_valido and grado_calc > 0 and bool(patron) and patron != patrones[0]
+        h = _hallazgo_medida(flags, clave, patron or None, interpretacion="contribuyente" if contribuyente else None)
+        if h: hallazgos.append(h)
+    hallazgos.append(Hallazgo("grado_vexus", ESTADO_CALCULADO, grado_calc if grado_valido else None))
+    return tuple(hallazgos)
+
+
+# --- Tabla de secciones del informe ---
+# (clave, título, función evaluadora, sub-modelos del informe que lee, flags "No Valorado" que consulta).
+# Las dependencias declaradas permiten reutilizar una sección mientras no cambien ni sus
+# sub-modelos (por versión) ni sus flags (GeneradorInformeIncremental).
+# Todas las evaluadoras reciben además los umbrales del sexo del paciente.
+_SECCIONES: Tuple[Tuple[str, str, Callable[[InformeEcoCompleto, UmbralesReferencia], Tuple[Hallazgo, ...]], Tuple[str, ...], Tuple[str, ...]], ...] = (
+    ("vi_dimensiones", "Dimensiones del ventrículo izquierdo", _evaluar_vi_dimensiones, ("medidas_vi",),
+     (P_VI_SEPTO, P_VI_PARED_POST, P_VI_DTDVI)),
+    ("fevi", "Función sistólica del ventrículo izquierdo", _evaluar_fevi, ("medidas_vi", "medidas_auriculas"),
+     (P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE)),
+    ("ai_volumen", "Aurícula izquierda", _evaluar_ai_volumen, ("medidas_auriculas",), (P_AI_VOL_IDX,)),
+    ("vd_funcion", "Ventrículo derecho", _evaluar_vd_funcion, ("medidas_vd",), (P_VD_DIAM_BASAL, P_VD_TAPSE)),
+    ("valvulopatias", "Valvulopatías", _evaluar_valvulopatias, ("valvulopatias",),
+     (P_VALV_EST_AO, P_VALV_INS_AO, P_VALV_INS_MI, P_VALV_INS_TR)),
+    ("presiones_llenado", "Presiones de llenado del ventrículo izquierdo", _evaluar_presiones_llenado,
+     ("presiones_llenado", "medidas_auriculas"),
+     (P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL)),
+    ("derrames_lineas_b", "Derrames y líneas B", _evaluar_derrames_y_lineasb,
+     ("derrame_pericardico", "lineas_b", "derrame_pleural"),
+     (P_DERR_PERIC_PRESENTE, P_DERR_PERIC_CUANTIA, P_LINEAS_B_PRESENTE, P_LINEAS_B_DESC,
+      P_DERR_PLEURAL_PRESENTE, P_DERR_PLEURAL_TIPO, P_DERR_PLEURAL_LOC)),
+    ("congestion_sistemica", "Congestión sistémica (VCI y VExUS)", _evaluar_congestion_sistemica, ("vci", "vexus"),
+     (P_VCI_DIAM, P_VCI_COLAPSO_RADIO, P_VCI_MM_INSPIRACION, P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR)),
+)
+
+
+# --- Evolución respecto al estudio previo del paciente (logic/evolucion.py) ---
+# No está en _SECCIONES: solo se añade cuando se indica el punto del estudio previo.
+CLAVE_EVOLUCION = "evolucion"
+TITULO_EVOLUCION = "Evolución respecto al estudio previo"
+
+@perfilar()
+def _evaluar_evolucion(informe: InformeEcoCompleto, umbrales: UmbralesReferencia,
+                       previo: PuntoEvolucion) -> Tuple[Hallazgo, ...]:
+    actual = punto_evolucion(informe, umbrales)
+    cambios, sin_cambios = comparar(previo, actual)
+    if not cambios and not sin_cambios: return () # Ningún parámetro valorado en ambos estudios
+    hallazgos = [Hallazgo("estudio_previo", ESTADO_CALCULADO, previo.fecha_estudio, detalle=previo.id_informe)]
+    hallazgos += [Hallazgo(c.clave, ESTADO_CALCULADO, c.valor_actual, c.unidad, "cambio", valor_anterior=c.valor_anterior)
+                  for c in cambios]
+    hallazgos += [Hallazgo(clave, ESTADO_CALCULADO, actual.valores[clave], UNIDADES_EVOLUCION[clave], "sin_cambios",
+                           valor_anterior=previo.valores[clave]) for clave in sin_cambios]
+    return tuple(hallazgos)
+
+def _seccion_evolucion(informe: InformeEcoCompleto, umbrales: UmbralesReferencia,
+                       previo: Optional[PuntoEvolucion]) -> Tuple[SeccionInforme, ...]:
+    if previo is None: return ()
+    return (SeccionInforme(CLAVE_EVOLUCION, TITULO_EVOLUCION, _evaluar_evolucion(informe, umbrales, previo)),)
+
+
+def _documento(informe: InformeEcoCompleto, secciones: Tuple[SeccionInforme, ...]) -> DocumentoInforme:
+    return DocumentoInforme(id_informe=informe.id_informe, fecha_estudio=informe.paciente.fecha_estudio,
+                            realizado_por=informe.realizado_por or "",
+                            comentarios_adicionales=informe.comentarios_adicionales or "",
+                            secciones=secciones,
+                            paciente=CabeceraPaciente(nhc=informe.paciente.nhc or "", nombre=informe.paciente.nombre or "",
+                                                      apellidos=informe.paciente.apellidos or "", sexo=informe.paciente.sexo or ""))
+
+
+@perfilar()
+def construir_documento(informe: InformeEcoCompleto, rangos: Optional[ReferenceRanges] = None,
+                        previo: Optional[PuntoEvolucion] = None) -> DocumentoInforme:
+    """Evalúa el estudio una vez y devuelve su DocumentoInforme. 'rangos' permite usar
+    otros valores de referencia (por defecto, los de config). Con 'previo' (el punto de
+    evolución del estudio anterior del paciente) se añade la sección de evolución.
+    Los errores se propagan."""
+    umbrales = (rangos or RANGOS_REFERENCIA).para_sexo(informe.paciente.sexo)
+    return _documento(informe, tuple(SeccionInforme(clave, titulo, evaluar(informe, umbrales))
+                                     for clave, titulo, evaluar, _submodelos, _flags in _SECCIONES)
+                      + _seccion_evolucion(informe, umbrales, previo))
+
+
+@perfilar()
+def generar_informe_texto(informe: InformeEcoCompleto, rangos: Optional[ReferenceRanges] = None,
+                          previo: Optional[PuntoEvolucion] = None) -> str:
+    """Texto del informe. 'rangos' permite usar otros valores de referencia (por defecto, los de config)."""
     try:
-        parrafos_finales = []
-        parrafos_finales.append("INFORME DE ECOCARDIOSCOPIA CLÍNICA A PIE DE CAMA")
-        parrafos_finales.append("==============================================")
-
-        if informe.realizado_por and informe.realizado_por.strip() != "":
-            parrafos_finales.append(f"Realizado por: {informe.realizado_por.strip()}\n")
-        
-        # --- Construcción del cuerpo del informe ---
-        cuerpo_informe = []
-        
-        parrafo_vi = _narrar_vi_dimensiones(informe)
-        if parrafo_vi: cuerpo_informe.append(parrafo_vi)
-        
-        parrafo_fevi = _narrar_fevi(informe) # FEVI ahora es parte de _narrar_vi, o puede ser separada
-        # Si _narrar_vi ya incluye FEVI, no llamar a _narrar_fevi por separado.
-        # Ajustado arriba: _narrar_vi incluye dimensiones y _narrar_fevi la función.
-        if parrafo_fevi: cuerpo_informe.append(parrafo_fevi)
-        
-        parrafo_ai = _narrar_ai_volumen(informe)
-        if parrafo_ai: cuerpo_informe.append(parrafo_ai)
-        
-        parrafo_vd = _narrar_vd_funcion(informe)
-        if parrafo_vd: cuerpo_informe.append(parrafo_vd)
-        
-        parrafo_valv = _narrar_valvulopatias(informe)
-        if parrafo_valv: cuerpo_informe.append(parrafo_valv)
-        
-        parrafo_pres_llen = _narrar_presiones_llenado(informe)
-        if parrafo_pres_llen: cuerpo_informe.append(parrafo_pres_llen)
-        
-        parrafo_derrames_lineasb = _narrar_derrames_y_lineasb(informe) # Combina varios ahora
-        if parrafo_derrames_lineasb: cuerpo_informe.append(parrafo_derrames_lineasb)
-        
-        parrafo_cong_sist = _narrar_congestion_sistemica(informe)
-        if parrafo_cong_sist: cuerpo_informe.append(parrafo_cong_sist)
-
-        if cuerpo_informe: # Si hay algún hallazgo que reportar
-            parrafos_finales.append("\n--- HALLAZGOS ECOCARDIOGRÁFICOS ---")
-            parrafos_finales.append("\n\n".join(cuerpo_informe)) # Unir párrafos de hallazgos con doble salto
-        else: # Si todo se omitió o estaba NV y no generó texto.
-            parrafos_finales.append("\nNo se detallaron hallazgos ecocardiográficos específicos o todos los apartados fueron omitidos/no valorados.")
-
-
-        if informe.comentarios_adicionales and informe.comentarios_adicionales.strip() != "":
-            parrafos_finales.append("\n\n--- CONCLUSIÓN / COMENTARIOS ADICIONALES ---")
-            parrafos_finales.append(informe.comentarios_adicionales.strip())
-        
-        parrafos_finales.append("\n==============================================")
-        
+        texto = renderizar_texto(construir_documento(informe, rangos, previo))
         log_message("Informe de texto en formato párrafo (nueva lógica) generado.", "info")
-        
-        return "\n".join(parrafos_finales).strip()
+        return texto
 
     except Exception as e:
         log_message(f"Error crítico generando informe (nueva lógica): {e}", "error", exc_info=True)
-        return f"ERROR AL GENERAR EL INFORME:\n{e}\n\nConsulte el log."
\ No newline at end of file
+        return f"ERROR AL GENERAR EL INFORME:\n{e}\n\nConsulte el log."
+
+
+class GeneradorInformeIncremental:
+    """
+    Generador de informes con memoización por sección, pensado para la previsualización.
+    Cada sección se evalúa y redacta de nuevo solo si ha cambiado la versión de alguno de
+    sus sub-modelos, alguno de sus flags "No Valorado" o los umbrales aplicados (sexo); el
+    resto se reutiliza desde la caché y se reensambla con la cabecera y los comentarios actuales.
+    Produce exactamente el mismo texto que generar_informe_texto.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[tuple, SeccionInforme, Optional[str]]] = {}
+        self.secciones_recalculadas: List[str] = [] # De la última generación (diagnóstico)
+        self.ultimo_documento: Optional[DocumentoInforme] = None # Para exportar a otros formatos sin reevaluar
+
+    def invalidar(self):
+        self._cache.clear()
+        self.ultimo_documento = None
+
+    @perfilar()
+    def generar(self, informe: InformeEcoCompleto, rangos: Optional[ReferenceRanges] = None,
+                previo: Optional[PuntoEvolucion] = None) -> str:
+        try:
+            umbrales = (rangos or RANGOS_REFERENCIA).para_sexo(informe.paciente.sexo)
+            flags = informe.param_no_valorado_flags
+            recalculadas = []
+            secciones = []
+            cuerpo_informe = []
+            for clave, titulo, evaluar, submodelos, claves_flags in _SECCIONES:
+                clave_cache = (tuple(getattr(informe, nombre).version for nombre in submodelos),
+                               tuple(bool(flags.get(k)) for k in claves_flags), umbrales)
+                en_cache = self._cache.get(clave)
+                if en_cache is not None and en_cache[0] == clave_cache:
+                    seccion, parrafo = en_cache[1], en_cache[2]
+                else:
+                    seccion = SeccionInforme(clave, titulo, evaluar(informe, umbrales))
+                    parrafo = redactar_seccion(seccion)
+                    self._cache[clave] = (clave_cache, seccion, parrafo)
+                    recalculadas.append(clave)
+                secciones.append(seccion)
+                if parrafo: cuerpo_informe.append(parrafo)
+            for seccion in _seccion_evolucion(informe, umbrales, previo): # Depende de todo el estudio: siempre se evalúa
+                secciones.append(seccion)
+                parrafo = redactar_seccion(seccion)
+                if parrafo: cuerpo_informe.append(parrafo)
+                recalculadas.append(seccion.clave)
+            self.secciones_recalculadas = recalculadas
+            self.ultimo_documento = _documento(informe, tuple(secciones))
+
+            texto = ensamblar_texto(informe.realizado_por, informe.comentarios_adicionales, cuerpo_informe)
+            log_message(f"Informe generado de forma incremental (secciones recalculadas: {len(recalculadas)}).", "debug")
+            return texto
+        except Exception as e:
+            log_message(f"Error crítico generando informe incremental: {e}", "error", exc_info=True)
+            self.invalidar()
+            return f"ERROR AL GENERAR EL INFORME:\n{e}\n\nConsulte el log."
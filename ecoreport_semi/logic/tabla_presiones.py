@@ -0,0 +1,167 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Algoritmo de presiones de llenado del VI (infograma SEMI) como tabla de decisión.
+
+Cada estudio se reduce a un índice de 8 bits:
+- bits 6-7: banda de E/A (no disponible, <= 0.8, entre 0.8 y 2, >= 2);
+- bits 0-5: para cada criterio adicional (volumen AI, E/e', velocidad IT), un bit
+  "evaluable" (hay valor) y otro "positivo" (supera el corte).
+TABLA_PRESIONES[indice] es el código PRESIONES_* del resultado; la tabla se genera una
+vez al importar a partir de REGLAS_BANDA_E_A y REGLAS_CRITERIOS, que son el algoritmo
+tal como lo describe el infograma. estimar_presiones_llenado_vi (logic/calculations.py,
+con etiqueta_presiones) y la versión NumPy (logic/calculos_vectorizados.py) solo calculan
+el índice y leen la tabla.
+"""
+from typing import Dict, Optional, Tuple
+
+from rangos_referencia import UmbralesReferencia
+
+# --- Códigos de resultado (ETIQUETAS_PRESIONES[codigo] es el texto del informe) ---
+PRESIONES_NO_VALORABLES = 0
+PRESIONES_NORMALES_SI_CONSISTENTES = 1
+PRESIONES_ELEVADAS_RESTRICTIVO = 2
+PRESIONES_INDETERMINADAS_INSUFICIENTES = 3
+PRESIONES_ELEVADAS = 4
+PRESIONES_NORMALES = 5
+PRESIONES_INDETERMINADAS_DISCORDANTES = 6
+ETIQUETAS_PRESIONES = (
+    "No valorables (E/A no disponible)",
+    "Presiones de llenado normales (si datos consistentes)",
+    "Presiones de llenado ELEVADAS (Patrón restrictivo)",
+    "Indeterminadas (datos insuficientes para E/A 0.8-2)",
+    "Presiones de llenado ELEVADAS",
+    "Presiones de llenado normales",
+    "Indeterminadas (discordantes, valorar otras técnicas)",
+)
+
+# --- Bandas de E/A ---
+BANDA_E_A_NO_DISPONIBLE = 0
+BANDA_E_A_NORMAL = 1       # E/A <= e_a_normal_max (0.8)
+BANDA_E_A_INTERMEDIA = 2   # Entre ambos cortes: se aplican los tres criterios adicionales
+BANDA_E_A_RESTRICTIVA = 3  # E/A >= e_a_elevada_min (2)
+BANDAS_E_A = 4
+
+# --- Criterios adicionales (orden de los bits) ---
+CRITERIO_AI_VOL = 0   # Volumen AI indexado > ai_vol_idx_dilatada_min (34 ml/m²)
+CRITERIO_E_E_PRIMA = 1 # E/e' > e_e_prima_corte (14)
+CRITERIO_IT_VEL = 2   # Velocidad IT > it_velocidad_corte_ms (2.8 m/s)
+CRITERIOS = 3
+BITS_CRITERIOS = 2 * CRITERIOS
+
+
+def bit_evaluable(criterio: int) -> int:
+    return 1 << (2 * criterio)
+
+
+def bit_positivo(criterio: int) -> int:
+    return 1 << (2 * criterio + 1)
+
+
+# --- El algoritmo ---
+# Bandas de E/A que deciden por sí solas
+REGLAS_BANDA_E_A: Dict[int, int] = {
+    BANDA_E_A_NO_DISPONIBLE: PRESIONES_NO_VALORABLES,
+    BANDA_E_A_NORMAL: PRESIONES_NORMALES_SI_CONSISTENTES,
+    BANDA_E_A_RESTRICTIVA: PRESIONES_ELEVADAS_RESTRICTIVO,
+}
+# E/A intermedio: (criterios evaluables, criterios positivos) -> resultado
+REGLAS_CRITERIOS: Dict[Tuple[int, int], int] = {
+    (0, 0): PRESIONES_INDETERMINADAS_INSUFICIENTES,
+    (1, 0): PRESIONES_INDETERMINADAS_INSUFICIENTES,
+    (1, 1): PRESIONES_INDETERMINADAS_INSUFICIENTES,
+    (2, 0): PRESIONES_NORMALES,
+    (2, 1): PRESIONES_INDETERMINADAS_DISCORDANTES,
+    (2, 2): PRESIONES_ELEVADAS,
+    (3, 0): PRESIONES_NORMALES,
+    (3, 1): PRESIONES_NORMALES,
+    (3, 2): PRESIONES_ELEVADAS,
+    (3, 3): PRESIONES_ELEVADAS,
+}
+
+
+def _recuento(bits: int) -> Tuple[int, int]:
+    """(evaluables, positivos) de los bits de criterios. Un bit positivo sin su bit
+    evaluable no se produce nunca; si apareciera, no cuenta."""
+    evaluables = sum(1 for c in range(CRITERIOS) if bits & bit_evaluable(c))
+    positivos = sum(1 for c in range(CRITERIOS) if bits & bit_evaluable(c) and bits & bit_positivo(c))
+    return evaluables, positivos
+
+
+def _compilar_tabla() -> bytes:
+    tabla = bytearray(BANDAS_E_A << BITS_CRITERIOS)
+    for banda in range(BANDAS_E_A):
+        for bits in range(1 << BITS_CRITERIOS):
+            if banda in REGLAS_BANDA_E_A:
+                codigo = REGLAS_BANDA_E_A[banda]
+            else:
+                codigo = REGLAS_CRITERIOS[_recuento(bits)]
+            tabla[(banda << BITS_CRITERIOS) | bits] = codigo
+    return bytes(tabla)
+
+
+TABLA_PRESIONES = _compilar_tabla()
+_AI_EVALUABLE, _AI_POSITIVO = bit_evaluable(CRITERIO_AI_VOL), bit_positivo(CRITERIO_AI_VOL)
+_E_E_EVALUABLE, _E_E_POSITIVO = bit_evaluable(CRITERIO_E_E_PRIMA), bit_positivo(CRITERIO_E_E_PRIMA)
+_IT_EVALUABLE, _IT_POSITIVO = bit_evaluable(CRITERIO_IT_VEL), bit_positivo(CRITERIO_IT_VEL)
+# Bits de un criterio medido que supera el corte
+_AI_SI = _AI_EVALUABLE | _AI_POSITIVO
+_E_E_SI = _E_E_EVALUABLE | _E_E_POSITIVO
+_IT_SI = _IT_EVALUABLE | _IT_POSITIVO
+
+
+# --- Índice de un estudio ---
+
+def banda_e_a(e_a: Optional[float], umbrales: UmbralesReferencia) -> int:
+    if e_a is None:
+        return BANDA_E_A_NO_DISPONIBLE
+    if e_a <= umbrales.e_a_normal_max:
+        return BANDA_E_A_NORMAL
+    if e_a >= umbrales.e_a_elevada_min:
+        return BANDA_E_A_RESTRICTIVA
+    return BANDA_E_A_INTERMEDIA
+
+
+def bits_criterios(ai_vol: Optional[float], e_e_prima: Optional[float], it_vel: Optional[float],
+                   umbrales: UmbralesReferencia) -> int:
+    bits = 0
+    if ai_vol is not None:
+        bits |= _AI_SI if ai_vol > umbrales.ai_vol_idx_dilatada_min else _AI_EVALUABLE
+    if e_e_prima is not None:
+        bits |= _E_E_SI if e_e_prima > umbrales.e_e_prima_corte else _E_E_EVALUABLE
+    if it_vel is not None:
+        bits |= _IT_SI if it_vel > umbrales.it_velocidad_corte_ms else _IT_EVALUABLE
+    return bits
+
+
+# etiqueta_presiones lee de aquí el texto de cada fila (sin pasar por el código PRESIONES_*)
+ETIQUETAS_POR_INDICE = tuple(ETIQUETAS_PRESIONES[codigo] for codigo in TABLA_PRESIONES)
+_INDICE_INTERMEDIA = BANDA_E_A_INTERMEDIA << BITS_CRITERIOS
+# Bandas que deciden sin mirar los criterios: cualquier fila de su bloque
+_ETIQUETA_SIN_E_A = ETIQUETAS_POR_INDICE[BANDA_E_A_NO_DISPONIBLE << BITS_CRITERIOS]
+_ETIQUETA_E_A_NORMAL = ETIQUETAS_POR_INDICE[BANDA_E_A_NORMAL << BITS_CRITERIOS]
+_ETIQUETA_E_A_RESTRICTIVO = ETIQUETAS_POR_INDICE[BANDA_E_A_RESTRICTIVA << BITS_CRITERIOS]
+
+
+def etiqueta_presiones(e_a: Optional[float], ai_vol: Optional[float], e_e_prima: Optional[float],
+                       it_vel: Optional[float], umbrales: UmbralesReferencia) -> str:
+    """Texto del resultado de un estudio (ETIQUETAS_PRESIONES). Es el camino de cada informe,
+    así que hace en línea lo mismo que banda_e_a() y bits_criterios(), sin llamarlas, con las
+    mismas constantes de bits y filas que la tabla; si la banda de E/A decide sola no evalúa
+    los criterios. benchmarks/bench_tabla_presiones.py comprueba que el índice coincide con el
+    de banda_e_a() + bits_criterios() en todas las combinaciones."""
+    if e_a is None:
+        return _ETIQUETA_SIN_E_A
+    if e_a <= umbrales.e_a_normal_max:
+        return _ETIQUETA_E_A_NORMAL
+    if e_a >= umbrales.e_a_elevada_min:
+        return _ETIQUETA_E_A_RESTRICTIVO
+    indice = _INDICE_INTERMEDIA
+    if ai_vol is not None:
+        indice |= _AI_SI if ai_vol > umbrales.ai_vol_idx_dilatada_min else _AI_EVALUABLE
+    if e_e_prima is not None:
+        indice |= _E_E_SI if e_e_prima > umbrales.e_e_prima_corte else _E_E_EVALUABLE
+    if it_vel is not None:
+        indice |= _IT_SI if it_vel > umbrales.it_velocidad_corte_ms else _IT_EVALUABLE
+    return ETIQUETAS_POR_INDICE[indice]
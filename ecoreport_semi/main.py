@@ -7,23 +7,49 @@ Basado en los parámetros de la SEMI para evaluación ecocardiográfica a pie de
 """
 
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui.main_window import MainWindow
+import time
+import config
 from utils.error_handling import setup_exception_handling, log_message
+from utils import perfilado
+
+def _registrar_arranque(inicio_ns: int, ventana):
+    """Tiempo desde main() hasta el primer pintado completo de la ventana: al log, al perfil
+    y, con config.MEDIR_ARRANQUE, a la salida estándar o a un fichero, cerrando después la
+    aplicación. 'pintado_unix' (reloj del sistema) permite a quien lanzó el proceso medir
+    también lo anterior a main(): arranque del intérprete y, en --onefile, la descompresión."""
+    duracion_ns = time.perf_counter_ns() - inicio_ns
+    perfilado.registrar("arranque.primer_pintado", duracion_ns)
+    log_message(f"Arranque: {duracion_ns / 1e6:.0f} ms hasta el primer pintado de la ventana.", "info")
+    if config.MEDIR_ARRANQUE:
+        linea = f"arranque_ms={duracion_ns / 1e6:.1f} pintado_unix={time.time():.6f}"
+        if config.MEDIR_ARRANQUE == "1":
+            print(linea, flush=True)
+        else:
+            with open(config.MEDIR_ARRANQUE, "a", encoding="utf-8") as f:
+                f.write(linea + "\n")
+        ventana.close()
 
 def main():
     """Punto de entrada principal de la aplicación."""
+    inicio_ns = time.perf_counter_ns()
     # --- INICIO: Marcador para localización de errores (Configuración Global) ---
     setup_exception_handling()
     # --- FIN: Marcador para localización de errores (Configuración Global) ---
     try:
         log_message("Iniciando la aplicación EcoReport SEMI.", "info")
-        
+        if config.PERFILADO_ACTIVO:
+            log_message("Perfilado activo: el resumen se guardará al salir (Ctrl+Mayús+P para verlo).", "info")
+
+        # Qt solo se carga aquí: el núcleo (models, logic) se puede importar sin PyQt5
+        from PyQt5.QtWidgets import QApplication
+        from gui.main_window import MainWindow
+
         app = QApplication(sys.argv)
         app.setApplicationName("EcoReport SEMI")
         app.setApplicationVersion("1.0.0") # Puedes obtener esto de config.py
 
         main_window = MainWindow()
+        main_window.primer_pintado.connect(lambda: _registrar_arranque(inicio_ns, main_window))
         main_window.show()
         
         log_message("Ventana principal mostrada. Iniciando bucle de eventos.", "info")
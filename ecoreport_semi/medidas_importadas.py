@@ -0,0 +1,183 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Correspondencia entre las medidas que envían los equipos (OBX de HL7, conceptos
+codificados de DICOM SR) y los campos del modelo, con la conversión de unidades.
+
+La usan importacion_hl7.py e importacion_dicom_sr.py. Cada medida se identifica por un
+código o un texto (en mayúsculas); las correspondencias por defecto son las abreviaturas
+de la nomenclatura ASE, los nombres de concepto DICOM/LOINC y los propios nombres
+'seccion.campo'. Cada centro puede añadir los de sus equipos con un JSON
+{"CODIGO": "seccion.campo"} (cargar_correspondencias).
+"""
+import json
+from typing import Dict, List, Optional, Union
+
+# --- Unidades: factor para pasar a la unidad del campo del modelo ---
+_UNIDADES = {
+    "mm": {"mm": 1.0, "cm": 10.0, "m": 1000.0},
+    "cm/s": {"cm/s": 1.0, "m/s": 100.0, "mm/s": 0.1},
+    "m/s": {"m/s": 1.0, "cm/s": 0.01, "mm/s": 0.001},
+    "%": {"%": 1.0},
+    "ml/m2": {"ml/m2": 1.0},
+    "ratio": {"ratio": 1.0, "1": 1.0},
+}
+# Escrituras habituales de las unidades (en minúsculas y sin espacios); las de DICOM SR son UCUM
+_ALIAS_UNIDADES = {"ml/m^2": "ml/m2", "ml/m²": "ml/m2", "ml/(m2)": "ml/m2", "{ratio}": "ratio", "pct": "%",
+                   "cm/sec": "cm/s", "m/sec": "m/s", "mm/sec": "mm/s", "{ml}/m2": "ml/m2", "ml/m*2": "ml/m2"}
+
+# Campos que se pueden importar y su unidad. colapso_mayor_50 se calcula a partir del
+# porcentaje de colapso inspiratorio de la VCI.
+CAMPOS_IMPORTABLES = {
+    "medidas_vi.septo_iv_mm": "mm",
+    "medidas_vi.pared_posterior_vi_mm": "mm",
+    "medidas_vi.dtdvi_mm": "mm",
+    "medidas_vi.fevi_porcentaje": "%",
+    "medidas_auriculas.ai_vol_ml_m2": "ml/m2",
+    "medidas_vd.vd_diametro_basal_mm": "mm",
+    "medidas_vd.tapse_mm": "mm",
+    "presiones_llenado.mitral_e_a_ratio": "ratio",
+    "presiones_llenado.e_prima_septal_cms": "cm/s",
+    "presiones_llenado.e_prima_lateral_cms": "cm/s",
+    "presiones_llenado.e_sobre_e_prima_ratio": "ratio",
+    "presiones_llenado.it_velocidad_max_ms": "m/s",
+    "vci.diametro_max_mm": "mm",
+    "vci.mm_inspiracion": "mm",
+    "vci.colapso_mayor_50": "%",
+}
+
+# Código o texto (en mayúsculas) -> campo
+CORRESPONDENCIAS_MEDIDAS = {
+    # Abreviaturas ASE (OBX-3 de HL7 y códigos privados de muchos equipos)
+    "IVSD": "medidas_vi.septo_iv_mm",
+    "IVS": "medidas_vi.septo_iv_mm",
+    "LVPWD": "medidas_vi.pared_posterior_vi_mm",
+    "LVPW": "medidas_vi.pared_posterior_vi_mm",
+    "LVIDD": "medidas_vi.dtdvi_mm",
+    "LVEDD": "medidas_vi.dtdvi_mm",
+    "LVEF": "medidas_vi.fevi_porcentaje",
+    "EF": "medidas_vi.fevi_porcentaje",
+    "FEVI": "medidas_vi.fevi_porcentaje",
+    "LAVI": "medidas_auriculas.ai_vol_ml_m2",
+    "LAESVI": "medidas_auriculas.ai_vol_ml_m2",
+    "LA VOL INDEX": "medidas_auriculas.ai_vol_ml_m2",
+    "RVD1": "medidas_vd.vd_diametro_basal_mm",
+    "RVDB": "medidas_vd.vd_diametro_basal_mm",
+    "RV BASAL": "medidas_vd.vd_diametro_basal_mm",
+    "TAPSE": "medidas_vd.tapse_mm",
+    "MV E/A": "presiones_llenado.mitral_e_a_ratio",
+    "MV E/A RATIO": "presiones_llenado.mitral_e_a_ratio",
+    "E/A": "presiones_llenado.mitral_e_a_ratio",
+    "E' SEPT": "presiones_llenado.e_prima_septal_cms",
+    "MV E' SEPT": "presiones_llenado.e_prima_septal_cms",
+    "E' LAT": "presiones_llenado.e_prima_lateral_cms",
+    "MV E' LAT": "presiones_llenado.e_prima_lateral_cms",
+    "E/E'": "presiones_llenado.e_sobre_e_prima_ratio",
+    "E/E' AVG": "presiones_llenado.e_sobre_e_prima_ratio",
+    "MV E/E'": "presiones_llenado.e_sobre_e_prima_ratio",
+    "TR VMAX": "presiones_llenado.it_velocidad_max_ms",
+    "TR MAX VEL": "presiones_llenado.it_velocidad_max_ms",
+    "TR PEAK VEL": "presiones_llenado.it_velocidad_max_ms",
+    "IVC": "vci.diametro_max_mm",
+    "IVC DIAM": "vci.diametro_max_mm",
+    "IVC EXP": "vci.diametro_max_mm",
+    "IVC INSP": "vci.mm_inspiracion",
+    "IVC COLLAPSE": "vci.colapso_mayor_50",
+    # Códigos LOINC de los informes de ecocardiografía (DICOM PS3.16, TID 5200)
+    "18154-5": "medidas_vi.septo_iv_mm",
+    "18152-9": "medidas_vi.pared_posterior_vi_mm",
+    "29436-3": "medidas_vi.dtdvi_mm",
+    "10230-1": "medidas_vi.fevi_porcentaje",
+    # Nombres de concepto (CodeMeaning) de DICOM SR, por si el código es privado
+    "INTERVENTRICULAR SEPTUM DIASTOLIC THICKNESS": "medidas_vi.septo_iv_mm",
+    "LEFT VENTRICLE POSTERIOR WALL DIASTOLIC THICKNESS": "medidas_vi.pared_posterior_vi_mm",
+    "LEFT VENTRICLE INTERNAL END DIASTOLIC DIMENSION": "medidas_vi.dtdvi_mm",
+    "LEFT VENTRICULAR EJECTION FRACTION": "medidas_vi.fevi_porcentaje",
+    "LEFT ATRIUM VOLUME INDEX": "medidas_auriculas.ai_vol_ml_m2",
+    "LEFT ATRIAL VOLUME INDEX": "medidas_auriculas.ai_vol_ml_m2",
+    "RIGHT VENTRICLE BASAL DIAMETER": "medidas_vd.vd_diametro_basal_mm",
+    "TRICUSPID ANNULAR PLANE SYSTOLIC EXCURSION": "medidas_vd.tapse_mm",
+    "MITRAL VALVE E/A RATIO": "presiones_llenado.mitral_e_a_ratio",
+    "MITRAL VALVE E TO A RATIO": "presiones_llenado.mitral_e_a_ratio",
+    "SEPTAL E' VELOCITY": "presiones_llenado.e_prima_septal_cms",
+    "LATERAL E' VELOCITY": "presiones_llenado.e_prima_lateral_cms",
+    "E/E' RATIO": "presiones_llenado.e_sobre_e_prima_ratio",
+    "TRICUSPID REGURGITATION PEAK VELOCITY": "presiones_llenado.it_velocidad_max_ms",
+    "INFERIOR VENA CAVA DIAMETER": "vci.diametro_max_mm",
+    "INFERIOR VENA CAVA COLLAPSE": "vci.colapso_mayor_50",
+}
+CORRESPONDENCIAS_MEDIDAS.update({campo.upper(): campo for campo in CAMPOS_IMPORTABLES})
+
+
+class ErrorMapeo(ValueError):
+    pass
+
+
+def cargar_correspondencias(ruta: Optional[str]) -> Dict[str, str]:
+    """Correspondencias por defecto más las de un JSON {"CODIGO": "seccion.campo"}."""
+    correspondencias = dict(CORRESPONDENCIAS_MEDIDAS)
+    if ruta:
+        with open(ruta, encoding="utf-8") as f:
+            adicionales = json.load(f)
+        desconocidos = {campo for campo in adicionales.values() if campo not in CAMPOS_IMPORTABLES}
+        if desconocidos:
+            raise ValueError(f"Campos no importables en '{ruta}': {', '.join(sorted(desconocidos))}")
+        correspondencias.update({codigo.strip().upper(): campo for codigo, campo in adicionales.items()})
+    return correspondencias
+
+
+def buscar_campo(correspondencias: Dict[str, str], *claves: str) -> Optional[str]:
+    """Campo de la primera clave (código, texto...) que tenga correspondencia."""
+    for clave in claves:
+        campo = correspondencias.get(clave.strip().upper())
+        if campo:
+            return campo
+    return None
+
+
+def convertir_unidad(valor: float, unidad_origen: str, campo: str) -> float:
+    unidad_campo = CAMPOS_IMPORTABLES[campo]
+    unidad = unidad_origen.strip().lower().replace(" ", "")
+    unidad = _ALIAS_UNIDADES.get(unidad, unidad)
+    if not unidad:
+        return valor # Sin unidad: se asume la del campo
+    factor = _UNIDADES[unidad_campo].get(unidad)
+    if factor is None:
+        raise ErrorMapeo(f"unidad '{unidad_origen}' no convertible a {unidad_campo}")
+    return valor * factor
+
+
+def valor_campo(campo: str, numero: float) -> Union[float, bool]:
+    """Valor que se asigna al campo: el número ya convertido, salvo el colapso de la VCI."""
+    return numero > 50 if campo == "vci.colapso_mayor_50" else numero
+
+
+# Datos del estudio que se copian al completar un informe solo si en el destino están vacíos
+CAMPOS_ESTUDIO = ("paciente.nhc", "paciente.apellidos", "paciente.nombre", "paciente.sexo", "realizado_por")
+
+
+def _objeto_y_atributo(informe, clave: str):
+    seccion, _, atributo = clave.rpartition(".")
+    return (getattr(informe, seccion) if seccion else informe), atributo
+
+
+def completar_informe(destino, origen) -> List[str]:
+    """Copia en 'destino' (el informe abierto en la interfaz) las medidas importadas que
+    tiene 'origen' y, solo donde 'destino' no tiene nada, los datos del paciente y
+    realizado_por. La fecha del estudio se toma de 'origen'. Devuelve las claves asignadas."""
+    asignados = []
+    for clave in CAMPOS_IMPORTABLES:
+        seccion_origen, atributo = _objeto_y_atributo(origen, clave)
+        valor = getattr(seccion_origen, atributo)
+        if valor is not None:
+            setattr(_objeto_y_atributo(destino, clave)[0], atributo, valor)
+            asignados.append(clave)
+    for clave in CAMPOS_ESTUDIO:
+        objeto_destino, atributo = _objeto_y_atributo(destino, clave)
+        valor = getattr(_objeto_y_atributo(origen, clave)[0], atributo)
+        if valor and not getattr(objeto_destino, atributo):
+            setattr(objeto_destino, atributo, valor)
+            asignados.append(clave)
+    destino.paciente.fecha_estudio = origen.paciente.fecha_estudio
+    return asignados
@@ -4,10 +4,14 @@
 """
 Modelos de datos (dataclasses) para el informe de ecocardioscopia.
 """
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict 
+import copy
+from dataclasses import dataclass, field, fields, is_dataclass, asdict
+from functools import lru_cache
+from itertools import count
+from typing import Optional, List, Dict, Any, Union, get_args, get_origin
 from datetime import datetime
-import config # Para acceder a valores de referencia y otras constantes
+from rangos_referencia import UmbralesReferencia, UMBRALES_POR_DEFECTO # Valores de referencia (desde config)
+from utils.identificadores import nuevo_id_informe
 
 # --- Claves para el diccionario parametro_no_valorado_flags ---
 # Estas claves identificarán cada campo individual que puede ser "No Valorado"
@@ -54,6 +58,55 @@ P_VEXUS_VSH = "vexus_patron_vena_suprahepatica"
 P_VEXUS_VP = "vexus_patron_vena_porta"
 P_VEXUS_VIR = "vexus_patron_vena_intrarrenal"
 
+# Todas las claves anteriores, en un orden fijo. El orden es estable (solo se añaden
+# claves al final): StudyTable lo usa como posición de bit de cada flag "No Valorado".
+CLAVES_NO_VALORADO = (
+    P_VI_SEPTO, P_VI_PARED_POST, P_VI_DTDVI, P_FEVI_CUALITATIVA, P_FEVI_PORCENTAJE,
+    P_AI_VOL_IDX, P_VD_DIAM_BASAL, P_VD_TAPSE,
+    P_VALV_EST_AO, P_VALV_INS_AO, P_VALV_INS_MI, P_VALV_INS_TR,
+    P_PRES_LLEN_E_A, P_PRES_LLEN_E_SEPTAL, P_PRES_LLEN_E_LATERAL, P_PRES_LLEN_IT_VEL, P_PRES_LLEN_E_E_PRIMA_RATIO,
+    P_DERR_PERIC_PRESENTE, P_DERR_PERIC_CUANTIA,
+    P_LINEAS_B_PRESENTE, P_LINEAS_B_DESC,
+    P_DERR_PLEURAL_PRESENTE, P_DERR_PLEURAL_TIPO, P_DERR_PLEURAL_LOC,
+    P_VCI_DIAM, P_VCI_COLAPSO_RADIO, P_VCI_MM_INSPIRACION,
+    P_VEXUS_VCI_DILATADA, P_VEXUS_VSH, P_VEXUS_VP, P_VEXUS_VIR,
+)
+
+# --- Seguimiento de cambios en los sub-modelos ---
+# Cada modificación real de un campo (valor distinto al actual) asigna a la instancia una
+# versión nueva, única en todo el proceso. La generación incremental del informe usa esas
+# versiones como clave de caché de cada sección: si la versión no cambia, el texto tampoco.
+_contador_versiones = count(1)
+_TIPOS_ESCALARES = (type(None), bool, int, float, str, datetime)
+_AUSENTE = object()
+
+class _ModeloVersionado:
+    """Mixin para los sub-modelos del informe: versión por instancia y campos modificados."""
+
+    def __setattr__(self, nombre, valor):
+        estado = self.__dict__
+        if "_congelado" in estado:
+            raise AttributeError(f"{type(self).__name__} es una instantánea de solo lectura (campo '{nombre}')")
+        actual = estado.get(nombre, _AUSENTE)
+        if actual is valor or (type(actual) is type(valor) and type(valor) in _TIPOS_ESCALARES and actual == valor):
+            return # Sin cambio real: se conserva la versión (y la caché de secciones)
+        object.__setattr__(self, nombre, valor)
+        estado["_version"] = next(_contador_versiones)
+        estado.setdefault("_campos_modificados", set()).add(nombre)
+
+    @property
+    def version(self) -> int:
+        return self.__dict__.get("_version", 0)
+
+    @property
+    def campos_modificados(self) -> frozenset:
+        """Campos modificados desde la última llamada a limpiar_modificaciones()."""
+        return frozenset(self.__dict__.get("_campos_modificados", ()))
+
+    def limpiar_modificaciones(self):
+        self.__dict__.pop("_campos_modificados", None)
+
+
 # Helper function _format_valor (Corregido para manejar string en try-except)
 def _format_valor(valor, unidad="", decimales=1, default_si_none="no medido"):
     """Formatea un valor numérico con su unidad y decimales especificados.
@@ -68,14 +121,15 @@ def _format_valor(valor, unidad="", decimales=1, default_si_none="no medido"):
 
 
 @dataclass
-class DatosPaciente:
+class DatosPaciente(_ModeloVersionado):
     nhc: str = ""
     nombre: str = ""
     apellidos: str = ""
     fecha_estudio: datetime = field(default_factory=datetime.now)
+    sexo: str = "" # "M", "F" o "" (no consta: se usan los valores de referencia masculinos)
 
 @dataclass
-class MedidasVI:
+class MedidasVI(_ModeloVersionado):
     septo_iv_mm: Optional[float] = None
     pared_posterior_vi_mm: Optional[float] = None
     dtdvi_mm: Optional[float] = None
@@ -84,9 +138,12 @@ class MedidasVI:
 
     @property
     def hipertrofia_vi_presente(self) -> str: # Cambiado a str para consistencia
-        # Asumir sexo masculino si no se especifica, o crear lógica para pasarlo
-        umbral_septo = getattr(config, 'SEPTUM_MAX_MASC', 11) 
-        umbral_pared = getattr(config, 'PARED_POST_MAX_MASC', 11)
+        return self.evaluar_hipertrofia_vi(UMBRALES_POR_DEFECTO)
+
+    def evaluar_hipertrofia_vi(self, umbrales: UmbralesReferencia) -> str:
+        """Como hipertrofia_vi_presente, con los umbrales del sexo del paciente."""
+        umbral_septo = umbrales.septo_max_mm
+        umbral_pared = umbrales.pared_posterior_max_mm
         
         presente = False
         detalles_hvi = []
@@ -122,33 +179,39 @@ class MedidasVI:
 
 
 @dataclass
-class MedidasAuriculas:
+class MedidasAuriculas(_ModeloVersionado):
     ai_vol_ml_m2: Optional[float] = None
 
 @dataclass
-class MedidasVD:
+class MedidasVD(_ModeloVersionado):
     vd_diametro_basal_mm: Optional[float] = None
     tapse_mm: Optional[float] = None
 
     @property
     def vd_dilatado(self) -> str:
-        if self.vd_diametro_basal_mm is None: return "No valorado"
-        return "Sí" if self.vd_diametro_basal_mm > getattr(config, 'VD_DIAMETRO_BASAL_MAX', 42) else "No"
+        return self.evaluar_dilatacion(UMBRALES_POR_DEFECTO)
 
     @property
     def tapse_disminuido(self) -> str:
+        return self.evaluar_tapse(UMBRALES_POR_DEFECTO)
+
+    def evaluar_dilatacion(self, umbrales: UmbralesReferencia) -> str:
+        if self.vd_diametro_basal_mm is None: return "No valorado"
+        return "Sí" if self.vd_diametro_basal_mm > umbrales.vd_diametro_basal_max_mm else "No"
+
+    def evaluar_tapse(self, umbrales: UmbralesReferencia) -> str:
         if self.tapse_mm is None: return "No valorado"
-        return "Sí" if self.tapse_mm < getattr(config, 'TAPSE_NORMAL_MIN', 17) else "No"
+        return "Sí" if self.tapse_mm < umbrales.tapse_normal_min_mm else "No"
 
 @dataclass
-class Valvulopatias:
+class Valvulopatias(_ModeloVersionado):
     estenosis_aortica_sig: bool = False
     insuficiencia_aortica_sig: bool = False
     insuficiencia_mitral_sig: bool = False
     insuficiencia_tricuspidea_sig: bool = False
 
 @dataclass
-class PresionesLlenadoVI:
+class PresionesLlenadoVI(_ModeloVersionado):
     mitral_e_a_ratio: Optional[float] = None
     e_prima_septal_cms: Optional[float] = None
     e_prima_lateral_cms: Optional[float] = None
@@ -162,22 +225,25 @@ class PresionesLlenadoVI:
         return sum(valid_values) / len(valid_values)
 
 @dataclass
-class DerramePericardico:
+class DerramePericardico(_ModeloVersionado):
     presente: bool = False
     cuantia_mm: Optional[float] = None
 
     @property
     def clasificacion(self) -> str:
+        return self.clasificar(UMBRALES_POR_DEFECTO)
+
+    def clasificar(self, umbrales: UmbralesReferencia) -> str:
         if not self.presente: return "No"
         if self.cuantia_mm is None: return "Sí (cuantía no especificada)"
-        leve_max = getattr(config, 'DERRPER_LEVE_MAX', 10)
-        mod_max = getattr(config, 'DERRPER_MODERADO_MAX', 20)
+        leve_max = umbrales.derrame_pericardico_leve_max_mm
+        mod_max = umbrales.derrame_pericardico_moderado_max_mm
         if self.cuantia_mm <= leve_max: return f"Sí, Leve ({self.cuantia_mm:.1f} mm)"
         elif self.cuantia_mm <= mod_max: return f"Sí, Moderado ({self.cuantia_mm:.1f} mm)"
         else: return f"Sí, Severo ({self.cuantia_mm:.1f} mm)"
 
 @dataclass
-class DerramePleural:
+class DerramePleural(_ModeloVersionado):
     presente: bool = False
     tipo_cuantificacion: Optional[str] = None
     localizacion: Optional[str] = None
@@ -192,18 +258,21 @@ class DerramePleural:
         return desc
 
 @dataclass
-class LineasBEstudio:
+class LineasBEstudio(_ModeloVersionado):
     presentes: bool = False 
     descripcion_hallazgos: str = ""
 
 @dataclass
-class VenaCavaInferior: # Ya la tienes así, solo para confirmar
+class VenaCavaInferior(_ModeloVersionado): # Ya la tienes así, solo para confirmar
     diametro_max_mm: Optional[float] = None
     colapso_mayor_50: Optional[bool] = None  # True: >50%, False: <50%, None: no seleccionado/no valorado
     mm_inspiracion: Optional[float] = None   # mm en inspiración
 
     @property
     def hallazgos_vci(self) -> str:
+        return self.describir_hallazgos(UMBRALES_POR_DEFECTO)
+
+    def describir_hallazgos(self, umbrales: UmbralesReferencia) -> str:
         if self.diametro_max_mm is None and self.colapso_mayor_50 is None and self.mm_inspiracion is None:
             return "No valorada"
         
@@ -231,7 +300,7 @@ class VenaCavaInferior: # Ya la tienes así, solo para confirmar
 
         # Añadir interpretación de PVC solo si tenemos diámetro Y colapso por radio
         if self.diametro_max_mm is not None and self.colapso_mayor_50 is not None:
-            diam_pat_vci = getattr(config, 'VCI_DIAMETRO_PATOLOGICO_PVC', 21)
+            diam_pat_vci = umbrales.vci_diametro_patologico_mm
             # El infograma dice "<50%" para patológico si VCI > 21mm.
             # Entonces, colapso_mayor_50 == False (es decir, <50%) es el problemático.
             patologico_pvc = (self.diametro_max_mm > diam_pat_vci and not self.colapso_mayor_50)
@@ -241,24 +310,8 @@ class VenaCavaInferior: # Ya la tienes así, solo para confirmar
                 texto_base += " No sugestiva de PVC elevada."
         return texto_base
 
-    @property
-    def hallazgos_vci(self) -> str:
-        if self.diametro_max_mm is None and self.colapso_inspiratorio_porcentaje is None: return "No valorada"
-        
-        texto_diam = f"Diámetro: {_format_valor(self.diametro_max_mm, ' mm', default_si_none='no medido')}"
-        texto_colapso = f"Colapso: {_format_valor(self.colapso_inspiratorio_porcentaje, '%', 0, default_si_none='no medido')}"
-        texto = f"{texto_diam}, {texto_colapso}."
-
-        if self.diametro_max_mm is not None and self.colapso_inspiratorio_porcentaje is not None:
-            diam_pat_vci = getattr(config, 'VCI_DIAMETRO_PATOLOGICO_PVC', 21)
-            colapso_min_normal_vci = getattr(config, 'VCI_COLAPSO_INSPIRATORIO_MIN_NORMAL_PVC', 50)
-            patologico = (self.diametro_max_mm > diam_pat_vci and self.colapso_inspiratorio_porcentaje < colapso_min_normal_vci)
-            if patologico: texto += " Sugestiva de PVC elevada."
-            else: texto += " No sugestiva de PVC elevada."
-        return texto
-
 @dataclass
-class VExUSScore:
+class VExUSScore(_ModeloVersionado):
     vci_patologica_vexus: bool = False
     patron_vena_suprahepatica: Optional[str] = None
     patron_vena_porta: Optional[str] = None
@@ -268,7 +321,7 @@ class VExUSScore:
 
 @dataclass
 class InformeEcoCompleto:
-    id_informe: str = field(default_factory=lambda: f"ECO-{datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]}")
+    id_informe: str = field(default_factory=nuevo_id_informe) # "ECO-" + ULID: único y ordenable por fecha de creación
     realizado_por: str = ""
     comentarios_adicionales: str = ""
     
@@ -284,4 +337,176 @@ class InformeEcoCompleto:
     vci: VenaCavaInferior = field(default_factory=VenaCavaInferior)
     vexus: VExUSScore = field(default_factory=VExUSScore)
 
-    param_no_valorado_flags: Dict[str, bool] = field(default_factory=dict)
\ No newline at end of file
+    param_no_valorado_flags: Dict[str, bool] = field(default_factory=dict)
+
+
+# --- Serialización (dict <-> InformeEcoCompleto) ---
+# Usada por la generación por lotes (batch.py) para construir informes desde JSONL/CSV.
+# Se aceptan dicts anidados ({"medidas_vi": {"septo_iv_mm": 11}}) o planos con claves
+# "seccion.campo" ({"medidas_vi.septo_iv_mm": "11"}), que es como llegan las columnas de un CSV.
+# Los flags "No Valorado" se indican con la clave "param_no_valorado_flags.<P_...>".
+
+_VALORES_VERDADEROS = {"1", "true", "t", "si", "sí", "s", "yes", "y", "x"}
+_VALORES_FALSOS = {"0", "false", "f", "no", "n"}
+
+def _a_bool(valor) -> Optional[bool]:
+    if valor is None or isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto == "":
+        return None
+    if texto in _VALORES_VERDADEROS:
+        return True
+    if texto in _VALORES_FALSOS:
+        return False
+    raise ValueError(f"Valor booleano no reconocido: '{valor}'")
+
+def _a_float(valor) -> Optional[float]:
+    if valor is None or isinstance(valor, float):
+        return valor
+    texto = str(valor).strip().replace(',', '.')
+    return float(texto) if texto else None
+
+def _a_int(valor) -> Optional[int]:
+    if valor is None or isinstance(valor, int):
+        return valor
+    texto = str(valor).strip()
+    return int(texto) if texto else None
+
+def _a_datetime(valor) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    for formato in ("%d/%m/%Y", "%d/%m/%Y %H:%M"):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(texto)
+
+def _a_str(valor) -> str:
+    return "" if valor is None else str(valor)
+
+def _a_str_opcional(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    texto = str(valor)
+    return texto if texto.strip() else None
+
+def _convertidor_para_tipo(tipo):
+    """Devuelve (convertidor, es_opcional) para el tipo anotado de un campo del modelo."""
+    opcional = False
+    if get_origin(tipo) is Union:
+        args = [a for a in get_args(tipo) if a is not type(None)]
+        opcional = len(args) != len(get_args(tipo))
+        tipo = args[0] if len(args) == 1 else tipo
+    if tipo is bool:
+        convertidor = _a_bool
+    elif tipo is float:
+        convertidor = _a_float
+    elif tipo is int:
+        convertidor = _a_int
+    elif tipo is datetime:
+        convertidor = _a_datetime
+    elif tipo is str:
+        convertidor = _a_str_opcional if opcional else _a_str
+    else:
+        convertidor = lambda v: v
+    return convertidor, opcional
+
+@lru_cache(maxsize=None)
+def _convertidores(cls) -> Dict[str, Any]:
+    return {f.name: _convertidor_para_tipo(f.type) for f in fields(cls)
+            if not is_dataclass(f.type) and f.name != "param_no_valorado_flags"}
+
+def _anidar_claves(datos: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte claves planas 'seccion.campo' en dicts anidados (las anidadas se respetan)."""
+    anidado: Dict[str, Any] = {}
+    for clave, valor in datos.items():
+        if clave is None:  # Columnas sobrantes de csv.DictReader
+            continue
+        if "." in clave:
+            seccion, campo = clave.split(".", 1)
+            anidado.setdefault(seccion, {})[campo] = valor
+        elif isinstance(valor, dict):
+            anidado.setdefault(clave, {}).update(valor)
+        else:
+            anidado[clave] = valor
+    return anidado
+
+def _convertir_campos(cls, datos: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = {}
+    for nombre, (convertidor, opcional) in _convertidores(cls).items():
+        if nombre not in datos:
+            continue
+        valor = convertidor(datos[nombre])
+        if valor is None and not opcional:
+            continue  # Campo obligatorio vacío: se usa el valor por defecto del modelo
+        kwargs[nombre] = valor
+    return kwargs
+
+def informe_desde_dict(datos: Dict[str, Any]) -> InformeEcoCompleto:
+    """Construye un InformeEcoCompleto desde un dict anidado o plano ('seccion.campo').
+    Las claves desconocidas se ignoran y los valores vacíos se tratan como no medidos."""
+    anidado = _anidar_claves(datos)
+    kwargs = _convertir_campos(InformeEcoCompleto, anidado)
+    if not kwargs.get("id_informe"):
+        kwargs.pop("id_informe", None)  # Se genera uno nuevo
+    for f in fields(InformeEcoCompleto):
+        if is_dataclass(f.type) and f.name in anidado:
+            kwargs[f.name] = f.type(**_convertir_campos(f.type, anidado[f.name] or {}))
+    flags = anidado.get("param_no_valorado_flags") or {}
+    kwargs["param_no_valorado_flags"] = {k: v for k, v in ((k, _a_bool(v)) for k, v in flags.items()) if v is not None}
+    return InformeEcoCompleto(**kwargs)
+
+def informe_a_dict(informe: InformeEcoCompleto) -> Dict[str, Any]:
+    """Convierte el informe en un dict anidado serializable a JSON (fechas en ISO 8601)."""
+    datos = asdict(informe)
+    fecha = informe.paciente.fecha_estudio
+    datos["paciente"]["fecha_estudio"] = fecha.isoformat() if isinstance(fecha, datetime) else fecha
+    return datos
+
+# --- Instantáneas de solo lectura ---
+def instantanea_informe(informe: InformeEcoCompleto, anterior: Optional[InformeEcoCompleto] = None) -> InformeEcoCompleto:
+    """Copia del informe que puede leerse desde otro hilo mientras la interfaz sigue
+    modificando el original: sub-modelos copiados y congelados (asignar un campo lanza
+    AttributeError) y flags en un dict propio. Las copias conservan la versión del
+    original, así que la caché de GeneradorInformeIncremental sigue sirviendo.
+    Los sub-modelos que no han cambiado desde 'anterior' (otra instantánea) se comparten,
+    y también su dict de flags si es igual."""
+    valores = {}
+    for f in fields(InformeEcoCompleto):
+        valor = getattr(informe, f.name)
+        if isinstance(valor, _ModeloVersionado):
+            previo = getattr(anterior, f.name, None)
+            if previo is not None and type(previo) is type(valor) and previo.version == valor.version:
+                valores[f.name] = previo
+            else:
+                copia = copy.copy(valor)
+                copia.__dict__.pop("_campos_modificados", None) # El set es compartido con el original
+                copia.__dict__["_congelado"] = True
+                valores[f.name] = copia
+        elif isinstance(valor, dict):
+            previo = getattr(anterior, f.name, None)
+            valores[f.name] = previo if isinstance(previo, dict) and previo == valor else dict(valor)
+        else:
+            valores[f.name] = valor
+    return InformeEcoCompleto(**valores)
+
+def informe_desde_instantanea(instantanea: InformeEcoCompleto) -> InformeEcoCompleto:
+    """Informe modificable con el contenido de una instantánea (p. ej. al deshacer). Los
+    sub-modelos conservan la versión de la instantánea: su contenido es el mismo."""
+    valores = {}
+    for f in fields(InformeEcoCompleto):
+        valor = getattr(instantanea, f.name)
+        if isinstance(valor, _ModeloVersionado):
+            copia = copy.copy(valor)
+            copia.__dict__.pop("_congelado", None)
+            valores[f.name] = copia
+        elif isinstance(valor, dict):
+            valores[f.name] = dict(valor)
+        else:
+            valores[f.name] = valor
+    return InformeEcoCompleto(**valores)
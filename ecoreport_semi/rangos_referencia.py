@@ -0,0 +1,122 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Valores de referencia ecocardiográficos como objetos inmutables, por sexo del paciente.
+
+ReferenceRanges se construye una sola vez desde config (RANGOS_REFERENCIA, validado al
+importar) y reparte los umbrales en dos UmbralesReferencia, masculino y femenino; los
+modelos y cálculos leen los umbrales como atributos normales en lugar de consultar
+config en cada acceso. Un proceso por lotes puede construir otro conjunto con
+ReferenceRanges.desde_config(sustituciones={...}) o desde un JSON, sin modificar config.
+
+Si el sexo del paciente no consta se usan los umbrales masculinos (como hasta ahora).
+"""
+import json
+import math
+from dataclasses import dataclass, fields
+from typing import Any, Mapping, Optional
+
+import config
+
+SEXO_MASCULINO = "M"
+SEXO_FEMENINO = "F"
+SEXOS = (SEXO_MASCULINO, SEXO_FEMENINO)
+
+
+@dataclass(frozen=True)
+class UmbralesReferencia:
+    """Umbrales para un sexo. Todos en las unidades de config (mm, %, ml/m², m/s)."""
+    septo_max_mm: float
+    pared_posterior_max_mm: float
+    dtdvi_max_mm: float
+    fevi_reducida_max: float
+    fevi_ligeramente_reducida_max: float
+    ai_vol_idx_normal_max_rs: float
+    ai_vol_idx_dilatada_min: float
+    vd_diametro_basal_max_mm: float
+    tapse_normal_min_mm: float
+    e_a_normal_max: float
+    e_a_elevada_min: float
+    e_e_prima_corte: float
+    it_velocidad_corte_ms: float
+    derrame_pericardico_leve_max_mm: float
+    derrame_pericardico_moderado_max_mm: float
+    vci_diametro_patologico_mm: float
+    vci_colapso_min_normal_pct: float
+
+    def __post_init__(self):
+        for f in fields(self):
+            valor = getattr(self, f.name)
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor) or valor <= 0:
+                raise ValueError(f"Valor de referencia no válido para '{f.name}': {valor!r}")
+        for menor, mayor in (("fevi_reducida_max", "fevi_ligeramente_reducida_max"),
+                             ("e_a_normal_max", "e_a_elevada_min"),
+                             ("derrame_pericardico_leve_max_mm", "derrame_pericardico_moderado_max_mm")):
+            if getattr(self, menor) >= getattr(self, mayor):
+                raise ValueError(f"Valores de referencia incoherentes: '{menor}' debe ser menor que '{mayor}'.")
+
+
+# Nombre de la constante de config para cada umbral; los específicos de sexo llevan
+# el sufijo _MASC / _FEM.
+_CONSTANTES_CONFIG = {
+    "septo_max_mm": "SEPTUM_MAX",
+    "pared_posterior_max_mm": "PARED_POST_MAX",
+    "dtdvi_max_mm": "DTDVI_MAX",
+    "fevi_reducida_max": "FEVI_REDUCIDA_MAX",
+    "fevi_ligeramente_reducida_max": "FEVI_LIGERAMENTE_REDUCIDA_MAX",
+    "ai_vol_idx_normal_max_rs": "AI_VOL_IDX_NORMAL_MAX_RS",
+    "ai_vol_idx_dilatada_min": "AI_VOL_IDX_DILATADA_MIN_FA_O_ICFEVIP",
+    "vd_diametro_basal_max_mm": "VD_DIAMETRO_BASAL_MAX",
+    "tapse_normal_min_mm": "TAPSE_NORMAL_MIN",
+    "e_a_normal_max": "E_A_NORMAL_MAX",
+    "e_a_elevada_min": "E_A_ELEVADA_MIN",
+    "e_e_prima_corte": "E_E_PRIMA_CORTE_PRESIONES",
+    "it_velocidad_corte_ms": "IT_VELOCIDAD_CORTE_PRESIONES",
+    "derrame_pericardico_leve_max_mm": "DERRPER_LEVE_MAX",
+    "derrame_pericardico_moderado_max_mm": "DERRPER_MODERADO_MAX",
+    "vci_diametro_patologico_mm": "VCI_DIAMETRO_PATOLOGICO_PVC",
+    "vci_colapso_min_normal_pct": "VCI_COLAPSO_INSPIRATORIO_MIN_NORMAL_PVC",
+}
+_POR_SEXO = {"septo_max_mm", "pared_posterior_max_mm", "dtdvi_max_mm"}
+_SUFIJOS_SEXO = {SEXO_MASCULINO: "_MASC", SEXO_FEMENINO: "_FEM"}
+
+
+@dataclass(frozen=True)
+class ReferenceRanges:
+    masculino: UmbralesReferencia
+    femenino: UmbralesReferencia
+
+    def para_sexo(self, sexo: Optional[str]) -> UmbralesReferencia:
+        return self.femenino if sexo == SEXO_FEMENINO else self.masculino
+
+    @classmethod
+    def desde_config(cls, sustituciones: Optional[Mapping[str, Any]] = None, fuente=config) -> "ReferenceRanges":
+        """Construye los rangos desde las constantes de config. 'sustituciones' reemplaza
+        constantes por nombre (p. ej. {"SEPTUM_MAX_FEM": 9}); un nombre desconocido es un error."""
+        sustituciones = dict(sustituciones or {})
+        conocidas = {nombre + sufijo if campo in _POR_SEXO else nombre
+                     for campo, nombre in _CONSTANTES_CONFIG.items() for sufijo in _SUFIJOS_SEXO.values()}
+        desconocidas = set(sustituciones) - conocidas
+        if desconocidas:
+            raise ValueError(f"Valores de referencia desconocidos: {', '.join(sorted(desconocidas))}")
+
+        def _umbrales(sexo: str) -> UmbralesReferencia:
+            valores = {}
+            for campo, nombre in _CONSTANTES_CONFIG.items():
+                if campo in _POR_SEXO:
+                    nombre += _SUFIJOS_SEXO[sexo]
+                valores[campo] = sustituciones[nombre] if nombre in sustituciones else getattr(fuente, nombre)
+            return UmbralesReferencia(**valores)
+
+        return cls(masculino=_umbrales(SEXO_MASCULINO), femenino=_umbrales(SEXO_FEMENINO))
+
+    @classmethod
+    def desde_json(cls, ruta: str) -> "ReferenceRanges":
+        """Rangos de config con las sustituciones de un JSON {"CONSTANTE": valor, ...}."""
+        with open(ruta, encoding="utf-8") as f:
+            return cls.desde_config(json.load(f))
+
+
+RANGOS_REFERENCIA = ReferenceRanges.desde_config()
+UMBRALES_POR_DEFECTO = RANGOS_REFERENCIA.masculino # Sexo no especificado
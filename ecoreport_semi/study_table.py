@@ -0,0 +1,281 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento compacto de muchos estudios en memoria, para análisis de cohortes.
+
+Un InformeEcoCompleto son ~12 objetos con su propio __dict__ más un dict de flags;
+con 100k estudios eso son cientos de MB para unas pocas decenas de números. Aquí:
+
+- EstudioCompacto: un único objeto con __slots__ por estudio (un slot por campo,
+  flags "No Valorado" como máscara de bits).
+- StudyTable: una columna tipada por campo (array.array): float64 con NaN para las
+  medidas, int8 para booleanos y categorías (-1 = sin valor), int16 para los enteros
+  (-32768 = sin valor; -1 es un valor válido, p. ej. el código de error del grado VExUS)
+  y uint64 para la máscara de flags. Las columnas numéricas se exponen sin copia
+  (memoryview / numpy.frombuffer) y cada fila se puede reconstruir como
+  InformeEcoCompleto bajo demanda.
+
+Los códigos de los patrones VExUS son el índice en config.VSH_PATRONES / VP_PATRONES /
+VIR_PATRONES, los mismos que esperan los kernels de logic/calculos_vectorizados.py.
+"""
+import math
+from array import array
+from collections import namedtuple
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Union, get_args, get_origin
+
+import config
+from rangos_referencia import SEXOS
+from models import InformeEcoCompleto, CLAVES_NO_VALORADO
+
+# Tipos de columna
+F64 = "d"      # float64, NaN = None
+BOOL = "b"     # int8: 0/1 (-1 = None si el campo es Optional[bool])
+ENTERO = "h"   # int16, ENTERO_NULO = None
+ENTERO_NULO = -32768
+CATEGORIA = "c" # int8 con código de categoría, -1 = None (almacenado como array 'b')
+FECHA = "t"    # float64 con timestamp POSIX, NaN = None (almacenado como array 'd')
+TEXTO = "s"    # lista de str (texto libre, sin representación numérica)
+
+# Categorías conocidas de los campos de texto cerrados. Un valor no listado se añade
+# al final de la tabla de categorías (los códigos ya asignados no cambian).
+CATEGORIAS: Dict[str, List[str]] = {
+    "paciente.sexo": list(SEXOS),
+    "medidas_vi.fevi_cualitativa": ["Preservada", "Ligeramente Dep.", "Severamente Dep."],
+    "derrame_pleural.tipo_cuantificacion": ["Leve", "Moderado", "Severo"],
+    "derrame_pleural.localizacion": ["Derecho", "Izquierdo", "Bilateral"],
+    "vexus.patron_vena_suprahepatica": config.VSH_PATRONES,
+    "vexus.patron_vena_porta": config.VP_PATRONES,
+    "vexus.patron_vena_intrarrenal": config.VIR_PATRONES,
+}
+COLUMNA_FLAGS = "param_no_valorado_flags"
+
+Columna = namedtuple("Columna", "nombre submodelo campo tipo opcional atributo")
+
+
+def _tipo_columna(ruta: str, tipo) -> tuple:
+    opcional = False
+    if get_origin(tipo) is Union:
+        args = [a for a in get_args(tipo) if a is not type(None)]
+        opcional, tipo = True, args[0]
+    if ruta in CATEGORIAS:
+        return CATEGORIA, opcional
+    return {float: F64, bool: BOOL, int: ENTERO, datetime: FECHA}.get(tipo, TEXTO), opcional
+
+
+def _construir_esquema() -> tuple:
+    columnas = []
+    for f in fields(InformeEcoCompleto):
+        if f.name == COLUMNA_FLAGS:
+            continue
+        if is_dataclass(f.type):
+            for sub in fields(f.type):
+                ruta = f"{f.name}.{sub.name}"
+                columnas.append(Columna(ruta, f.name, sub.name, *_tipo_columna(ruta, sub.type), ruta.replace(".", "_")))
+        else:
+            columnas.append(Columna(f.name, None, f.name, *_tipo_columna(f.name, f.type), f.name))
+    return tuple(columnas)
+
+
+ESQUEMA = _construir_esquema()
+_COLUMNAS_POR_NOMBRE = {c.nombre: c for c in ESQUEMA}
+_BIT_FLAG = {clave: 1 << i for i, clave in enumerate(CLAVES_NO_VALORADO)}
+
+
+def flags_a_mascara(flags: Dict[str, bool]) -> int:
+    mascara = 0
+    for clave, valor in flags.items():
+        if valor and clave in _BIT_FLAG:
+            mascara |= _BIT_FLAG[clave]
+    return mascara
+
+
+def mascara_a_flags(mascara: int) -> Dict[str, bool]:
+    return {clave: True for clave, bit in _BIT_FLAG.items() if mascara & bit}
+
+
+def _leer_valores(informe: InformeEcoCompleto) -> Iterator[Any]:
+    for col in ESQUEMA:
+        origen = getattr(informe, col.submodelo) if col.submodelo else informe
+        yield getattr(origen, col.campo)
+
+
+def _construir_informe(valores: Iterable[Any], mascara_flags: int) -> InformeEcoCompleto:
+    kwargs: Dict[str, Any] = {}
+    submodelos: Dict[str, Dict[str, Any]] = {}
+    for col, valor in zip(ESQUEMA, valores):
+        if col.submodelo:
+            submodelos.setdefault(col.submodelo, {})[col.campo] = valor
+        else:
+            kwargs[col.campo] = valor
+    tipos = {f.name: f.type for f in fields(InformeEcoCompleto)}
+    for nombre, campos in submodelos.items():
+        kwargs[nombre] = tipos[nombre](**campos)
+    kwargs[COLUMNA_FLAGS] = mascara_a_flags(mascara_flags)
+    return InformeEcoCompleto(**kwargs)
+
+
+class EstudioCompacto:
+    """Un estudio en un único objeto con __slots__ (sin __dict__ ni sub-objetos).
+    Los atributos son las rutas del modelo con '_' (p. ej. medidas_vi_septo_iv_mm)."""
+    __slots__ = tuple(c.atributo for c in ESQUEMA) + ("flags_no_valorado",)
+
+    @classmethod
+    def desde_informe(cls, informe: InformeEcoCompleto) -> "EstudioCompacto":
+        registro = cls.__new__(cls)
+        for col, valor in zip(ESQUEMA, _leer_valores(informe)):
+            setattr(registro, col.atributo, valor)
+        registro.flags_no_valorado = flags_a_mascara(informe.param_no_valorado_flags)
+        return registro
+
+    def a_informe(self) -> InformeEcoCompleto:
+        return _construir_informe((getattr(self, c.atributo) for c in ESQUEMA), self.flags_no_valorado)
+
+
+class FilaEstudio:
+    """Vista sin copia de una fila de StudyTable; lee de las columnas al acceder."""
+    __slots__ = ("_tabla", "indice")
+
+    def __init__(self, tabla: "StudyTable", indice: int):
+        self._tabla = tabla
+        self.indice = indice
+
+    def __getitem__(self, nombre_columna: str) -> Any:
+        return self._tabla.valor(self.indice, nombre_columna)
+
+    def a_informe(self) -> InformeEcoCompleto:
+        return self._tabla.a_informe(self.indice)
+
+
+class StudyTable:
+    """Tabla columnar de estudios. Se llena con agregar()/extender() y se consulta por
+    columna (columna(), columna_numpy()) o por fila (fila(i), iteración)."""
+
+    def __init__(self):
+        self._columnas: Dict[str, Any] = {}
+        self._categorias: Dict[str, List[str]] = {}
+        self._codigos: Dict[str, Dict[str, int]] = {}
+        for col in ESQUEMA:
+            if col.tipo == TEXTO:
+                self._columnas[col.nombre] = []
+            elif col.tipo == CATEGORIA:
+                self._columnas[col.nombre] = array("b")
+                self._categorias[col.nombre] = list(CATEGORIAS[col.nombre])
+                self._codigos[col.nombre] = {v: i for i, v in enumerate(CATEGORIAS[col.nombre])}
+            else:
+                self._columnas[col.nombre] = array("d" if col.tipo == FECHA else col.tipo)
+        self._columnas[COLUMNA_FLAGS] = array("Q")
+        self._n = 0
+
+    @classmethod
+    def desde_informes(cls, informes: Iterable[InformeEcoCompleto]) -> "StudyTable":
+        tabla = cls()
+        tabla.extender(informes)
+        return tabla
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[FilaEstudio]:
+        return (FilaEstudio(self, i) for i in range(self._n))
+
+    # --- Codificación de valores ---
+    def _codificar(self, col: Columna, valor) -> Any:
+        if col.tipo == F64:
+            return math.nan if valor is None else float(valor)
+        if col.tipo == FECHA:
+            return math.nan if valor is None else valor.timestamp()
+        if col.tipo == BOOL:
+            return -1 if valor is None else int(valor)
+        if col.tipo == ENTERO:
+            return ENTERO_NULO if valor is None else int(valor)
+        if col.tipo == CATEGORIA:
+            if valor is None or valor == "":
+                return -1
+            codigos = self._codigos[col.nombre]
+            if valor not in codigos:
+                if len(codigos) >= 127:
+                    raise ValueError(f"Demasiadas categorías distintas en '{col.nombre}'")
+                codigos[valor] = len(self._categorias[col.nombre])
+                self._categorias[col.nombre].append(valor)
+            return codigos[valor]
+        return valor
+
+    def _decodificar(self, col: Columna, bruto) -> Any:
+        if col.tipo in (F64, FECHA):
+            if math.isnan(bruto):
+                return None
+            return datetime.fromtimestamp(bruto) if col.tipo == FECHA else bruto
+        if col.tipo == BOOL:
+            return None if bruto < 0 else bool(bruto)
+        if col.tipo == ENTERO:
+            return None if bruto == ENTERO_NULO else bruto
+        if col.tipo == CATEGORIA:
+            if bruto < 0:
+                return None if col.opcional else "" # p. ej. sexo no especificado
+            return self._categorias[col.nombre][bruto]
+        return bruto
+
+    # --- Escritura ---
+    def agregar(self, informe: InformeEcoCompleto) -> int:
+        """Añade un estudio y devuelve su índice de fila.
+        Si alguna columna numérica tiene una vista viva (columna(), columna_numpy()), lanza
+        BufferError y la tabla queda como estaba."""
+        fila = [(col.nombre, self._codificar(col, valor)) for col, valor in zip(ESQUEMA, _leer_valores(informe))]
+        fila.append((COLUMNA_FLAGS, flags_a_mascara(informe.param_no_valorado_flags)))
+        agregadas = []
+        try:
+            for nombre, valor in fila:
+                self._columnas[nombre].append(valor)
+                agregadas.append(nombre)
+        except BufferError:
+            # Las columnas ya ampliadas no tienen vistas (se acaban de modificar): se deshace
+            for nombre in agregadas:
+                self._columnas[nombre].pop()
+            raise BufferError("No se pueden añadir filas mientras haya vistas de columnas de la tabla "
+                              "(liberarlas con memoryview.release() o del)") from None
+        self._n += 1
+        return self._n - 1
+
+    def extender(self, informes: Iterable[InformeEcoCompleto]):
+        for informe in informes:
+            self.agregar(informe)
+
+    # --- Lectura ---
+    def categorias(self, nombre_columna: str) -> List[str]:
+        """Etiquetas de una columna categórica, indexadas por código."""
+        return list(self._categorias[nombre_columna])
+
+    def columna(self, nombre_columna: str):
+        """Columna sin copia: memoryview para columnas numéricas, lista para texto.
+        Mientras el memoryview exista, agregar() lanza BufferError; liberarlo con release()."""
+        datos = self._columnas[nombre_columna]
+        return datos if isinstance(datos, list) else memoryview(datos)
+
+    def columna_numpy(self, nombre_columna: str):
+        """Columna como array de NumPy que comparte memoria con la tabla (requiere NumPy).
+        Mientras el array exista, agregar() lanza BufferError; copiarlo (np.array) si hay
+        que seguir añadiendo filas."""
+        import numpy as np
+        return np.frombuffer(self._columnas[nombre_columna], dtype=self._columnas[nombre_columna].typecode)
+
+    def valor(self, indice: int, nombre_columna: str) -> Any:
+        if nombre_columna == COLUMNA_FLAGS:
+            return mascara_a_flags(self._columnas[COLUMNA_FLAGS][indice])
+        col = _COLUMNAS_POR_NOMBRE[nombre_columna]
+        return self._decodificar(col, self._columnas[nombre_columna][indice])
+
+    def fila(self, indice: int) -> FilaEstudio:
+        if not -self._n <= indice < self._n:
+            raise IndexError(indice)
+        return FilaEstudio(self, indice % self._n)
+
+    def a_informe(self, indice: int) -> InformeEcoCompleto:
+        valores = (self._decodificar(col, self._columnas[col.nombre][indice]) for col in ESQUEMA)
+        return _construir_informe(valores, self._columnas[COLUMNA_FLAGS][indice])
+
+    def bytes_columnas(self) -> int:
+        """Memoria ocupada por los buffers de las columnas numéricas (sin el texto libre)."""
+        return sum(d.itemsize * len(d) for d in self._columnas.values() if isinstance(d, array))
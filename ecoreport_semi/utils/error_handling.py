@@ -3,23 +3,106 @@
 # -*- coding: utf-8 -*-
 """
 Utilidades para el manejo de errores y logging en EcoReport SEMI.
+Este módulo no depende de PyQt5: el núcleo (models, logic/*) lo importa también en
+modo sin interfaz. Qt solo se importa al mostrar el diálogo de error global.
 """
 import sys
 import traceback
 import logging
 import os
-from PyQt5.QtWidgets import QMessageBox
-import config # Para LOG_FILE_PATH
+import atexit
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+import config # Para LOG_FILE_PATH y niveles / intervalo de volcado del log
+
+# El registro es asíncrono: log_message solo encola el mensaje (QueueHandler) y un hilo
+# escritor lo pasa al fichero y a la consola, volcando a disco cada
+# config.LOG_INTERVALO_FLUSH_S segundos en lugar de en cada mensaje. Los niveles por
+# debajo de los configurados se descartan antes de crear el registro.
 
 _logger = None
+_escritor = None # _EscritorLogEnCola activo (None si el log es síncrono)
+
+_NIVELES = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+
+def _nivel_configurado(nombre: str, por_defecto: int) -> int:
+    nivel = logging.getLevelName(nombre)
+    return nivel if isinstance(nivel, int) else por_defecto
+
+
+_NIVEL_ARCHIVO = _nivel_configurado(config.LOG_NIVEL_ARCHIVO, logging.DEBUG)
+_NIVEL_CONSOLA = _nivel_configurado(config.LOG_NIVEL_CONSOLA, logging.INFO)
+_NIVEL_MINIMO = min(_NIVEL_ARCHIVO, _NIVEL_CONSOLA)
+
+
+class _VolcadoDiferido:
+    """Mixin para StreamHandler/FileHandler: emit() ya no vuelca a disco en cada mensaje;
+    lo hace el escritor periódicamente con volcar(). Con diferir=False vuelve al
+    comportamiento normal (volcado inmediato)."""
+    diferir = True
+
+    def flush(self):
+        if not self.diferir:
+            self.volcar()
+
+    def volcar(self):
+        logging.StreamHandler.flush(self)
+
+    def close(self):
+        self.volcar()
+        super().close()
+
+
+class _ArchivoConVolcadoDiferido(_VolcadoDiferido, logging.FileHandler):
+    pass
+
+
+class _ConsolaConVolcadoDiferido(_VolcadoDiferido, logging.StreamHandler):
+    pass
+
+
+class _EscritorLogEnCola(QueueListener):
+    """Hilo escritor: saca los registros de la cola, los pasa a los manejadores reales
+    y vuelca sus búferes como mucho cada intervalo_flush segundos."""
+
+    def __init__(self, cola, manejadores, intervalo_flush: float):
+        super().__init__(cola, *manejadores, respect_handler_level=True)
+        self.intervalo_flush = intervalo_flush
+        self._ultimo_volcado = time.monotonic()
+
+    def dequeue(self, block):
+        while True:
+            restante = self._ultimo_volcado + self.intervalo_flush - time.monotonic()
+            if restante <= 0:
+                self.volcar()
+                restante = self.intervalo_flush
+            try:
+                return self.queue.get(block, timeout=restante)
+            except queue.Empty:
+                if not block:
+                    raise
+
+    def volcar(self):
+        for manejador in self.handlers:
+            manejador.volcar()
+        self._ultimo_volcado = time.monotonic()
+
 
 def _get_logger():
-    global _logger
+    global _logger, _escritor
     if _logger is None:
         # --- INICIO: Marcador para localización de errores (Config Logger) ---
         try:
             _logger = logging.getLogger("EcoReportSEMI")
-            _logger.setLevel(logging.DEBUG) # Nivel mínimo para capturar todo
+            _logger.setLevel(_NIVEL_MINIMO) # Lo que quede por debajo no llega a crear registro
 
             # Evitar añadir manejadores múltiples si se llama varias veces (aunque no debería)
             if not _logger.handlers:
@@ -28,17 +111,28 @@ def _get_logger():
                     "%(asctime)s [%(levelname)-8s] %(module)-15s:%(lineno)-4d - %(message)s"
                 )
                 
-                # Manejador para archivo
-                file_handler = logging.FileHandler(config.LOG_FILE_PATH, encoding='utf-8', mode='a')
+                # Manejador para archivo (el directorio se crea aquí, no al importar config)
+                log_file_path = config.preparar_directorio_logs()
+                file_handler = _ArchivoConVolcadoDiferido(log_file_path, encoding='utf-8', mode='a')
                 file_handler.setFormatter(formatter)
-                file_handler.setLevel(logging.DEBUG) # Loguear todo a archivo
-                _logger.addHandler(file_handler)
+                file_handler.setLevel(_NIVEL_ARCHIVO)
 
                 # Manejador para consola (opcional, para desarrollo)
-                console_handler = logging.StreamHandler(sys.stdout)
+                console_handler = _ConsolaConVolcadoDiferido(sys.stdout)
                 console_handler.setFormatter(formatter)
-                console_handler.setLevel(logging.INFO) # Loguear INFO y superior a consola
-                _logger.addHandler(console_handler)
+                console_handler.setLevel(_NIVEL_CONSOLA)
+
+                manejadores = (file_handler, console_handler)
+                if config.LOG_INTERVALO_FLUSH_S > 0:
+                    cola = queue.SimpleQueue()
+                    _logger.addHandler(QueueHandler(cola))
+                    _escritor = _EscritorLogEnCola(cola, manejadores, config.LOG_INTERVALO_FLUSH_S)
+                    _escritor.start()
+                    _volcar_tambien_al_salir_de_multiprocessing()
+                else: # Intervalo 0: log síncrono, como antes
+                    for manejador in manejadores:
+                        manejador.diferir = False
+                        _logger.addHandler(manejador)
             
             _logger.info(f"Logger 'EcoReportSEMI' configurado. Log en: {config.LOG_FILE_PATH}")
         except Exception as e:
@@ -51,19 +145,69 @@ def _get_logger():
         # --- FIN: Marcador para localización de errores (Config Logger) ---
     return _logger
 
+
+def detener_logging():
+    """Escribe todo lo pendiente en la cola, vuelca a disco y pasa el log a modo síncrono
+    (los mensajes posteriores se escriben directamente). Se llama al cerrar la ventana
+    principal y, por si acaso, al salir del intérprete."""
+    global _escritor
+    if _escritor is None:
+        return
+    escritor, _escritor = _escritor, None
+    # --- INICIO: Marcador para localización de errores (Detener Logging) ---
+    try:
+        escritor.stop() # Procesa los registros que queden en la cola y para el hilo
+        for manejador in escritor.handlers:
+            manejador.diferir = False
+            manejador.volcar()
+        for manejador in list(_logger.handlers):
+            if isinstance(manejador, QueueHandler):
+                _logger.removeHandler(manejador)
+        for manejador in escritor.handlers:
+            _logger.addHandler(manejador)
+    except Exception as e:
+        print(f"CRITICAL: Error deteniendo el escritor de log: {e}\n{traceback.format_exc()}")
+    # --- FIN: Marcador para localización de errores (Detener Logging) ---
+
+
+def _volcar_tambien_al_salir_de_multiprocessing():
+    # Los procesos hijos de multiprocessing (fork) terminan con os._exit y no ejecutan
+    # atexit; sus finalizadores sí se ejecutan.
+    mp_util = sys.modules.get("multiprocessing.util")
+    if mp_util is not None:
+        mp_util.Finalize(None, detener_logging, exitpriority=10)
+
+
+def _volcar_antes_de_fork():
+    if _escritor is not None:
+        _escritor.volcar()
+
+
+def _reiniciar_en_proceso_hijo():
+    # El hilo escritor no existe en el proceso hijo (p. ej. procesos de batch.py):
+    # se descarta el logger heredado y se crea uno propio en el primer mensaje.
+    global _logger, _escritor
+    if _logger is not None:
+        for manejador in list(_logger.handlers):
+            _logger.removeHandler(manejador)
+    _logger = None
+    _escritor = None
+
+
+atexit.register(detener_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_volcar_antes_de_fork, after_in_child=_reiniciar_en_proceso_hijo)
+
+
 def log_message(message: str, level: str = "info", exc_info=False):
-    """Registra un mensaje usando el logger de la aplicación."""
-    logger = _get_logger()
-    if level == "debug":
-        logger.debug(message, exc_info=exc_info)
-    elif level == "info":
-        logger.info(message, exc_info=exc_info)
-    elif level == "warning":
-        logger.warning(message, exc_info=exc_info)
-    elif level == "error":
-        logger.error(message, exc_info=exc_info)
-    elif level == "critical":
-        logger.critical(message, exc_info=exc_info)
+    """Registra un mensaje usando el logger de la aplicación. No bloquea en E/S: el
+    mensaje se encola y lo escribe el hilo escritor. Los niveles desactivados se
+    descartan aquí mismo, sin tocar el logger."""
+    nivel = _NIVELES.get(level)
+    if nivel is None or nivel < _NIVEL_MINIMO:
+        return
+    # stacklevel=2: %(module)s y %(lineno)d se refieren a quien llama a log_message
+    _get_logger().log(nivel, message, exc_info=exc_info, stacklevel=2)
 
 def _handle_exception(exc_type, exc_value, exc_traceback):
     """Manejador para excepciones no capturadas (sys.excepthook)."""
@@ -100,7 +244,11 @@ def _handle_exception(exc_type, exc_value, exc_traceback):
     # Sin embargo, si QApplication ya está corriendo, es generalmente seguro.
     # Para mayor robustez, se podría emitir una señal a la ventana principal para que ella muestre el diálogo.
     # Aquí asumimos que QApplication está activo.
-    if QMessageBox is not None: # Verificar si el módulo está disponible
+    try:
+        from PyQt5.QtWidgets import QApplication, QMessageBox # Import diferido: solo en modo GUI
+    except ImportError:
+        QApplication = QMessageBox = None
+    if QMessageBox is not None and QApplication.instance() is not None: # Verificar si hay GUI activa
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Critical)
         msg_box.setWindowTitle("Error Crítico en la Aplicación")
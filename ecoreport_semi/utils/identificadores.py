@@ -0,0 +1,87 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Identificadores de estudio únicos y ordenables por tiempo (formato ULID).
+
+Cada identificador son 128 bits: 48 de milisegundos desde 1970 y 80 aleatorios, en 26
+caracteres de base 32 de Crockford, de modo que el orden alfabético es el cronológico.
+Dentro de un mismo milisegundo (o si el reloj retrocede) no se sortean bits nuevos: la
+parte aleatoria del anterior se incrementa en 1, así que los identificadores de un
+proceso son estrictamente crecientes y generarlos en bloque no llama a os.urandom cada vez.
+
+Procesos distintos (o equipos distintos) parten de valores aleatorios independientes
+en cada milisegundo; que dos coincidan tiene probabilidad del orden de 2^-80. Un proceso
+creado con fork hereda el estado del padre, por lo que se reinicia tras el fork: sin eso,
+padre e hijo continuarían la misma secuencia.
+"""
+import os
+import threading
+import time
+
+PREFIJO_INFORME = "ECO-"
+LONGITUD_ULID = 26
+
+_ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ" # Crockford: sin I, L, O ni U
+# Se codifica de 10 en 10 bits (pares de caracteres): la marca de tiempo ocupa 10 caracteres
+# (48 bits con dos ceros a la izquierda) y la parte aleatoria los 16 restantes
+_PARES = tuple(a + b for a in _ALFABETO for b in _ALFABETO)
+_DESPLAZAMIENTOS_TIEMPO = (40, 30, 20, 10, 0)
+_DESPLAZAMIENTOS_ALEATORIOS = (70, 60, 50, 40, 30, 20, 10, 0)
+_BITS_ALEATORIOS = 80
+_MAXIMO_ALEATORIO = (1 << _BITS_ALEATORIOS) - 1
+
+_cerrojo = threading.Lock()
+_ultimo_ms = -1
+_ultimo_aleatorio = 0
+_prefijo_tiempo = "" # Codificación de _ultimo_ms, que solo cambia una vez por milisegundo
+
+
+def _codificar(valor: int, desplazamientos) -> str:
+    return "".join([_PARES[(valor >> d) & 0x3FF] for d in desplazamientos])
+
+
+def nuevo_ulid() -> str:
+    """ULID de 26 caracteres, mayor que cualquier otro generado antes en este proceso."""
+    global _ultimo_ms, _ultimo_aleatorio, _prefijo_tiempo
+    ms = time.time_ns() // 1_000_000
+    with _cerrojo:
+        if ms <= _ultimo_ms:
+            _ultimo_aleatorio += 1
+            if _ultimo_aleatorio <= _MAXIMO_ALEATORIO:
+                return _prefijo_tiempo + _codificar(_ultimo_aleatorio, _DESPLAZAMIENTOS_ALEATORIOS)
+            # 2^79 identificadores en el mismo milisegundo: se toma prestado el siguiente
+            ms = _ultimo_ms + 1
+        # La mitad superior queda libre para incrementar sin desbordar en la práctica
+        _ultimo_aleatorio = int.from_bytes(os.urandom(10), "big") >> 1
+        _ultimo_ms = ms
+        _prefijo_tiempo = _codificar(ms, _DESPLAZAMIENTOS_TIEMPO)
+        return _prefijo_tiempo + _codificar(_ultimo_aleatorio, _DESPLAZAMIENTOS_ALEATORIOS)
+
+
+def nuevo_id_informe() -> str:
+    return PREFIJO_INFORME + nuevo_ulid()
+
+
+def milisegundos_ulid(ulid: str) -> int:
+    """Marca de tiempo (ms desde 1970) de un ULID, o de un id_informe con prefijo."""
+    if ulid.startswith(PREFIJO_INFORME):
+        ulid = ulid[len(PREFIJO_INFORME):]
+    if len(ulid) != LONGITUD_ULID:
+        raise ValueError(f"ULID no válido: {ulid!r}")
+    valor = 0
+    for caracter in ulid.upper():
+        valor = (valor << 5) | _ALFABETO.index(caracter)
+    return valor >> _BITS_ALEATORIOS
+
+
+def _reiniciar_tras_fork():
+    global _cerrojo, _ultimo_ms, _ultimo_aleatorio, _prefijo_tiempo
+    _cerrojo = threading.Lock()
+    _ultimo_ms = -1
+    _ultimo_aleatorio = 0
+    _prefijo_tiempo = ""
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
@@ -0,0 +1,195 @@
+# Creado por Alejandro Venegas Robles.
+# En caso de incidencias, contactar con alejandro2196vr@gmail.com
+# -*- coding: utf-8 -*-
+"""
+Perfilado opcional: número de llamadas y tiempos por función o bloque de código.
+
+Se activa con la variable de entorno ECOREPORT_PERFIL=1 o con el argumento --profile
+(config.PERFILADO_ACTIVO, leído al importar). Desactivado no cuesta nada: @perfilar()
+devuelve la misma función sin envolver y medir() un contexto nulo compartido.
+
+Activado, cada medida acumula llamadas, tiempo total/mínimo/máximo y un histograma
+por potencias de 2 de microsegundos (cubeta k = [2^(k-1), 2^k) µs), que se puede sumar
+entre procesos (extraer/combinar). Al salir se escribe resumen() en JSON en
+config.PERFIL_SALIDA (por defecto, perfil_<fecha>.json junto al log). En la GUI,
+Ctrl+Mayús+P muestra las medidas en curso (gui/perfil_dialog.py).
+"""
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Optional
+
+import config
+
+ACTIVO = config.PERFILADO_ACTIVO
+CUBETAS = 32 # La última acumula todo lo que pase de 2^30 µs
+
+_medidas: Dict[str, "_Medida"] = {}
+_cerrojo = threading.Lock() # La previsualización genera informes en otro hilo
+_CONTEXTO_NULO = nullcontext()
+
+
+class _Medida:
+    __slots__ = ("llamadas", "total_ns", "min_ns", "max_ns", "histograma")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.histograma = [0] * CUBETAS
+
+    def anadir(self, ns: int):
+        self.llamadas += 1
+        self.total_ns += ns
+        self.min_ns = ns if self.min_ns is None else min(self.min_ns, ns)
+        self.max_ns = max(self.max_ns, ns)
+        self.histograma[min((ns // 1000).bit_length(), CUBETAS - 1)] += 1
+
+    def percentil_us(self, q: float) -> float:
+        """Límite superior de la cubeta que contiene el percentil q (aproximado por exceso)."""
+        objetivo = q * self.llamadas
+        acumulado = 0
+        for k, n in enumerate(self.histograma):
+            acumulado += n
+            if n and acumulado >= objetivo:
+                return float(2 ** k)
+        return float(2 ** (CUBETAS - 1))
+
+
+def registrar(nombre: str, ns: int):
+    with _cerrojo:
+        medida = _medidas.get(nombre)
+        if medida is None:
+            medida = _medidas[nombre] = _Medida()
+        medida.anadir(ns)
+
+
+def perfilar(nombre: Optional[str] = None):
+    """Decorador. Sin nombre, la medida se llama 'modulo.Clase.funcion'."""
+    def decorador(funcion):
+        if not ACTIVO:
+            return funcion
+        clave = nombre or f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @functools.wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            inicio = time.perf_counter_ns()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar(clave, time.perf_counter_ns() - inicio)
+        return envoltorio
+    return decorador
+
+
+@contextmanager
+def _medir_activo(nombre: str):
+    inicio = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        registrar(nombre, time.perf_counter_ns() - inicio)
+
+
+def medir(nombre: str):
+    """Contexto 'with medir("escritura.pdf"):' para bloques que no son una función."""
+    return _medir_activo(nombre) if ACTIVO else _CONTEXTO_NULO
+
+
+def _etiqueta_cubeta(k: int) -> str:
+    if k == 0:
+        return "<1us"
+    if k == CUBETAS - 1:
+        return f">={2 ** (k - 1)}us"
+    return f"{2 ** (k - 1)}-{2 ** k}us"
+
+
+def resumen() -> dict:
+    """Medidas acumuladas, de mayor a menor tiempo total. Los tiempos en µs salvo total_ms."""
+    with _cerrojo:
+        medidas = sorted(_medidas.items(), key=lambda item: item[1].total_ns, reverse=True)
+        return {nombre: {
+            "llamadas": m.llamadas,
+            "total_ms": round(m.total_ns / 1e6, 3),
+            "media_us": round(m.total_ns / m.llamadas / 1e3, 2),
+            "min_us": round(m.min_ns / 1e3, 2),
+            "max_us": round(m.max_ns / 1e3, 2),
+            "p50_us": m.percentil_us(0.50),
+            "p99_us": m.percentil_us(0.99),
+            "histograma": {_etiqueta_cubeta(k): n for k, n in enumerate(m.histograma) if n},
+        } for nombre, m in medidas}
+
+
+def reiniciar():
+    with _cerrojo:
+        _medidas.clear()
+
+
+def extraer() -> dict:
+    """Medidas en bruto (serializables) y vacía el registro; para enviarlas desde un
+    proceso del pool al principal, que las suma con combinar()."""
+    with _cerrojo:
+        crudo = {nombre: (m.llamadas, m.total_ns, m.min_ns, m.max_ns, m.histograma) for nombre, m in _medidas.items()}
+        _medidas.clear()
+    return crudo
+
+
+def combinar(crudo: dict):
+    with _cerrojo:
+        for nombre, (llamadas, total_ns, min_ns, max_ns, histograma) in crudo.items():
+            medida = _medidas.get(nombre)
+            if medida is None:
+                medida = _medidas[nombre] = _Medida()
+            medida.llamadas += llamadas
+            medida.total_ns += total_ns
+            medida.min_ns = min_ns if medida.min_ns is None else min(medida.min_ns, min_ns)
+            medida.max_ns = max(medida.max_ns, max_ns)
+            medida.histograma = [a + b for a, b in zip(medida.histograma, histograma)]
+
+
+def _reiniciar_tras_fork():
+    # El cerrojo podía estar tomado por otro hilo del padre en el momento del fork
+    global _cerrojo
+    _cerrojo = threading.Lock()
+    _medidas.clear()
+
+
+def volcar_resumen(ruta: Optional[str] = None) -> str:
+    """Escribe el resumen en JSON y devuelve la ruta."""
+    if ruta is None:
+        ruta = config.PERFIL_SALIDA
+    if ruta is None:
+        config.preparar_directorio_logs()
+        ruta = os.path.join(config.LOG_DIR, f"perfil_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(carpeta, exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"fecha": datetime.now().isoformat(timespec="seconds"), "pid": os.getpid(),
+                   "medidas": resumen()}, f, indent=2, ensure_ascii=False)
+    return ruta
+
+
+def _volcar_al_salir():
+    # Solo el proceso principal: los del pool envían sus medidas con extraer()
+    if multiprocessing.parent_process() is not None or not _medidas:
+        return
+    try:
+        ruta = volcar_resumen()
+        print(f"Perfil de rendimiento guardado en: {ruta}")
+    except OSError as e:
+        print(f"No se pudo guardar el perfil de rendimiento: {e}")
+
+
+if ACTIVO:
+    atexit.register(_volcar_al_salir)
+    # Un proceso creado con fork hereda las medidas del padre: empieza de cero (en Windows
+    # no hay fork y los procesos de multiprocessing arrancan ya vacíos)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_reiniciar_tras_fork)